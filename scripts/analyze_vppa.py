@@ -21,8 +21,10 @@ VPPA 分析腳本
 import sys
 import json
 import argparse
+from contextlib import nullcontext
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
+from typing import ContextManager, Optional
 
 # 將專案根目錄加入 Python 路徑
 project_root = Path(__file__).parent.parent
@@ -93,7 +95,8 @@ def update_db_to_now(
     symbol: str,
     timeframe: str,
     cache: SQLiteCacheManager,
-    client: ChipWhispererMT5Client
+    client: ChipWhispererMT5Client,
+    mt5_lock: Optional[ContextManager] = None
 ) -> int:
     """
     補充 DB 數據到目前為止
@@ -103,6 +106,7 @@ def update_db_to_now(
         timeframe: 時間週期
         cache: SQLite 快取管理器
         client: MT5 客戶端
+        mt5_lock: 呼叫 MT5 終端機時持有的鎖（多執行緒共用終端機時使用，寫入 DB 時不持有）
 
     回傳：
         新增的數據筆數
@@ -127,12 +131,13 @@ def update_db_to_now(
     logger.info(f"補充數據：{from_time} ~ {to_time}")
 
     # 從 MT5 取得數據
-    rates = mt5.copy_rates_range(
-        symbol,
-        tf_constant,
-        from_time,
-        to_time
-    )
+    with mt5_lock or nullcontext():
+        rates = mt5.copy_rates_range(
+            symbol,
+            tf_constant,
+            from_time,
+            to_time
+        )
 
     if rates is None or len(rates) == 0:
         logger.info("無新數據需要補充")
@@ -156,7 +161,8 @@ def fetch_data(
     timeframe: str,
     count: int,
     cache: SQLiteCacheManager,
-    client: ChipWhispererMT5Client
+    client: ChipWhispererMT5Client,
+    mt5_lock: Optional[ContextManager] = None
 ) -> pd.DataFrame:
     """
     取得 K 線數據（優先從 DB，不足則從 MT5 補充）
@@ -167,29 +173,29 @@ def fetch_data(
         count: 需要的 K 線數量
         cache: SQLite 快取管理器
         client: MT5 客戶端
+        mt5_lock: 呼叫 MT5 終端機時持有的鎖（多執行緒共用終端機時使用，寫入 DB 時不持有）
 
     回傳：
         K 線 DataFrame
     """
     tf_constant = TIMEFRAME_MAP[timeframe]
-    tf_minutes = TIMEFRAME_MINUTES[timeframe]
 
-    # 先從 DB 取得數據
-    end_time = datetime.now(timezone.utc)
-    start_time = end_time - timedelta(minutes=tf_minutes * count * 2)  # 多取一些以確保足夠
+    # DB 最新 K 線落後超過一個週期時先補到最新（筆數足夠不代表是最新資料）
+    if cache.is_stale(symbol, timeframe):
+        update_db_to_now(symbol, timeframe, cache, client, mt5_lock=mt5_lock)
 
-    df = cache.query_candles(symbol, timeframe, start_time, end_time)
+    # 先從 DB 取得最新的 count 筆數據（舊到新）
+    df = cache.query_latest(symbol, timeframe, count)
 
     if df is not None and len(df) >= count:
         logger.info(f"從 DB 取得 {len(df)} 筆數據")
-        # 取最新的 count 筆
-        df = df.sort_values('time', ascending=True).tail(count).reset_index(drop=True)
         return df
 
     # DB 數據不足，從 MT5 取得
     logger.info(f"DB 數據不足（{len(df) if df is not None else 0} 筆），從 MT5 補充")
 
-    rates = mt5.copy_rates_from_pos(symbol, tf_constant, 0, count)
+    with mt5_lock or nullcontext():
+        rates = mt5.copy_rates_from_pos(symbol, tf_constant, 0, count)
 
     if rates is None or len(rates) == 0:
         raise RuntimeError(f"無法從 MT5 取得 {symbol} {timeframe} 數據")
@@ -2,129 +2,94 @@
 """
 歷史數據批次回填腳本
 
-此腳本會對指定的商品不斷往回抓取指定週期的數據，直到沒有更多數據為止，
-並將所有數據保存到 SQLite 資料庫中。
+此腳本會對指定的商品 × 時間週期矩陣不斷往回抓取數據，直到沒有更多數據為止，
+並將所有數據保存到 SQLite 資料庫中。MT5 抓取與資料庫寫入分別在兩個執行緒
+以有界佇列管線化進行，進度檢查點保存在資料庫中，中斷後重新執行即可續抓。
 
 使用方式：
     python scripts/backfill_data.py GOLD
-    python scripts/backfill_data.py GOLD --timeframe M5
+    python scripts/backfill_data.py GOLD SILVER EURUSD --timeframe M1,M5,H1
     python scripts/backfill_data.py GOLD --timeframe H1 --batch-size 5000
     python scripts/backfill_data.py GOLD --db-path data/my_cache.db
+    python scripts/backfill_data.py GOLD --restart
 """
 
 import sys
 import argparse
-from datetime import datetime, timezone, timedelta
 from pathlib import Path
+from typing import List
 
 # 將專案根目錄加入 Python 路徑
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 import MetaTrader5 as mt5
-import pandas as pd
 from loguru import logger
 
 from src.core.mt5_config import MT5Config
 from src.core.mt5_client import ChipWhispererMT5Client
 from src.core.sqlite_cache import SQLiteCacheManager
+from src.core.backfill import BackfillOrchestrator
+
+
+def _select_symbols(symbols: List[str]) -> List[str]:
+    """
+    驗證並啟用商品，回傳可回填的商品列表
+
+    參數：
+        symbols: 商品代碼列表
+
+    回傳：
+        存在且已啟用的商品代碼列表
+    """
+    selected = []
+
+    for symbol in symbols:
+        symbol_info = mt5.symbol_info(symbol)
+        if symbol_info is None:
+            logger.error(f"商品不存在，略過：{symbol}")
+            continue
+
+        if not symbol_info.visible:
+            if not mt5.symbol_select(symbol, True):
+                logger.error(f"無法啟用商品，略過：{symbol}")
+                continue
+            logger.info(f"已啟用商品：{symbol}")
 
+        selected.append(symbol)
 
-# MT5 時間週期對應表
-TIMEFRAME_MAP = {
-    'M1': mt5.TIMEFRAME_M1,      # 1 分鐘
-    'M2': mt5.TIMEFRAME_M2,      # 2 分鐘
-    'M3': mt5.TIMEFRAME_M3,      # 3 分鐘
-    'M4': mt5.TIMEFRAME_M4,      # 4 分鐘
-    'M5': mt5.TIMEFRAME_M5,      # 5 分鐘
-    'M6': mt5.TIMEFRAME_M6,      # 6 分鐘
-    'M10': mt5.TIMEFRAME_M10,    # 10 分鐘
-    'M12': mt5.TIMEFRAME_M12,    # 12 分鐘
-    'M15': mt5.TIMEFRAME_M15,    # 15 分鐘
-    'M20': mt5.TIMEFRAME_M20,    # 20 分鐘
-    'M30': mt5.TIMEFRAME_M30,    # 30 分鐘
-    'H1': mt5.TIMEFRAME_H1,      # 1 小時
-    'H2': mt5.TIMEFRAME_H2,      # 2 小時
-    'H3': mt5.TIMEFRAME_H3,      # 3 小時
-    'H4': mt5.TIMEFRAME_H4,      # 4 小時
-    'H6': mt5.TIMEFRAME_H6,      # 6 小時
-    'H8': mt5.TIMEFRAME_H8,      # 8 小時
-    'H12': mt5.TIMEFRAME_H12,    # 12 小時
-    'D1': mt5.TIMEFRAME_D1,      # 日線
-    'W1': mt5.TIMEFRAME_W1,      # 週線
-    'MN1': mt5.TIMEFRAME_MN1,    # 月線
-}
-
-# 時間週期對應的分鐘數（用於計算時間偏移）
-TIMEFRAME_MINUTES = {
-    'M1': 1,
-    'M2': 2,
-    'M3': 3,
-    'M4': 4,
-    'M5': 5,
-    'M6': 6,
-    'M10': 10,
-    'M12': 12,
-    'M15': 15,
-    'M20': 20,
-    'M30': 30,
-    'H1': 60,
-    'H2': 120,
-    'H3': 180,
-    'H4': 240,
-    'H6': 360,
-    'H8': 480,
-    'H12': 720,
-    'D1': 1440,
-    'W1': 10080,
-    'MN1': 43200,
-}
+    return selected
 
 
 def backfill_data(
-    symbol: str,
-    timeframe: str = "M1",
+    symbols: List[str],
+    timeframes: List[str],
     db_path: str = "data/candles.db",
     batch_size: int = 10000,
-    max_retries: int = 3
-) -> dict:
+    max_retries: int = 3,
+    write_batch_size: int = SQLiteCacheManager.BULK_BATCH_SIZE,
+    queue_size: int = 4,
+    restart: bool = False
+) -> List[dict]:
     """
-    批次回填歷史數據
+    批次回填商品 × 時間週期矩陣的歷史數據
 
     參數：
-        symbol: 商品代碼（例如 'GOLD', 'EURUSD'）
-        timeframe: 時間週期（例如 'M1', 'M5', 'H1', 'D1'）
+        symbols: 商品代碼列表（例如 ['GOLD', 'EURUSD']）
+        timeframes: 時間週期列表（例如 ['M1', 'H1']）
         db_path: SQLite 資料庫路徑
         batch_size: 每次請求的 K 線數量
         max_retries: 失敗時的最大重試次數
+        write_batch_size: 寫入資料庫時每個交易的筆數
+        queue_size: 抓取與寫入之間的佇列上限（批次數）
+        restart: 是否忽略檢查點，從現在重新往回抓
 
     回傳：
-        包含統計資訊的字典
+        每個商品、週期的統計字典列表
     """
-    # 驗證時間週期
-    timeframe = timeframe.upper()
-    if timeframe not in TIMEFRAME_MAP:
-        raise ValueError(f"無效的時間週期：{timeframe}，支援的週期：{', '.join(TIMEFRAME_MAP.keys())}")
-
-    tf_constant = TIMEFRAME_MAP[timeframe]
-    tf_minutes = TIMEFRAME_MINUTES[timeframe]
-
-    # 統計資訊
-    stats = {
-        'symbol': symbol,
-        'timeframe': timeframe,
-        'total_records': 0,
-        'batches_fetched': 0,
-        'oldest_time': None,
-        'newest_time': None,
-        'start_time': datetime.now(),
-        'end_time': None,
-        'status': 'running'
-    }
-
     logger.info(f"=" * 60)
-    logger.info(f"開始回填 {symbol} {timeframe} 歷史數據")
-    logger.info(f"批次大小：{batch_size}，資料庫：{db_path}")
+    logger.info(f"開始回填 {', '.join(symbols)} × {', '.join(timeframes)} 歷史數據")
+    logger.info(f"批次大小：{batch_size}，佇列上限：{queue_size}，資料庫：{db_path}")
     logger.info(f"=" * 60)
 
     # 初始化 MT5 連線
@@ -135,126 +100,39 @@ def backfill_data(
         client.connect()
         logger.info("MT5 連線成功")
 
-        # 驗證商品
-        symbol_info = mt5.symbol_info(symbol)
-        if symbol_info is None:
-            raise ValueError(f"商品不存在：{symbol}")
-
-        if not symbol_info.visible:
-            if not mt5.symbol_select(symbol, True):
-                raise ValueError(f"無法啟用商品：{symbol}")
-            logger.info(f"已啟用商品：{symbol}")
+        selected = _select_symbols(symbols)
+        if not selected:
+            raise ValueError(f"沒有可回填的商品：{', '.join(symbols)}")
 
         # 初始化 SQLite 快取
-        cache = SQLiteCacheManager(db_path)
-        logger.info(f"SQLite 快取已初始化：{db_path}")
-
-        # 檢查現有數據的最早時間
-        existing_oldest = cache.get_oldest_time(symbol, timeframe)
-        if existing_oldest:
-            logger.info(f"資料庫中已有數據，最早時間：{existing_oldest}")
-            # 從現有最早時間往前抓
-            current_end_time = existing_oldest
-        else:
-            logger.info("資料庫中無現有數據，從現在開始往回抓")
-            current_end_time = datetime.now(timezone.utc)
-
-        # 開始批次抓取
-        consecutive_empty = 0
-        max_consecutive_empty = 3  # 連續空結果次數上限
-
-        while consecutive_empty < max_consecutive_empty:
-            retry_count = 0
-
-            while retry_count < max_retries:
-                try:
-                    # 從指定時間往前抓取
-                    logger.info(f"抓取批次 {stats['batches_fetched'] + 1}：{current_end_time} 往前 {batch_size} 根")
-
-                    rates = mt5.copy_rates_from(
-                        symbol,
-                        tf_constant,
-                        current_end_time,
-                        batch_size
-                    )
-
-                    if rates is None or len(rates) == 0:
-                        error = mt5.last_error()
-                        if error[0] == 1:  # 無更多數據
-                            logger.info(f"已無更多歷史數據（MT5 回傳空結果）")
-                            consecutive_empty += 1
-                            # 往前推一段時間再試
-                            current_end_time = current_end_time - timedelta(days=30)
-                            break
-                        else:
-                            raise RuntimeError(f"MT5 錯誤：{error}")
-
-                    # 轉換為 DataFrame
-                    df = pd.DataFrame(rates)
-                    df['time'] = pd.to_datetime(df['time'], unit='s', utc=True)
-
-                    # 取得這批數據的時間範圍
-                    batch_oldest = df['time'].min()
-                    batch_newest = df['time'].max()
-
-                    logger.info(f"取得 {len(df)} 根 K 線：{batch_oldest} ~ {batch_newest}")
-
-                    # 保存到資料庫
-                    inserted = cache.insert_candles(df, symbol, timeframe)
-                    logger.info(f"已保存 {inserted} 筆新數據到資料庫")
-
-                    # 更新統計
-                    stats['total_records'] += inserted
-                    stats['batches_fetched'] += 1
-
-                    if stats['newest_time'] is None or batch_newest > stats['newest_time']:
-                        stats['newest_time'] = batch_newest
-
-                    if stats['oldest_time'] is None or batch_oldest < stats['oldest_time']:
-                        stats['oldest_time'] = batch_oldest
-
-                    # 檢查是否還有更早的數據
-                    if len(df) < batch_size:
-                        logger.info(f"本批次數據不足 {batch_size} 根，可能已到達歷史數據起點")
-                        consecutive_empty += 1
-                    else:
-                        consecutive_empty = 0  # 重置計數
-
-                    # 更新下一批的結束時間（從最早的時間往前）
-                    current_end_time = batch_oldest - timedelta(minutes=tf_minutes)
-
-                    # 顯示進度
-                    logger.info(f"累計進度：{stats['total_records']} 筆，{stats['batches_fetched']} 批次")
-                    logger.info("-" * 40)
-
-                    break  # 成功，跳出重試迴圈
-
-                except Exception as e:
-                    retry_count += 1
-                    logger.warning(f"抓取失敗（重試 {retry_count}/{max_retries}）：{e}")
-                    if retry_count >= max_retries:
-                        logger.error(f"達到最大重試次數，跳過此批次")
-                        consecutive_empty += 1
-                        current_end_time = current_end_time - timedelta(days=1)
-
-        # 完成
-        stats['status'] = 'completed'
-        stats['end_time'] = datetime.now()
-        duration = stats['end_time'] - stats['start_time']
+        with SQLiteCacheManager(db_path) as cache:
+            logger.info(f"SQLite 快取已初始化：{db_path}")
+
+            orchestrator = BackfillOrchestrator(
+                cache,
+                batch_size=batch_size,
+                write_batch_size=write_batch_size,
+                queue_size=queue_size,
+                max_retries=max_retries
+            )
+            jobs = orchestrator.run(selected, timeframes, restart=restart)
+
+        results = [job.to_dict() for job in jobs]
 
         logger.info(f"=" * 60)
         logger.info(f"回填完成！")
-        logger.info(f"商品：{symbol}")
-        logger.info(f"週期：{timeframe}")
-        logger.info(f"總筆數：{stats['total_records']}")
-        logger.info(f"批次數：{stats['batches_fetched']}")
-        logger.info(f"時間範圍：{stats['oldest_time']} ~ {stats['newest_time']}")
-        logger.info(f"耗時：{duration}")
+        for result in results:
+            logger.info(
+                f"{result['symbol']:<10} {result['timeframe']:<4} {result['status']:<10}"
+                f"新增 {result['inserted']:>10,}  更新 {result['updated']:>10,}  "
+                f"{result['batches']:>5} 批  {result['elapsed_seconds']:>8.1f} 秒  "
+                f"{result['rows_per_sec']:>10,.0f} 筆/秒"
+            )
         logger.info(f"=" * 60)
 
+        return results
+
     except Exception as e:
-        stats['status'] = 'failed'
-        stats['error'] = str(e)
         logger.error(f"回填失敗：{e}")
         raise
 
@@ -262,8 +140,6 @@ def backfill_data(
         client.disconnect()
         logger.info("MT5 連線已關閉")
 
-    return stats
-
 
 def main():
     parser = argparse.ArgumentParser(
@@ -273,8 +149,10 @@ def main():
 範例：
     python scripts/backfill_data.py GOLD
     python scripts/backfill_data.py GOLD --timeframe M5
+    python scripts/backfill_data.py GOLD SILVER EURUSD --timeframe M1,M5,H1
     python scripts/backfill_data.py EURUSD --timeframe H1 --batch-size 5000
     python scripts/backfill_data.py GOLD --timeframe D1 --db-path data/my_cache.db
+    python scripts/backfill_data.py GOLD --restart
 
 支援的時間週期：
     M1, M2, M3, M4, M5, M6, M10, M12, M15, M20, M30
@@ -284,16 +162,17 @@ def main():
     )
 
     parser.add_argument(
-        'symbol',
+        'symbols',
         type=str,
-        help='商品代碼（例如：GOLD, EURUSD, USDJPY）'
+        nargs='+',
+        help='商品代碼，可指定多個（例如：GOLD EURUSD USDJPY）'
     )
 
     parser.add_argument(
         '--timeframe',
         type=str,
         default='M1',
-        help='時間週期（預設：M1）'
+        help='時間週期，多個以逗號分隔（預設：M1，例如：M1,M5,H1）'
     )
 
     parser.add_argument(
@@ -310,6 +189,13 @@ def main():
         help='SQLite 資料庫路徑（預設：data/candles.db）'
     )
 
+    parser.add_argument(
+        '--write-batch-size',
+        type=int,
+        default=SQLiteCacheManager.BULK_BATCH_SIZE,
+        help=f'寫入資料庫時每個交易的筆數（預設：{SQLiteCacheManager.BULK_BATCH_SIZE}）'
+    )
+
     parser.add_argument(
         '--max-retries',
         type=int,
@@ -317,6 +203,19 @@ def main():
         help='失敗時的最大重試次數（預設：3）'
     )
 
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=4,
+        help='抓取與寫入之間的佇列上限，單位為批次（預設：4）'
+    )
+
+    parser.add_argument(
+        '--restart',
+        action='store_true',
+        help='忽略資料庫中的進度檢查點，從現在重新往回抓'
+    )
+
     args = parser.parse_args()
 
     # 確保資料庫目錄存在
@@ -325,23 +224,30 @@ def main():
 
     # 執行回填
     try:
-        stats = backfill_data(
-            symbol=args.symbol.upper(),
-            timeframe=args.timeframe.upper(),
+        results = backfill_data(
+            symbols=[symbol.upper() for symbol in args.symbols],
+            timeframes=[tf.strip().upper() for tf in args.timeframe.split(',') if tf.strip()],
             db_path=args.db_path,
             batch_size=args.batch_size,
-            max_retries=args.max_retries
+            max_retries=args.max_retries,
+            write_batch_size=args.write_batch_size,
+            queue_size=args.queue_size,
+            restart=args.restart
         )
 
-        if stats['status'] == 'completed':
-            print(f"\n✅ 回填成功！共 {stats['total_records']} 筆 {stats['timeframe']} 數據")
+        failed = [r for r in results if r['status'] == 'failed']
+        total = sum(r['inserted'] for r in results)
+
+        if not failed:
+            print(f"\n✅ 回填成功！{len(results)} 個工作共新增 {total} 筆數據")
             sys.exit(0)
         else:
-            print(f"\n❌ 回填失敗：{stats.get('error', '未知錯誤')}")
+            for r in failed:
+                print(f"\n❌ {r['symbol']} {r['timeframe']} 回填失敗：{r.get('error') or '未知錯誤'}")
             sys.exit(1)
 
     except KeyboardInterrupt:
-        print("\n\n⚠️ 使用者中斷，已保存的數據不受影響")
+        print("\n\n⚠️ 使用者中斷，已保存的數據不受影響，重新執行即可從檢查點續抓")
         sys.exit(130)
 
     except Exception as e:
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+指標運算後端基準測試
+
+在不同 K 線數量下比較三種實作的耗時：
+- pandas：改版前逐根 K 線以 iloc 取值的迴圈（只跑到 --pandas-max-rows）
+- numpy：向量化路徑（indicator_backend 的 numpy 後端）
+- numba：JIT 路徑（需安裝 numba，首次呼叫的編譯時間不計入）
+
+測試項目：
+- pivots：偵測 Pivot High / Pivot Low
+- volume：單一區間的成交量分配
+- vppa：calculate_vppa 完整流程
+
+使用方式：
+    python scripts/benchmark_indicator_backends.py
+    python scripts/benchmark_indicator_backends.py --rows 1000,10000,100000,1000000
+    CHIP_INDICATOR_BACKEND=numpy python scripts/benchmark_indicator_backends.py
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# 將專案根目錄加入 Python 路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import pandas as pd
+from loguru import logger
+
+from src.agent import indicator_backend
+from src.agent.indicators import (
+    find_pivot_indices,
+    calculate_volume_profile_for_range,
+    calculate_vppa
+)
+from scripts.benchmark_volume_profile import make_candles, legacy_volume_profile, time_call
+
+
+def legacy_pivots(df: pd.DataFrame, length: int) -> int:
+    """改版前的實作：逐根 K 線切片左右窗口並取極值"""
+    count = 0
+    for i in range(length, len(df) - length):
+        center_high = df['high'].iloc[i]
+        if (center_high > df['high'].iloc[i-length:i].max() and
+                center_high > df['high'].iloc[i+1:i+length+1].max()):
+            count += 1
+
+        center_low = df['low'].iloc[i]
+        if (center_low < df['low'].iloc[i-length:i].min() and
+                center_low < df['low'].iloc[i+1:i+length+1].min()):
+            count += 1
+    return count
+
+
+def run_backend(backend: str, df: pd.DataFrame, args) -> dict:
+    """以指定後端執行各測試項目，回傳耗時（秒）"""
+    previous = indicator_backend.set_backend(backend)
+    highs = df['high'].to_numpy(dtype=float)
+    lows = df['low'].to_numpy(dtype=float)
+    df_indexed = df.set_index('time')
+
+    tasks = {
+        'pivots': lambda: find_pivot_indices(highs, lows, args.pivot_length),
+        'volume': lambda: calculate_volume_profile_for_range(df, 0, len(df) - 1, args.levels),
+        'vppa': lambda: calculate_vppa(df_indexed, args.pivot_length, args.levels)
+    }
+
+    try:
+        results = {}
+        for name, task in tasks.items():
+            task()  # 預熱（JIT 編譯）
+            results[name] = time_call(task, repeat=args.repeat)
+        return results
+    finally:
+        indicator_backend.set_backend(previous)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='指標運算後端基準測試')
+
+    parser.add_argument(
+        '--rows',
+        type=str,
+        default='1000,10000,100000,1000000',
+        help='K 線筆數，逗號分隔（預設：1000,10000,100000,1000000）'
+    )
+
+    parser.add_argument(
+        '--levels',
+        type=int,
+        default=27,
+        help='價格分層數量（預設：27）'
+    )
+
+    parser.add_argument(
+        '--pivot-length',
+        type=int,
+        default=67,
+        help='Pivot Point 左右觀察窗口大小（預設：67）'
+    )
+
+    parser.add_argument(
+        '--pandas-max-rows',
+        type=int,
+        default=10000,
+        help='pandas 迴圈只測到此筆數（預設：10000）'
+    )
+
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=3,
+        help='每項測試重複次數，取最短耗時（預設：3）'
+    )
+
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+    backends = ['numpy'] + (['numba'] if indicator_backend.numba is not None else [])
+    rows_list = [int(rows) for rows in args.rows.split(',')]
+
+    print("=" * 78)
+    print(f"指標運算後端基準測試（預設後端：{indicator_backend.get_backend()}，"
+          f"pivot_length={args.pivot_length}，levels={args.levels}）")
+    if indicator_backend.numba is None:
+        print("未安裝 numba，略過 JIT 後端")
+    print("=" * 78)
+    print(f"{'筆數':>10}  {'項目':<8}{'pandas':>14}{'numpy':>14}{'numba':>14}")
+    print("-" * 78)
+
+    for rows in rows_list:
+        df = make_candles(rows)
+        timings = {backend: run_backend(backend, df, args) for backend in backends}
+
+        pandas_timings = {}
+        if rows <= args.pandas_max_rows:
+            pandas_timings['pivots'] = time_call(lambda: legacy_pivots(df, args.pivot_length))
+            pandas_timings['volume'] = time_call(lambda: legacy_volume_profile(df, args.levels))
+
+        for name in ('pivots', 'volume', 'vppa'):
+            cells = [pandas_timings.get(name)] + [
+                timings[backend][name] if backend in timings else None
+                for backend in ('numpy', 'numba')
+            ]
+            formatted = ''.join(
+                f"{cell * 1000:>11.2f} ms" if cell is not None else f"{'-':>14}"
+                for cell in cells
+            )
+            print(f"{rows:>10}  {name:<8}{formatted}")
+
+    print("=" * 78)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+SQLite 快取連線開銷基準測試
+
+比較「每次呼叫建立新連線」與「連線池重複使用連線」兩種模式下，
+agent 工具每則訊息會連續呼叫的 get_newest_time、query_candles、
+insert_candles 的單次呼叫耗時。
+
+使用方式：
+    python scripts/benchmark_sqlite_cache.py
+    python scripts/benchmark_sqlite_cache.py --iterations 2000 --rows 50000
+"""
+
+import sys
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+# 將專案根目錄加入 Python 路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.core.sqlite_cache import SQLiteCacheManager
+from src.core.sqlite_pool import SQLiteConnectionPool
+
+
+class UnpooledConnectionPool(SQLiteConnectionPool):
+    """模擬改版前行為：每次呼叫建立新連線，用完即關閉"""
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
+        )
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def acquire_reader(self) -> sqlite3.Connection:
+        return self._open()
+
+    def acquire_writer(self) -> sqlite3.Connection:
+        return self._open()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        conn.close()
+
+
+def make_rates(rows: int, start_epoch: int = 1704067200) -> np.ndarray:
+    """建立與 MT5 copy_rates_* 相同 dtype 的結構化陣列"""
+    dtype = np.dtype([
+        ('time', '<i8'), ('open', '<f8'), ('high', '<f8'),
+        ('low', '<f8'), ('close', '<f8'), ('tick_volume', '<u8'),
+        ('spread', '<i4'), ('real_volume', '<u8')
+    ])
+    rates = np.zeros(rows, dtype=dtype)
+    rates['time'] = start_epoch + np.arange(rows) * 60
+    rates['open'] = 2000.0 + np.cumsum(np.random.randn(rows))
+    rates['high'] = rates['open'] + 1.0
+    rates['low'] = rates['open'] - 1.0
+    rates['close'] = rates['open'] + 0.5
+    rates['tick_volume'] = 100
+    rates['spread'] = 2
+    rates['real_volume'] = 0
+    return rates
+
+
+def time_calls(func, iterations: int) -> float:
+    """回傳單次呼叫的平均耗時（微秒）"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run_benchmark(manager: SQLiteCacheManager, rates: np.ndarray, iterations: int) -> dict:
+    """對三個常用方法計時"""
+    newest = manager.get_newest_time('GOLD', 'M1')
+    window_start = newest - pd.Timedelta(minutes=200)
+
+    last_row = rates[-1:].copy()
+
+    def insert_one(i):
+        last_row['close'] = 2000.0 + i * 0.01
+        manager.insert_candles(pd.DataFrame(last_row), 'GOLD', 'M1')
+
+    return {
+        'get_newest_time': time_calls(
+            lambda i: manager.get_newest_time('GOLD', 'M1'), iterations
+        ),
+        'query_candles (200 筆)': time_calls(
+            lambda i: manager.query_candles('GOLD', 'M1', window_start, newest), iterations
+        ),
+        'insert_candles (1 筆)': time_calls(insert_one, iterations)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 快取連線開銷基準測試')
+
+    parser.add_argument(
+        '--iterations',
+        type=int,
+        default=500,
+        help='每個方法的呼叫次數（預設：500）'
+    )
+
+    parser.add_argument(
+        '--rows',
+        type=int,
+        default=20000,
+        help='預先寫入的 M1 K 線筆數（預設：20000）'
+    )
+
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+    rates = make_rates(args.rows)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = str(Path(tmp_dir) / 'benchmark.db')
+
+        with SQLiteCacheManager(db_path) as manager:
+            manager.bulk_insert_candles(rates, 'GOLD', 'M1')
+
+            pooled = run_benchmark(manager, rates, args.iterations)
+
+            manager._pool = UnpooledConnectionPool(db_path)
+            unpooled = run_benchmark(manager, rates, args.iterations)
+
+    print("=" * 72)
+    print(f"SQLite 快取單次呼叫耗時（{args.iterations} 次平均，{args.rows} 筆 K 線）")
+    print("=" * 72)
+    print(f"{'方法':<24}{'每次新連線 (µs)':>16}{'連線池 (µs)':>14}{'加速':>10}")
+
+    for name in pooled:
+        speedup = unpooled[name] / pooled[name] if pooled[name] else float('inf')
+        print(f"{name:<24}{unpooled[name]:>16.1f}{pooled[name]:>14.1f}{speedup:>9.1f}x")
+
+    print("=" * 72)
+
+
+if __name__ == '__main__':
+    main()
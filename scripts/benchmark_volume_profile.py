@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Volume Profile 成交量分配基準測試
+
+比較改版前逐根 K 線（iloc）逐層迴圈的實作，與向量化的
+distribute_volume 核心在 calculate_volume_profile_for_range 中的耗時，
+並確認兩者結果一致。
+
+使用方式：
+    python scripts/benchmark_volume_profile.py
+    python scripts/benchmark_volume_profile.py --rows 100000 --levels 27
+    python scripts/benchmark_volume_profile.py --legacy-rows 5000
+"""
+
+import sys
+import argparse
+import time
+from pathlib import Path
+
+# 將專案根目錄加入 Python 路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.agent.indicators import calculate_volume_profile_for_range
+
+
+def make_candles(rows: int, seed: int = 0) -> pd.DataFrame:
+    """建立隨機走勢的 M1 K 線"""
+    rng = np.random.default_rng(seed)
+    close = 2000.0 + rng.normal(0, 0.5, rows).cumsum()
+
+    return pd.DataFrame({
+        'time': pd.date_range('2024-01-01', periods=rows, freq='min', tz='UTC'),
+        'open': close + rng.normal(0, 0.1, rows),
+        'high': close + rng.exponential(0.3, rows),
+        'low': close - rng.exponential(0.3, rows),
+        'close': close,
+        'tick_volume': rng.integers(1, 500, rows),
+        'real_volume': rng.integers(1, 5000, rows)
+    })
+
+
+def legacy_volume_profile(range_df: pd.DataFrame, price_levels: int) -> np.ndarray:
+    """改版前的實作：逐根 K 線以 iloc 取值，再逐層比較"""
+    price_highest = range_df['high'].max()
+    price_lowest = range_df['low'].min()
+    price_step = (price_highest - price_lowest) / price_levels
+
+    volume_storage = np.zeros(price_levels)
+
+    for idx in range(len(range_df)):
+        row = range_df.iloc[idx]
+        bar_high = row['high']
+        bar_low = row['low']
+        bar_volume = row['real_volume']
+        bar_range = bar_high - bar_low
+
+        for level in range(price_levels):
+            level_low = price_lowest + level * price_step
+            level_high = price_lowest + (level + 1) * price_step
+
+            if bar_high >= level_low and bar_low < level_high:
+                if bar_range == 0:
+                    volume_storage[level] += bar_volume
+                else:
+                    volume_storage[level] += bar_volume * (price_step / bar_range)
+
+    return volume_storage
+
+
+def time_call(func, repeat: int = 1) -> float:
+    """回傳單次呼叫的最短耗時（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Volume Profile 成交量分配基準測試')
+
+    parser.add_argument(
+        '--rows',
+        type=int,
+        default=100000,
+        help='M1 K 線筆數（預設：100000）'
+    )
+
+    parser.add_argument(
+        '--levels',
+        type=int,
+        default=27,
+        help='價格分層數量（預設：27）'
+    )
+
+    parser.add_argument(
+        '--legacy-rows',
+        type=int,
+        default=None,
+        help='舊版實作只跑前 N 筆並依比例推算（預設：與 --rows 相同）'
+    )
+
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+    df = make_candles(args.rows)
+    legacy_rows = min(args.legacy_rows or args.rows, args.rows)
+
+    vectorized = time_call(
+        lambda: calculate_volume_profile_for_range(df, 0, args.rows - 1, args.levels),
+        repeat=5
+    )
+
+    legacy_df = df.iloc[:legacy_rows]
+    legacy_result = {}
+    legacy = time_call(
+        lambda: legacy_result.setdefault('profile', legacy_volume_profile(legacy_df, args.levels))
+    )
+    legacy_scaled = legacy * args.rows / legacy_rows
+
+    # 在相同區間上比對結果
+    expected = legacy_result['profile']
+    actual = calculate_volume_profile_for_range(
+        df, 0, legacy_rows - 1, args.levels
+    )['volume_profile']
+    max_diff = float(np.max(np.abs(actual - expected)) / expected.sum())
+
+    print("=" * 72)
+    print(f"Volume Profile 成交量分配（{args.rows} 筆 K 線 × {args.levels} 層）")
+    print("=" * 72)
+    legacy_note = '' if legacy_rows == args.rows else f"（以 {legacy_rows} 筆推算）"
+    print(f"{'舊版逐根逐層迴圈':<20}{legacy_scaled * 1000:>14.1f} ms{legacy_note}")
+    print(f"{'向量化核心':<20}{vectorized * 1000:>14.1f} ms")
+    print(f"{'加速':<20}{legacy_scaled / vectorized:>14.0f} x")
+    print(f"{'最大相對誤差':<20}{max_diff:>14.2e}")
+    print("=" * 72)
+
+
+if __name__ == '__main__':
+    main()
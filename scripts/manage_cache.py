@@ -8,6 +8,8 @@ SQLite 快取管理命令列工具
     python scripts/manage_cache.py check-gaps --symbol GOLD --timeframe H1
     python scripts/manage_cache.py fill-gaps --symbol GOLD --timeframe H1
     python scripts/manage_cache.py clear --symbol GOLD --timeframe H1
+    python scripts/manage_cache.py rebuild-metadata --symbol GOLD
+    python scripts/manage_cache.py migrate
     python scripts/manage_cache.py optimize
 """
 
@@ -39,7 +41,10 @@ def cli(ctx, db_path):
     """SQLite 快取管理工具"""
     ctx.ensure_object(dict)
     ctx.obj['db_path'] = db_path
-    ctx.obj['cache_manager'] = SQLiteCacheManager(db_path)
+
+    # 舊版資料庫無法直接開啟，遷移命令不建立快取管理器
+    if ctx.invoked_subcommand != 'migrate':
+        ctx.obj['cache_manager'] = SQLiteCacheManager(db_path)
 
 
 @cli.command()
@@ -205,6 +210,49 @@ def clear(ctx, symbol, timeframe, force):
     click.echo(f"\n已刪除 {deleted_count} 筆記錄")
 
 
+@cli.command()
+@click.option('--symbol', help='商品代碼（可選）')
+@click.option('--timeframe', help='時間週期（可選）')
+@click.pass_context
+def rebuild_metadata(ctx, symbol, timeframe):
+    """從 K 線數據完整重建快取元數據"""
+    manager = ctx.obj['cache_manager']
+
+    target = ' '.join(filter(None, [symbol, timeframe])) or '所有商品'
+    click.echo(f"\n重建 {target} 的快取元數據（全表掃描）...\n")
+
+    rebuilt_count = manager.rebuild_metadata(symbol, timeframe)
+    click.echo(f"已重建 {rebuilt_count} 個商品-週期組合")
+
+
+@cli.command()
+@click.option('--no-vacuum', is_flag=True, help='遷移後不執行 VACUUM')
+@click.pass_context
+def migrate(ctx, no_vacuum):
+    """將舊版資料庫遷移為整數 epoch 儲存格式"""
+    db_path = ctx.obj['db_path']
+
+    click.echo(f"\n遷移資料庫：{db_path}\n")
+
+    try:
+        stats = SQLiteCacheManager.migrate_storage(db_path, vacuum=not no_vacuum)
+    except Exception as e:
+        click.echo(f"\n遷移失敗：{e}", err=True)
+        sys.exit(1)
+
+    if stats['status'] == 'up_to_date':
+        click.echo("資料庫已是新版儲存格式，無需遷移")
+        return
+
+    click.echo(f"舊表記錄數：{stats['legacy_records']}")
+    click.echo(f"已遷移記錄數：{stats['migrated_records']}")
+    click.echo(f"略過記錄數：{stats['skipped_records']}")
+    click.echo(
+        f"檔案大小：{stats['size_before'] / 1024 / 1024:.1f} MB -> "
+        f"{stats['size_after'] / 1024 / 1024:.1f} MB"
+    )
+
+
 @cli.command()
 @click.pass_context
 def optimize(ctx):
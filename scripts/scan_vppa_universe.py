@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+商品清單 VPPA 掃描腳本
+
+從 SQLite 快取讀取 markets/symbols.txt（或指定商品）的 K 線，
+以多程序平行計算 VPPA，並依完成順序輸出每個商品最新區間的 POC / VAH / VAL。
+此腳本只讀取快取，不連線 MT5（請先以 backfill_data.py 回填數據）。
+
+使用方式：
+    python scripts/scan_vppa_universe.py
+    python scripts/scan_vppa_universe.py --symbols GOLD SILVER --timeframe H1
+    python scripts/scan_vppa_universe.py --count 2160 --pivot-length 67 --workers 4
+    python scripts/scan_vppa_universe.py --output output/universe.json
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+# 將專案根目錄加入 Python 路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from loguru import logger
+
+from src.core.sqlite_cache import SQLiteCacheManager
+from src.agent.vppa_universe import compute_vppa_universe, load_universe_symbols
+
+
+def main():
+    parser = argparse.ArgumentParser(description='商品清單 VPPA 掃描腳本')
+
+    parser.add_argument(
+        '--symbols',
+        type=str,
+        nargs='+',
+        default=None,
+        help='商品代碼（預設：讀取 --symbols-file）'
+    )
+
+    parser.add_argument(
+        '--symbols-file',
+        type=str,
+        default='markets/symbols.txt',
+        help='商品清單檔案（預設：markets/symbols.txt）'
+    )
+
+    parser.add_argument(
+        '--timeframe',
+        type=str,
+        default='M1',
+        help='時間週期（預設：M1）'
+    )
+
+    parser.add_argument(
+        '--count',
+        type=int,
+        default=2160,
+        help='每個商品使用的 K 線數量（預設：2160）'
+    )
+
+    parser.add_argument(
+        '--pivot-length',
+        type=int,
+        default=67,
+        help='Pivot Point 左右觀察窗口大小（預設：67）'
+    )
+
+    parser.add_argument(
+        '--price-levels',
+        type=int,
+        default=27,
+        help='價格分層數量（預設：27）'
+    )
+
+    parser.add_argument(
+        '--value-area-pct',
+        type=float,
+        default=0.67,
+        help='Value Area 成交量百分比（預設：0.67）'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='工作程序數量（預設：CPU 核心數，0 表示不使用多程序）'
+    )
+
+    parser.add_argument(
+        '--db-path',
+        type=str,
+        default='data/candles.db',
+        help='SQLite 資料庫路徑（預設：data/candles.db）'
+    )
+
+    parser.add_argument(
+        '--output',
+        type=str,
+        default=None,
+        help='將每個商品的價位輸出為 JSON 檔案'
+    )
+
+    args = parser.parse_args()
+
+    symbols = args.symbols or load_universe_symbols(args.symbols_file)
+    params = {
+        'pivot_length': args.pivot_length,
+        'price_levels': args.price_levels,
+        'value_area_pct': args.value_area_pct
+    }
+
+    summary = []
+
+    with SQLiteCacheManager(args.db_path) as cache:
+        for result in compute_vppa_universe(
+            symbols, args.timeframe, params,
+            cache=cache, count=args.count, max_workers=args.workers
+        ):
+            if not result['success']:
+                print(f"{result['symbol']:<12} 失敗：{result['error']}")
+                summary.append({'symbol': result['symbol'], 'error': result['error']})
+                continue
+
+            levels = result['levels']
+            if levels is None:
+                print(f"{result['symbol']:<12} 沒有足夠的 Pivot Point 形成區間")
+                continue
+
+            print(
+                f"{result['symbol']:<12} POC {levels['poc']:>12.5f}  "
+                f"VAH {levels['vah']:>12.5f}  VAL {levels['val']:>12.5f}  "
+                f"{'發展中' if levels['is_developing'] else '已確認'}  "
+                f"{result['elapsed_seconds'] * 1000:>8.1f} ms"
+            )
+            summary.append({
+                'symbol': result['symbol'],
+                'timeframe': result['timeframe'],
+                'end_time': result['end_time'].isoformat(),
+                **levels
+            })
+
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        logger.info(f"結果已儲存：{output_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Tick Volume Profile 腳本
+
+從 SQLite 的 ticks 表逐區塊讀取 Tick，以 np.bincount 建立價格直方圖，
+輸出 POC / VAH / VAL 與成交量最大的價格層級。
+加上 --ingest 時會先連線 MT5，以一小時為單位把 Tick 回填到資料庫。
+
+使用方式：
+    python scripts/tick_volume_profile.py GOLD --ingest
+    python scripts/tick_volume_profile.py GOLD --hours 8 --price-step 0.5
+    python scripts/tick_volume_profile.py EURUSD --price-step 0.0001 --price mid --weight ticks
+    python scripts/tick_volume_profile.py GOLD --output output/gold_ticks.json
+"""
+
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+# 將專案根目錄加入 Python 路徑
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+from loguru import logger
+
+from src.core.sqlite_cache import SQLiteCacheManager
+from src.agent.indicators import calculate_tick_volume_profile
+
+
+def ingest(
+    symbol: str,
+    cache: SQLiteCacheManager,
+    start_time: datetime,
+    end_time: datetime
+) -> dict:
+    """連線 MT5 並回填 Tick"""
+    from src.core.mt5_config import MT5Config
+    from src.core.mt5_client import ChipWhispererMT5Client
+    from src.core.backfill import backfill_ticks
+
+    client = ChipWhispererMT5Client(MT5Config())
+
+    try:
+        client.connect()
+        logger.info("MT5 連線成功")
+        return backfill_ticks(cache, symbol, start_time, end_time)
+    finally:
+        client.disconnect()
+        logger.info("MT5 連線已關閉")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tick Volume Profile 腳本')
+
+    parser.add_argument(
+        'symbol',
+        type=str,
+        help='商品代碼（例如：GOLD）'
+    )
+
+    parser.add_argument(
+        '--hours',
+        type=float,
+        default=24,
+        help='統計最近幾小時的 Tick（預設：24）'
+    )
+
+    parser.add_argument(
+        '--price-step',
+        type=float,
+        default=0.1,
+        help='價格層級高度（預設：0.1）'
+    )
+
+    parser.add_argument(
+        '--price',
+        type=str,
+        default='auto',
+        choices=['auto', 'last', 'bid', 'ask', 'mid'],
+        help='價格來源（預設：auto，有成交價時使用成交價，否則使用買賣中價）'
+    )
+
+    parser.add_argument(
+        '--weight',
+        type=str,
+        default='auto',
+        choices=['auto', 'volume', 'ticks'],
+        help='權重來源（預設：auto，有成交量時使用成交量，否則每筆 Tick 計為 1）'
+    )
+
+    parser.add_argument(
+        '--value-area-pct',
+        type=float,
+        default=0.7,
+        help='Value Area 成交量百分比（預設：0.7）'
+    )
+
+    parser.add_argument(
+        '--ingest',
+        action='store_true',
+        help='計算前先從 MT5 回填 Tick'
+    )
+
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=10,
+        help='顯示成交量最大的價格層級數量（預設：10）'
+    )
+
+    parser.add_argument(
+        '--db-path',
+        type=str,
+        default='data/candles.db',
+        help='SQLite 資料庫路徑（預設：data/candles.db）'
+    )
+
+    parser.add_argument(
+        '--output',
+        type=str,
+        default=None,
+        help='將結果輸出為 JSON 檔案'
+    )
+
+    args = parser.parse_args()
+
+    symbol = args.symbol.upper()
+    end_time = datetime.now(timezone.utc)
+    start_time = end_time - timedelta(hours=args.hours)
+
+    with SQLiteCacheManager(args.db_path) as cache:
+        if args.ingest:
+            ingest(symbol, cache, start_time, end_time)
+
+        started = time.perf_counter()
+        profile = calculate_tick_volume_profile(
+            cache.iter_tick_chunks(
+                symbol, start_time, end_time, columns=['bid', 'ask', 'last', 'volume']
+            ),
+            price_step=args.price_step,
+            price=args.price,
+            weight=args.weight,
+            value_area_pct=args.value_area_pct
+        )
+        elapsed = time.perf_counter() - started
+
+    print("=" * 60)
+    print(
+        f"{symbol} Tick Volume Profile"
+        f"（{start_time:%Y-%m-%d %H:%M} ~ {end_time:%Y-%m-%d %H:%M} UTC）"
+    )
+    print("=" * 60)
+    print(f"Tick 筆數：{profile['tick_count']:,}（{elapsed * 1000:.1f} ms）")
+    print(f"價格層級：{profile['levels']}（每層 {args.price_step:g}）")
+    print(f"POC：{profile['poc']['price']:.5f}（{profile['poc']['volume']:,.0f}）")
+    print(f"VAH：{profile['vah']:.5f}")
+    print(f"VAL：{profile['val']:.5f}")
+    print("-" * 60)
+
+    for level in np.argsort(profile['volume_profile'])[::-1][:args.top]:
+        print(
+            f"{profile['price_centers'][level]:>14.5f}  "
+            f"{profile['volume_profile'][level]:>14,.0f}"
+        )
+
+    if args.output:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output = {
+            'symbol': symbol,
+            'start_time': start_time.isoformat(),
+            'end_time': end_time.isoformat(),
+            **{key: value for key, value in profile.items() if not isinstance(value, np.ndarray)},
+            'price_centers': profile['price_centers'].tolist(),
+            'volume_profile': profile['volume_profile'].tolist()
+        }
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(output, f, ensure_ascii=False, indent=2, default=float)
+        logger.info(f"結果已儲存：{output_path}")
+
+
+if __name__ == '__main__':
+    main()
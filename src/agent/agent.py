@@ -5,13 +5,40 @@ Agent 核心邏輯模組
 提供自然語言查詢和智能分析功能。
 """
 
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional
 import os
+import threading
+import time
+import uuid
 from loguru import logger
 import anthropic
 from dotenv import load_dotenv
 
-from .tools import TOOLS, execute_tool
+from .tools import TOOLS, execute_tools, release_conversation
+
+
+# Prompt caching 斷點（5 分鐘存活）
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# API 回應 usage 中要累計的 token 欄位
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+
+
+# 串流事件回呼：接收 {'type': 'text' | 'tool_start' | 'tool_end', ...} 字典
+EventCallback = Callable[[Dict[str, Any]], None]
+
+
+def _new_usage() -> Dict[str, Any]:
+    """建立空白的用量計數器"""
+    usage: Dict[str, Any] = {"messages": 0, "requests": 0}
+    usage.update({field: 0 for field in USAGE_FIELDS})
+    usage.update({"api_seconds": 0.0, "tool_seconds": 0.0, "total_seconds": 0.0})
+    return usage
 
 
 class MT5Agent:
@@ -21,13 +48,20 @@ class MT5Agent:
     整合 Claude API 和 MT5 工具，提供自然語言查詢功能。
     """
 
-    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        prompt_cache: Optional[bool] = None
+    ):
         """
         初始化 Agent
 
         參數：
             api_key: Anthropic API Key（若未提供則從環境變數讀取）
             model: Claude 模型別名（預設為 sonnet，即 Sonnet 4.5）
+            prompt_cache: 是否在工具定義、系統提示與對話歷史加上 cache_control 斷點
+                （若未提供則讀取 PROMPT_CACHE_ENABLED，預設啟用）
         """
         # 載入環境變數
         load_dotenv()
@@ -46,8 +80,18 @@ class MT5Agent:
         # 對話歷史（用於多輪對話）
         self.conversation_history: List[Dict[str, Any]] = []
 
-        # 儲存最後的工具結果（用於傳遞圖片等資源）
-        self.last_tool_result: Optional[Dict[str, Any]] = None
+        # Prompt caching：工具定義與系統提示在每次請求間不變，標記後可重複使用快取
+        if prompt_cache is None:
+            prompt_cache = os.getenv('PROMPT_CACHE_ENABLED', 'true').lower() in ('true', '1', 'yes')
+        self.prompt_cache = prompt_cache
+        self._tools = TOOLS
+        if prompt_cache and TOOLS:
+            # 斷點放在最後一個工具上，快取涵蓋全部工具定義
+            self._tools = [*TOOLS[:-1], {**TOOLS[-1], "cache_control": CACHE_CONTROL}]
+
+        # 累計用量（同一個 agent 可能同時服務多個群組，需加鎖）
+        self._usage_totals = _new_usage()
+        self._usage_lock = threading.Lock()
 
         logger.info(f"MT5 Agent 初始化完成（模型：{self.model}）")
 
@@ -55,7 +99,8 @@ class MT5Agent:
         self,
         user_message: str,
         system_prompt: Optional[str] = None,
-        max_turns: int = 10
+        max_turns: int = 10,
+        on_event: Optional[EventCallback] = None
     ) -> str:
         """
         處理用戶訊息並回傳 Agent 回應
@@ -64,6 +109,11 @@ class MT5Agent:
             user_message: 用戶訊息
             system_prompt: 系統提示（可選）
             max_turns: 最大工具調用輪數（預設 10）
+            on_event: 串流事件回呼（可選）。提供時改用串流 API，並依序送出：
+                - {'type': 'text', 'text': 文字片段}
+                - {'type': 'tool_start', 'tools': [工具名稱, ...]}
+                - {'type': 'tool_end', 'tools': [工具名稱, ...], 'seconds': 耗時}
+                回呼在呼叫 process_message 的執行緒中執行
 
         回傳：
             Agent 的回應文字
@@ -81,7 +131,8 @@ class MT5Agent:
 4. calculate_rsi - 計算相對強弱指標
 5. get_account_info - 取得帳戶資訊
 
-請根據用戶的需求，自動選擇並調用適當的工具。在使用計算工具前，需要先使用 get_candles 取得資料。
+請根據用戶的需求，自動選擇並調用適當的工具。在使用計算工具前，需要先使用 get_candles 取得資料，
+並將回傳的 candles_handle 傳給計算工具。
 
 回答時請：
 - 使用繁體中文
@@ -93,6 +144,48 @@ class MT5Agent:
         # 建立用戶訊息
         messages = [{"role": "user", "content": user_message}]
 
+        # 本次對話的識別碼（get_candles 建立的 K 線資料代號只在本次對話中有效）
+        conversation_id = uuid.uuid4().hex
+
+        usage = _new_usage()
+        usage["messages"] = 1
+        started = time.perf_counter()
+
+        try:
+            return self._run_conversation(
+                messages, system_prompt, max_turns, conversation_id, usage, on_event
+            )
+        finally:
+            release_conversation(conversation_id)
+            usage["total_seconds"] = time.perf_counter() - started
+            self._record_usage(usage)
+
+    def _run_conversation(
+        self,
+        messages: List[Dict[str, Any]],
+        system_prompt: str,
+        max_turns: int,
+        conversation_id: str,
+        usage: Dict[str, Any],
+        on_event: Optional[EventCallback] = None
+    ) -> str:
+        """
+        執行對話循環（支援多輪工具調用）
+
+        參數：
+            messages: 訊息列表（會在循環中追加）
+            system_prompt: 系統提示
+            max_turns: 最大工具調用輪數
+            conversation_id: 對話識別碼
+            usage: 本次訊息的用量計數器（會在循環中累加）
+            on_event: 串流事件回呼（可選）
+
+        回傳：
+            Agent 的回應文字
+        """
+        # 最後一個帶圖片等資源的工具結果（只屬於本次對話）
+        last_tool_result: Optional[Dict[str, Any]] = None
+
         # 開始對話循環（支援多輪工具調用）
         turn_count = 0
         while turn_count < max_turns:
@@ -101,13 +194,16 @@ class MT5Agent:
 
             try:
                 # 調用 Claude API
-                response = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=16384,  # 增加 token 限制以避免截斷
-                    system=system_prompt,
-                    tools=TOOLS,
-                    messages=messages
+                request_started = time.perf_counter()
+                response = self._create_message(
+                    {
+                        "model": self.model,
+                        "max_tokens": 16384,  # 增加 token 限制以避免截斷
+                        **self._build_request(system_prompt, messages)
+                    },
+                    on_event
                 )
+                self._count_request(usage, response, time.perf_counter() - request_started)
 
                 logger.debug(f"API 回應狀態：{response.stop_reason}")
 
@@ -120,11 +216,9 @@ class MT5Agent:
                     logger.info("對話完成")
 
                     # 如果有圖片資源，合併到回應中
-                    if self.last_tool_result:
-                        result = self.last_tool_result.copy()
+                    if last_tool_result:
+                        result = last_tool_result.copy()
                         result["message"] = text_response
-                        # 清空以便下次使用
-                        self.last_tool_result = None
                         return result
 
                     return text_response
@@ -139,33 +233,45 @@ class MT5Agent:
                         "content": response.content
                     })
 
-                    # 執行所有工具調用
-                    tool_results = []
-                    for content_block in response.content:
-                        if content_block.type == "tool_use":
-                            tool_name = content_block.name
-                            tool_input = content_block.input
-                            tool_use_id = content_block.id
+                    # 執行所有工具調用（互相獨立的計算工具並行執行，結果依原順序排列）
+                    tool_blocks = [block for block in response.content if block.type == "tool_use"]
 
-                            logger.info(f"執行工具：{tool_name}")
-                            logger.debug(f"工具輸入：{tool_input}")
+                    for content_block in tool_blocks:
+                        logger.info(f"執行工具：{content_block.name}")
+                        logger.debug(f"工具輸入：{content_block.input}")
 
-                            # 執行工具
-                            tool_result = execute_tool(tool_name, tool_input)
+                    tool_names = [block.name for block in tool_blocks]
+                    self._emit(on_event, {"type": "tool_start", "tools": tool_names})
 
-                            # 儲存工具結果（用於圖片等資源傳遞）
-                            if isinstance(tool_result, dict) and tool_result.get("data", {}).get("image_path"):
-                                self.last_tool_result = tool_result
-                                logger.info(f"偵測到圖片資源：{tool_result['data']['image_path']}")
+                    started = time.perf_counter()
+                    results = execute_tools(
+                        [(block.name, block.input) for block in tool_blocks],
+                        conversation_id
+                    )
+                    tool_seconds = time.perf_counter() - started
 
-                            # 格式化工具結果
-                            tool_results.append({
-                                "type": "tool_result",
-                                "tool_use_id": tool_use_id,
-                                "content": str(tool_result)
-                            })
+                    self._emit(
+                        on_event, {"type": "tool_end", "tools": tool_names, "seconds": tool_seconds}
+                    )
+                    usage["tool_seconds"] += tool_seconds
+                    logger.debug(f"{len(tool_blocks)} 個工具執行完成，耗時 {tool_seconds:.2f} 秒")
 
-                            logger.debug(f"工具結果：{tool_result}")
+                    tool_results = []
+                    for content_block, tool_result in zip(tool_blocks, results):
+                        # 儲存工具結果（用於圖片等資源傳遞）
+                        data = tool_result.get("data", {}) if isinstance(tool_result, dict) else {}
+                        if data.get("image_path"):
+                            last_tool_result = tool_result
+                            logger.info(f"偵測到圖片資源：{data['image_path']}")
+
+                        # 格式化工具結果
+                        tool_results.append({
+                            "type": "tool_result",
+                            "tool_use_id": content_block.id,
+                            "content": str(tool_result)
+                        })
+
+                        logger.debug(f"工具結果：{tool_result}")
 
                     # 將工具結果加入訊息歷史
                     messages.append({
@@ -193,6 +299,145 @@ class MT5Agent:
         logger.warning(f"達到最大工具調用輪數：{max_turns}")
         return "抱歉，處理您的請求時超過了最大步驟數。請簡化您的問題或分多次詢問。"
 
+    def _create_message(self, request: Dict[str, Any], on_event: Optional[EventCallback]) -> Any:
+        """
+        呼叫 Messages API
+
+        沒有事件回呼時使用一般請求；有回呼時使用串流 API，邊接收邊轉送文字片段，
+        最後回傳與一般請求相同的完整 Message。
+
+        參數：
+            request: messages.create 的參數
+            on_event: 串流事件回呼（可選）
+
+        回傳：
+            API 回應（Message）
+        """
+        if on_event is None:
+            return self.client.messages.create(**request)
+
+        with self.client.messages.stream(**request) as stream:
+            for event in stream:
+                if event.type == "text":
+                    self._emit(on_event, {"type": "text", "text": event.text})
+
+            return stream.get_final_message()
+
+    @staticmethod
+    def _emit(on_event: Optional[EventCallback], event: Dict[str, Any]) -> None:
+        """送出串流事件（回呼失敗不影響對話）"""
+        if on_event is None:
+            return
+
+        try:
+            on_event(event)
+        except Exception as e:
+            logger.warning(f"串流事件回呼失敗：{e}")
+
+    def _build_request(self, system_prompt: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        建立 messages.create 的 system / tools / messages 參數
+
+        啟用 prompt caching 時：
+        - 工具定義與系統提示各加一個 cache_control 斷點（跨訊息重複使用）
+        - 最後一則工具結果加一個斷點，多輪工具調用時前幾輪的對話可從快取讀取
+        當日記憶等每次不同的內容放在用戶訊息中，不會破壞前面的快取。
+
+        參數：
+            system_prompt: 系統提示
+            messages: 訊息歷史（不會被修改）
+
+        回傳：
+            {'system', 'tools', 'messages'} 字典
+        """
+        if not self.prompt_cache:
+            return {"system": system_prompt, "tools": TOOLS, "messages": messages}
+
+        system = [{"type": "text", "text": system_prompt, "cache_control": CACHE_CONTROL}]
+
+        # 斷點只加在本次請求的副本上，歷史訊息中不會累積超過上限的斷點
+        last = messages[-1] if messages else None
+        if last and isinstance(last.get("content"), list) and isinstance(last["content"][-1], dict):
+            content = [
+                *last["content"][:-1],
+                {**last["content"][-1], "cache_control": CACHE_CONTROL},
+            ]
+            messages = [*messages[:-1], {**last, "content": content}]
+
+        return {"system": system, "tools": self._tools, "messages": messages}
+
+    def _count_request(self, usage: Dict[str, Any], response: Any, seconds: float) -> None:
+        """
+        累加單次 API 請求的 token 用量與耗時
+
+        參數：
+            usage: 本次訊息的用量計數器
+            response: API 回應
+            seconds: 請求耗時（秒）
+        """
+        response_usage = getattr(response, "usage", None)
+        counts = {field: getattr(response_usage, field, 0) or 0 for field in USAGE_FIELDS}
+
+        usage["requests"] += 1
+        usage["api_seconds"] += seconds
+        for field, count in counts.items():
+            usage[field] += count
+
+        logger.debug(
+            f"API 請求：輸入 {counts['input_tokens']} tokens"
+            f"（快取讀取 {counts['cache_read_input_tokens']}、"
+            f"快取寫入 {counts['cache_creation_input_tokens']}），"
+            f"輸出 {counts['output_tokens']} tokens，耗時 {seconds:.2f} 秒"
+        )
+
+    def _record_usage(self, usage: Dict[str, Any]) -> None:
+        """記錄一則訊息的用量並併入累計"""
+        logger.info(
+            f"訊息用量：{usage['requests']} 次請求，"
+            f"輸入 {usage['input_tokens']} tokens"
+            f"（快取讀取 {usage['cache_read_input_tokens']}、"
+            f"快取寫入 {usage['cache_creation_input_tokens']}），"
+            f"輸出 {usage['output_tokens']} tokens；"
+            f"API {usage['api_seconds']:.2f} 秒、工具 {usage['tool_seconds']:.2f} 秒、"
+            f"總計 {usage['total_seconds']:.2f} 秒"
+        )
+
+        with self._usage_lock:
+            for key, value in usage.items():
+                self._usage_totals[key] += value
+
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """
+        取得累計用量
+
+        回傳：
+            {
+                'messages': int,                     # 處理的訊息數
+                'requests': int,                     # API 請求數
+                'input_tokens': int,                 # 未命中快取的輸入 tokens
+                'output_tokens': int,
+                'cache_creation_input_tokens': int,  # 寫入快取的輸入 tokens
+                'cache_read_input_tokens': int,      # 從快取讀取的輸入 tokens
+                'api_seconds': float,                # API 請求總耗時
+                'tool_seconds': float,               # 工具執行總耗時
+                'total_seconds': float,              # 訊息處理總耗時
+                'cache_hit_rate': float              # 快取讀取占全部輸入 tokens 的比例
+            }
+        """
+        with self._usage_lock:
+            stats = dict(self._usage_totals)
+
+        prompt_tokens = (
+            stats["input_tokens"]
+            + stats["cache_creation_input_tokens"]
+            + stats["cache_read_input_tokens"]
+        )
+        stats["cache_hit_rate"] = (
+            stats["cache_read_input_tokens"] / prompt_tokens if prompt_tokens else 0.0
+        )
+
+        return stats
+
     def _extract_text_response(self, response: anthropic.types.Message) -> str:
         """
         從 API 回應中提取文字內容
@@ -0,0 +1,205 @@
+"""
+Agent 執行層模組
+
+MT5Agent.process_message 內含同步的 Claude API 呼叫、MT5 查詢與圖表輸出，
+直接在 async 處理器中執行會阻塞 Telegram 事件迴圈，讓所有群組一起等待。
+此模組把 Agent 回合交給有上限的執行緒池處理，並維持同一群組的訊息順序。
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable
+
+from loguru import logger
+
+
+class AgentQueueFullError(RuntimeError):
+    """同一群組排隊中的訊息已達上限"""
+
+
+@dataclass
+class _ChatQueue:
+    """單一群組的排隊狀態"""
+
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    depth: int = 0  # 排隊中與執行中的訊息數
+
+
+class AgentExecutor:
+    """
+    Agent 回合執行器
+
+    - 同一群組（chat_id）的訊息依收到順序逐一執行
+    - 不同群組並行執行，同時執行的回合數不超過 max_workers
+    - 每個群組最多 max_pending_per_chat 則訊息排隊，超過時拒絕新訊息
+    - stats() 提供佇列深度、等待與執行時間等指標
+
+    使用方式：
+        executor = AgentExecutor(max_workers=4)
+        response = await executor.submit(chat.id, agent.process_message, text)
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending_per_chat: int = 5):
+        """
+        初始化執行器
+
+        參數：
+            max_workers: 同時執行的 Agent 回合上限（執行緒池大小）
+            max_pending_per_chat: 每個群組排隊中（含執行中）的訊息上限
+
+        例外：
+            ValueError: 參數小於 1 時
+        """
+        if max_workers < 1:
+            raise ValueError(f"max_workers 必須大於 0：{max_workers}")
+        if max_pending_per_chat < 1:
+            raise ValueError(f"max_pending_per_chat 必須大於 0：{max_pending_per_chat}")
+
+        self.max_workers = max_workers
+        self.max_pending_per_chat = max_pending_per_chat
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='agent')
+        self._chats: Dict[Hashable, _ChatQueue] = {}
+        self._semaphore = None
+
+        # 指標
+        self._waiting = 0
+        self._running = 0
+        self._max_depth = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+
+        logger.info(f"Agent 執行器初始化完成（執行緒：{max_workers}，每群組排隊上限：{max_pending_per_chat}）")
+
+    def pending(self, chat_id: Hashable) -> int:
+        """
+        取得群組排隊中（含執行中）的訊息數
+
+        參數：
+            chat_id: Telegram Chat ID
+
+        回傳：
+            訊息數
+        """
+        queue = self._chats.get(chat_id)
+        return queue.depth if queue else 0
+
+    async def submit(self, chat_id: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        在執行緒池中執行同步函數，並等待結果
+
+        參數：
+            chat_id: Telegram Chat ID（決定排隊順序）
+            func: 要執行的同步函數（例如 agent.process_message）
+            *args, **kwargs: 傳給 func 的參數
+
+        回傳：
+            func 的回傳值
+
+        例外：
+            AgentQueueFullError: 群組排隊訊息已達上限時
+            func 拋出的例外會原樣拋出
+        """
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = _ChatQueue()
+
+        if queue.depth >= self.max_pending_per_chat:
+            self._rejected += 1
+            logger.warning(f"群組 {chat_id} 排隊訊息已達上限（{queue.depth}），拒絕新訊息")
+            raise AgentQueueFullError(f"群組 {chat_id} 排隊訊息已達上限：{queue.depth}")
+
+        if self._semaphore is None:
+            # 延遲到第一次提交才建立，確保綁定到 Bot 執行中的事件迴圈
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+
+        queue.depth += 1
+        self._waiting += 1
+        self._max_depth = max(self._max_depth, self._waiting)
+        enqueued_at = time.perf_counter()
+        started_at = None
+
+        logger.debug(f"群組 {chat_id} 訊息排入佇列（群組深度：{queue.depth}，全域等待：{self._waiting}）")
+
+        try:
+            async with queue.lock:
+                async with self._semaphore:
+                    started_at = time.perf_counter()
+                    self._waiting -= 1
+                    self._running += 1
+                    self._total_wait += started_at - enqueued_at
+
+                    loop = asyncio.get_running_loop()
+                    try:
+                        result = await loop.run_in_executor(
+                            self._pool, lambda: func(*args, **kwargs)
+                        )
+                    except Exception:
+                        self._failed += 1
+                        raise
+                    finally:
+                        self._running -= 1
+                        self._total_run += time.perf_counter() - started_at
+
+            self._completed += 1
+            return result
+
+        finally:
+            if started_at is None:
+                # 在取得執行權前被取消
+                self._waiting -= 1
+
+            queue.depth -= 1
+            if queue.depth == 0 and self._chats.get(chat_id) is queue:
+                del self._chats[chat_id]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        取得執行器指標
+
+        回傳：
+            {
+                'max_workers': int,          # 同時執行上限
+                'running': int,              # 執行中的回合
+                'waiting': int,              # 排隊等待中的回合（佇列深度）
+                'max_queue_depth': int,      # 曾出現的最大佇列深度
+                'active_chats': int,         # 有訊息排隊或執行中的群組數
+                'chat_depths': dict,         # 各群組排隊中（含執行中）的訊息數
+                'completed': int,            # 成功完成的回合
+                'failed': int,               # 拋出例外的回合
+                'rejected': int,             # 因排隊已滿被拒絕的訊息
+                'avg_wait_ms': float,        # 平均排隊時間
+                'avg_run_ms': float          # 平均執行時間
+            }
+        """
+        finished = self._completed + self._failed
+        started = finished + self._running
+
+        return {
+            'max_workers': self.max_workers,
+            'running': self._running,
+            'waiting': self._waiting,
+            'max_queue_depth': self._max_depth,
+            'active_chats': len(self._chats),
+            'chat_depths': {chat_id: queue.depth for chat_id, queue in self._chats.items()},
+            'completed': self._completed,
+            'failed': self._failed,
+            'rejected': self._rejected,
+            'avg_wait_ms': self._total_wait / started * 1000 if started else 0.0,
+            'avg_run_ms': self._total_run / finished * 1000 if finished else 0.0
+        }
+
+    def shutdown(self, wait: bool = False) -> None:
+        """
+        關閉執行緒池
+
+        參數：
+            wait: 是否等待執行中的回合結束
+        """
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        logger.info("Agent 執行器已關閉")
@@ -10,10 +10,100 @@ from loguru import logger
 from datetime import datetime
 import pytz
 import os
+import re
 
 from .agent import MT5Agent
 
 
+# 當日日誌中一則互動的開頭：[2026-01-05 10:00:00] 用戶 name (id): 訊息
+_INTERACTION_PATTERN = re.compile(r'^\[(\d{4}-\d{2}-\d{2} (\d{2}:\d{2}):\d{2})\] 用戶 (.*?): ', re.MULTILINE)
+
+
+def _clip(text: str, limit: int) -> str:
+    """截斷文字並加上省略符號"""
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def summarize_daily_memory(
+    content: str,
+    max_chars: int = 4000,
+    recent: int = 3,
+    reflection_chars: int = 1200,
+    response_chars: int = 600,
+    question_chars: int = 80
+) -> str:
+    """
+    將當日日誌壓縮為有長度上限的記憶視窗
+
+    當日日誌由自我認知與逐則互動（用戶訊息＋完整回應）組成，整天累積後可能有數萬字元。
+    壓縮後保留：
+    - 自我認知（截斷至 reflection_chars）
+    - 最近 recent 則互動（回應截斷至 response_chars）
+    - 更早的互動只保留時間與問題（由新到舊，直到達到 max_chars）
+
+    參數：
+        content: 當日日誌內容
+        max_chars: 記憶視窗的字元上限
+        recent: 保留回應內容的最近互動數量
+        reflection_chars: 自我認知的字元上限
+        response_chars: 每則最近互動回應的字元上限
+        question_chars: 較早互動問題的字元上限
+
+    回傳：
+        壓縮後的記憶文字（沒有內容時回傳空字串）
+    """
+    matches = list(_INTERACTION_PATTERN.finditer(content))
+    header = content[:matches[0].start()] if matches else content
+
+    interactions = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        body = content[match.end():end]
+        question, _, response = body.partition('\n回應: ')
+        interactions.append({
+            'timestamp': match.group(1),
+            'clock': match.group(2),
+            'user': match.group(3),
+            'question': question.strip(),
+            'response': response.strip()
+        })
+
+    sections = []
+
+    reflection = '\n'.join(line for line in header.splitlines() if not set(line.strip()) <= {'='})
+    if reflection.strip():
+        sections.append(f"[自我認知]\n{_clip(reflection, reflection_chars)}")
+
+    recent_items = interactions[-recent:] if recent > 0 else []
+    if recent_items:
+        sections.append("[最近的互動]\n" + "\n\n".join(
+            f"[{item['timestamp']}] 用戶 {item['user']}: {_clip(item['question'], response_chars)}\n"
+            f"回應: {_clip(item['response'], response_chars)}"
+            for item in recent_items
+        ))
+
+    # 較早的互動由新到舊加入，直到達到字元上限
+    older = interactions[:len(interactions) - len(recent_items)]
+    budget = max_chars - sum(len(section) + 2 for section in sections)
+    lines = []
+    for item in reversed(older):
+        line = f"- {item['clock']} {item['user']}：{_clip(item['question'], question_chars)}"
+        if len(line) + 1 > budget - 40:
+            break
+        lines.append(line)
+        budget -= len(line) + 1
+
+    if older:
+        omitted = len(older) - len(lines)
+        summary = "\n".join(reversed(lines))
+        if omitted:
+            summary = f"（另有 {omitted} 則更早的互動已省略）\n{summary}".rstrip()
+        sections.insert(1 if reflection.strip() else 0, f"[較早的互動（僅列問題）]\n{summary}")
+
+    return _clip("\n\n".join(sections), max_chars) if sections else ''
+
+
 class AgentManager:
     """
     Agent 管理器
@@ -47,6 +137,10 @@ class AgentManager:
         self.api_key = api_key
         self.model = model
         self.agents_base_dir = Path(agents_base_dir)
+
+        # 附加到用戶訊息的當日記憶視窗大小
+        self.memory_max_chars = int(os.getenv('DAILY_MEMORY_MAX_CHARS', '4000'))
+        self.memory_recent_interactions = int(os.getenv('DAILY_MEMORY_RECENT_INTERACTIONS', '3'))
         self.agents: Dict[str, MT5Agent] = {}
         self.agent_configs: Dict[str, Dict[str, str]] = {}
 
@@ -229,7 +323,7 @@ class AgentManager:
 
 **重要提醒**：
 - 在調用 get_candles 前，請先確認 symbol 參數使用的是 symbols.txt 中的**正確名稱**（全大寫）
-- 在使用計算工具前，需要先使用 get_candles 取得資料
+- 在使用計算工具前，需要先使用 get_candles 取得資料，並將回傳的 candles_handle 傳給計算工具
 
 # 回答規範
 
@@ -324,6 +418,41 @@ class AgentManager:
             logger.debug(f"{agent_name} 的當日記憶檔案不存在")
             return ''
 
+    def build_memory_context(self, agent_name: str) -> str:
+        """
+        取得附加到用戶訊息的當日記憶視窗
+
+        與 read_daily_memory 不同，回傳的內容經 summarize_daily_memory 壓縮，
+        長度不超過 DAILY_MEMORY_MAX_CHARS，不會隨當日互動數量無限增長。
+
+        參數：
+            agent_name: agent 名稱（小寫）
+
+        回傳：
+            壓縮後的當日記憶，若沒有記憶則回傳空字串
+        """
+        content = self.read_daily_memory(agent_name)
+        if not content:
+            return ''
+
+        memory = summarize_daily_memory(
+            content,
+            max_chars=self.memory_max_chars,
+            recent=self.memory_recent_interactions
+        )
+        logger.debug(f"{agent_name} 的當日記憶：{len(content)} 字元壓縮為 {len(memory)} 字元")
+
+        return memory
+
+    def get_usage_stats(self) -> Dict[str, Dict]:
+        """
+        取得所有 agent 的累計 API 用量
+
+        回傳：
+            {agent 名稱: MT5Agent.get_usage_stats() 結果} 字典
+        """
+        return {name: agent.get_usage_stats() for name, agent in self.agents.items()}
+
     def append_to_daily_log(self, agent_name: str, content: str):
         """
         追加內容到指定 agent 的當日日誌
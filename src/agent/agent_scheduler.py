@@ -5,6 +5,7 @@ Agent 定時任務管理器
 """
 
 from typing import Optional
+import asyncio
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from loguru import logger
@@ -87,7 +88,12 @@ class AgentScheduler:
 """
 
             # 使用 agent 生成自我認知（不使用 default_system_prompt）
-            reflection = agent.process_message(prompt, system_prompt="你是一個專業的 MT5 交易團隊成員，正在撰寫你的每日自我認知。")
+            # process_message 為同步呼叫，移到執行緒中執行以免阻塞 Bot 的事件迴圈
+            reflection = await asyncio.to_thread(
+                agent.process_message,
+                prompt,
+                system_prompt="你是一個專業的 MT5 交易團隊成員，正在撰寫你的每日自我認知。"
+            )
 
             # 建立日誌內容
             log_content = f"""{'='*60}
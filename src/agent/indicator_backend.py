@@ -0,0 +1,272 @@
+"""
+技術指標運算後端模組
+
+此模組提供 indicators.py 中分支較多、難以完全向量化的內層迴圈的 JIT 版本：
+- 成交量分配（逐根 K 線逐層比較）
+- Value Area 擴展（從 POC 逐層向兩側擴展）
+- Pivot Point 掃描（單調佇列滑動窗口極值）
+
+匯入時若已安裝 numba 則以 numba.njit 編譯並使用 JIT 後端，否則使用 NumPy 向量化路徑。
+可透過環境變數 CHIP_INDICATOR_BACKEND 強制指定：
+- auto（預設）：有 numba 時使用 numba
+- numpy：一律使用 NumPy 向量化路徑
+- numba：使用 numba（未安裝時記錄警告並改用 numpy）
+
+未安裝 numba 時，本模組的核心函數仍可以純 Python 執行（僅供測試與驗證，不會被自動選用）。
+"""
+
+import os
+
+import numpy as np
+from loguru import logger
+
+try:
+    import numba
+except ImportError:  # numba 為選用依賴
+    numba = None
+
+
+# 強制指定後端的環境變數
+BACKEND_ENV = 'CHIP_INDICATOR_BACKEND'
+
+# 可用的後端名稱
+BACKENDS = ('numpy', 'numba')
+
+
+def _jit(func):
+    """已安裝 numba 時以 njit 編譯，否則回傳原函數"""
+    if numba is None:
+        return func
+    return numba.njit(cache=True, nogil=True)(func)
+
+
+# ============================================================================
+# JIT 核心函數
+# ============================================================================
+
+@_jit
+def distribute_volume_by_range(
+    highs,
+    lows,
+    volumes,
+    range_ids,
+    price_lowest,
+    price_step,
+    price_levels,
+    even_split=False
+):
+    """
+    將每根 K 線的成交量分配到所屬區間的價格層級（逐根逐層比較）
+
+    參數與回傳值同 indicators._distribute_volume_by_range，
+    even_split 為 True 時對應 weights='even'。
+    """
+    result = np.zeros((len(price_lowest), price_levels))
+
+    for i in range(len(highs)):
+        bar_high = highs[i]
+        bar_low = lows[i]
+        range_id = range_ids[i]
+        lowest = price_lowest[range_id]
+        step = price_step[range_id]
+
+        if even_split:
+            # 先計算覆蓋的層數，每層平分成交量
+            covered = 0
+            for level in range(price_levels):
+                level_low = lowest + level * step
+                if level_low > bar_high:
+                    break
+                if bar_low < lowest + (level + 1) * step:
+                    covered += 1
+
+            if covered == 0:
+                continue
+            weight = volumes[i] / covered
+        else:
+            bar_range = bar_high - bar_low
+            if bar_range == 0:
+                weight = volumes[i]
+            else:
+                weight = volumes[i] * (step / bar_range)
+
+        for level in range(price_levels):
+            level_low = lowest + level * step
+            level_high = lowest + (level + 1) * step
+
+            if bar_high >= level_low and bar_low < level_high:
+                result[range_id, level] += weight
+            elif level_low > bar_high:
+                # 層級由低到高，之後的層級都不會被覆蓋
+                break
+
+    return result
+
+
+@_jit
+def expand_value_area(volume_matrix, poc_level, target_volume, total_volume):
+    """
+    從 POC 向兩側擴展 Value Area（逐區間、逐層）
+
+    參數：
+        volume_matrix: (區間數, 價格層數) 成交量矩陣
+        poc_level: 每個區間的 POC 層級
+        target_volume: 每個區間的目標成交量
+        total_volume: 每個區間的總成交量（為 0 的區間不擴展）
+
+    回傳：
+        (value_area_volume, level_above_poc, level_below_poc)
+    """
+    range_count, price_levels = volume_matrix.shape
+    top = price_levels - 1
+
+    value_area_volume = np.empty(range_count)
+    level_above = poc_level.copy()
+    level_below = poc_level.copy()
+
+    for row in range(range_count):
+        above = poc_level[row]
+        below = poc_level[row]
+        volume = volume_matrix[row, above]
+
+        if total_volume[row] != 0:
+            while volume < target_volume[row]:
+                if below == 0 and above == top:
+                    break
+
+                volume_above = volume_matrix[row, above + 1] if above < top else 0.0
+                volume_below = volume_matrix[row, below - 1] if below > 0 else 0.0
+
+                if volume_above == 0 and volume_below == 0:
+                    break
+
+                # 相等時優先向上擴展（與 PineScript 行為一致）
+                if above < top and (volume_above >= volume_below or below == 0):
+                    volume += volume_above
+                    above += 1
+                else:
+                    volume += volume_below
+                    below -= 1
+
+        value_area_volume[row] = volume
+        level_above[row] = above
+        level_below[row] = below
+
+    return value_area_volume, level_above, level_below
+
+
+@_jit
+def _scan_pivot_side(values, length, sign, result):
+    """
+    標記 values * sign 嚴格大於左右各 length 根 K 線的位置（忽略 NaN）
+
+    以單調佇列計算滑動窗口最大值，每根 K 線只進出佇列一次，與 length 無關。
+    """
+    n = len(values)
+    window_max = np.full(n - length + 1, np.nan)
+    queue = np.empty(n, dtype=np.int64)
+    head = 0
+    tail = 0
+
+    for i in range(n):
+        value = values[i] * sign
+        if not np.isnan(value):
+            while tail > head and values[queue[tail - 1]] * sign <= value:
+                tail -= 1
+            queue[tail] = i
+            tail += 1
+
+        start = i - length + 1
+        while tail > head and queue[head] < start:
+            head += 1
+        if start >= 0 and tail > head:
+            window_max[start] = values[queue[head]] * sign
+
+    # 中心 i 的左窗口起點為 i - length、右窗口起點為 i + 1（全為 NaN 的窗口比較結果為 False）
+    for i in range(length, n - length):
+        center = values[i] * sign
+        result[i] = center > window_max[i - length] and center > window_max[i + 1]
+
+
+@_jit
+def scan_pivots(highs, lows, length):
+    """
+    掃描 Pivot High / Pivot Low（嚴格大於/小於左右各 length 根 K 線，忽略 NaN）
+
+    回傳：
+        (is_pivot_high, is_pivot_low) 布林陣列
+    """
+    is_high = np.zeros(len(highs), dtype=np.bool_)
+    is_low = np.zeros(len(lows), dtype=np.bool_)
+
+    _scan_pivot_side(highs, length, 1.0, is_high)
+    _scan_pivot_side(lows, length, -1.0, is_low)
+
+    return is_high, is_low
+
+
+# ============================================================================
+# 後端選擇
+# ============================================================================
+
+def _select_backend() -> str:
+    """依環境變數與 numba 是否可用選擇後端"""
+    requested = os.getenv(BACKEND_ENV, 'auto').strip().lower()
+
+    if requested not in ('auto',) + BACKENDS:
+        logger.warning(f"無效的指標運算後端：{requested}（{BACKEND_ENV}），改用自動選擇")
+        requested = 'auto'
+
+    if requested == 'numba' and numba is None:
+        logger.warning(f"{BACKEND_ENV}=numba 但未安裝 numba，改用 numpy 後端")
+        return 'numpy'
+
+    if requested == 'auto':
+        return 'numba' if numba is not None else 'numpy'
+
+    return requested
+
+
+_backend = _select_backend()
+logger.debug(f"指標運算後端：{_backend}")
+
+
+def get_backend() -> str:
+    """
+    取得目前使用的指標運算後端
+
+    回傳：
+        'numpy' 或 'numba'
+    """
+    return _backend
+
+
+def set_backend(name: str) -> str:
+    """
+    切換指標運算後端（例如基準測試時比較不同後端）
+
+    參數：
+        name: 'numpy' 或 'numba'
+
+    回傳：
+        切換前的後端名稱
+
+    例外：
+        ValueError: 後端名稱無效，或指定 numba 但未安裝時
+    """
+    global _backend
+
+    if name not in BACKENDS:
+        raise ValueError(f"無效的指標運算後端：{name}，可用的後端：{', '.join(BACKENDS)}")
+
+    if name == 'numba' and numba is None:
+        raise ValueError("未安裝 numba，無法使用 numba 後端")
+
+    previous = _backend
+    _backend = name
+    return previous
+
+
+def use_jit() -> bool:
+    """目前是否使用 JIT 後端"""
+    return _backend == 'numba'
@@ -0,0 +1,285 @@
+"""
+指標計算結果快取模組
+
+Claude 在同一段對話中重複呼叫相同工具、或多位使用者在同一分鐘內詢問
+同一商品時，SMA / RSI / Volume Profile / VPPA 會以相同數據重算。
+此模組以「數據指紋 + 指標名稱 + 參數」為鍵快取計算結果：
+
+- 記憶體層：LRU + TTL，超過容量淘汰最久未使用的項目，過期項目於讀取時移除
+- 磁碟層（選用）：寫入 SQLite 資料庫的 indicator_results 表，可跨行程、跨重啟共用
+- 命中 / 未命中計數：以 stats() 取得，供 /status 等監控使用
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+from loguru import logger
+
+
+class IndicatorCache:
+    """
+    指標計算結果快取
+
+    快取鍵由 make_key() 產生：
+    (指標名稱, 數據指紋, 排序後的參數)，數據指紋為
+    frame_fingerprint() 的 (symbol, timeframe, 最新 K 線時間, K 線數量)
+    或 json_fingerprint() 的 K 線 JSON 內容雜湊。
+
+    執行緒安全：所有操作以同一把鎖保護，計算本身在鎖外執行。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 60.0,
+        store=None
+    ):
+        """
+        初始化快取
+
+        參數：
+            max_entries: 記憶體層最多保留的項目數量
+            ttl_seconds: 項目存活秒數（記憶體層與磁碟層共用）
+            store: 磁碟層（SQLiteCacheManager 實例），None 表示只使用記憶體
+
+        例外：
+            ValueError: max_entries 小於 1 或 ttl_seconds 不為正數時
+        """
+        if max_entries < 1:
+            raise ValueError(f"無效的快取容量：{max_entries}")
+        if ttl_seconds <= 0:
+            raise ValueError(f"無效的快取存活時間：{ttl_seconds}")
+
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+
+        # key -> (expires_at, value)，依使用順序排列（最近使用在尾端）
+        self._entries: 'OrderedDict[Tuple, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    # ========================================================================
+    # 快取鍵
+    # ========================================================================
+
+    @staticmethod
+    def frame_fingerprint(symbol: str, timeframe: str, df: pd.DataFrame) -> Tuple:
+        """
+        以商品、週期、最新 K 線時間與 K 線數量建立數據指紋
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 時間週期
+            df: K 線 DataFrame（含 time 欄位或以時間為索引）
+
+        回傳：
+            (symbol, timeframe, last_time, bar_count) 元組
+        """
+        if len(df) == 0:
+            return (symbol, timeframe, None, 0)
+
+        last_time = df['time'].iloc[-1] if 'time' in df.columns else df.index[-1]
+        return (symbol, timeframe, str(last_time), len(df))
+
+    @staticmethod
+    def json_fingerprint(candles_json: str) -> Tuple:
+        """
+        以 K 線 JSON 內容建立數據指紋
+
+        candles_json 不含商品與週期資訊，改以內容雜湊辨識；
+        雜湊比解析 JSON 便宜得多，命中時可省去解析與計算。
+
+        參數：
+            candles_json: get_candles 工具提供的 K 線 JSON 字串
+
+        回傳：
+            ('json', 內容雜湊, 字串長度) 元組
+        """
+        digest = hashlib.blake2b(candles_json.encode('utf-8'), digest_size=16).hexdigest()
+        return ('json', digest, len(candles_json))
+
+    @staticmethod
+    def make_key(indicator: str, fingerprint: Tuple, params: Optional[Dict] = None) -> Tuple:
+        """
+        建立快取鍵
+
+        參數：
+            indicator: 指標名稱（例如：calculate_sma）
+            fingerprint: frame_fingerprint() 或 json_fingerprint() 的結果
+            params: 指標參數
+
+        回傳：
+            可雜湊的快取鍵元組
+        """
+        return (indicator, tuple(fingerprint), tuple(sorted((params or {}).items())))
+
+    @staticmethod
+    def _key_text(key: Tuple) -> str:
+        """快取鍵轉為磁碟層使用的字串"""
+        return json.dumps(key, ensure_ascii=False, default=str)
+
+    # ========================================================================
+    # 讀寫
+    # ========================================================================
+
+    def get(self, key: Tuple, default: Any = None) -> Any:
+        """
+        讀取快取項目（記憶體層未命中時查詢磁碟層）
+
+        參數：
+            key: make_key() 產生的快取鍵
+            default: 未命中時的回傳值
+
+        回傳：
+            快取的計算結果，未命中時回傳 default
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry[1]
+
+                del self._entries[key]
+                self._expirations += 1
+
+        if self.store is not None:
+            try:
+                row = self.store.get_indicator_result(self._key_text(key), now=int(now))
+            except Exception as e:
+                logger.warning(f"讀取磁碟指標快取失敗：{e}")
+                row = None
+
+            if row is not None:
+                value = json.loads(row['result'])
+                with self._lock:
+                    self._disk_hits += 1
+                    self._put(key, value, min(row['expires_at'], now + self.ttl_seconds))
+                return value
+
+        with self._lock:
+            self._misses += 1
+
+        return default
+
+    def set(self, key: Tuple, value: Any, persist: bool = False) -> None:
+        """
+        寫入快取項目
+
+        參數：
+            key: make_key() 產生的快取鍵
+            value: 計算結果
+            persist: 是否同時寫入磁碟層（value 必須可序列化為 JSON）
+        """
+        expires_at = time.time() + self.ttl_seconds
+
+        with self._lock:
+            self._put(key, value, expires_at)
+
+        if persist and self.store is not None:
+            indicator, fingerprint = key[0], key[1]
+            try:
+                self.store.save_indicator_result(
+                    cache_key=self._key_text(key),
+                    indicator=indicator,
+                    symbol=str(fingerprint[0]),
+                    timeframe=str(fingerprint[1]),
+                    result=json.dumps(value, ensure_ascii=False),
+                    expires_at=int(expires_at)
+                )
+            except Exception as e:
+                logger.warning(f"寫入磁碟指標快取失敗：{e}")
+
+    def get_or_compute(
+        self,
+        key: Tuple,
+        compute: Callable[[], Any],
+        persist: bool = False
+    ) -> Any:
+        """
+        讀取快取，未命中時計算並寫入
+
+        參數：
+            key: make_key() 產生的快取鍵
+            compute: 無參數的計算函數
+            persist: 是否同時寫入磁碟層
+
+        回傳：
+            計算結果
+        """
+        missing = object()
+        value = self.get(key, missing)
+
+        if value is missing:
+            value = compute()
+            self.set(key, value, persist=persist)
+
+        return value
+
+    def _put(self, key: Tuple, value: Any, expires_at: float) -> None:
+        """寫入記憶體層並淘汰超出容量的項目（呼叫端需持有鎖）"""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def clear(self) -> None:
+        """清空記憶體層並重設計數（磁碟層不受影響）"""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._disk_hits = self._misses = 0
+            self._evictions = self._expirations = 0
+
+    # ========================================================================
+    # 監控
+    # ========================================================================
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        取得快取統計
+
+        回傳：
+            {
+                'size': int,            # 記憶體層項目數量
+                'max_entries': int,
+                'ttl_seconds': float,
+                'hits': int,            # 記憶體層命中
+                'disk_hits': int,       # 磁碟層命中
+                'misses': int,
+                'evictions': int,       # 因容量淘汰的項目數
+                'expirations': int,     # 因過期移除的項目數
+                'hit_rate': float,      # (hits + disk_hits) / 總查詢次數
+                'disk_enabled': bool
+            }
+        """
+        with self._lock:
+            lookups = self._hits + self._disk_hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'hit_rate': (self._hits + self._disk_hits) / lookups if lookups else 0.0,
+                'disk_enabled': self.store is not None
+            }
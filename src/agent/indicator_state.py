@@ -0,0 +1,435 @@
+"""
+串流技術指標狀態模組
+
+calculate_sma / calculate_rsi / calculate_bollinger_bands 每次都對整段序列重算，
+此模組提供可逐根（或逐 Tick）更新的對應狀態物件，每次更新為 O(1)：
+- SMAState：維護視窗內數值的累計和
+- RSIState：維護漲跌的累計和（smoothing='sma'）或 Wilder 平滑平均（smoothing='wilder'）
+- BollingerState：以 Welford 演算法維護視窗內的平均數與平方差和
+
+每個狀態可先以 seed() 餵入快取中的歷史 K 線，之後：
+- update(value)：新 K 線收盤（或開盤）時加入一個新值
+- revise(value)：尚未收盤的最新 K 線價格變動時，改寫最後一個值
+
+各狀態的 value 與對相同序列呼叫批次函數的最後一個值相同（誤差僅來自浮點運算順序），
+累計和每 RESYNC_INTERVAL 次更新以視窗內數值重新計算一次，避免誤差累積。
+"""
+
+import math
+from collections import deque
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+# 每隔多少次更新以視窗內數值重新計算累計和
+RESYNC_INTERVAL = 4096
+
+
+class _WindowState:
+    """固定視窗狀態的共用部分"""
+
+    def __init__(self, window: int):
+        """
+        參數：
+            window: 視窗大小
+
+        例外：
+            ValueError: 視窗大小小於 1 時
+        """
+        if window < 1:
+            raise ValueError(f"無效的視窗大小：{window}")
+
+        self.window = window
+        self.reset()
+
+    def reset(self) -> None:
+        """清除所有狀態"""
+        self._count = 0
+        self._clear()
+
+    @property
+    def count(self) -> int:
+        """已加入的數值數量（revise 不計入）"""
+        return self._count
+
+    @property
+    def ready(self) -> bool:
+        """是否已有足夠數值產生指標"""
+        return self.value is not None
+
+    def seed(self, values: Iterable[float]) -> '_WindowState':
+        """
+        清除狀態後依序加入歷史數值
+
+        參數：
+            values: 依時間排序的歷史數值（例如快取中的收盤價）
+
+        回傳：
+            狀態本身（可串接使用）
+        """
+        self.reset()
+        values = np.asarray(values, dtype=float)
+        length = self._seed_length()
+
+        for value in values if length is None else values[-length:]:
+            self.update(value)
+
+        # 捨棄的前段數值仍計入 count
+        self._count = len(values)
+
+        return self
+
+    def update(self, value: float):
+        """
+        加入一個新值（新 K 線）
+
+        參數：
+            value: 新 K 線的價格
+
+        回傳：
+            更新後的指標值（資料不足時為 None）
+        """
+        self._count += 1
+        self._push(float(value))
+
+        if self._count % RESYNC_INTERVAL == 0:
+            self._resync()
+
+        return self.value
+
+    def revise(self, value: float):
+        """
+        改寫最後一個值（最新 K 線尚未收盤時的價格變動）
+
+        參數：
+            value: 最新 K 線的價格
+
+        回傳：
+            更新後的指標值（資料不足時為 None）
+
+        例外：
+            ValueError: 尚未加入任何數值時
+        """
+        if self._count == 0:
+            raise ValueError("尚未加入任何數值，無法改寫最後一個值")
+
+        self._replace_last(float(value))
+
+        return self.value
+
+    def _seed_length(self) -> Optional[int]:
+        """seed() 只需要的最後幾個數值（None 表示需要全部）"""
+        return self.window
+
+    def _clear(self) -> None:
+        raise NotImplementedError
+
+    def _push(self, value: float) -> None:
+        raise NotImplementedError
+
+    def _replace_last(self, value: float) -> None:
+        raise NotImplementedError
+
+    def _resync(self) -> None:
+        pass
+
+
+class SMAState(_WindowState):
+    """
+    簡單移動平均線（SMA）串流狀態
+
+    value 與 calculate_sma(df, window).iloc[-1] 相同。
+
+    使用範例：
+        sma = SMAState(window=20).seed(df['close'])
+        sma.update(new_close)      # 新 K 線
+        sma.revise(latest_price)   # 最新 K 線價格變動
+    """
+
+    def _clear(self) -> None:
+        self._values = deque(maxlen=self.window)
+        self._sum = 0.0
+
+    def _push(self, value: float) -> None:
+        if len(self._values) == self.window:
+            self._sum -= self._values[0]
+        self._values.append(value)
+        self._sum += value
+
+    def _replace_last(self, value: float) -> None:
+        self._sum += value - self._values[-1]
+        self._values[-1] = value
+
+    def _resync(self) -> None:
+        self._sum = math.fsum(self._values)
+
+    @property
+    def value(self) -> Optional[float]:
+        """最新 SMA 值（資料不足時為 None）"""
+        if len(self._values) < self.window:
+            return None
+        return self._sum / self.window
+
+
+class BollingerState(_WindowState):
+    """
+    布林通道串流狀態
+
+    以 Welford 演算法維護視窗內的平均數與平方差和（樣本標準差，ddof=1），
+    新值進入、舊值離開視窗時只需 O(1) 更新，且不會有 E[x²] - E[x]² 的相消誤差。
+    value 與 calculate_bollinger_bands(df, window, num_std) 各序列的最後一個值相同。
+    """
+
+    def __init__(self, window: int = 20, num_std: float = 2.0):
+        """
+        參數：
+            window: 移動平均視窗大小（預設 20）
+            num_std: 標準差倍數（預設 2.0）
+
+        例外：
+            ValueError: 視窗大小小於 1 時
+        """
+        self.num_std = num_std
+        super().__init__(window)
+
+    def _clear(self) -> None:
+        self._values = deque(maxlen=self.window)
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def _push(self, value: float) -> None:
+        if len(self._values) == self.window:
+            self._replace(self._values[0], value)
+            self._values.append(value)
+            return
+
+        self._values.append(value)
+        delta = value - self._mean
+        self._mean += delta / len(self._values)
+        self._m2 += delta * (value - self._mean)
+
+    def _replace_last(self, value: float) -> None:
+        self._replace(self._values[-1], value)
+        self._values[-1] = value
+
+    def _replace(self, old: float, new: float) -> None:
+        """視窗內的 old 換成 new（數量不變）"""
+        mean = self._mean + (new - old) / len(self._values)
+        self._m2 = max(self._m2 + (new - old) * (new - mean + old - self._mean), 0.0)
+        self._mean = mean
+
+    def _resync(self) -> None:
+        values = np.fromiter(self._values, dtype=float)
+        self._mean = float(values.mean())
+        self._m2 = float(((values - self._mean) ** 2).sum())
+
+    @property
+    def std(self) -> Optional[float]:
+        """視窗內的樣本標準差（資料不足時為 None）"""
+        if len(self._values) < self.window:
+            return None
+        if self.window == 1:
+            return math.nan
+        return math.sqrt(self._m2 / (self.window - 1))
+
+    @property
+    def value(self) -> Optional[Tuple[float, float, float]]:
+        """最新 (upper_band, middle_band, lower_band)（資料不足時為 None）"""
+        std = self.std
+        if std is None:
+            return None
+        return (
+            self._mean + std * self.num_std,
+            self._mean,
+            self._mean - std * self.num_std
+        )
+
+
+class RSIState(_WindowState):
+    """
+    相對強弱指標（RSI）串流狀態
+
+    smoothing：
+    - 'sma'：視窗內漲跌的簡單平均，與 calculate_rsi(df, window) 相同
+      （與批次函數一致，第一根 K 線視為漲跌皆為 0）
+    - 'wilder'：Wilder 平滑，與 calculate_rsi(df, window, smoothing='wilder') 相同
+
+    平均跌幅為 0 時 RSI 為 100；漲跌皆為 0 時為 None（批次函數為 NaN）。
+    """
+
+    SMOOTHING_METHODS = ('sma', 'wilder')
+
+    def __init__(self, window: int = 14, smoothing: str = 'sma'):
+        """
+        參數：
+            window: RSI 視窗大小（預設 14）
+            smoothing: 平均方式，'sma' 或 'wilder'（預設 'sma'）
+
+        例外：
+            ValueError: 視窗大小小於 1 或平滑方式無效時
+        """
+        if smoothing not in self.SMOOTHING_METHODS:
+            raise ValueError(
+                f"無效的平滑方式：{smoothing}，可選：{', '.join(self.SMOOTHING_METHODS)}"
+            )
+
+        self.smoothing = smoothing
+        super().__init__(window)
+
+    def _seed_length(self) -> Optional[int]:
+        # Wilder 平滑與全部歷史有關；簡單平均只需要 window 個漲跌（window + 1 個價格）
+        return None if self.smoothing == 'wilder' else self.window + 1
+
+    def _clear(self) -> None:
+        self._last = None            # 最新價格
+        self._prev = None            # 最新價格的前一個價格
+        # smoothing='sma'
+        self._gains = deque(maxlen=self.window)
+        self._losses = deque(maxlen=self.window)
+        self._sum_gain = 0.0
+        self._sum_loss = 0.0
+        self._gain_bars = 0          # 視窗內上漲的 K 線數
+        self._loss_bars = 0          # 視窗內下跌的 K 線數
+        # smoothing='wilder'：(已累計的漲跌數, 平均漲幅, 平均跌幅)，以及加入最新值之前的狀態
+        self._wilder = (0, 0.0, 0.0)
+        self._wilder_prev = self._wilder
+
+    def _push(self, value: float) -> None:
+        self._prev, self._last = self._last, value
+
+        if self.smoothing == 'wilder':
+            self._wilder_prev = self._wilder
+            if self._prev is not None:
+                self._wilder = self._wilder_step(self._wilder_prev, value - self._prev)
+            return
+
+        gain, loss = self._split(None if self._prev is None else value - self._prev)
+        if len(self._gains) == self.window:
+            self._remove(self._gains[0], self._losses[0])
+        self._gains.append(gain)
+        self._losses.append(loss)
+        self._add(gain, loss)
+
+    def _replace_last(self, value: float) -> None:
+        self._last = value
+
+        if self.smoothing == 'wilder':
+            if self._prev is not None:
+                self._wilder = self._wilder_step(self._wilder_prev, value - self._prev)
+            return
+
+        gain, loss = self._split(None if self._prev is None else value - self._prev)
+        self._remove(self._gains[-1], self._losses[-1])
+        self._gains[-1] = gain
+        self._losses[-1] = loss
+        self._add(gain, loss)
+
+    def _add(self, gain: float, loss: float) -> None:
+        self._sum_gain += gain
+        self._sum_loss += loss
+        self._gain_bars += gain > 0
+        self._loss_bars += loss > 0
+
+    def _remove(self, gain: float, loss: float) -> None:
+        self._sum_gain -= gain
+        self._sum_loss -= loss
+        self._gain_bars -= gain > 0
+        self._loss_bars -= loss > 0
+
+    def _resync(self) -> None:
+        self._sum_gain = math.fsum(self._gains)
+        self._sum_loss = math.fsum(self._losses)
+
+    @staticmethod
+    def _split(delta: Optional[float]) -> Tuple[float, float]:
+        """價格變動拆成 (漲幅, 跌幅)，第一根 K 線（無變動）視為 (0, 0)"""
+        if delta is None or delta != delta:
+            return 0.0, 0.0
+        return max(delta, 0.0), max(-delta, 0.0)
+
+    def _wilder_step(
+        self,
+        state: Tuple[int, float, float],
+        delta: float
+    ) -> Tuple[int, float, float]:
+        """由前一個 Wilder 狀態與新的價格變動計算下一個狀態"""
+        count, avg_gain, avg_loss = state
+        gain, loss = self._split(delta)
+        count += 1
+
+        if count < self.window:
+            # 暖身期：先累計總和
+            return count, avg_gain + gain, avg_loss + loss
+        if count == self.window:
+            # 第一個平均值為前 window 個漲跌的簡單平均
+            return count, (avg_gain + gain) / self.window, (avg_loss + loss) / self.window
+
+        return (
+            count,
+            (avg_gain * (self.window - 1) + gain) / self.window,
+            (avg_loss * (self.window - 1) + loss) / self.window
+        )
+
+    @property
+    def averages(self) -> Optional[Tuple[float, float]]:
+        """最新 (平均漲幅, 平均跌幅)（資料不足時為 None）"""
+        if self.smoothing == 'wilder':
+            count, avg_gain, avg_loss = self._wilder
+            return (avg_gain, avg_loss) if count >= self.window else None
+
+        if len(self._gains) < self.window:
+            return None
+
+        # 視窗內沒有漲（跌）時直接回傳 0，避免累計和的殘差
+        avg_gain = self._sum_gain / self.window if self._gain_bars else 0.0
+        avg_loss = self._sum_loss / self.window if self._loss_bars else 0.0
+        return avg_gain, avg_loss
+
+    @property
+    def value(self) -> Optional[float]:
+        """最新 RSI 值（範圍 0-100，資料不足或漲跌皆為 0 時為 None）"""
+        averages = self.averages
+        if averages is None:
+            return None
+
+        avg_gain, avg_loss = averages
+        if avg_loss == 0:
+            return 100.0 if avg_gain > 0 else None
+
+        return 100 - 100 / (1 + avg_gain / avg_loss)
+
+
+def seed_from_cache(
+    cache,
+    symbol: str,
+    timeframe: str,
+    states: Sequence[_WindowState],
+    column: str = 'close',
+    count: int = 5000
+) -> int:
+    """
+    以 SQLite 快取中最新的 K 線為多個指標狀態暖身
+
+    參數：
+        cache: SQLiteCacheManager 實例
+        symbol: 商品代碼
+        timeframe: 時間週期
+        states: 要暖身的狀態物件
+        column: 使用的價格欄位（預設 'close'）
+        count: 讀取最新的 K 線數量（Wilder RSI 需要較長的歷史才會收斂）
+
+    回傳：
+        讀取的 K 線數量
+    """
+    values = cache.query_candles_arrays(
+        symbol, timeframe, order='desc', limit=count, columns=[column]
+    )[column][::-1]
+
+    for state in states:
+        state.seed(values)
+
+    logger.info(f"已以 {len(values)} 根 {symbol} {timeframe} K 線為 {len(states)} 個指標狀態暖身")
+
+    return len(values)
@@ -4,15 +4,18 @@
 此模組提供各種技術指標的計算功能，可被 Agent 工具調用。
 """
 
-from typing import Dict, Tuple
+from typing import Dict, Iterable, Tuple
 import numpy as np
 import pandas as pd
 from loguru import logger
 
+from . import indicator_backend
+
 
 def calculate_volume_profile(
     df: pd.DataFrame,
-    price_bins: int = 100
+    price_bins: int = 100,
+    value_area_pct: float = 0.70
 ) -> Tuple[pd.DataFrame, Dict]:
     """
     計算整個資料集的 Volume Profile
@@ -21,9 +24,14 @@ def calculate_volume_profile(
     如果需要計算特定區間的 Volume Profile（例如 Pivot Point 之間的區間），
     請使用 calculate_volume_profile_for_range() 函數。
 
+    成交量分配與 Value Area 擴展使用與 VPPA 相同的 distribute_volume /
+    calculate_value_area_many，但沿用原本的平均分配：每根 K 線的成交量
+    平分到其覆蓋的價格層級（總量不變）；POC、VAH、VAL 以價格層級的中心價回報。
+
     參數：
         df: K 線資料 DataFrame（必須包含 'high', 'low', 'real_volume' 欄位）
         price_bins: 價格區間數量（預設 100）
+        value_area_pct: Value Area 包含的成交量百分比（預設 0.70 即 70%）
 
     回傳：
         (profile_df, metrics) 元組
@@ -44,113 +52,200 @@ def calculate_volume_profile(
     if len(df) == 0:
         raise ValueError("輸入資料為空")
 
-    # 1. 確定價格範圍
-    price_min = df['low'].min()
-    price_max = df['high'].max()
+    # 1. 確定價格範圍與每層高度
+    price_min = float(df['low'].min())
+    price_max = float(df['high'].max())
+    price_step = (price_max - price_min) / price_bins
     logger.debug(f"價格範圍：{price_min:.2f} ~ {price_max:.2f}")
 
-    # 2. 建立價格區間
-    price_edges = np.linspace(price_min, price_max, price_bins + 1)
-    price_centers = (price_edges[:-1] + price_edges[1:]) / 2
-
-    # 3. 計算每個價格區間的成交量
-    volumes = np.zeros(price_bins)
-
-    for _, row in df.iterrows():
-        # 找出此 K 線涵蓋的價格區間
-        low_idx = np.searchsorted(price_edges, row['low'], side='left')
-        high_idx = np.searchsorted(price_edges, row['high'], side='right') - 1
-
-        # 確保索引在有效範圍內
-        low_idx = max(0, min(low_idx, price_bins - 1))
-        high_idx = max(0, min(high_idx, price_bins - 1))
-
-        # 將成交量分配到涵蓋的價格區間
-        span = high_idx - low_idx + 1
-        if span > 0:
-            volume_per_bin = row['real_volume'] / span
-            volumes[low_idx:high_idx + 1] += volume_per_bin
+    price_centers = price_min + (np.arange(price_bins) + 0.5) * price_step
+
+    # 2. 計算每個價格層級的成交量（價格無變化時全部落在最低層）
+    real_volume = df['real_volume'].to_numpy(dtype=np.float64)
+    volumes = distribute_volume(
+        df['high'].to_numpy(dtype=np.float64),
+        df['low'].to_numpy(dtype=np.float64),
+        real_volume,
+        price_min,
+        price_step if price_step > 0 else 1.0,
+        price_bins,
+        weights='even'
+    )
 
-    # 4. 建立 Volume Profile DataFrame
     profile_df = pd.DataFrame({
         'price': price_centers,
         'volume': volumes
     })
 
-    # 按成交量排序
-    profile_df_sorted_by_volume = profile_df.sort_values('volume', ascending=False)
+    # 3. 計算 POC 與 Value Area（從 POC 向兩側擴展）
+    value_area = _value_area_row(
+        calculate_value_area_many(
+            volumes[None, :],
+            np.array([price_min]),
+            np.array([price_step]),
+            value_area_pct
+        ),
+        0
+    )
 
-    # 5. 計算 POC (Point of Control) - 成交量最大的價位
-    poc_price = profile_df_sorted_by_volume.iloc[0]['price']
-    poc_volume = profile_df_sorted_by_volume.iloc[0]['volume']
+    poc_price = price_centers[value_area['poc_level']]
+    vah = price_centers[value_area['level_above_poc']]
+    val = price_centers[value_area['level_below_poc']]
 
-    logger.info(f"POC (Point of Control)：{poc_price:.2f}，成交量：{poc_volume:.0f}")
+    logger.info(f"POC (Point of Control)：{poc_price:.2f}，成交量：{value_area['poc_volume']:.0f}")
+    logger.info(f"Value Area High (VAH)：{vah:.2f}")
+    logger.info(f"Value Area Low (VAL)：{val:.2f}")
+    logger.info(
+        f"Value Area 成交量：{value_area['value_area_volume']:.0f} "
+        f"({value_area['value_area_pct']:.1f}%)"
+    )
 
-    # 6. 計算 Value Area (70% 成交量區間)
-    total_volume = volumes.sum()
-    target_volume = total_volume * 0.70
+    # 4. 整理結果
+    metrics = {
+        'poc_price': float(poc_price),
+        'poc_volume': float(value_area['poc_volume']),
+        'vah': float(vah),
+        'val': float(val),
+        'value_area_volume': float(value_area['value_area_volume']),
+        'total_volume': float(real_volume.sum()),
+        'value_area_percentage': float(value_area['value_area_pct'])
+    }
 
-    # 從 POC 開始向兩側擴展，直到達到 70% 成交量
-    profile_df_sorted_by_price = profile_df.sort_values('price')
-    poc_idx = profile_df_sorted_by_price[
-        profile_df_sorted_by_price['price'] == poc_price
-    ].index[0]
+    return profile_df, metrics
 
-    # 初始化 Value Area
-    value_area_volume = poc_volume
-    lower_idx = poc_idx
-    upper_idx = poc_idx
 
-    # 向兩側擴展
-    while value_area_volume < target_volume:
-        # 檢查是否還有空間擴展
-        can_expand_lower = lower_idx > 0
-        can_expand_upper = upper_idx < len(profile_df_sorted_by_price) - 1
+def _tick_prices_and_weights(
+    chunk: Dict[str, np.ndarray],
+    price: str,
+    weight: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    取出單一 Tick 區塊的價格與權重
 
-        if not can_expand_lower and not can_expand_upper:
-            break
+    price='auto' 時有成交價（last > 0）的 Tick 使用成交價，否則使用買賣中價；
+    weight='auto' 時有成交量（volume > 0）的 Tick 使用成交量，否則每筆 Tick 計為 1。
+    """
+    if price == 'mid':
+        prices = (chunk['bid'] + chunk['ask']) / 2
+    elif price == 'auto':
+        prices = np.where(chunk['last'] > 0, chunk['last'], (chunk['bid'] + chunk['ask']) / 2)
+    else:
+        prices = chunk[price]
 
-        # 選擇成交量較大的一側擴展
-        lower_volume = (
-            profile_df_sorted_by_price.iloc[lower_idx - 1]['volume']
-            if can_expand_lower else 0
-        )
-        upper_volume = (
-            profile_df_sorted_by_price.iloc[upper_idx + 1]['volume']
-            if can_expand_upper else 0
-        )
+    if weight == 'ticks':
+        weights = np.ones(len(prices))
+    elif weight == 'auto':
+        weights = np.where(chunk['volume'] > 0, chunk['volume'], 1.0)
+    else:
+        weights = chunk['volume']
 
-        if lower_volume > upper_volume and can_expand_lower:
-            lower_idx -= 1
-            value_area_volume += lower_volume
-        elif can_expand_upper:
-            upper_idx += 1
-            value_area_volume += upper_volume
+    return prices, weights
 
-    # Value Area High (VAH) 和 Low (VAL)
-    vah = profile_df_sorted_by_price.iloc[upper_idx]['price']
-    val = profile_df_sorted_by_price.iloc[lower_idx]['price']
 
-    logger.info(f"Value Area High (VAH)：{vah:.2f}")
-    logger.info(f"Value Area Low (VAL)：{val:.2f}")
+def calculate_tick_volume_profile(
+    tick_chunks: Iterable[Dict[str, np.ndarray]],
+    price_step: float,
+    price: str = 'auto',
+    weight: str = 'auto',
+    value_area_pct: float = 0.7
+) -> Dict:
+    """
+    以 Tick 數據計算 Volume Profile
+
+    K 線版本只能把每根 K 線的成交量平均分配到其高低點之間；Tick 版本直接把每筆 Tick
+    的成交量放進其成交價所在的價格層級。每個區塊以一次 np.bincount 累加，
+    直方圖隨價格範圍向兩側擴充，因此只需掃描一次、記憶體只需單一區塊與直方圖的大小。
+
+    價格層級 k 涵蓋 [k × price_step, (k + 1) × price_step)，與 Tick 的起始時間無關，
+    不同時段算出的直方圖可以直接對齊相加。
+
+    參數：
+        tick_chunks: Tick 區塊（例如 SQLiteCacheManager.iter_tick_chunks() 的結果），
+                     每個區塊為包含 bid, ask, last, volume 欄位的陣列字典
+        price_step: 每個價格層級的高度（建議為商品最小跳動點的整數倍）
+        price: 價格來源，'auto'、'last'、'bid'、'ask' 或 'mid'（預設 'auto'）
+        weight: 權重來源，'auto'、'volume' 或 'ticks'（預設 'auto'）
+        value_area_pct: Value Area 包含的成交量百分比（預設 0.7）
+
+    回傳：
+        {
+            'price_lowest': float,           # 最低層級的下緣
+            'price_step': float,
+            'levels': int,                   # 價格層級數
+            'price_centers': np.ndarray,     # 各層級中心價格
+            'volume_profile': np.ndarray,    # 各層級成交量
+            'tick_count': int,               # 納入計算的 Tick 筆數
+            'poc': {'level', 'price', 'volume'},
+            'vah', 'val', 'value_area_volume', 'total_volume', ...  # 同 calculate_value_area()
+        }
+
+    例外：
+        ValueError: 參數無效或沒有有效的 Tick 時
+    """
+    if price_step <= 0:
+        raise ValueError(f"無效的價格層級高度：{price_step}")
+    if price not in ('auto', 'last', 'bid', 'ask', 'mid'):
+        raise ValueError(f"無效的價格來源：{price}")
+    if weight not in ('auto', 'volume', 'ticks'):
+        raise ValueError(f"無效的權重來源：{weight}")
+
+    histogram = np.zeros(0)
+    base_level = 0
+    tick_count = 0
+
+    for chunk in tick_chunks:
+        prices, weights = _tick_prices_and_weights(chunk, price, weight)
+
+        valid = np.isfinite(prices) & (prices > 0)
+        if not valid.all():
+            prices, weights = prices[valid], weights[valid]
+        if len(prices) == 0:
+            continue
+
+        # 加上極小值，避免剛好落在層級邊界的價格因浮點誤差落入下一層
+        levels = np.floor(prices / price_step + 1e-9).astype(np.int64)
+        low, high = int(levels.min()), int(levels.max())
+
+        # 直方圖向兩側擴充以涵蓋本區塊的價格範圍
+        if len(histogram) == 0:
+            base_level = low
+            histogram = np.zeros(high - low + 1)
+        else:
+            if low < base_level:
+                histogram = np.concatenate([np.zeros(base_level - low), histogram])
+                base_level = low
+            if high >= base_level + len(histogram):
+                histogram = np.concatenate([histogram, np.zeros(high - base_level - len(histogram) + 1)])
+
+        histogram += np.bincount(levels - base_level, weights=weights, minlength=len(histogram))
+        tick_count += len(prices)
+
+    if tick_count == 0:
+        raise ValueError("沒有有效的 Tick 數據")
+
+    price_lowest = base_level * price_step
+    value_area = calculate_value_area(histogram, price_lowest, price_step, value_area_pct)
+
     logger.info(
-        f"Value Area 成交量：{value_area_volume:.0f} "
-        f"({value_area_volume/total_volume*100:.1f}%)"
+        f"Tick Volume Profile 計算完成：{tick_count} 筆 Tick，{len(histogram)} 個價格層級，"
+        f"POC {value_area['poc_price']:.5f}"
     )
 
-    # 7. 整理結果
-    metrics = {
-        'poc_price': float(poc_price),
-        'poc_volume': float(poc_volume),
-        'vah': float(vah),
-        'val': float(val),
-        'value_area_volume': float(value_area_volume),
-        'total_volume': float(total_volume),
-        'value_area_percentage': float(value_area_volume / total_volume * 100)
+    return {
+        'price_lowest': price_lowest,
+        'price_step': price_step,
+        'levels': len(histogram),
+        'price_centers': price_lowest + (np.arange(len(histogram)) + 0.5) * price_step,
+        'volume_profile': histogram,
+        'tick_count': tick_count,
+        'poc': {
+            'level': value_area['poc_level'],
+            'price': value_area['poc_price'],
+            'volume': value_area['poc_volume']
+        },
+        **value_area
     }
 
-    return profile_df, metrics
-
 
 def calculate_sma(df: pd.DataFrame, window: int = 20, column: str = 'close') -> pd.Series:
     """
@@ -179,7 +274,12 @@ def calculate_sma(df: pd.DataFrame, window: int = 20, column: str = 'close') ->
     return sma
 
 
-def calculate_rsi(df: pd.DataFrame, window: int = 14, column: str = 'close') -> pd.Series:
+def calculate_rsi(
+    df: pd.DataFrame,
+    window: int = 14,
+    column: str = 'close',
+    smoothing: str = 'sma'
+) -> pd.Series:
     """
     計算相對強弱指標 (Relative Strength Index)
 
@@ -187,6 +287,10 @@ def calculate_rsi(df: pd.DataFrame, window: int = 14, column: str = 'close') ->
         df: K 線資料 DataFrame
         window: RSI 視窗大小（預設 14）
         column: 用於計算的欄位名稱（預設 'close'）
+        smoothing: 平均漲跌的計算方式（預設 'sma'）
+            - 'sma'：視窗內的簡單平均
+            - 'wilder'：Wilder 平滑（第一個值為前 window 個漲跌的簡單平均，
+              之後為 (前值 × (window - 1) + 本期) / window）
 
     回傳：
         包含 RSI 值的 Series（範圍 0-100）
@@ -197,6 +301,9 @@ def calculate_rsi(df: pd.DataFrame, window: int = 14, column: str = 'close') ->
     if column not in df.columns:
         raise ValueError(f"DataFrame 中缺少欄位：{column}")
 
+    if smoothing not in ('sma', 'wilder'):
+        raise ValueError(f"無效的平滑方式：{smoothing}，可選：sma, wilder")
+
     if len(df) < window + 1:
         raise ValueError(f"資料筆數（{len(df)}）不足以計算 RSI（需要至少 {window + 1} 筆）")
 
@@ -210,8 +317,12 @@ def calculate_rsi(df: pd.DataFrame, window: int = 14, column: str = 'close') ->
     loss = -delta.where(delta < 0, 0)
 
     # 計算平均漲跌
-    avg_gain = gain.rolling(window=window).mean()
-    avg_loss = loss.rolling(window=window).mean()
+    if smoothing == 'wilder':
+        avg_gain = _wilder_average(gain, window)
+        avg_loss = _wilder_average(loss, window)
+    else:
+        avg_gain = gain.rolling(window=window).mean()
+        avg_loss = loss.rolling(window=window).mean()
 
     # 計算 RS 和 RSI
     rs = avg_gain / avg_loss
@@ -220,6 +331,19 @@ def calculate_rsi(df: pd.DataFrame, window: int = 14, column: str = 'close') ->
     return rsi
 
 
+def _wilder_average(values: pd.Series, window: int) -> pd.Series:
+    """
+    Wilder 平滑平均（第一個值前的位置為 NaN）
+
+    第一個值位於 window，為 values[1:window + 1] 的簡單平均（values[0] 為第一根 K 線，
+    沒有價格變動）；之後等同 alpha = 1 / window 的指數平均。
+    """
+    seeded = values.iloc[window:].copy()
+    seeded.iloc[0] = values.iloc[1:window + 1].mean()
+
+    return seeded.ewm(alpha=1 / window, adjust=False).mean().reindex(values.index)
+
+
 def calculate_bollinger_bands(
     df: pd.DataFrame,
     window: int = 20,
@@ -262,6 +386,88 @@ def calculate_bollinger_bands(
     return upper_band, middle_band, lower_band
 
 
+def _sliding_extreme(values: np.ndarray, window: int, func) -> np.ndarray:
+    """
+    以分塊前綴/後綴累積（van Herk / Gil-Werman）計算滑動窗口極值
+
+    將序列切成長度為 window 的區塊，窗口 [s, s + window) 必定橫跨至多兩個區塊，
+    其極值為「s 所在區塊的後綴極值」與「s + window - 1 所在區塊的前綴極值」之較大（小）者。
+    每個元素只被累積兩次，與窗口大小無關。
+
+    參數：
+        values: 一維浮點陣列
+        window: 窗口大小（>= 1）
+        func: np.fmax 或 np.fmin（忽略 NaN，與 pandas 的 max()/min() 一致）
+
+    回傳：
+        長度為 len(values) - window + 1 的陣列，第 s 個元素為 values[s:s + window] 的極值
+    """
+    n = len(values)
+    block_count = -(-n // window)
+
+    padded = np.full(block_count * window, np.nan)
+    padded[:n] = values
+    blocks = padded.reshape(block_count, window)
+
+    prefix = func.accumulate(blocks, axis=1).ravel()
+    suffix = func.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+
+    starts = np.arange(n - window + 1)
+    return func(suffix[starts], prefix[starts + window - 1])
+
+
+def find_pivot_indices(
+    highs: np.ndarray,
+    lows: np.ndarray,
+    length: int = 20
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    偵測 Pivot High 和 Pivot Low 的位置（線性時間）
+
+    判斷規則與 find_pivot_points 相同：中心點必須嚴格大於（小於）
+    左右各 length 根 K 線的最高價（最低價），NaN 價格不會成為 Pivot Point。
+
+    參數：
+        highs: 最高價陣列
+        lows: 最低價陣列
+        length: 左右觀察窗口大小（預設 20）
+
+    回傳：
+        (pivot_high_indices, pivot_low_indices) 遞增排序的整數索引陣列
+
+    例外：
+        ValueError: 窗口大小無效或資料量不足時
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+
+    if length < 1:
+        raise ValueError(f"無效的窗口大小：{length}")
+
+    if len(highs) < length * 2 + 1:
+        raise ValueError(
+            f"資料筆數（{len(highs)}）不足以偵測 Pivot Points"
+            f"（需要至少 {length * 2 + 1} 筆）"
+        )
+
+    if indicator_backend.use_jit():
+        is_high, is_low = indicator_backend.scan_pivots(highs, lows, length)
+        return np.flatnonzero(is_high), np.flatnonzero(is_low)
+
+    # window_high[s] = max(highs[s:s + length])，中心 i 的左窗口為 s = i - length、右窗口為 s = i + 1
+    window_high = _sliding_extreme(highs, length, np.fmax)
+    window_low = _sliding_extreme(lows, length, np.fmin)
+
+    centers = slice(length, len(highs) - length)
+    left = slice(0, len(highs) - 2 * length)
+    right = slice(length + 1, len(highs) - length + 1)
+
+    is_high = (highs[centers] > window_high[left]) & (highs[centers] > window_high[right])
+    is_low = (lows[centers] < window_low[left]) & (lows[centers] < window_low[right])
+
+    return np.flatnonzero(is_high) + length, np.flatnonzero(is_low) + length
+
+
 def find_pivot_points(
     df: pd.DataFrame,
     length: int = 20
@@ -287,6 +493,7 @@ def find_pivot_points(
     注意：
         - Pivot Point 的確認需要右側 length 根 K 線，因此最後 length 根 K 線無法確認
         - 這是符合交易實務的延遲特性
+        - 只需要位置時請使用 find_pivot_indices，可避免複製整個 DataFrame
     """
     logger.info(f"開始偵測 Pivot Points（左右窗口：{length}）")
 
@@ -296,56 +503,101 @@ def find_pivot_points(
     if missing_columns:
         raise ValueError(f"缺少必要欄位：{missing_columns}")
 
-    if len(df) < length * 2 + 1:
-        raise ValueError(
-            f"資料筆數（{len(df)}）不足以偵測 Pivot Points"
-            f"（需要至少 {length * 2 + 1} 筆）"
-        )
+    highs = df['high'].to_numpy(dtype=np.float64)
+    lows = df['low'].to_numpy(dtype=np.float64)
+    high_indices, low_indices = find_pivot_indices(highs, lows, length)
 
     # 建立副本以避免修改原始資料
-    df_result = df.copy()
-    df_result['pivot_high'] = np.nan
-    df_result['pivot_low'] = np.nan
-
-    # 遍歷可能的 Pivot Point 位置（排除前後各 length 根）
-    for i in range(length, len(df) - length):
-        # 檢查 Pivot High
-        center_high = df['high'].iloc[i]
-        left_window = df['high'].iloc[i-length:i]
-        right_window = df['high'].iloc[i+1:i+length+1]
-
-        # 中心點必須嚴格大於左右兩側的所有點
-        if (center_high > left_window.max() and
-            center_high > right_window.max()):
-            df_result.loc[df_result.index[i], 'pivot_high'] = center_high
-            logger.debug(
-                f"偵測到 Pivot High：索引 {i}，價格 {center_high:.2f}"
-            )
+    pivot_high = np.full(len(df), np.nan)
+    pivot_low = np.full(len(df), np.nan)
+    pivot_high[high_indices] = highs[high_indices]
+    pivot_low[low_indices] = lows[low_indices]
 
-        # 檢查 Pivot Low
-        center_low = df['low'].iloc[i]
-        left_window_low = df['low'].iloc[i-length:i]
-        right_window_low = df['low'].iloc[i+1:i+length+1]
-
-        # 中心點必須嚴格小於左右兩側的所有點
-        if (center_low < left_window_low.min() and
-            center_low < right_window_low.min()):
-            df_result.loc[df_result.index[i], 'pivot_low'] = center_low
-            logger.debug(
-                f"偵測到 Pivot Low：索引 {i}，價格 {center_low:.2f}"
-            )
+    df_result = df.copy()
+    df_result['pivot_high'] = pivot_high
+    df_result['pivot_low'] = pivot_low
 
-    # 統計結果
-    pivot_high_count = df_result['pivot_high'].notna().sum()
-    pivot_low_count = df_result['pivot_low'].notna().sum()
     logger.info(
-        f"偵測完成：找到 {pivot_high_count} 個 Pivot High，"
-        f"{pivot_low_count} 個 Pivot Low"
+        f"偵測完成：找到 {len(high_indices)} 個 Pivot High，"
+        f"{len(low_indices)} 個 Pivot Low"
     )
 
     return df_result
 
 
+def _collect_pivot_points(
+    index: pd.Index,
+    high_indices: np.ndarray,
+    high_prices: np.ndarray,
+    low_indices: np.ndarray,
+    low_prices: np.ndarray
+) -> list:
+    """
+    依時間順序合併 Pivot High / Pivot Low
+
+    同一根 K 線同時為 Pivot High 與 Pivot Low 時以 Pivot High 為準。
+
+    回傳：
+        [{'idx', 'type', 'price', 'time'}, ...]
+    """
+    low_mask = ~np.isin(low_indices, high_indices)
+    low_indices = low_indices[low_mask]
+    low_prices = low_prices[low_mask]
+
+    indices = np.concatenate([high_indices, low_indices])
+    prices = np.concatenate([high_prices, low_prices])
+    types = np.array(['H'] * len(high_indices) + ['L'] * len(low_indices))
+    order = np.argsort(indices, kind='stable')
+
+    return [
+        {
+            'idx': int(indices[k]),
+            'type': str(types[k]),
+            'price': prices[k],
+            'time': index[indices[k]]
+        }
+        for k in order
+    ]
+
+
+def _pair_pivot_ranges(pivot_points: list) -> list:
+    """
+    配對相鄰的 Pivot Points 形成區間
+
+    回傳：
+        區間列表（格式見 extract_pivot_ranges）
+    """
+    if len(pivot_points) < 2:
+        logger.warning(f"Pivot Point 數量不足（僅 {len(pivot_points)} 個），無法形成區間")
+        return []
+
+    ranges = []
+    for i in range(len(pivot_points) - 1):
+        start_pivot = pivot_points[i]
+        end_pivot = pivot_points[i + 1]
+
+        range_info = {
+            'start_idx': start_pivot['idx'],
+            'end_idx': end_pivot['idx'],
+            'start_time': start_pivot['time'],
+            'end_time': end_pivot['time'],
+            'pivot_type': end_pivot['type'],
+            'pivot_price': end_pivot['price'],
+            'bar_count': end_pivot['idx'] - start_pivot['idx']
+        }
+
+        ranges.append(range_info)
+
+        logger.debug(
+            f"區間 {i+1}：索引 {range_info['start_idx']} -> {range_info['end_idx']}，"
+            f"類型 {range_info['pivot_type']}，K 線數 {range_info['bar_count']}"
+        )
+
+    logger.info(f"提取完成：共 {len(ranges)} 個區間")
+
+    return ranges
+
+
 def extract_pivot_ranges(df: pd.DataFrame) -> list:
     """
     從 DataFrame 中提取 Pivot Point 區間配對
@@ -380,54 +632,348 @@ def extract_pivot_ranges(df: pd.DataFrame) -> list:
         raise ValueError(f"缺少必要欄位：{missing_columns}")
 
     # 找出所有 Pivot Point 的位置
-    pivot_points = []
-
-    for i in range(len(df)):
-        if not pd.isna(df['pivot_high'].iloc[i]):
-            pivot_points.append({
-                'idx': i,
-                'type': 'H',
-                'price': df['pivot_high'].iloc[i],
-                'time': df.index[i]
-            })
-        elif not pd.isna(df['pivot_low'].iloc[i]):
-            pivot_points.append({
-                'idx': i,
-                'type': 'L',
-                'price': df['pivot_low'].iloc[i],
-                'time': df.index[i]
-            })
-
-    if len(pivot_points) < 2:
-        logger.warning(f"Pivot Point 數量不足（僅 {len(pivot_points)} 個），無法形成區間")
-        return []
+    pivot_high = df['pivot_high'].to_numpy(dtype=np.float64)
+    pivot_low = df['pivot_low'].to_numpy(dtype=np.float64)
+    high_indices = np.flatnonzero(~np.isnan(pivot_high))
+    low_indices = np.flatnonzero(~np.isnan(pivot_low))
+
+    pivot_points = _collect_pivot_points(
+        df.index,
+        high_indices, pivot_high[high_indices],
+        low_indices, pivot_low[low_indices]
+    )
 
     # 配對相鄰的 Pivot Points 形成區間
-    ranges = []
-    for i in range(len(pivot_points) - 1):
-        start_pivot = pivot_points[i]
-        end_pivot = pivot_points[i + 1]
+    return _pair_pivot_ranges(pivot_points)
 
-        range_info = {
-            'start_idx': start_pivot['idx'],
-            'end_idx': end_pivot['idx'],
-            'start_time': start_pivot['time'],
-            'end_time': end_pivot['time'],
-            'pivot_type': end_pivot['type'],
-            'pivot_price': end_pivot['price'],
-            'bar_count': end_pivot['idx'] - start_pivot['idx']
+
+def _count_edges_below(
+    prices: np.ndarray,
+    price_lowest: np.ndarray,
+    price_step: np.ndarray,
+    price_levels: int,
+    offset: int
+) -> np.ndarray:
+    """
+    計算 price_lowest + (level + offset) * price_step <= price 的層級數
+
+    先以除法估算，再以與逐層比較完全相同的浮點運算修正邊界，
+    確保結果與 PineScript 相容演算法的比較條件一致。
+
+    參數：
+        prices: 價格陣列
+        price_lowest: 每個價格對應區間的最低價（可廣播）
+        price_step: 每個價格對應區間的每層高度（可廣播，必須大於 0）
+        price_levels: 價格分層數量
+        offset: 邊界偏移（0 為層級下界，1 為層級上界）
+
+    回傳：
+        介於 0 ~ price_levels 的整數陣列
+    """
+    estimate = np.floor((prices - price_lowest) / price_step) + 1 - offset
+    count = np.clip(estimate, 0, price_levels).astype(np.int64)
+
+    for _ in range(2):
+        count += (count < price_levels) & (price_lowest + (count + offset) * price_step <= prices)
+        count -= (count > 0) & (price_lowest + (count - 1 + offset) * price_step > prices)
+
+    return count
+
+
+def _distribute_volume_by_range(
+    highs: np.ndarray,
+    lows: np.ndarray,
+    volumes: np.ndarray,
+    range_ids: np.ndarray,
+    price_lowest: np.ndarray,
+    price_step: np.ndarray,
+    price_levels: int,
+    weights: str = 'proportional'
+) -> np.ndarray:
+    """
+    將每根 K 線的成交量分配到所屬區間的價格層級
+
+    參數：
+        highs, lows, volumes: 每根 K 線（可重複出現於多個區間）的最高價、最低價、成交量
+        range_ids: 每根 K 線所屬的區間編號
+        price_lowest: 每個區間的最低價
+        price_step: 每個區間的每層高度（必須大於 0）
+        price_levels: 價格分層數量
+        weights: 每層分得的成交量；'proportional' 為 volume * price_step / (high - low)
+            （PineScript VPPA），'even' 為 volume / 覆蓋層數（每根 K 線的總量不變）
+
+    回傳：
+        形狀為 (區間數, price_levels) 的成交量矩陣
+
+    例外：
+        ValueError: weights 無效時
+    """
+    if weights not in ('proportional', 'even'):
+        raise ValueError(f"無效的成交量分配方式：{weights}")
+
+    if indicator_backend.use_jit():
+        return indicator_backend.distribute_volume_by_range(
+            highs, lows, volumes, range_ids, price_lowest, price_step, price_levels,
+            weights == 'even'
+        )
+
+    range_count = len(price_lowest)
+
+    # 價格為 NaN 的 K 線不覆蓋任何層級（與逐層比較的結果一致）
+    valid = ~(np.isnan(highs) | np.isnan(lows))
+    if not valid.all():
+        highs, lows, volumes, range_ids = (
+            highs[valid], lows[valid], volumes[valid], range_ids[valid]
+        )
+
+    bar_lowest = price_lowest[range_ids]
+    bar_step = price_step[range_ids]
+
+    # 覆蓋的第一層：層級上界 <= low 的層數；覆蓋的最後一層 + 1：層級下界 <= high 的層數
+    first = _count_edges_below(lows, bar_lowest, bar_step, price_levels, offset=1)
+    stop = _count_edges_below(highs, bar_lowest, bar_step, price_levels, offset=0)
+
+    covered = np.maximum(stop - first, 0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if weights == 'even':
+            level_weights = np.where(covered > 0, volumes / covered, 0.0)
+        else:
+            bar_ranges = highs - lows
+            level_weights = np.where(
+                bar_ranges == 0, volumes, volumes * (bar_step / bar_ranges)
+            )
+
+    # 展開每根 K 線覆蓋的 (區間, 層級)，以 bincount 依 K 線順序逐層累加：
+    # 累加順序與逐根逐層迴圈相同，結果逐位元一致，不會出現差分陣列累加的浮點誤差
+    # （誤差會改變 Value Area 擴展時平手層級的選擇）
+    bar_index = np.repeat(np.arange(len(first)), covered)
+    level_index = (
+        np.arange(len(bar_index))
+        - np.repeat(np.cumsum(covered) - covered, covered)
+        + first[bar_index]
+    )
+
+    profile = np.bincount(
+        range_ids[bar_index] * price_levels + level_index,
+        weights=level_weights[bar_index],
+        minlength=range_count * price_levels
+    )
+
+    return profile.reshape(range_count, price_levels)
+
+
+def distribute_volume(
+    highs: np.ndarray,
+    lows: np.ndarray,
+    volumes: np.ndarray,
+    price_lowest: float,
+    price_step: float,
+    price_levels: int,
+    weights: str = 'proportional'
+) -> np.ndarray:
+    """
+    將每根 K 線的成交量分配到價格層級（PineScript VPPA 演算法的向量化版本）
+
+    第 level 層的價格範圍為 [price_lowest + level * price_step,
+    price_lowest + (level + 1) * price_step)，K 線覆蓋該層的條件為
+    high >= 層級下界 AND low < 層級上界，每個覆蓋的層級分得
+    volume * price_step / (high - low)（high == low 時分得全部成交量）。
+
+    每根 K 線覆蓋的層級是連續的，因此只需求出首尾層級，
+    再展開覆蓋的層級一次累加，複雜度為 O(覆蓋層級總數)，不需逐根逐層比較。
+
+    參數：
+        highs: 每根 K 線的最高價
+        lows: 每根 K 線的最低價
+        volumes: 每根 K 線的成交量
+        price_lowest: 最低層的下界
+        price_step: 每層的價格高度（必須大於 0）
+        price_levels: 價格分層數量
+        weights: 'proportional'（預設，如上）或 'even'（每個覆蓋的層級平分成交量）
+
+    回傳：
+        每層的成交量（長度 = price_levels）
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+
+    return _distribute_volume_by_range(
+        highs,
+        np.asarray(lows, dtype=np.float64),
+        np.asarray(volumes, dtype=np.float64),
+        np.zeros(len(highs), dtype=np.int64),
+        np.array([price_lowest], dtype=np.float64),
+        np.array([price_step], dtype=np.float64),
+        price_levels,
+        weights
+    )[0]
+
+
+def _range_reduce(
+    values: np.ndarray,
+    start_indices: np.ndarray,
+    end_indices: np.ndarray,
+    func: np.ufunc
+) -> np.ndarray:
+    """
+    以稀疏表（sparse table）計算多個區間的最大值或最小值
+
+    建表 O(n log n)，每個區間查詢 O(1)（兩個重疊的 2^k 區塊取 func）。
+
+    參數：
+        values: 數值陣列
+        start_indices: 區間起點（包含）
+        end_indices: 區間終點（包含）
+        func: 可交換且冪等的 ufunc（例如 np.fmax、np.fmin）
+
+    回傳：
+        每個區間的 func 結果
+    """
+    lengths = end_indices - start_indices + 1
+    max_power = int(lengths.max()).bit_length() - 1
+
+    table = [values]
+    for power in range(1, max_power + 1):
+        half = 1 << (power - 1)
+        previous = table[-1]
+        table.append(func(previous[:-half], previous[half:]))
+
+    powers = np.log2(lengths).astype(np.int64)
+    result = np.empty(len(start_indices), dtype=values.dtype)
+
+    for power in np.unique(powers):
+        mask = powers == power
+        level = table[power]
+        starts = start_indices[mask]
+        result[mask] = func(level[starts], level[end_indices[mask] - (1 << power) + 1])
+
+    return result
+
+
+def calculate_volume_profiles(
+    highs: np.ndarray,
+    lows: np.ndarray,
+    volumes: np.ndarray,
+    start_indices: np.ndarray,
+    end_indices: np.ndarray,
+    price_levels: int = 25,
+    fallback_volumes: np.ndarray = None
+) -> dict:
+    """
+    一次計算多個區間的 Volume Profile
+
+    與逐一呼叫 calculate_volume_profile_for_range 的結果相同，但不切割 DataFrame：
+    區間最高/最低價以稀疏表查詢，區間成交量總和以前綴和計算，
+    所有區間的成交量分配在同一次向量化運算中完成。
+
+    參數：
+        highs: 全部 K 線的最高價
+        lows: 全部 K 線的最低價
+        volumes: 全部 K 線的成交量（通常為 real_volume）
+        start_indices: 每個區間的起始索引（包含）
+        end_indices: 每個區間的結束索引（包含）
+        price_levels: 價格分層數量（預設 25）
+        fallback_volumes: 區間內 volumes 總和為 0 時改用的成交量（通常為 tick_volume）
+
+    回傳：
+        字典，包含（R 為區間數）：
+        {
+            'volume_profile': np.ndarray,   # (R, price_levels) 每層成交量
+            'price_lowest': np.ndarray,     # (R,) 區間最低價
+            'price_highest': np.ndarray,    # (R,) 區間最高價
+            'price_step': np.ndarray,       # (R,) 每層的價格高度（價格無變化時為 0）
+            'price_centers': np.ndarray,    # (R, price_levels) 每層的中心價格
+            'total_volume': np.ndarray,     # (R,) 區間總成交量
+            'bar_count': np.ndarray         # (R,) K 線數量
         }
 
-        ranges.append(range_info)
+    例外：
+        ValueError: 索引範圍無效時
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    volumes = np.asarray(volumes, dtype=np.float64)
+    start_indices = np.asarray(start_indices, dtype=np.int64)
+    end_indices = np.asarray(end_indices, dtype=np.int64)
+    range_count = len(start_indices)
+
+    if range_count == 0:
+        empty = np.empty((0, price_levels))
+        return {
+            'volume_profile': empty,
+            'price_lowest': np.empty(0),
+            'price_highest': np.empty(0),
+            'price_step': np.empty(0),
+            'price_centers': empty,
+            'total_volume': np.empty(0),
+            'bar_count': np.empty(0, dtype=np.int64)
+        }
 
-        logger.debug(
-            f"區間 {i+1}：索引 {range_info['start_idx']} -> {range_info['end_idx']}，"
-            f"類型 {range_info['pivot_type']}，K 線數 {range_info['bar_count']}"
+    if (
+        len(end_indices) != range_count
+        or (start_indices < 0).any()
+        or (end_indices >= len(highs)).any()
+        or (start_indices >= end_indices).any()
+    ):
+        raise ValueError(f"無效的索引範圍：資料長度={len(highs)}")
+
+    bar_count = end_indices - start_indices + 1
+
+    # 區間成交量總和（前綴和），總和為 0 的區間改用 fallback_volumes
+    def range_sums(values):
+        prefix = np.concatenate(([0.0], np.cumsum(values)))
+        return prefix[end_indices + 1] - prefix[start_indices]
+
+    range_volume = range_sums(volumes)
+    use_fallback = np.zeros(range_count, dtype=bool)
+    if fallback_volumes is not None:
+        fallback_volumes = np.asarray(fallback_volumes, dtype=np.float64)
+        use_fallback = range_volume == 0
+        range_volume = np.where(use_fallback, range_sums(fallback_volumes), range_volume)
+
+    # 區間最高/最低價（稀疏表）
+    price_highest = _range_reduce(highs, start_indices, end_indices, np.fmax)
+    price_lowest = _range_reduce(lows, start_indices, end_indices, np.fmin)
+    price_step = (price_highest - price_lowest) / price_levels
+
+    # 價格無變化的區間：成交量全為 0，中心價格皆為最低價
+    flat = price_step == 0
+
+    volume_profile = np.zeros((range_count, price_levels))
+    active = np.flatnonzero(~flat)
+
+    if len(active) > 0:
+        # 展開每個區間包含的 K 線索引（相鄰區間共用的端點會出現兩次）
+        active_counts = bar_count[active]
+        local_ids = np.repeat(np.arange(len(active)), active_counts)
+        offsets = np.arange(local_ids.size) - np.repeat(
+            np.cumsum(active_counts) - active_counts, active_counts
         )
+        bar_idx = start_indices[active][local_ids] + offsets
 
-    logger.info(f"提取完成：共 {len(ranges)} 個區間")
+        bar_volumes = volumes[bar_idx]
+        if use_fallback[active].any():
+            bar_volumes = np.where(
+                use_fallback[active][local_ids], fallback_volumes[bar_idx], bar_volumes
+            )
 
-    return ranges
+        volume_profile[active] = _distribute_volume_by_range(
+            highs[bar_idx], lows[bar_idx], bar_volumes, local_ids,
+            price_lowest[active], price_step[active], price_levels
+        )
+
+    price_centers = price_lowest[:, None] + (np.arange(price_levels) + 0.5) * price_step[:, None]
+    total_volume = np.where(flat, range_volume, volume_profile.sum(axis=1))
+
+    return {
+        'volume_profile': volume_profile,
+        'price_lowest': price_lowest,
+        'price_highest': price_highest,
+        'price_step': price_step,
+        'price_centers': price_centers,
+        'total_volume': total_volume,
+        'bar_count': bar_count
+    }
 
 
 def calculate_volume_profile_for_range(
@@ -482,7 +1028,7 @@ def calculate_volume_profile_for_range(
         )
 
     # 取得區間資料（包含 end_idx）
-    range_df = df.iloc[start_idx:end_idx+1].copy()
+    range_df = df.iloc[start_idx:end_idx+1]
     bar_count = len(range_df)
 
     # 決定使用哪個成交量欄位
@@ -522,40 +1068,18 @@ def calculate_volume_profile_for_range(
 
     price_step = price_range / price_levels
 
-    # 初始化成交量儲存陣列
-    volume_storage = np.zeros(price_levels)
-
-    # 遍歷每根 K 線，分配成交量到價格層級
-    for idx in range(len(range_df)):
-        row = range_df.iloc[idx]
-        bar_high = row['high']
-        bar_low = row['low']
-        bar_volume = row[volume_column]
-        bar_range = bar_high - bar_low
-
-        # 遍歷每個價格層級
-        for level in range(price_levels):
-            level_low = price_lowest + level * price_step
-            level_high = price_lowest + (level + 1) * price_step
-
-            # 檢查 K 線是否覆蓋此價格層級
-            # 條件：K 線的 high >= 層級下界 AND K 線的 low < 層級上界
-            if bar_high >= level_low and bar_low < level_high:
-                # 按比例分配成交量
-                if bar_range == 0:
-                    # K 線是一條線（開盤價 = 收盤價），全部分配給此層級
-                    volume_storage[level] += bar_volume
-                else:
-                    # 按 price_step / bar_range 比例分配
-                    # 這是 PineScript VPPA 的核心公式
-                    ratio = price_step / bar_range
-                    volume_storage[level] += bar_volume * ratio
+    # 分配成交量到價格層級
+    volume_storage = distribute_volume(
+        range_df['high'].to_numpy(dtype=np.float64),
+        range_df['low'].to_numpy(dtype=np.float64),
+        range_df[volume_column].to_numpy(dtype=np.float64),
+        price_lowest,
+        price_step,
+        price_levels
+    )
 
     # 計算每層的中心價格
-    price_centers = np.array([
-        price_lowest + (level + 0.5) * price_step
-        for level in range(price_levels)
-    ])
+    price_centers = price_lowest + (np.arange(price_levels) + 0.5) * price_step
 
     total_volume = volume_storage.sum()
 
@@ -627,123 +1151,231 @@ def calculate_value_area(
     if len(volume_storage) == 0:
         raise ValueError("volume_storage 不能為空")
 
+    value_areas = calculate_value_area_many(
+        np.asarray(volume_storage, dtype=np.float64)[None, :],
+        np.array([price_lowest], dtype=np.float64),
+        np.array([price_step], dtype=np.float64),
+        value_area_pct
+    )
+    result = _value_area_row(value_areas, 0)
+
+    if result['total_volume'] == 0:
+        logger.warning("總成交量為 0，無法計算 Value Area")
+        return result
+
+    logger.debug(
+        f"Value Area 計算完成：POC {result['poc_price']:.2f}，"
+        f"VAH {result['vah']:.2f}，VAL {result['val']:.2f}，"
+        f"寬度 {result['value_area_width']:.2f}，"
+        f"成交量 {result['value_area_volume']:.0f} ({result['value_area_pct']:.1f}%)"
+    )
+
+    return result
+
+
+def calculate_value_area_many(
+    volume_matrix: np.ndarray,
+    price_lowest: np.ndarray,
+    price_step: np.ndarray,
+    value_area_pct: float = 0.68
+) -> dict:
+    """
+    一次計算多個 Volume Profile 的 Value Area
+
+    演算法與 calculate_value_area 相同（從 POC 向兩側擴展，每次選擇成交量較大的一側，
+    相等時優先向上，兩側皆無成交量或到達邊界時停止），但每一步擴展同時處理所有區間，
+    迴圈次數至多為價格層數，與區間數量無關。
+
+    參數：
+        volume_matrix: 形狀為 (區間數, 價格層數) 的成交量矩陣
+        price_lowest: 每個區間的最低價
+        price_step: 每個區間的每層高度
+        value_area_pct: Value Area 包含的成交量百分比（預設 0.68 即 68%）
+
+    回傳：
+        字典，鍵與 calculate_value_area 相同，每個值為長度 = 區間數的陣列
+
+    例外：
+        ValueError: 輸入參數無效時
+    """
+    volume_matrix = np.asarray(volume_matrix, dtype=np.float64)
+    price_lowest = np.asarray(price_lowest, dtype=np.float64)
+    price_step = np.asarray(price_step, dtype=np.float64)
+
+    # 驗證輸入
+    if volume_matrix.ndim != 2 or volume_matrix.shape[1] == 0:
+        raise ValueError("volume_matrix 必須為 (區間數, 價格層數) 的非空矩陣")
+
     if value_area_pct <= 0 or value_area_pct > 1:
         raise ValueError(
             f"value_area_pct 必須在 0 到 1 之間，得到：{value_area_pct}"
         )
 
-    if price_step < 0:
-        raise ValueError(f"price_step 必須為正數，得到：{price_step}")
+    if (price_step < 0).any():
+        raise ValueError(f"price_step 必須為正數，得到：{price_step.min()}")
+
+    rows = np.arange(volume_matrix.shape[0])
 
     # 計算 POC (Point of Control)
-    poc_level = int(np.argmax(volume_storage))
-    poc_volume = volume_storage[poc_level]
+    poc_level = np.argmax(volume_matrix, axis=1)
+    poc_volume = volume_matrix[rows, poc_level]
     poc_price = price_lowest + (poc_level + 0.5) * price_step
+    total_volume = volume_matrix.sum(axis=1)
 
-    total_volume = volume_storage.sum()
+    # 從 POC 開始向兩側擴展
+    target_volume = total_volume * value_area_pct
 
-    if total_volume == 0:
-        logger.warning("總成交量為 0，無法計算 Value Area")
-        return {
-            'poc_level': poc_level,
-            'poc_price': poc_price,
-            'poc_volume': 0,
-            'poc_volume_pct': 0,
-            'vah': price_lowest + (poc_level + 1.0) * price_step,
-            'val': price_lowest + (poc_level + 0.0) * price_step,
-            'value_area_volume': 0,
-            'total_volume': 0,
-            'value_area_pct': 0,
-            'value_area_width': 0,
-            'level_above_poc': poc_level,
-            'level_below_poc': poc_level
-        }
+    if indicator_backend.use_jit():
+        value_area_volume, level_above, level_below = indicator_backend.expand_value_area(
+            volume_matrix, poc_level, target_volume, total_volume
+        )
+    else:
+        value_area_volume, level_above, level_below = _expand_value_area(
+            volume_matrix, poc_level, target_volume, total_volume
+        )
 
-    poc_volume_pct = (poc_volume / total_volume * 100) if total_volume > 0 else 0
+    # 計算 VAH（上邊界層級的上界）和 VAL（下邊界層級的下界）
+    vah = price_lowest + (level_above + 1.0) * price_step
+    val = price_lowest + (level_below + 0.0) * price_step
 
-    logger.debug(
-        f"POC：層級 {poc_level}，價格 {poc_price:.2f}，"
-        f"成交量 {poc_volume:.0f} ({poc_volume_pct:.1f}%)"
-    )
+    has_volume = total_volume != 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        poc_volume_pct = np.where(has_volume, poc_volume / total_volume * 100, 0.0)
+        actual_value_area_pct = np.where(has_volume, value_area_volume / total_volume * 100, 0.0)
 
-    # 計算目標成交量
-    target_volume = total_volume * value_area_pct
+    return {
+        'poc_level': poc_level,
+        'poc_price': poc_price,
+        'poc_volume': np.where(has_volume, poc_volume, 0.0),
+        'poc_volume_pct': poc_volume_pct,
+        'vah': vah,
+        'val': val,
+        'value_area_volume': np.where(has_volume, value_area_volume, 0.0),
+        'total_volume': total_volume,
+        'value_area_pct': actual_value_area_pct,
+        'value_area_width': np.where(has_volume, vah - val, 0.0),
+        'level_above_poc': level_above,
+        'level_below_poc': level_below
+    }
 
-    # 從 POC 開始向兩側擴展
-    value_area_volume = poc_volume
-    level_above_poc = poc_level
-    level_below_poc = poc_level
-
-    while value_area_volume < target_volume:
-        # 檢查是否已經到達邊界
-        if level_below_poc == 0 and level_above_poc == len(volume_storage) - 1:
-            logger.debug("已擴展到價格範圍邊界，停止擴展")
-            break
-
-        # 取得上下相鄰層級的成交量
-        volume_above = (
-            volume_storage[level_above_poc + 1]
-            if level_above_poc < len(volume_storage) - 1
-            else 0
-        )
-        volume_below = (
-            volume_storage[level_below_poc - 1]
-            if level_below_poc > 0
-            else 0
-        )
 
-        # 如果兩側都沒有成交量，停止擴展
-        if volume_above == 0 and volume_below == 0:
-            logger.debug("兩側都無成交量，停止擴展")
-            break
-
-        # 選擇成交量較大的一側擴展
-        # 如果成交量相等，優先向上擴展（與 PineScript 行為一致）
-        if volume_above >= volume_below:
-            value_area_volume += volume_above
-            level_above_poc += 1
-            logger.debug(
-                f"向上擴展到層級 {level_above_poc}，"
-                f"增加成交量 {volume_above:.0f}"
-            )
-        else:
-            value_area_volume += volume_below
-            level_below_poc -= 1
-            logger.debug(
-                f"向下擴展到層級 {level_below_poc}，"
-                f"增加成交量 {volume_below:.0f}"
-            )
+def _expand_value_area(
+    volume_matrix: np.ndarray,
+    poc_level: np.ndarray,
+    target_volume: np.ndarray,
+    total_volume: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    從 POC 向兩側擴展 Value Area（NumPy 版本，每一步同時處理所有區間）
 
-    # 計算 VAH 和 VAL
-    # VAH = 上邊界層級的上界
-    vah = price_lowest + (level_above_poc + 1.0) * price_step
-    # VAL = 下邊界層級的下界
-    val = price_lowest + (level_below_poc + 0.0) * price_step
+    回傳：
+        (value_area_volume, level_above_poc, level_below_poc)
+    """
+    range_count, price_levels = volume_matrix.shape
+    rows = np.arange(range_count)
+    top = price_levels - 1
 
-    value_area_width = vah - val
-    actual_value_area_pct = (
-        (value_area_volume / total_volume * 100) if total_volume > 0 else 0
-    )
+    value_area_volume = volume_matrix[rows, poc_level].copy()
+    level_above = poc_level.copy()
+    level_below = poc_level.copy()
+    active = (total_volume != 0) & (value_area_volume < target_volume)
+
+    while active.any():
+        at_top = level_above == top
+        at_bottom = level_below == 0
+
+        volume_above = np.where(at_top, 0.0, volume_matrix[rows, np.minimum(level_above + 1, top)])
+        volume_below = np.where(at_bottom, 0.0, volume_matrix[rows, np.maximum(level_below - 1, 0)])
+
+        # 到達邊界或兩側都沒有成交量時停止擴展
+        active &= ~(at_top & at_bottom) & ~((volume_above == 0) & (volume_below == 0))
+
+        # 選擇成交量較大的一側擴展（相等時優先向上，與 PineScript 行為一致）
+        go_up = active & ~at_top & ((volume_above >= volume_below) | at_bottom)
+        go_down = active & ~go_up
+
+        value_area_volume += np.where(go_up, volume_above, 0.0) + np.where(go_down, volume_below, 0.0)
+        level_above += go_up
+        level_below -= go_down
+
+        active &= value_area_volume < target_volume
+
+    return value_area_volume, level_above, level_below
+
+
+def _value_area_row(value_areas: dict, index: int) -> dict:
+    """
+    取出 calculate_value_area_many 第 index 個區間的結果（轉為 Python 純量）
+
+    回傳：
+        與 calculate_value_area 相同格式的字典
+    """
+    row = {
+        key: (int(values[index]) if key in ('poc_level', 'level_above_poc', 'level_below_poc')
+              else float(values[index]))
+        for key, values in value_areas.items()
+    }
+
+    # 總成交量為 0 時維持原本的整數 0
+    if row['total_volume'] == 0:
+        for key in ('poc_volume', 'poc_volume_pct', 'value_area_volume',
+                    'total_volume', 'value_area_pct', 'value_area_width'):
+            row[key] = 0
+
+    return row
 
-    logger.debug(
-        f"Value Area 計算完成：VAH {vah:.2f}，VAL {val:.2f}，"
-        f"寬度 {value_area_width:.2f}，"
-        f"成交量 {value_area_volume:.0f} ({actual_value_area_pct:.1f}%)"
-    )
+
+def _build_range_data(profiles: dict, value_areas: dict, index: int) -> dict:
+    """
+    將 calculate_volume_profiles 的第 index 個區間整理為 VPPA 區間字典
+
+    參數：
+        profiles: calculate_volume_profiles 的回傳值
+        value_areas: 對 profiles 呼叫 calculate_value_area_many 的回傳值
+        index: 區間位置
+
+    回傳：
+        包含價格範圍、Volume Profile、POC、Value Area 與統計資訊的字典
+        （不含區間索引、時間與 Pivot 資訊）
+    """
+    volume_profile = profiles['volume_profile'][index]
+    price_lowest = float(profiles['price_lowest'][index])
+    price_highest = float(profiles['price_highest'][index])
+    price_step = float(profiles['price_step'][index])
+    total_volume = float(profiles['total_volume'][index])
+    bar_count = int(profiles['bar_count'][index])
+
+    va_result = _value_area_row(value_areas, index)
 
     return {
-        'poc_level': int(poc_level),
-        'poc_price': float(poc_price),
-        'poc_volume': float(poc_volume),
-        'poc_volume_pct': float(poc_volume_pct),
-        'vah': float(vah),
-        'val': float(val),
-        'value_area_volume': float(value_area_volume),
-        'total_volume': float(total_volume),
-        'value_area_pct': float(actual_value_area_pct),
-        'value_area_width': float(value_area_width),
-        'level_above_poc': int(level_above_poc),
-        'level_below_poc': int(level_below_poc)
+        # 價格範圍
+        'price_highest': price_highest,
+        'price_lowest': price_lowest,
+        'price_range': price_highest - price_lowest,
+        'price_step': price_step,
+
+        # Volume Profile（轉為 list 以便序列化）
+        'volume_profile': volume_profile.tolist(),
+        'price_centers': profiles['price_centers'][index].tolist(),
+
+        # POC
+        'poc': {
+            'level': va_result['poc_level'],
+            'price': va_result['poc_price'],
+            'volume': va_result['poc_volume'],
+            'volume_pct': va_result['poc_volume_pct']
+        },
+
+        # Value Area
+        'vah': va_result['vah'],
+        'val': va_result['val'],
+        'value_area_width': va_result['value_area_width'],
+        'value_area_volume': va_result['value_area_volume'],
+        'value_area_pct': va_result['value_area_pct'],
+
+        # 統計
+        'total_volume': total_volume,
+        'avg_volume_per_bar': total_volume / bar_count if bar_count > 0 else 0
     }
 
 
@@ -878,15 +1510,22 @@ def calculate_vppa(
 
     # Step 1: 偵測 Pivot Points
     logger.info("Step 1/5: 偵測 Pivot Points")
-    df_with_pivots = find_pivot_points(df, length=pivot_length)
+    highs = df['high'].to_numpy(dtype=np.float64)
+    lows = df['low'].to_numpy(dtype=np.float64)
+    high_indices, low_indices = find_pivot_indices(highs, lows, pivot_length)
 
-    pivot_high_count = df_with_pivots['pivot_high'].notna().sum()
-    pivot_low_count = df_with_pivots['pivot_low'].notna().sum()
+    pivot_high_count = len(high_indices)
+    pivot_low_count = len(low_indices)
     total_pivot_points = pivot_high_count + pivot_low_count
 
     # Step 2: 提取區間
     logger.info("Step 2/5: 提取 Pivot Point 區間")
-    ranges = extract_pivot_ranges(df_with_pivots)
+    pivot_points = _collect_pivot_points(
+        df.index,
+        high_indices, highs[high_indices],
+        low_indices, lows[low_indices]
+    )
+    ranges = _pair_pivot_ranges(pivot_points)
 
     if len(ranges) == 0:
         logger.warning("未找到任何 Pivot Point 區間，回傳空結果")
@@ -906,195 +1545,91 @@ def calculate_vppa(
             'developing_range': None
         }
 
-    # Step 3: 計算每個區間的 Volume Profile
-    logger.info(f"Step 3/5: 計算 {len(ranges)} 個區間的 Volume Profile")
+    # Step 3: 一次計算所有區間（含發展中區間）的 Volume Profile
+    last_pivot_idx = ranges[-1]['end_idx']
+    current_idx = len(df) - 1
+    has_developing = include_developing and current_idx > last_pivot_idx
+
+    start_indices = [r['start_idx'] for r in ranges]
+    end_indices = [r['end_idx'] for r in ranges]
+    if has_developing:
+        start_indices.append(last_pivot_idx)
+        end_indices.append(current_idx)
+
+    logger.info(f"Step 3/5: 計算 {len(start_indices)} 個區間的 Volume Profile")
+
+    profiles = calculate_volume_profiles(
+        highs,
+        lows,
+        df['real_volume'].to_numpy(dtype=np.float64),
+        np.array(start_indices),
+        np.array(end_indices),
+        price_levels=price_levels,
+        fallback_volumes=(
+            df['tick_volume'].to_numpy(dtype=np.float64)
+            if 'tick_volume' in df.columns else None
+        )
+    )
+
+    value_areas = calculate_value_area_many(
+        profiles['volume_profile'], profiles['price_lowest'], profiles['price_step'], value_area_pct
+    )
 
     pivot_ranges_data = []
 
     for i, range_info in enumerate(ranges):
-        logger.info(f"處理區間 {i+1}/{len(ranges)}：索引 {range_info['start_idx']} -> {range_info['end_idx']}")
-
-        # 計算 Volume Profile
-        vp_result = calculate_volume_profile_for_range(
-            df,
-            start_idx=range_info['start_idx'],
-            end_idx=range_info['end_idx'],
-            price_levels=price_levels
-        )
-
-        # 計算 Value Area
-        va_result = calculate_value_area(
-            volume_storage=vp_result['volume_profile'],
-            price_lowest=vp_result['price_lowest'],
-            price_step=vp_result['price_step'],
-            value_area_pct=value_area_pct
-        )
-
-        # 整合所有資料
-        range_data = {
-            # 區間資訊
+        range_data = _build_range_data(profiles, value_areas, i)
+        range_data.update({
             'range_id': i,
             'start_idx': range_info['start_idx'],
             'end_idx': range_info['end_idx'],
             'start_time': range_info['start_time'],
             'end_time': range_info['end_time'],
             'bar_count': range_info['bar_count'],
-
-            # Pivot Point 資訊
             'pivot_type': range_info['pivot_type'],
-            'pivot_price': range_info['pivot_price'],
-
-            # 價格範圍
-            'price_highest': vp_result['price_highest'],
-            'price_lowest': vp_result['price_lowest'],
-            'price_range': vp_result['price_highest'] - vp_result['price_lowest'],
-            'price_step': vp_result['price_step'],
-
-            # Volume Profile（轉為 list 以便序列化）
-            'volume_profile': vp_result['volume_profile'].tolist(),
-            'price_centers': vp_result['price_centers'].tolist(),
-
-            # POC
-            'poc': {
-                'level': va_result['poc_level'],
-                'price': va_result['poc_price'],
-                'volume': va_result['poc_volume'],
-                'volume_pct': va_result['poc_volume_pct']
-            },
-
-            # Value Area
-            'vah': va_result['vah'],
-            'val': va_result['val'],
-            'value_area_width': va_result['value_area_width'],
-            'value_area_volume': va_result['value_area_volume'],
-            'value_area_pct': va_result['value_area_pct'],
-
-            # 統計
-            'total_volume': vp_result['total_volume'],
-            'avg_volume_per_bar': (
-                vp_result['total_volume'] / vp_result['bar_count']
-                if vp_result['bar_count'] > 0 else 0
-            )
-        }
-
+            'pivot_price': range_info['pivot_price']
+        })
         pivot_ranges_data.append(range_data)
 
         logger.debug(
-            f"區間 {i+1} 完成：POC={va_result['poc_price']:.2f}, "
-            f"VAH={va_result['vah']:.2f}, VAL={va_result['val']:.2f}"
+            f"區間 {i+1} 完成：POC={range_data['poc']['price']:.2f}, "
+            f"VAH={range_data['vah']:.2f}, VAL={range_data['val']:.2f}"
         )
 
     # Step 4: 建立 Pivot Points 摘要
     logger.info("Step 4/5: 建立 Pivot Points 摘要")
 
-    pivot_summary = []
-    for i in range(len(df_with_pivots)):
-        if not pd.isna(df_with_pivots['pivot_high'].iloc[i]):
-            pivot_summary.append({
-                'idx': i,
-                'type': 'H',
-                'price': df_with_pivots['pivot_high'].iloc[i],
-                'time': df_with_pivots.index[i]
-            })
-        elif not pd.isna(df_with_pivots['pivot_low'].iloc[i]):
-            pivot_summary.append({
-                'idx': i,
-                'type': 'L',
-                'price': df_with_pivots['pivot_low'].iloc[i],
-                'time': df_with_pivots.index[i]
-            })
-
-    # Step 5: 計算即時發展中的區間（可選）
+    pivot_summary = pivot_points
+
+    # Step 5: 即時發展中的區間（從最後一個 Pivot Point 到現在，已於 Step 3 一併計算）
     logger.info("Step 5/5: 計算即時發展中的區間")
 
     developing_range = None
 
-    if include_developing and len(pivot_summary) > 0:
-        # 最後一個 Pivot Point
-        last_pivot = pivot_summary[-1]
-        last_pivot_idx = last_pivot['idx']
-        current_idx = len(df) - 1
-
-        # 確保有足夠的 K 線形成區間
-        if current_idx > last_pivot_idx:
-            logger.info(
-                f"計算發展中區間：索引 {last_pivot_idx} -> {current_idx} "
-                f"({current_idx - last_pivot_idx} 根 K 線)"
-            )
-
-            try:
-                # 計算 Volume Profile
-                vp_dev = calculate_volume_profile_for_range(
-                    df,
-                    start_idx=last_pivot_idx,
-                    end_idx=current_idx,
-                    price_levels=price_levels
-                )
-
-                # 計算 Value Area
-                va_dev = calculate_value_area(
-                    volume_storage=vp_dev['volume_profile'],
-                    price_lowest=vp_dev['price_lowest'],
-                    price_step=vp_dev['price_step'],
-                    value_area_pct=value_area_pct
-                )
-
-                developing_range = {
-                    'is_developing': True,
-                    'range_id': len(ranges),  # 接續最後一個歷史區間的 ID
-                    'start_idx': last_pivot_idx,
-                    'end_idx': current_idx,
-                    'start_time': df.index[last_pivot_idx],
-                    'end_time': df.index[current_idx],
-                    'bar_count': current_idx - last_pivot_idx + 1,
-
-                    # Pivot Point 資訊（發展中，使用最後一個 Pivot）
-                    'pivot_type': last_pivot['type'],
-                    'pivot_price': last_pivot['price'],
-
-                    # 價格範圍
-                    'price_highest': vp_dev['price_highest'],
-                    'price_lowest': vp_dev['price_lowest'],
-                    'price_range': vp_dev['price_highest'] - vp_dev['price_lowest'],
-                    'price_step': vp_dev['price_step'],
-
-                    # Volume Profile
-                    'volume_profile': vp_dev['volume_profile'].tolist(),
-                    'price_centers': vp_dev['price_centers'].tolist(),
-
-                    # POC
-                    'poc': {
-                        'level': va_dev['poc_level'],
-                        'price': va_dev['poc_price'],
-                        'volume': va_dev['poc_volume'],
-                        'volume_pct': va_dev['poc_volume_pct']
-                    },
-
-                    # Value Area
-                    'vah': va_dev['vah'],
-                    'val': va_dev['val'],
-                    'value_area_width': va_dev['value_area_width'],
-                    'value_area_volume': va_dev['value_area_volume'],
-                    'value_area_pct': va_dev['value_area_pct'],
-
-                    # 統計
-                    'total_volume': vp_dev['total_volume'],
-                    'avg_volume_per_bar': (
-                        vp_dev['total_volume'] / vp_dev['bar_count']
-                        if vp_dev['bar_count'] > 0 else 0
-                    )
-                }
-
-                logger.info(
-                    f"發展中區間完成：POC={va_dev['poc_price']:.2f}, "
-                    f"VAH={va_dev['vah']:.2f}, VAL={va_dev['val']:.2f}"
-                )
-
-            except Exception as e:
-                logger.warning(f"計算發展中區間時發生錯誤：{e}")
-                developing_range = None
-        else:
-            logger.info("最後一個 Pivot Point 後沒有足夠的 K 線，跳過發展中區間")
+    if has_developing:
+        last_pivot = ranges[-1]
+        developing_range = _build_range_data(profiles, value_areas, len(ranges))
+        developing_range.update({
+            'is_developing': True,
+            'range_id': len(ranges),  # 接續最後一個歷史區間的 ID
+            'start_idx': last_pivot_idx,
+            'end_idx': current_idx,
+            'start_time': df.index[last_pivot_idx],
+            'end_time': df.index[current_idx],
+            'bar_count': current_idx - last_pivot_idx + 1,
+
+            # Pivot Point 資訊（發展中，使用最後一個 Pivot）
+            'pivot_type': last_pivot['pivot_type'],
+            'pivot_price': last_pivot['pivot_price']
+        })
+
+        logger.info(
+            f"發展中區間完成：索引 {last_pivot_idx} -> {current_idx}，"
+            f"POC={developing_range['poc']['price']:.2f}, "
+            f"VAH={developing_range['vah']:.2f}, VAL={developing_range['val']:.2f}"
+        )
+    elif include_developing:
+        logger.info("最後一個 Pivot Point 後沒有足夠的 K 線，跳過發展中區間")
 
     # 組裝最終結果
     result = {
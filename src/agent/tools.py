@@ -5,16 +5,21 @@ Agent 自訂工具定義
 封裝 src/core 模組的功能和技術指標計算。
 """
 
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
 from loguru import logger
 import pandas as pd
 import json
 import os
 import sys
+import time
+import secrets
 from pathlib import Path
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 import MetaTrader5 as mt5
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # 確保可以匯入 core 模組
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -25,9 +30,10 @@ from .indicators import (
     calculate_volume_profile,
     calculate_sma,
     calculate_rsi,
-    calculate_bollinger_bands,
-    calculate_vppa
+    calculate_bollinger_bands
 )
+from .vppa_state import VPPAState
+from .indicator_cache import IndicatorCache
 from visualization import plot_vppa_chart
 
 
@@ -63,6 +69,159 @@ _mt5_client = None
 _mt5_config = None
 _cache_manager = None
 
+# Agent 回合在 Bot 的執行緒池中並行執行，單例建立需加鎖
+_singleton_lock = threading.Lock()
+
+# MT5 終端機呼叫的全域鎖（MetaTrader5 套件不是執行緒安全的）
+# 只在呼叫終端機時持有，SQLite 讀寫、合成與繪圖不持有（可重入：連線檢查可能巢狀）
+_mt5_lock = threading.RLock()
+
+# 串流 VPPA 狀態：(symbol, timeframe, pivot_length, price_levels, value_area_pct) -> VPPAState
+_vppa_states: Dict[tuple, VPPAState] = {}
+_vppa_states_lock = threading.Lock()
+
+# 指標計算結果快取（LRU + TTL，選用 SQLite 磁碟層）
+_indicator_cache = None
+_indicator_cache_lock = threading.Lock()
+
+
+# ============================================================================
+# K 線資料代號（dataset handle）
+# ============================================================================
+
+class CandleDatasetRegistry:
+    """
+    K 線資料代號登記表
+
+    get_candles 把 K 線保留在記憶體中並回傳簡短代號，計算工具以代號取得 K 線，
+    不必讓 Claude 把整段 candles_json 複製回工具參數。
+
+    - 代號屬於建立它的對話（conversation_id），其他對話無法存取
+    - 超過存活時間的代號在存取或登記時移除；對話結束時以 release_conversation() 釋放
+    - 登記數量超過上限時淘汰最久未使用的代號
+    """
+
+    def __init__(self, ttl_seconds: float = 900.0, max_datasets: int = 128):
+        """
+        初始化登記表
+
+        參數：
+            ttl_seconds: 代號存活秒數（每次存取後重新計算）
+            max_datasets: 最多保留的代號數量
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_datasets = max_datasets
+
+        # (conversation_id, handle) -> dataset 字典，依使用順序排列
+        self._datasets: 'OrderedDict[Tuple[Optional[str], str], Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        df: pd.DataFrame,
+        symbol: str,
+        timeframe: str,
+        conversation_id: Optional[str] = None
+    ) -> str:
+        """
+        登記一組 K 線並回傳代號
+
+        參數：
+            df: K 線 DataFrame
+            symbol: 商品代碼
+            timeframe: 時間週期
+            conversation_id: 所屬對話（None 表示不屬於任何對話）
+
+        回傳：
+            K 線資料代號（例如 GOLD-H1-3f9a2c1d）
+        """
+        handle = f"{symbol}-{timeframe}-{secrets.token_hex(4)}"
+        now = time.monotonic()
+
+        with self._lock:
+            self._purge(now)
+            self._datasets[(conversation_id, handle)] = {
+                'handle': handle,
+                'frame': df,
+                'symbol': symbol,
+                'timeframe': timeframe,
+                'expires_at': now + self.ttl_seconds
+            }
+            while len(self._datasets) > self.max_datasets:
+                self._datasets.popitem(last=False)
+
+        logger.debug(f"登記 K 線資料代號：{handle}（{len(df)} 根，對話：{conversation_id}）")
+
+        return handle
+
+    def get(self, handle: str, conversation_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        以代號取得 K 線
+
+        參數：
+            handle: register() 回傳的代號
+            conversation_id: 目前的對話
+
+        回傳：
+            {'handle', 'frame', 'symbol', 'timeframe', 'expires_at'} 字典
+
+        例外：
+            KeyError: 代號不存在、已過期或屬於其他對話時
+        """
+        now = time.monotonic()
+        key = (conversation_id, handle)
+
+        with self._lock:
+            dataset = self._datasets.get(key)
+
+            if dataset is None or dataset['expires_at'] <= now:
+                self._datasets.pop(key, None)
+                raise KeyError(handle)
+
+            dataset['expires_at'] = now + self.ttl_seconds
+            self._datasets.move_to_end(key)
+
+            return dataset
+
+    def release_conversation(self, conversation_id: Optional[str]) -> int:
+        """
+        釋放對話的所有代號
+
+        參數：
+            conversation_id: 對話識別碼
+
+        回傳：
+            釋放的代號數量
+        """
+        with self._lock:
+            keys = [key for key in self._datasets if key[0] == conversation_id]
+            for key in keys:
+                del self._datasets[key]
+
+        if keys:
+            logger.debug(f"已釋放對話 {conversation_id} 的 {len(keys)} 個 K 線資料代號")
+
+        return len(keys)
+
+    def _purge(self, now: float) -> None:
+        """移除過期的代號（呼叫端需持有鎖）"""
+        expired = [key for key, dataset in self._datasets.items() if dataset['expires_at'] <= now]
+        for key in expired:
+            del self._datasets[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._datasets)
+
+
+_candle_registry = CandleDatasetRegistry(
+    ttl_seconds=float(os.getenv("CANDLE_HANDLE_TTL_SECONDS", "900")),
+    max_datasets=int(os.getenv("CANDLE_HANDLE_MAX_DATASETS", "128"))
+)
+
+# get_candles 回傳的最近 K 線筆數（讓 Claude 不需要完整資料也能描述近期走勢）
+RECENT_CANDLES_PREVIEW = 5
+
 
 def get_mt5_client() -> ChipWhispererMT5Client:
     """
@@ -76,14 +235,16 @@ def get_mt5_client() -> ChipWhispererMT5Client:
     """
     global _mt5_client, _mt5_config
 
-    if _mt5_client is None:
-        logger.info("初始化 MT5 客戶端")
-        _mt5_config = MT5Config()
-        _mt5_client = ChipWhispererMT5Client(_mt5_config)
-        _mt5_client.connect()
+    with _mt5_lock:
+        if _mt5_client is None:
+            logger.info("初始化 MT5 客戶端")
+            _mt5_config = MT5Config()
+            _mt5_client = ChipWhispererMT5Client(_mt5_config)
+            _mt5_client.connect()
+
+        # 確保連線
+        _mt5_client.ensure_connected()
 
-    # 確保連線
-    _mt5_client.ensure_connected()
     return _mt5_client
 
 
@@ -94,7 +255,11 @@ def get_mt5_client() -> ChipWhispererMT5Client:
 TOOLS = [
     {
         "name": "get_candles",
-        "description": "取得指定商品和時間週期的 K 線資料。可用於查詢歷史價格數據。",
+        "description": (
+            "取得指定商品和時間週期的 K 線資料。可用於查詢歷史價格數據。"
+            "回傳 K 線摘要、最近幾根 K 線，以及 candles_handle（K 線資料代號），"
+            "計算工具以 candles_handle 取得完整 K 線。"
+        ),
         "input_schema": {
             "type": "object",
             "properties": {
@@ -117,13 +282,23 @@ TOOLS = [
     },
     {
         "name": "calculate_volume_profile",
-        "description": "計算 Volume Profile 技術指標，包含 POC（最大成交量價位）、VAH（價值區域高點）、VAL（價值區域低點）。需要先使用 get_candles 取得 K 線資料。",
+        "description": (
+            "計算 Volume Profile 技術指標，包含 POC（最大成交量價位）、"
+            "VAH（價值區域高點）、VAL（價值區域低點）。"
+            "需要先使用 get_candles 取得 K 線資料代號。"
+        ),
         "input_schema": {
             "type": "object",
             "properties": {
+                "candles_handle": {
+                    "type": "string",
+                    "description": "K 線資料代號（get_candles 回傳的 candles_handle）"
+                },
                 "candles_json": {
                     "type": "string",
-                    "description": "JSON 格式的 K 線資料字串（由 get_candles 工具提供）"
+                    "description": (
+                        "JSON 格式的 K 線資料字串（舊版參數，請優先使用 candles_handle）"
+                    )
                 },
                 "price_bins": {
                     "type": "integer",
@@ -131,18 +306,24 @@ TOOLS = [
                     "default": 100
                 }
             },
-            "required": ["candles_json"]
+            "required": []
         }
     },
     {
         "name": "calculate_sma",
-        "description": "計算簡單移動平均線（SMA）。需要先使用 get_candles 取得 K 線資料。",
+        "description": "計算簡單移動平均線（SMA）。需要先使用 get_candles 取得 K 線資料代號。",
         "input_schema": {
             "type": "object",
             "properties": {
+                "candles_handle": {
+                    "type": "string",
+                    "description": "K 線資料代號（get_candles 回傳的 candles_handle）"
+                },
                 "candles_json": {
                     "type": "string",
-                    "description": "JSON 格式的 K 線資料字串"
+                    "description": (
+                        "JSON 格式的 K 線資料字串（舊版參數，請優先使用 candles_handle）"
+                    )
                 },
                 "window": {
                     "type": "integer",
@@ -155,18 +336,27 @@ TOOLS = [
                     "default": "close"
                 }
             },
-            "required": ["candles_json"]
+            "required": []
         }
     },
     {
         "name": "calculate_rsi",
-        "description": "計算相對強弱指標（RSI），用於判斷超買超賣。需要先使用 get_candles 取得 K 線資料。",
+        "description": (
+            "計算相對強弱指標（RSI），用於判斷超買超賣。"
+            "需要先使用 get_candles 取得 K 線資料代號。"
+        ),
         "input_schema": {
             "type": "object",
             "properties": {
+                "candles_handle": {
+                    "type": "string",
+                    "description": "K 線資料代號（get_candles 回傳的 candles_handle）"
+                },
                 "candles_json": {
                     "type": "string",
-                    "description": "JSON 格式的 K 線資料字串"
+                    "description": (
+                        "JSON 格式的 K 線資料字串（舊版參數，請優先使用 candles_handle）"
+                    )
                 },
                 "window": {
                     "type": "integer",
@@ -179,7 +369,7 @@ TOOLS = [
                     "default": "close"
                 }
             },
-            "required": ["candles_json"]
+            "required": []
         }
     },
     {
@@ -231,30 +421,121 @@ TOOLS = [
 ]
 
 
+# 工具是否可與其他工具並行執行
+# 會呼叫 MT5 終端機或輸出圖表的工具設為 False：同一回合中這些工具在目前執行緒依序執行，
+# 其中的 MT5 呼叫另以 _mt5_lock 保護；純計算工具只讀取記憶體中的 K 線，可並行
+TOOL_PARALLEL_SAFE: Dict[str, bool] = {
+    "get_candles": False,
+    "calculate_volume_profile": True,
+    "calculate_sma": True,
+    "calculate_rsi": True,
+    "get_account_info": False,
+    "generate_vppa_chart": False,
+}
+
+# 並行工具的執行緒池（延遲建立）
+_tool_pool = None
+_tool_pool_lock = threading.Lock()
+
+
 # ============================================================================
 # 工具執行函式
 # ============================================================================
 
-def execute_tool(tool_name: str, tool_input: Dict[str, Any]) -> Dict[str, Any]:
+def execute_tool(
+    tool_name: str,
+    tool_input: Dict[str, Any],
+    conversation_id: Optional[str] = None
+) -> Dict[str, Any]:
     """
     執行指定的工具
 
     參數：
         tool_name: 工具名稱
         tool_input: 工具輸入參數
+        conversation_id: 所屬對話（決定 K 線資料代號的可見範圍）
 
     回傳：
         工具執行結果字典
     """
+    return _dispatch_tool(tool_name, tool_input, conversation_id)
+
+
+def execute_tools(
+    tool_calls: List[Tuple[str, Dict[str, Any]]],
+    conversation_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    執行同一回合的多個工具調用
+
+    並行安全的工具交給執行緒池同時執行，其餘工具在目前執行緒依序執行，
+    回合耗時約為最慢的工具而非全部工具耗時的總和。結果依輸入順序回傳。
+
+    參數：
+        tool_calls: [(工具名稱, 工具輸入參數), ...]
+        conversation_id: 所屬對話
+
+    回傳：
+        與 tool_calls 順序相同的工具執行結果列表
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(tool_calls)
+    parallel = [i for i, (name, _) in enumerate(tool_calls) if TOOL_PARALLEL_SAFE.get(name, False)]
+
+    if len(parallel) < 2:
+        parallel = []
+
+    pool = _get_tool_pool() if parallel else None
+    futures = {
+        i: pool.submit(execute_tool, tool_calls[i][0], tool_calls[i][1], conversation_id)
+        for i in parallel
+    }
+
+    if futures:
+        logger.debug(f"並行執行 {len(futures)} 個工具：{[tool_calls[i][0] for i in futures]}")
+
+    for i, (tool_name, tool_input) in enumerate(tool_calls):
+        if i not in futures:
+            results[i] = execute_tool(tool_name, tool_input, conversation_id)
+
+    for i, future in futures.items():
+        results[i] = future.result()
+
+    return results
+
+
+def _get_tool_pool() -> ThreadPoolExecutor:
+    """
+    取得並行工具的執行緒池單例
+
+    回傳：
+        ThreadPoolExecutor 實例（大小由 TOOL_MAX_WORKERS 設定，預設 4）
+    """
+    global _tool_pool
+
+    with _tool_pool_lock:
+        if _tool_pool is None:
+            max_workers = int(os.getenv("TOOL_MAX_WORKERS", "4"))
+            _tool_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+            logger.info(f"工具執行緒池初始化完成（執行緒：{max_workers}）")
+
+    return _tool_pool
+
+
+def _dispatch_tool(
+    tool_name: str,
+    tool_input: Dict[str, Any],
+    conversation_id: Optional[str]
+) -> Dict[str, Any]:
+    """依工具名稱呼叫對應的實作"""
     try:
         if tool_name == "get_candles":
-            return _get_candles(tool_input)
+            return _get_candles(tool_input, conversation_id)
         elif tool_name == "calculate_volume_profile":
-            return _calculate_volume_profile(tool_input)
+            return _calculate_volume_profile(tool_input, conversation_id)
         elif tool_name == "calculate_sma":
-            return _calculate_sma(tool_input)
+            return _calculate_sma(tool_input, conversation_id)
         elif tool_name == "calculate_rsi":
-            return _calculate_rsi(tool_input)
+            return _calculate_rsi(tool_input, conversation_id)
         elif tool_name == "get_account_info":
             return _get_account_info(tool_input)
         elif tool_name == "generate_vppa_chart":
@@ -270,21 +551,24 @@ def execute_tool(tool_name: str, tool_input: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
-def _get_candles(args: Dict[str, Any]) -> Dict[str, Any]:
+def _get_candles(args: Dict[str, Any], conversation_id: Optional[str] = None) -> Dict[str, Any]:
     """
     取得 K 線資料（支援自動回補）
 
     此函數實作智慧資料取得策略：
-    1. 優先從 DB 查詢
-    2. 若 DB 資料不足，自動更新到最新（update_db_to_now）
-    3. 再次查詢 DB
-    4. 若仍不足，從 MT5 直接取得
+    0. 高週期且 DB 已有 M1 數據時，改用由 M1 在本地合成的衍生週期
+    1. DB 最新 K 線落後超過一個週期時，先更新到最新（update_db_to_now；衍生週期只需更新 M1）
+    2. 從 DB 查詢；若資料不足且尚未更新，自動更新到最新後再次查詢
+    3. 若仍不足，從 MT5 直接取得
+
+    K 線本身保留在伺服器端，回傳的是 K 線資料代號（candles_handle）、摘要與最近幾根 K 線。
 
     參數：
         args: 工具輸入參數
+        conversation_id: 所屬對話（K 線資料代號只在此對話中有效）
 
     回傳：
-        包含 K 線資料和摘要的字典
+        包含 K 線資料代號和摘要的字典
     """
     try:
         symbol = args.get("symbol", "GOLD").upper()
@@ -308,41 +592,58 @@ def _get_candles(args: Dict[str, Any]) -> Dict[str, Any]:
         backfilled = False
         backfill_count = 0
 
-        # 策略 1：優先從 DB 查詢
-        logger.info("嘗試從 DB 查詢資料")
-        tf_minutes = TIMEFRAME_MINUTES[timeframe]
-        end_time = datetime.now(timezone.utc)
-        start_time = end_time - timedelta(minutes=tf_minutes * count * 2)
+        # 策略 0：高週期可由 DB 中的 M1 合成時，不必向 MT5 個別取得
+        materialized = cache.ensure_materialized(symbol, timeframe)
+        source_timeframe = 'M1' if materialized else timeframe
+        if materialized:
+            logger.info(f"{timeframe} 由本地 M1 數據合成")
+
+        # 策略 1：DB 最新 K 線落後時先更新到最新（筆數足夠不代表是最新資料）
+        from scripts.analyze_vppa import update_db_to_now
+        refreshed = False
+        if cache.is_stale(symbol, source_timeframe):
+            logger.info(f"DB 最新 {source_timeframe} 數據已落後，更新到最新")
+            try:
+                backfill_count = update_db_to_now(
+                    symbol, source_timeframe, cache, client, mt5_lock=_mt5_lock
+                )
+                backfilled = True
+                refreshed = True
+            except Exception as refresh_error:
+                logger.warning(f"更新到最新失敗：{refresh_error}")
 
-        df = cache.query_candles(symbol, timeframe, start_time, end_time)
+        # 策略 2：從 DB 查詢
+        logger.info("嘗試從 DB 查詢資料")
+        df = cache.query_latest(symbol, timeframe, count)
 
         if df is not None and len(df) >= count:
             logger.info(f"DB 資料充足，取得 {len(df)} 筆")
-            df = df.sort_values('time', ascending=True).tail(count).reset_index(drop=True)
         else:
             # 策略 2：DB 資料不足，嘗試自動回補
             existing_count = len(df) if df is not None else 0
             logger.info(f"DB 資料不足（{existing_count}/{count}），觸發自動回補")
 
             try:
-                # 2.1 更新到最新
-                from scripts.analyze_vppa import update_db_to_now
-                backfill_count = update_db_to_now(symbol, timeframe, cache, client)
-                logger.info(f"已補充 {backfill_count} 筆新資料")
-                backfilled = True
+                # 2.1 更新到最新（策略 1 已更新時略過）
+                if not refreshed:
+                    backfill_count = update_db_to_now(
+                        symbol, source_timeframe, cache, client, mt5_lock=_mt5_lock
+                    )
+                    logger.info(f"已補充 {backfill_count} 筆新資料")
+                    backfilled = True
 
                 # 2.2 再次查詢 DB
-                df = cache.query_candles(symbol, timeframe, start_time, end_time)
+                df = cache.query_latest(symbol, timeframe, count)
 
                 if df is not None and len(df) >= count:
                     logger.info(f"回補後 DB 資料充足，取得 {len(df)} 筆")
-                    df = df.sort_values('time', ascending=True).tail(count).reset_index(drop=True)
                 else:
                     # 策略 3：仍不足，從 MT5 直接取得
                     logger.info(f"回補後仍不足（{len(df) if df is not None else 0}/{count}），從 MT5 直接取得")
 
                     tf_constant = TIMEFRAME_MAP[timeframe]
-                    rates = mt5.copy_rates_from_pos(symbol, tf_constant, 0, count)
+                    with _mt5_lock:
+                        rates = mt5.copy_rates_from_pos(symbol, tf_constant, 0, count)
 
                     if rates is None or len(rates) == 0:
                         raise RuntimeError(f"無法從 MT5 取得 {symbol} {timeframe} 數據")
@@ -362,20 +663,33 @@ def _get_candles(args: Dict[str, Any]) -> Dict[str, Any]:
                 logger.error(f"自動回補失敗：{backfill_error}")
                 # 回退：使用 HistoricalDataFetcher（原始邏輯）
                 logger.info("回退到原始查詢邏輯")
+                # （取得器內部交錯呼叫 MT5 與 SQLite，整個呼叫持有 MT5 鎖）
                 fetcher = HistoricalDataFetcher(client)
-                df = fetcher.get_candles_latest(
-                    symbol=symbol,
-                    timeframe=timeframe,
-                    count=count
-                )
-
-        # 將 DataFrame 轉換為可序列化的格式
-        df_copy = df.copy()
-        if 'time' in df_copy.columns:
-            df_copy['time'] = df_copy['time'].astype(str)
-
-        candles_data = df_copy.to_dict('records')
-        candles_json = json.dumps(candles_data, ensure_ascii=False)
+                with _mt5_lock:
+                    df = fetcher.get_candles_latest(
+                        symbol=symbol,
+                        timeframe=timeframe,
+                        count=count
+                    )
+                # get_candles_latest 依時間降冪排序，統一為升冪（tail 為最新 K 線）
+                df = df.sort_values('time', ascending=True).reset_index(drop=True)
+
+        # K 線保留在記憶體中，只回傳代號
+        candles_handle = _candle_registry.register(df, symbol, timeframe, conversation_id)
+
+        # 最近幾根 K 線（精簡欄位）
+        recent = df.tail(RECENT_CANDLES_PREVIEW)
+        recent_candles = [
+            {
+                "time": str(row.time) if 'time' in df.columns else None,
+                "open": float(row.open),
+                "high": float(row.high),
+                "low": float(row.low),
+                "close": float(row.close),
+                "volume": float(row.real_volume)
+            }
+            for row in recent.itertuples(index=False)
+        ]
 
         # 計算摘要資訊
         summary = {
@@ -405,12 +719,16 @@ def _get_candles(args: Dict[str, Any]) -> Dict[str, Any]:
             "success": True,
             "message": message,
             "data": {
-                "candles_json": candles_json,
-                "summary": summary
+                "candles_handle": candles_handle,
+                "summary": summary,
+                "recent_candles": recent_candles
             }
         }
 
-        logger.info(f"成功取得 {len(df)} 根 K 線（回補：{backfilled}，新增：{backfill_count}）")
+        logger.info(
+            f"成功取得 {len(df)} 根 K 線"
+            f"（回補：{backfilled}，新增：{backfill_count}，代號：{candles_handle}）"
+        )
         return result
 
     except Exception as e:
@@ -421,17 +739,71 @@ def _get_candles(args: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
-def _calculate_volume_profile(args: Dict[str, Any]) -> Dict[str, Any]:
+def _resolve_candles(
+    args: Dict[str, Any],
+    conversation_id: Optional[str]
+) -> Tuple[Tuple, Callable[[], pd.DataFrame]]:
+    """
+    取得計算工具的 K 線來源
+
+    優先使用 candles_handle（從記憶體讀取）；沒有代號時退回解析 candles_json。
+    K 線延遲到快取未命中時才載入，命中時不必解析 JSON。
+
+    參數：
+        args: 工具輸入參數
+        conversation_id: 目前的對話
+
+    回傳：
+        (數據指紋, 載入 K 線 DataFrame 的函數) 元組
+
+    例外：
+        ValueError: 代號無效或沒有提供 K 線時
+    """
+    handle = args.get("candles_handle")
+
+    if handle:
+        try:
+            dataset = _candle_registry.get(handle, conversation_id)
+        except KeyError:
+            raise ValueError(f"找不到 K 線資料代號 {handle}（可能已過期），請重新呼叫 get_candles")
+
+        fingerprint = IndicatorCache.frame_fingerprint(
+            dataset['symbol'], dataset['timeframe'], dataset['frame']
+        )
+        return fingerprint, lambda: dataset['frame']
+
+    candles_json = args.get("candles_json")
+
+    if candles_json:
+        return (
+            IndicatorCache.json_fingerprint(candles_json),
+            lambda: pd.DataFrame(json.loads(candles_json))
+        )
+
+    raise ValueError("缺少 K 線資料：請提供 get_candles 回傳的 candles_handle")
+
+
+def _calculate_volume_profile(
+    args: Dict[str, Any], conversation_id: Optional[str] = None
+) -> Dict[str, Any]:
     """計算 Volume Profile"""
     try:
-        candles_json = args.get("candles_json")
         price_bins = int(args.get("price_bins", 100))
 
         logger.info(f"工具調用：calculate_volume_profile(price_bins={price_bins})")
 
-        # 解析 K 線資料
-        candles_list = json.loads(candles_json)
-        df = pd.DataFrame(candles_list)
+        fingerprint, load_candles = _resolve_candles(args, conversation_id)
+
+        cache = _get_indicator_cache()
+        cache_key = cache.make_key(
+            "calculate_volume_profile", fingerprint, {"price_bins": price_bins}
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info("Volume Profile 命中快取")
+            return cached
+
+        df = load_candles()
 
         # 計算 Volume Profile
         profile_df, metrics = calculate_volume_profile(df, price_bins)
@@ -463,6 +835,7 @@ Volume Profile 分析結果：
             }
         }
 
+        cache.set(cache_key, result, persist=True)
         logger.info("Volume Profile 計算成功")
         return result
 
@@ -474,18 +847,26 @@ Volume Profile 分析結果：
         }
 
 
-def _calculate_sma(args: Dict[str, Any]) -> Dict[str, Any]:
+def _calculate_sma(args: Dict[str, Any], conversation_id: Optional[str] = None) -> Dict[str, Any]:
     """計算 SMA"""
     try:
-        candles_json = args.get("candles_json")
         window = int(args.get("window", 20))
         column = args.get("column", "close")
 
         logger.info(f"工具調用：calculate_sma(window={window}, column={column})")
 
-        # 解析 K 線資料
-        candles_list = json.loads(candles_json)
-        df = pd.DataFrame(candles_list)
+        fingerprint, load_candles = _resolve_candles(args, conversation_id)
+
+        cache = _get_indicator_cache()
+        cache_key = cache.make_key(
+            "calculate_sma", fingerprint, {"window": window, "column": column}
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info("SMA 命中快取")
+            return cached
+
+        df = load_candles()
 
         # 計算 SMA
         sma = calculate_sma(df, window, column)
@@ -517,13 +898,14 @@ def _calculate_sma(args: Dict[str, Any]) -> Dict[str, Any]:
                 "interpretation": f"""
 SMA({window}) 分析結果：
 
-• 最新 SMA 值：{latest_sma:.2f if latest_sma else 'N/A'}
+• 最新 SMA 值：{f'{latest_sma:.2f}' if latest_sma else 'N/A'}
 • 最新價格：{latest_price:.2f}
 • 趨勢判斷：{trend}
 """
             }
         }
 
+        cache.set(cache_key, result, persist=True)
         logger.info("SMA 計算成功")
         return result
 
@@ -535,18 +917,26 @@ SMA({window}) 分析結果：
         }
 
 
-def _calculate_rsi(args: Dict[str, Any]) -> Dict[str, Any]:
+def _calculate_rsi(args: Dict[str, Any], conversation_id: Optional[str] = None) -> Dict[str, Any]:
     """計算 RSI"""
     try:
-        candles_json = args.get("candles_json")
         window = int(args.get("window", 14))
         column = args.get("column", "close")
 
         logger.info(f"工具調用：calculate_rsi(window={window}, column={column})")
 
-        # 解析 K 線資料
-        candles_list = json.loads(candles_json)
-        df = pd.DataFrame(candles_list)
+        fingerprint, load_candles = _resolve_candles(args, conversation_id)
+
+        cache = _get_indicator_cache()
+        cache_key = cache.make_key(
+            "calculate_rsi", fingerprint, {"window": window, "column": column}
+        )
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info("RSI 命中快取")
+            return cached
+
+        df = load_candles()
 
         # 計算 RSI
         rsi = calculate_rsi(df, window, column)
@@ -580,13 +970,14 @@ def _calculate_rsi(args: Dict[str, Any]) -> Dict[str, Any]:
                 "interpretation": f"""
 RSI({window}) 分析結果：
 
-• 最新 RSI 值：{latest_rsi:.2f if latest_rsi else 'N/A'}
+• 最新 RSI 值：{f'{latest_rsi:.2f}' if latest_rsi else 'N/A'}
 • 狀態：{status}
 • 建議：{suggestion}
 """
             }
         }
 
+        cache.set(cache_key, result, persist=True)
         logger.info("RSI 計算成功")
         return result
 
@@ -607,7 +998,8 @@ def _get_account_info(args: Dict[str, Any]) -> Dict[str, Any]:
         client = get_mt5_client()
 
         # 取得帳戶資訊
-        account_info = client.get_account_info()
+        with _mt5_lock:
+            account_info = client.get_account_info()
 
         if account_info:
             result = {
@@ -686,25 +1078,38 @@ def _generate_vppa_chart(args: Dict[str, Any]) -> Dict[str, Any]:
 
         # 4.1 補充 DB 到最新
         from scripts.analyze_vppa import update_db_to_now
-        new_count = update_db_to_now(symbol, timeframe, cache, client)
+        new_count = update_db_to_now(symbol, timeframe, cache, client, mt5_lock=_mt5_lock)
         logger.info(f"補充了 {new_count} 筆新數據")
 
         # 4.2 取得 K 線數據
         from scripts.analyze_vppa import fetch_data
-        df = fetch_data(symbol, timeframe, count, cache, client)
+        df = fetch_data(symbol, timeframe, count, cache, client, mt5_lock=_mt5_lock)
         logger.info(f"取得 {len(df)} 筆 K 線數據")
 
         # 4.3 計算成交量移動平均
         df['volume_ma'] = df['real_volume'].rolling(window=14).mean()
 
-        # 4.4 計算 VPPA
-        df_indexed = df.set_index('time')
-        vppa_result = calculate_vppa(
-            df_indexed,
-            pivot_length=pivot_length,
-            price_levels=price_levels,
-            value_area_pct=0.67
+        # 4.4 計算 VPPA（數據未變時直接取用快取；否則重用同參數的串流狀態，
+        #     只處理上次請求之後變動的 K 線）
+        indicator_cache = _get_indicator_cache()
+        cache_key = indicator_cache.make_key(
+            "calculate_vppa",
+            indicator_cache.frame_fingerprint(symbol, timeframe, df),
+            {"pivot_length": pivot_length, "price_levels": price_levels, "value_area_pct": 0.67}
         )
+        vppa_result = indicator_cache.get(cache_key)
+
+        if vppa_result is None:
+            df_indexed = df.set_index('time')
+            vppa_state = _get_vppa_state(symbol, timeframe, pivot_length, price_levels, 0.67, count)
+            updated, vppa_result = vppa_state.update_and_snapshot(
+                df_indexed, count=len(df_indexed)
+            )
+            # 結果含 Timestamp，只保留在記憶體層
+            indicator_cache.set(cache_key, vppa_result)
+            logger.info(f"VPPA 狀態更新了 {updated} 根 K 線")
+        else:
+            logger.info("VPPA 命中快取")
 
         logger.info(
             f"VPPA 計算完成：{vppa_result['metadata']['total_pivot_points']} 個 Pivot Points，"
@@ -914,9 +1319,103 @@ def _get_cache_manager() -> SQLiteCacheManager:
     """
     global _cache_manager
 
-    if _cache_manager is None:
-        logger.info("初始化 SQLite 快取管理器")
-        db_path = os.getenv("CANDLES_DB_PATH", "data/candles.db")
-        _cache_manager = SQLiteCacheManager(db_path)
+    with _singleton_lock:
+        if _cache_manager is None:
+            logger.info("初始化 SQLite 快取管理器")
+            db_path = os.getenv("CANDLES_DB_PATH", "data/candles.db")
+            _cache_manager = SQLiteCacheManager(db_path)
 
     return _cache_manager
+
+
+def _get_vppa_state(
+    symbol: str,
+    timeframe: str,
+    pivot_length: int,
+    price_levels: int,
+    value_area_pct: float,
+    count: int
+) -> VPPAState:
+    """
+    取得（或建立）指定商品、時間週期與參數的串流 VPPA 狀態
+
+    參數：
+        symbol: 商品代碼
+        timeframe: 時間週期
+        pivot_length: Pivot Point 左右觀察窗口大小
+        price_levels: Volume Profile 價格分層數量
+        value_area_pct: Value Area 包含的成交量百分比
+        count: 請求的 K 線數量（決定狀態保留的 K 線數量）
+
+    回傳：
+        VPPAState 實例
+    """
+    key = (symbol, timeframe, pivot_length, price_levels, value_area_pct)
+
+    with _vppa_states_lock:
+        state = _vppa_states.get(key)
+
+        if state is None or (state.max_bars or 0) < count:
+            logger.info(f"建立 VPPA 串流狀態：{key}，保留 {count} 根 K 線")
+            state = VPPAState(
+                pivot_length=pivot_length,
+                price_levels=price_levels,
+                value_area_pct=value_area_pct,
+                max_bars=count
+            )
+            _vppa_states[key] = state
+
+    return state
+
+
+def _get_indicator_cache() -> IndicatorCache:
+    """
+    取得指標計算結果快取單例
+
+    以環境變數設定：
+    - INDICATOR_CACHE_MAX_ENTRIES：記憶體層容量（預設 256）
+    - INDICATOR_CACHE_TTL_SECONDS：存活秒數（預設 60）
+    - INDICATOR_CACHE_DISK：是否啟用 SQLite 磁碟層（預設 false）
+
+    回傳：
+        IndicatorCache 實例
+    """
+    global _indicator_cache
+
+    with _indicator_cache_lock:
+        if _indicator_cache is None:
+            use_disk = os.getenv("INDICATOR_CACHE_DISK", "false").lower() == "true"
+            _indicator_cache = IndicatorCache(
+                max_entries=int(os.getenv("INDICATOR_CACHE_MAX_ENTRIES", "256")),
+                ttl_seconds=float(os.getenv("INDICATOR_CACHE_TTL_SECONDS", "60")),
+                store=_get_cache_manager() if use_disk else None
+            )
+            logger.info(
+                f"初始化指標快取：容量 {_indicator_cache.max_entries}，"
+                f"存活 {_indicator_cache.ttl_seconds:g} 秒，磁碟層 {'啟用' if use_disk else '停用'}"
+            )
+
+    return _indicator_cache
+
+
+def get_indicator_cache_stats() -> Dict[str, Any]:
+    """
+    取得指標快取的命中統計（供監控使用）
+
+    回傳：
+        IndicatorCache.stats() 的結果
+    """
+    return _get_indicator_cache().stats()
+
+
+def release_conversation(conversation_id: Optional[str]) -> int:
+    """
+    釋放對話建立的所有 K 線資料代號（對話結束時呼叫）
+
+    參數：
+        conversation_id: 對話識別碼
+
+    回傳：
+        釋放的代號數量
+    """
+    return _candle_registry.release_conversation(conversation_id)
@@ -0,0 +1,592 @@
+"""
+串流 VPPA 狀態模組
+
+此模組提供可逐步餵入 K 線的 VPPA 計算狀態，供即時圖表重複請求時使用：
+- 只在右側 K 線足夠時才判定新的 Pivot Point，已完成的區間計算一次後凍結
+- 發展中區間的成交量分布逐根累加（每根 O(價格層數)），
+  只有新 K 線突破區間高低點或出現新 Pivot Point 時才整段重算
+- 最後幾根 K 線被修正（例如尚未收盤的 K 線）時，回溯受影響的 Pivot Point 後重新判定
+
+snapshot() 的結果與對相同 K 線呼叫 calculate_vppa 相同。
+"""
+
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from .indicators import (
+    distribute_volume,
+    find_pivot_indices,
+    calculate_volume_profiles,
+    calculate_value_area_many,
+    _collect_pivot_points,
+    _build_range_data
+)
+
+
+class VPPAState:
+    """
+    單一商品、時間週期與參數組合的 VPPA 計算狀態
+
+    內部以「絕對位置」（自建立狀態以來的第幾根 K 線）記錄 Pivot Point 與區間，
+    捨棄最舊的 K 線時不需改寫已凍結的結果。
+
+    使用範例：
+        state = VPPAState(pivot_length=67, price_levels=27, value_area_pct=0.67)
+        state.update(df)                   # df 以時間為索引
+        result = state.snapshot(count=2160)  # 與 calculate_vppa(df.tail(2160)) 相同
+    """
+
+    def __init__(
+        self,
+        pivot_length: int = 20,
+        price_levels: int = 25,
+        value_area_pct: float = 0.68,
+        max_bars: Optional[int] = None
+    ):
+        """
+        初始化 VPPA 狀態
+
+        參數：
+            pivot_length: Pivot Point 左右觀察窗口大小（預設 20）
+            price_levels: Volume Profile 價格分層數量（預設 25）
+            value_area_pct: Value Area 包含的成交量百分比（預設 0.68）
+            max_bars: 保留的 K 線數量上限，超過兩倍時捨棄最舊的 K 線（None 表示不限制）
+
+        例外：
+            ValueError: 參數無效時
+        """
+        if pivot_length < 1:
+            raise ValueError(f"無效的窗口大小：{pivot_length}")
+        if price_levels < 1:
+            raise ValueError(f"無效的價格分層數量：{price_levels}")
+
+        self.pivot_length = pivot_length
+        self.price_levels = price_levels
+        self.value_area_pct = value_area_pct
+        self.max_bars = max_bars
+
+        self._lock = threading.Lock()
+        self._clear()
+
+    # ========================================================================
+    # 公開介面
+    # ========================================================================
+
+    @property
+    def bar_count(self) -> int:
+        """目前保留的 K 線數量"""
+        return len(self._highs)
+
+    @property
+    def last_time(self) -> Optional[pd.Timestamp]:
+        """最後一根 K 線的時間（尚無資料時為 None）"""
+        return self._index[-1] if len(self._index) > 0 else None
+
+    def reset(self) -> None:
+        """清除所有 K 線與計算結果"""
+        with self._lock:
+            self._clear()
+
+    def update(self, df: pd.DataFrame) -> int:
+        """
+        餵入 K 線資料
+
+        df 可以與已保留的 K 線重疊：相同時間且數值相同的 K 線會被略過，
+        第一根不同的 K 線（含被修正的未收盤 K 線）之後的資料會回溯後重新計算。
+        df 的起點早於或不在已保留的 K 線中時，整個狀態以 df 重建。
+
+        參數：
+            df: K 線資料 DataFrame（以時間為索引，必須包含 'high', 'low', 'real_volume' 欄位，
+                可選 'tick_volume' 作為無 real_volume 時的回退）
+
+        回傳：
+            新增或重新計算的 K 線數量
+
+        例外：
+            ValueError: 缺少必要欄位時
+        """
+        with self._lock:
+            return self._update(df)
+
+    def snapshot(self, count: Optional[int] = None, include_developing: bool = True) -> dict:
+        """
+        取得最後 count 根 K 線的 VPPA 結果
+
+        參數：
+            count: K 線數量（None 表示全部保留的 K 線）
+            include_developing: 是否包含即時發展中的區間（預設 True）
+
+        回傳：
+            與 calculate_vppa 相同結構的字典（索引相對於這 count 根 K 線）
+
+        例外：
+            ValueError: K 線數量不足時
+        """
+        with self._lock:
+            return self._snapshot(count, include_developing)
+
+    def update_and_snapshot(
+        self,
+        df: pd.DataFrame,
+        count: Optional[int] = None,
+        include_developing: bool = True
+    ) -> Tuple[int, dict]:
+        """
+        餵入 K 線資料並取得結果（整個過程持有同一把鎖）
+
+        多個執行緒共用同一個狀態時，分開呼叫 update() 與 snapshot() 之間
+        可能被其他執行緒的 update() 插入，取得的結果不一定對應剛餵入的 K 線。
+
+        參數：
+            df: K 線資料 DataFrame（同 update()）
+            count: K 線數量（同 snapshot()）
+            include_developing: 是否包含即時發展中的區間（預設 True）
+
+        回傳：
+            (新增或重新計算的 K 線數量, snapshot 結果) 元組
+
+        例外：
+            ValueError: 缺少必要欄位或 K 線數量不足時
+        """
+        with self._lock:
+            updated = self._update(df)
+            return updated, self._snapshot(count, include_developing)
+
+    # ========================================================================
+    # 內部實作
+    # ========================================================================
+
+    def _update(self, df: pd.DataFrame) -> int:
+        """update() 的實作（呼叫端須持有 self._lock）"""
+        required_columns = ['high', 'low', 'real_volume']
+        missing_columns = [col for col in required_columns if col not in df.columns]
+        if missing_columns:
+            raise ValueError(f"缺少必要欄位：{missing_columns}")
+
+        if len(df) == 0:
+            return 0
+
+        times = df.index
+        highs = df['high'].to_numpy(dtype=np.float64)
+        lows = df['low'].to_numpy(dtype=np.float64)
+        volumes = df['real_volume'].to_numpy(dtype=np.float64)
+        ticks = (
+            df['tick_volume'].to_numpy(dtype=np.float64)
+            if 'tick_volume' in df.columns else None
+        )
+
+        start = self._find_overlap(times, highs, lows, volumes, ticks)
+
+        if start is None:
+            logger.info(f"VPPA 狀態以 {len(df)} 根 K 線重建")
+            self._clear()
+            self._has_ticks = ticks is not None
+            start = 0
+        elif start == len(df):
+            return 0
+
+        self._append(
+            times[start:], highs[start:], lows[start:], volumes[start:],
+            ticks[start:] if ticks is not None else None
+        )
+        self._advance()
+        self._trim()
+        self._version += 1
+
+        return len(df) - start
+
+    def _snapshot(self, count: Optional[int], include_developing: bool) -> dict:
+        """snapshot() 的實作（呼叫端須持有 self._lock）"""
+        n = len(self._highs)
+        window = n if count is None else min(count, n)
+
+        if window < self.pivot_length * 2 + 1:
+            raise ValueError(
+                f"資料筆數（{window}）不足以計算 VPPA"
+                f"（需要至少 {self.pivot_length * 2 + 1} 筆）"
+            )
+
+        window_start = self._offset + n - window
+        first_pivot = window_start + self.pivot_length
+
+        points = self._points[bisect.bisect_left(self._point_indices, first_pivot):]
+        pivot_high_count = (
+            len(self._high_pivots) - bisect.bisect_left(self._high_pivots, first_pivot)
+        )
+        pivot_low_count = (
+            len(self._low_pivots) - bisect.bisect_left(self._low_pivots, first_pivot)
+        )
+        total_pivot_points = pivot_high_count + pivot_low_count
+
+        metadata = {
+            'total_bars': window,
+            'pivot_length': self.pivot_length,
+            'price_levels': self.price_levels,
+            'value_area_pct': self.value_area_pct,
+            'total_pivot_points': total_pivot_points,
+            'total_ranges': max(len(points) - 1, 0),
+            'pivot_high_count': pivot_high_count,
+            'pivot_low_count': pivot_low_count
+        }
+
+        if len(points) < 2:
+            return {
+                'metadata': metadata,
+                'pivot_summary': [],
+                'pivot_ranges': [],
+                'developing_range': None
+            }
+
+        pivot_summary = [
+            dict(point, idx=point['idx'] - window_start) for point in points
+        ]
+
+        pivot_ranges = []
+        for range_id, (start_point, end_point) in enumerate(zip(points, points[1:])):
+            range_data = dict(self._ranges[(start_point['idx'], end_point['idx'])])
+            range_data.update({
+                'range_id': range_id,
+                'start_idx': start_point['idx'] - window_start,
+                'end_idx': end_point['idx'] - window_start
+            })
+            pivot_ranges.append(range_data)
+
+        developing_range = None
+        if include_developing and self._developing is not None:
+            developing_range = dict(self._developing_data())
+            developing_range.update({
+                'range_id': len(pivot_ranges),
+                'start_idx': developing_range['start_idx'] - window_start,
+                'end_idx': developing_range['end_idx'] - window_start
+            })
+
+        return {
+            'metadata': metadata,
+            'pivot_summary': pivot_summary,
+            'pivot_ranges': pivot_ranges,
+            'developing_range': developing_range
+        }
+
+    def _clear(self) -> None:
+        """重設為空狀態"""
+        self._index = pd.Index([])
+        self._highs = np.empty(0)
+        self._lows = np.empty(0)
+        self._volumes = np.empty(0)
+        self._ticks = np.empty(0)
+        self._has_ticks = False
+
+        # 位置 0 的 K 線對應的絕對位置（捨棄舊 K 線後遞增）
+        self._offset = 0
+
+        # 已確認的 Pivot Points（絕對位置）與已凍結的區間
+        self._high_pivots: List[int] = []
+        self._low_pivots: List[int] = []
+        self._points: List[dict] = []
+        self._point_indices: List[int] = []
+        self._ranges: Dict[tuple, dict] = {}
+
+        # 下一個尚未判定的 Pivot 候選位置（絕對位置）
+        self._next_candidate = self.pivot_length
+
+        # 發展中區間的累加狀態與快取
+        self._developing: Optional[dict] = None
+        self._developing_cache: Optional[tuple] = None
+        self._version = 0
+
+    def _find_overlap(self, times, highs, lows, volumes, ticks) -> Optional[int]:
+        """
+        比對新資料與已保留的 K 線，必要時回溯
+
+        回傳：
+            新資料中第一根需要處理的位置；None 表示需要重建
+        """
+        n = len(self._highs)
+        if n == 0 or (ticks is not None) != self._has_ticks:
+            return None
+
+        pos = int(self._index.searchsorted(times[0]))
+        if pos == n:
+            return 0
+        if self._index[pos] != times[0]:
+            return None
+
+        overlap = min(len(times), n - pos)
+        stored = slice(pos, pos + overlap)
+
+        same = np.asarray(self._index[stored] == times[:overlap])
+        for stored_values, values in (
+            (self._highs, highs), (self._lows, lows), (self._volumes, volumes),
+            (self._ticks if self._has_ticks else None, ticks)
+        ):
+            if stored_values is not None:
+                same &= np.isclose(stored_values[stored], values[:overlap], rtol=0, atol=0,
+                                   equal_nan=True)
+
+        changed = np.flatnonzero(~same)
+        if len(changed) == 0:
+            return overlap
+
+        first_changed = int(changed[0])
+        self._truncate(pos + first_changed)
+        return first_changed
+
+    def _append(self, times, highs, lows, volumes, ticks) -> None:
+        """將 K 線接在保留資料之後"""
+        self._index = self._index.append(pd.Index(times)) if len(self._index) else pd.Index(times)
+        self._highs = np.concatenate([self._highs, highs])
+        self._lows = np.concatenate([self._lows, lows])
+        self._volumes = np.concatenate([self._volumes, volumes])
+        if ticks is not None:
+            self._ticks = np.concatenate([self._ticks, ticks])
+
+    def _truncate(self, position: int) -> None:
+        """
+        捨棄 position（陣列位置）之後的 K 線，並回溯判定時用到這些 K 線的結果
+        """
+        cut = self._offset + position
+        length = self.pivot_length
+
+        self._index = self._index[:position]
+        self._highs = self._highs[:position]
+        self._lows = self._lows[:position]
+        self._volumes = self._volumes[:position]
+        self._ticks = self._ticks[:position]
+
+        # 候選位置 q 的判定用到 q + length 以前的 K 線
+        redo_from = cut - length
+        if redo_from < self._offset + length:
+            # 需要的左側 K 線已被捨棄，從保留的 K 線重新判定
+            redo_from = self._offset + length
+            self._high_pivots, self._low_pivots = [], []
+            self._points, self._point_indices = [], []
+            self._ranges = {}
+        else:
+            self._high_pivots = self._high_pivots[:bisect.bisect_left(self._high_pivots, redo_from)]
+            self._low_pivots = self._low_pivots[:bisect.bisect_left(self._low_pivots, redo_from)]
+            keep = bisect.bisect_left(self._point_indices, redo_from)
+            self._points = self._points[:keep]
+            self._point_indices = self._point_indices[:keep]
+            self._ranges = {
+                key: value for key, value in self._ranges.items() if key[1] < redo_from
+            }
+
+        self._next_candidate = min(self._next_candidate, redo_from)
+        self._developing = None
+
+        logger.debug(f"VPPA 狀態回溯至絕對位置 {cut}")
+
+    def _advance(self) -> None:
+        """判定新可判定的 Pivot Points、凍結新完成的區間並更新發展中區間"""
+        length = self.pivot_length
+        n = len(self._highs)
+        last_decidable = self._offset + n - 1 - length
+
+        if self._next_candidate <= last_decidable:
+            lo = self._next_candidate - length - self._offset
+            high_indices, low_indices = find_pivot_indices(
+                self._highs[lo:], self._lows[lo:], length
+            )
+
+            new_points = _collect_pivot_points(
+                self._index[lo:],
+                high_indices, self._highs[lo:][high_indices],
+                low_indices, self._lows[lo:][low_indices]
+            )
+            for point in new_points:
+                point['idx'] += lo + self._offset
+
+            self._high_pivots.extend((high_indices + lo + self._offset).tolist())
+            self._low_pivots.extend((low_indices + lo + self._offset).tolist())
+            self._next_candidate = last_decidable + 1
+
+            if new_points:
+                previous = self._points[-1:]
+                self._points.extend(new_points)
+                self._point_indices.extend(point['idx'] for point in new_points)
+                self._freeze_ranges(previous + new_points)
+                self._developing = None
+
+        self._update_developing()
+
+    def _freeze_ranges(self, points: List[dict]) -> None:
+        """一次計算相鄰 Pivot Points 之間的區間並凍結"""
+        if len(points) < 2:
+            return
+
+        starts = np.array([point['idx'] for point in points[:-1]]) - self._offset
+        ends = np.array([point['idx'] for point in points[1:]]) - self._offset
+
+        profiles = calculate_volume_profiles(
+            self._highs, self._lows, self._volumes, starts, ends,
+            price_levels=self.price_levels,
+            fallback_volumes=self._ticks if self._has_ticks else None
+        )
+
+        value_areas = calculate_value_area_many(
+            profiles['volume_profile'], profiles['price_lowest'], profiles['price_step'],
+            self.value_area_pct
+        )
+
+        for i, (start_point, end_point) in enumerate(zip(points, points[1:])):
+            range_data = _build_range_data(profiles, value_areas, i)
+            range_data.update({
+                'range_id': None,
+                'start_idx': start_point['idx'],
+                'end_idx': end_point['idx'],
+                'start_time': start_point['time'],
+                'end_time': end_point['time'],
+                'bar_count': end_point['idx'] - start_point['idx'],
+                'pivot_type': end_point['type'],
+                'pivot_price': end_point['price']
+            })
+            self._ranges[(start_point['idx'], end_point['idx'])] = range_data
+
+    def _update_developing(self) -> None:
+        """累加發展中區間的新 K 線（突破高低點時整段重算）"""
+        if not self._points:
+            self._developing = None
+            return
+
+        n = len(self._highs)
+        start = self._points[-1]['idx'] - self._offset
+        dev = self._developing
+
+        if dev is not None and dev['start'] == start:
+            new = slice(dev['end'] + 1, n)
+            if new.start >= n:
+                return
+
+            highs, lows = self._highs[new], self._lows[new]
+            inside = (
+                dev['step'] > 0
+                and (lows >= dev['lowest']).all()
+                and (highs <= dev['highest']).all()
+            )
+
+            if inside:
+                dev['real'] += distribute_volume(
+                    highs, lows, self._volumes[new], dev['lowest'], dev['step'], self.price_levels
+                )
+                dev['real_sum'] += self._volumes[new].sum()
+                if self._has_ticks:
+                    dev['tick'] += distribute_volume(
+                        highs, lows, self._ticks[new], dev['lowest'], dev['step'], self.price_levels
+                    )
+                    dev['tick_sum'] += self._ticks[new].sum()
+                dev['end'] = n - 1
+                return
+
+        # 整段重算
+        bars = slice(start, n)
+        lowest = float(np.fmin.reduce(self._lows[bars]))
+        highest = float(np.fmax.reduce(self._highs[bars]))
+        step = (highest - lowest) / self.price_levels
+
+        def profile(volumes):
+            if step > 0:
+                return distribute_volume(
+                    self._highs[bars], self._lows[bars], volumes[bars],
+                    lowest, step, self.price_levels
+                )
+            return np.zeros(self.price_levels)
+
+        self._developing = {
+            'start': start,
+            'end': n - 1,
+            'lowest': lowest,
+            'highest': highest,
+            'step': step,
+            'real': profile(self._volumes),
+            'real_sum': float(self._volumes[bars].sum()),
+            'tick': profile(self._ticks) if self._has_ticks else None,
+            'tick_sum': float(self._ticks[bars].sum()) if self._has_ticks else 0.0
+        }
+
+    def _developing_data(self) -> dict:
+        """發展中區間的 VPPA 區間字典（同一版本的狀態只計算一次，索引為絕對位置）"""
+        if self._developing_cache is not None and self._developing_cache[0] == self._version:
+            return self._developing_cache[1]
+
+        dev = self._developing
+        use_ticks = self._has_ticks and dev['real_sum'] == 0
+        volume_profile = dev['tick'] if use_ticks else dev['real']
+        range_volume = dev['tick_sum'] if use_ticks else dev['real_sum']
+        bar_count = dev['end'] - dev['start'] + 1
+
+        profiles = {
+            'volume_profile': volume_profile[None, :],
+            'price_lowest': np.array([dev['lowest']]),
+            'price_highest': np.array([dev['highest']]),
+            'price_step': np.array([dev['step']]),
+            'price_centers': (
+                dev['lowest'] + (np.arange(self.price_levels) + 0.5) * dev['step']
+            )[None, :],
+            'total_volume': np.array([
+                volume_profile.sum() if dev['step'] > 0 else range_volume
+            ]),
+            'bar_count': np.array([bar_count])
+        }
+
+        last_pivot = self._points[-1]
+        value_areas = calculate_value_area_many(
+            profiles['volume_profile'], profiles['price_lowest'], profiles['price_step'],
+            self.value_area_pct
+        )
+        range_data = _build_range_data(profiles, value_areas, 0)
+        range_data.update({
+            'is_developing': True,
+            'range_id': None,
+            'start_idx': last_pivot['idx'],
+            'end_idx': self._offset + dev['end'],
+            'start_time': self._index[dev['start']],
+            'end_time': self._index[dev['end']],
+            'bar_count': bar_count,
+            'pivot_type': last_pivot['type'],
+            'pivot_price': last_pivot['price']
+        })
+
+        self._developing_cache = (self._version, range_data)
+        return range_data
+
+    def _trim(self) -> None:
+        """K 線數量超過 max_bars 兩倍時捨棄最舊的 K 線"""
+        n = len(self._highs)
+        if self.max_bars is None or n <= self.max_bars * 2:
+            return
+
+        drop = n - self.max_bars
+
+        # 保留發展中區間與待判定候選位置所需的 K 線
+        if self._points:
+            drop = min(drop, self._points[-1]['idx'] - self._offset)
+        drop = min(drop, self._next_candidate - self.pivot_length - self._offset)
+        if drop <= 0:
+            return
+
+        new_offset = self._offset + drop
+        self._index = self._index[drop:]
+        self._highs = self._highs[drop:]
+        self._lows = self._lows[drop:]
+        self._volumes = self._volumes[drop:]
+        self._ticks = self._ticks[drop:]
+
+        self._high_pivots = self._high_pivots[bisect.bisect_left(self._high_pivots, new_offset):]
+        self._low_pivots = self._low_pivots[bisect.bisect_left(self._low_pivots, new_offset):]
+        keep = bisect.bisect_left(self._point_indices, new_offset)
+        self._points = self._points[keep:]
+        self._point_indices = self._point_indices[keep:]
+        self._ranges = {
+            key: value for key, value in self._ranges.items() if key[0] >= new_offset
+        }
+
+        if self._developing is not None:
+            self._developing['start'] -= drop
+            self._developing['end'] -= drop
+
+        self._offset = new_offset
@@ -0,0 +1,237 @@
+"""
+多商品 VPPA 批次計算模組
+
+此模組提供一次掃描整個商品清單（markets/symbols.txt）的 VPPA 計算：
+- 主程序依序從 SQLite 快取讀出 K 線陣列，寫成 .npy 檔後立即提交計算
+- 工作程序以 np.load(mmap_mode='r') 唯讀映射同一份檔案，不需 pickle 整個 DataFrame
+- 以 ProcessPoolExecutor 平行計算，結果依完成順序逐一回傳
+
+注意：Windows（MT5 所在平台）以 spawn 建立工作程序，
+呼叫端必須放在 if __name__ == '__main__': 之下。
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from .indicators import calculate_vppa
+
+
+# 工作程序讀取的欄位
+UNIVERSE_COLUMNS = ['time', 'high', 'low', 'tick_volume', 'real_volume']
+
+# calculate_vppa 可接受的參數
+VPPA_PARAMS = ('pivot_length', 'price_levels', 'value_area_pct', 'include_developing')
+
+
+def load_universe_symbols(symbols_file: str = 'markets/symbols.txt') -> List[str]:
+    """
+    讀取商品清單
+
+    檔案格式為每行「SYMBOL -> FolderName」，# 開頭為註解。
+
+    參數：
+        symbols_file: 商品清單檔案路徑
+
+    回傳：
+        商品代碼列表（依檔案順序）
+
+    例外：
+        FileNotFoundError: 檔案不存在時
+    """
+    symbols = []
+
+    with open(symbols_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#') and '->' in line:
+                symbols.append(line.split('->')[0].strip())
+
+    logger.info(f"已載入 {len(symbols)} 個商品：{symbols_file}")
+
+    return symbols
+
+
+def _compute_vppa_task(path: str, symbol: str, timeframe: str, params: Dict) -> Dict:
+    """
+    工作程序：以記憶體映射讀取 K 線並計算 VPPA
+
+    參數：
+        path: K 線 .npy 檔案路徑（結構化陣列，欄位見 UNIVERSE_COLUMNS）
+        symbol: 商品代碼
+        timeframe: 時間週期
+        params: calculate_vppa 參數
+
+    回傳：
+        計算結果字典（格式見 compute_vppa_universe）
+    """
+    started = time.perf_counter()
+    rates = np.load(path, mmap_mode='r')
+
+    df = pd.DataFrame(
+        {col: rates[col] for col in UNIVERSE_COLUMNS[1:]},
+        index=pd.to_datetime(rates['time'], unit='s', utc=True)
+    )
+
+    vppa = calculate_vppa(df, **params)
+
+    latest = vppa['developing_range'] or (
+        vppa['pivot_ranges'][-1] if vppa['pivot_ranges'] else None
+    )
+    levels = None
+    if latest is not None:
+        levels = {
+            'poc': latest['poc']['price'],
+            'vah': latest['vah'],
+            'val': latest['val'],
+            'is_developing': latest.get('is_developing', False)
+        }
+
+    return {
+        'symbol': symbol,
+        'timeframe': timeframe,
+        'success': True,
+        'bars': len(df),
+        'start_time': df.index[0],
+        'end_time': df.index[-1],
+        'levels': levels,
+        'vppa': vppa,
+        'elapsed_seconds': time.perf_counter() - started
+    }
+
+
+def _failure(symbol: str, timeframe: str, error: str) -> Dict:
+    """建立失敗結果"""
+    return {
+        'symbol': symbol,
+        'timeframe': timeframe,
+        'success': False,
+        'error': error
+    }
+
+
+def compute_vppa_universe(
+    symbols: Iterable[str],
+    timeframe: str,
+    params: Optional[Dict] = None,
+    *,
+    cache,
+    count: int = 2160,
+    max_workers: Optional[int] = None,
+    work_dir: Optional[str] = None
+) -> Iterator[Dict]:
+    """
+    平行計算多個商品的 VPPA，依完成順序逐一回傳結果
+
+    參數：
+        symbols: 商品代碼列表（可用 load_universe_symbols() 讀取）
+        timeframe: 時間週期
+        params: calculate_vppa 參數
+            （pivot_length, price_levels, value_area_pct, include_developing）
+        cache: SQLiteCacheManager 實例（K 線來源）
+        count: 每個商品使用最新的 K 線數量（預設 2160）
+        max_workers: 工作程序數量（預設為 CPU 核心數；0 表示在目前程序中依序計算）
+        work_dir: 存放 .npy 檔案的目錄（預設為暫存目錄，結束後刪除）
+
+    回傳：
+        產生器，每個商品一個字典：
+        成功時
+        {
+            'symbol': str, 'timeframe': str, 'success': True,
+            'bars': int,                     # 使用的 K 線數量
+            'start_time': Timestamp, 'end_time': Timestamp,
+            'levels': {'poc', 'vah', 'val', 'is_developing'} 或 None,  # 最新區間的價位
+            'vppa': dict,                    # calculate_vppa 的完整結果
+            'elapsed_seconds': float         # 工作程序的計算耗時
+        }
+        失敗時
+        {'symbol': str, 'timeframe': str, 'success': False, 'error': str}
+
+    例外：
+        ValueError: params 包含未知參數時
+    """
+    params = dict(params or {})
+    unknown = [key for key in params if key not in VPPA_PARAMS]
+    if unknown:
+        raise ValueError(f"未知的 VPPA 參數：{unknown}")
+
+    symbols = [symbol.upper() for symbol in symbols]
+    timeframe = timeframe.upper()
+
+    owns_dir = work_dir is None
+    work_path = Path(tempfile.mkdtemp(prefix='vppa_universe_') if owns_dir else work_dir)
+    work_path.mkdir(parents=True, exist_ok=True)
+
+    workers = os.cpu_count() if max_workers is None else max_workers
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+
+    logger.info(
+        f"開始計算 {len(symbols)} 個商品的 VPPA（{timeframe}，{count} 根 K 線，"
+        f"{f'{workers} 個工作程序' if executor else '目前程序'}）"
+    )
+
+    try:
+        futures = {}
+
+        for symbol in symbols:
+            # 讀取與計算重疊：每個商品寫檔後立即提交
+            try:
+                rates = cache.query_candles_arrays(
+                    symbol, timeframe, order='desc', limit=count,
+                    columns=UNIVERSE_COLUMNS, structured=True
+                )[::-1]
+            except Exception as e:
+                logger.error(f"讀取 {symbol} {timeframe} K 線失敗：{e}")
+                yield _failure(symbol, timeframe, f"讀取 K 線失敗：{e}")
+                continue
+
+            if len(rates) == 0:
+                yield _failure(symbol, timeframe, "快取中沒有 K 線數據")
+                continue
+
+            path = str(work_path / f"{symbol}_{timeframe}.npy")
+            np.save(path, rates)
+
+            if executor is None:
+                try:
+                    yield _compute_vppa_task(path, symbol, timeframe, params)
+                except Exception as e:
+                    logger.error(f"計算 {symbol} VPPA 失敗：{e}")
+                    yield _failure(symbol, timeframe, str(e))
+                continue
+
+            futures[executor.submit(_compute_vppa_task, path, symbol, timeframe, params)] = symbol
+
+            # 已完成的結果先回傳，不必等所有商品讀取完畢
+            for future in [f for f in futures if f.done()]:
+                yield _collect(future, futures.pop(future), timeframe)
+
+        for future in as_completed(list(futures)):
+            yield _collect(future, futures.pop(future), timeframe)
+
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if owns_dir:
+            shutil.rmtree(work_path, ignore_errors=True)
+
+    logger.info(f"{len(symbols)} 個商品的 VPPA 計算完成")
+
+
+def _collect(future, symbol: str, timeframe: str) -> Dict:
+    """取得工作程序的結果，例外轉為失敗結果"""
+    try:
+        result = future.result()
+        logger.debug(f"{symbol} VPPA 完成：{result['elapsed_seconds'] * 1000:.1f} ms")
+        return result
+    except Exception as e:
+        logger.error(f"計算 {symbol} VPPA 失敗：{e}")
+        return _failure(symbol, timeframe, str(e))
@@ -22,6 +22,10 @@ class BotConfig:
         anthropic_api_key: Anthropic API Key
         claude_model: Claude 模型名稱
         debug: 是否啟用除錯模式
+        agent_max_workers: 同時執行的 Agent 回合上限
+        agent_max_pending_per_chat: 每個群組排隊中的訊息上限
+        streaming: 是否以串流模式即時更新處理中訊息
+        stream_edit_interval: 串流模式下兩次編輯訊息的最短間隔（秒）
     """
 
     # Telegram 設定
@@ -35,6 +39,14 @@ class BotConfig:
     # 其他設定
     debug: bool
 
+    # Agent 執行層設定
+    agent_max_workers: int = 4
+    agent_max_pending_per_chat: int = 5
+
+    # 串流回應設定
+    streaming: bool = True
+    stream_edit_interval: float = 1.0
+
     @classmethod
     def from_env(cls) -> 'BotConfig':
         """
@@ -85,12 +97,28 @@ class BotConfig:
         claude_model = os.getenv('CLAUDE_MODEL', 'claude-sonnet-4-20250514')
         debug = os.getenv('DEBUG', 'false').lower() in ('true', '1', 'yes')
 
+        try:
+            agent_max_workers = int(os.getenv('AGENT_MAX_WORKERS', '4'))
+            agent_max_pending_per_chat = int(os.getenv('AGENT_MAX_PENDING_PER_CHAT', '5'))
+        except ValueError as e:
+            raise ValueError(f'解析 Agent 執行層設定失敗：{e}')
+
+        streaming = os.getenv('TELEGRAM_STREAMING', 'true').lower() in ('true', '1', 'yes')
+        try:
+            stream_edit_interval = float(os.getenv('TELEGRAM_STREAM_EDIT_INTERVAL', '1.0'))
+        except ValueError as e:
+            raise ValueError(f'解析 TELEGRAM_STREAM_EDIT_INTERVAL 失敗：{e}')
+
         return cls(
             telegram_bot_token=telegram_bot_token,
             telegram_group_ids=telegram_group_ids,
             anthropic_api_key=anthropic_api_key,
             claude_model=claude_model,
-            debug=debug
+            debug=debug,
+            agent_max_workers=agent_max_workers,
+            agent_max_pending_per_chat=agent_max_pending_per_chat,
+            streaming=streaming,
+            stream_edit_interval=stream_edit_interval
         )
 
     def is_allowed_group(self, chat_id: int) -> bool:
@@ -8,15 +8,14 @@ from telegram import Update, Chat, ChatMember
 from telegram.ext import ContextTypes
 from telegram.error import TimedOut, NetworkError
 from loguru import logger
-import sys
+import asyncio
 import os
-from pathlib import Path
 
-# 確保可以匯入 agent 模組
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from agent.agent import MT5Agent
+from src.agent.agent import MT5Agent
+from src.agent.agent_executor import AgentQueueFullError
+from src.agent.tools import get_indicator_cache_stats
 from .config import BotConfig
+from .stream_reply import StreamingReply
 
 
 # ============================================================================
@@ -172,6 +171,46 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             model=config.claude_model
         )
 
+        cache_stats = get_indicator_cache_stats()
+
+        executor = context.bot_data.get('agent_executor')
+        if executor:
+            queue_stats = executor.stats()
+            queue_line = (
+                f"⚙️ Agent 佇列：執行中 {queue_stats['running']}/{queue_stats['max_workers']}，"
+                f"等待 {queue_stats['waiting']}（最大 {queue_stats['max_queue_depth']}），"
+                f"平均等待 {queue_stats['avg_wait_ms']:.0f} ms，"
+                f"平均執行 {queue_stats['avg_run_ms'] / 1000:.1f} 秒"
+            )
+        else:
+            queue_line = "⚙️ Agent 佇列：未啟用"
+
+        agent_manager = context.bot_data.get('agent_manager')
+        usage_lines = []
+        if agent_manager:
+            for name, usage in agent_manager.get_usage_stats().items():
+                if usage['messages']:
+                    input_tokens = (
+                        usage['input_tokens']
+                        + usage['cache_creation_input_tokens']
+                        + usage['cache_read_input_tokens']
+                    )
+                    usage_lines.append(
+                        f"🧮 {name.capitalize()}：{usage['messages']} 則訊息 / "
+                        f"{usage['requests']} 次請求，輸入 {input_tokens:,} tokens"
+                        f"（快取命中 {usage['cache_hit_rate']:.0%}），"
+                        f"輸出 {usage['output_tokens']:,} tokens，"
+                        f"平均 {usage['total_seconds'] / usage['messages']:.1f} 秒"
+                    )
+        usage_text = "\n".join(usage_lines) if usage_lines else "🧮 Claude 用量：尚無紀錄"
+
+        cache_line = (
+            f"📊 指標快取：{cache_stats['size']}/{cache_stats['max_entries']} 筆，"
+            f"命中率 {cache_stats['hit_rate']:.0%}"
+            f"（命中 {cache_stats['hits'] + cache_stats['disk_hits']}，"
+            f"未命中 {cache_stats['misses']}）"
+        )
+
         status_message = f"""
 系統狀態檢查
 
@@ -179,6 +218,9 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 ✅ Claude Agent：已連線（模型：{config.claude_model}）
 ✅ MT5 連線：待檢查（需實際查詢時連線）
 ✅ 群組 ID：{chat.id}
+{cache_line}
+{queue_line}
+{usage_text}
 
 狀態：正常
 """
@@ -308,10 +350,27 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"訊息: {user_message}"
     )
 
-    # 顯示處理中訊息
-    processing_message = await message.reply_text(
-        f"{agent_name.capitalize()} 正在處理中..."
-    )
+    # 顯示處理中訊息（同一群組前面還有訊息時顯示排隊數量）
+    executor = context.bot_data.get('agent_executor')
+    ahead = executor.pending(chat.id) if executor else 0
+
+    if ahead:
+        processing_text = (
+            f"{agent_name.capitalize()} 已收到，前面還有 {ahead} 則訊息，排隊處理中..."
+        )
+    else:
+        processing_text = f"{agent_name.capitalize()} 正在處理中..."
+
+    processing_message = await message.reply_text(processing_text)
+
+    # 串流模式：Agent 產生文字與執行工具時，以節流的編輯即時更新處理中訊息
+    stream_reply = None
+    if config.streaming:
+        stream_reply = StreamingReply(
+            processing_message,
+            header=f"{agent_name.capitalize()} 正在處理中...",
+            interval=config.stream_edit_interval
+        )
 
     try:
         # 取得 agent 實例
@@ -323,43 +382,28 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         # ====================================================================
-        # 7. 整合記憶參考
+        # 7-9. 整合記憶、處理訊息並記錄互動（在執行緒池中執行，不阻塞事件迴圈）
         # ====================================================================
-        daily_memory = agent_manager.read_daily_memory(agent_name)
+        on_event = stream_reply.on_event if stream_reply else None
 
-        # 建立增強的訊息（若有記憶則附加）
-        if daily_memory:
-            enhanced_message = f"{user_message}\n\n[本日記憶參考]\n{daily_memory}"
-            logger.debug(f"已整合 {agent_name} 的記憶：{len(daily_memory)} 字元")
-        else:
-            enhanced_message = user_message
-            logger.debug(f"{agent_name} 沒有本日記憶")
-
-        # 取得 system prompt（從 agent 的 default_system_prompt 屬性）
-        system_prompt = getattr(agent, 'default_system_prompt', None)
-
-        # ====================================================================
-        # 8. 處理訊息
-        # ====================================================================
-        response = agent.process_message(
-            enhanced_message,
-            system_prompt=system_prompt
-        )
-
-        # ====================================================================
-        # 9. 記錄互動到日誌
-        # ====================================================================
-        from datetime import datetime
-        import pytz
-        taiwan_tz = pytz.timezone('Asia/Taipei')
-        timestamp = datetime.now(taiwan_tz).strftime('%Y-%m-%d %H:%M:%S')
-
-        interaction_log = f"""
-[{timestamp}] 用戶 {user.username} ({user.id}): {user_message}
-回應: {response}
+        try:
+            if stream_reply:
+                stream_reply.start()
 
-"""
-        agent_manager.append_to_daily_log(agent_name, interaction_log)
+            if executor:
+                response = await executor.submit(
+                    chat.id, _run_agent_turn, agent_manager, agent_name, agent, user_message, user,
+                    on_event=on_event
+                )
+            else:
+                response = await asyncio.to_thread(
+                    _run_agent_turn, agent_manager, agent_name, agent, user_message, user,
+                    on_event=on_event
+                )
+        finally:
+            # 停止編輯後才刪除處理中訊息並送出最終回應
+            if stream_reply:
+                await stream_reply.finish()
 
         # ====================================================================
         # 10. 回傳結果
@@ -461,6 +505,16 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         logger.info(f"成功回應群組 {chat.id} 管理員 {user.id}（Agent: {agent_name}）")
 
+    except AgentQueueFullError:
+        try:
+            await processing_message.delete()
+        except Exception:
+            pass
+
+        await message.reply_text(
+            f"{agent_name.capitalize()} 手上還有太多訊息在排隊，請稍後再試。"
+        )
+
     except Exception as e:
         logger.exception(f"處理訊息時發生錯誤：{str(e)}")
 
@@ -543,3 +597,57 @@ async def _check_group_admin(
     except Exception as e:
         logger.error(f"檢查群組管理員身份時發生錯誤：{e}")
         return False
+
+
+def _run_agent_turn(agent_manager, agent_name: str, agent, user_message: str, user, on_event=None):
+    """
+    執行一次 Agent 回合（同步，在執行緒池中呼叫）
+
+    讀取壓縮後的當日記憶、呼叫 agent.process_message，並把互動記錄追加到當日日誌。
+
+    參數：
+        agent_manager: AgentManager 實例
+        agent_name: agent 名稱（小寫）
+        agent: MT5Agent 實例
+        user_message: 用戶訊息
+        user: Telegram 用戶
+        on_event: 串流事件回呼（可選，提供時 agent 以串流模式處理）
+
+    回傳：
+        agent.process_message 的回應
+    """
+    # 整合記憶參考（壓縮為有長度上限的視窗，系統提示保持不變以利 prompt caching）
+    daily_memory = agent_manager.build_memory_context(agent_name)
+
+    # 建立增強的訊息（若有記憶則附加）
+    if daily_memory:
+        enhanced_message = f"{user_message}\n\n[本日記憶參考]\n{daily_memory}"
+        logger.debug(f"已整合 {agent_name} 的記憶：{len(daily_memory)} 字元")
+    else:
+        enhanced_message = user_message
+        logger.debug(f"{agent_name} 沒有本日記憶")
+
+    # 取得 system prompt（從 agent 的 default_system_prompt 屬性）
+    system_prompt = getattr(agent, 'default_system_prompt', None)
+
+    # 處理訊息
+    response = agent.process_message(
+        enhanced_message,
+        system_prompt=system_prompt,
+        on_event=on_event
+    )
+
+    # 記錄互動到日誌
+    from datetime import datetime
+    import pytz
+    taiwan_tz = pytz.timezone('Asia/Taipei')
+    timestamp = datetime.now(taiwan_tz).strftime('%Y-%m-%d %H:%M:%S')
+
+    interaction_log = f"""
+[{timestamp}] 用戶 {user.username} ({user.id}): {user_message}
+回應: {response}
+
+"""
+    agent_manager.append_to_daily_log(agent_name, interaction_log)
+
+    return response
@@ -0,0 +1,172 @@
+"""
+串流回應模組
+
+Agent 以串流模式處理訊息時，把文字片段與工具進度即時反映到「處理中」訊息上。
+Telegram 對編輯訊息有頻率限制，因此事件先累積在記憶體中，
+再以固定間隔（預設每秒一次）呼叫 edit_message_text 更新畫面。
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter, TimedOut, NetworkError
+from loguru import logger
+
+
+# Telegram 單則訊息長度上限
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# 工具名稱的顯示文字
+TOOL_LABELS = {
+    'get_candles': '取得 K 線',
+    'calculate_volume_profile': '計算 Volume Profile',
+    'calculate_sma': '計算 SMA',
+    'calculate_rsi': '計算 RSI',
+    'get_account_info': '查詢帳戶',
+    'generate_vppa_chart': '繪製 VPPA 圖表',
+}
+
+
+class StreamingReply:
+    """
+    以節流的訊息編輯呈現 Agent 的串流輸出
+
+    on_event() 可在任何執行緒呼叫（Agent 在執行緒池中執行），事件會轉交事件迴圈處理；
+    背景任務每 interval 秒檢查一次，內容有變化時才編輯訊息。
+
+    使用方式：
+        reply = StreamingReply(processing_message, header="Arthur 正在處理中...")
+        reply.start()
+        response = await executor.submit(
+            chat.id, agent.process_message, text, on_event=reply.on_event
+        )
+        await reply.finish()
+    """
+
+    def __init__(self, message: Message, header: str = '', interval: float = 1.0):
+        """
+        初始化串流回應
+
+        參數：
+            message: 要持續編輯的訊息（通常是「處理中」訊息）
+            header: 顯示在最上方的標題
+            interval: 兩次編輯之間的最短間隔（秒）
+        """
+        self.message = message
+        self.header = header
+        self.interval = interval
+
+        self._text_parts: List[str] = []
+        self._status = ''
+        self._version = 0
+        self._rendered_version = 0
+        self._edits = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def edits(self) -> int:
+        """已送出的編輯次數"""
+        return self._edits
+
+    def start(self) -> None:
+        """在目前的事件迴圈啟動背景編輯任務"""
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+
+    def on_event(self, event: Dict[str, Any]) -> None:
+        """
+        接收 Agent 的串流事件（執行緒安全）
+
+        參數：
+            event: MT5Agent.process_message 送出的事件字典
+        """
+        if self._loop is None or self._loop.is_closed():
+            return
+
+        self._loop.call_soon_threadsafe(self._apply, event)
+
+    async def finish(self) -> None:
+        """停止背景編輯任務（不再編輯訊息，最終回應由呼叫端送出）"""
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+        self._task = None
+        logger.debug(f"串流回應結束，共編輯 {self._edits} 次")
+
+    def render(self) -> str:
+        """
+        組合目前要顯示的文字
+
+        回傳：
+            標題、工具進度與目前已收到的回應文字（超過長度上限時保留結尾）
+        """
+        text = ''.join(self._text_parts).strip()
+        lines = [line for line in (self.header, self._status) if line]
+        prefix = '\n'.join(lines)
+
+        if not text:
+            return prefix
+
+        room = TELEGRAM_MESSAGE_LIMIT - len(prefix) - 2
+        if len(text) > room:
+            text = '…' + text[-(room - 1):]
+
+        return f"{prefix}\n\n{text}" if prefix else text
+
+    def _apply(self, event: Dict[str, Any]) -> None:
+        """在事件迴圈中套用事件"""
+        event_type = event.get('type')
+
+        if event_type == 'text':
+            self._text_parts.append(event.get('text', ''))
+        elif event_type == 'tool_start':
+            labels = '、'.join(TOOL_LABELS.get(name, name) for name in event.get('tools', []))
+            self._status = f"🔧 {labels}..."
+            # 新一輪工具調用前的文字通常是「讓我先取得資料」之類的過場，換行分隔
+            if self._text_parts:
+                self._text_parts.append('\n\n')
+        elif event_type == 'tool_end':
+            self._status = f"✅ 工具完成（{event.get('seconds', 0):.1f} 秒），整理分析中..."
+        else:
+            return
+
+        self._version += 1
+
+    async def _run(self) -> None:
+        """背景任務：節流編輯訊息"""
+        while True:
+            await asyncio.sleep(self.interval)
+
+            if self._version == self._rendered_version:
+                continue
+
+            version = self._version
+            text = self.render()
+
+            try:
+                await self.message.edit_text(text)
+                self._edits += 1
+            except RetryAfter as e:
+                delay = e.retry_after
+                delay = delay.total_seconds() if hasattr(delay, 'total_seconds') else float(delay)
+                logger.warning(f"編輯訊息過於頻繁，等待 {delay:.0f} 秒")
+                await asyncio.sleep(delay)
+                continue
+            except BadRequest as e:
+                # 內容相同時 Telegram 回傳 "Message is not modified"，視為已更新
+                if 'not modified' not in str(e).lower():
+                    logger.warning(f"編輯串流訊息失敗：{e}")
+            except (TimedOut, NetworkError) as e:
+                logger.warning(f"編輯串流訊息逾時：{e}")
+                continue
+
+            self._rendered_version = version
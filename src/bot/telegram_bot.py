@@ -18,6 +18,7 @@ from datetime import datetime
 import pytz
 
 from .config import BotConfig
+from src.agent.agent_executor import AgentExecutor
 from .handlers import (
     start_command,
     help_command,
@@ -60,10 +61,12 @@ class TelegramBot:
         )
 
         # 建立 Application
+        # concurrent_updates：不同群組的訊息並行處理，同一群組的順序由 AgentExecutor 保證
         self.application = (
             Application.builder()
             .token(config.telegram_bot_token)
             .request(request)
+            .concurrent_updates(True)
             .build()
         )
 
@@ -80,6 +83,13 @@ class TelegramBot:
         )
         self.application.bot_data['agent_manager'] = self.agent_manager
 
+        # Agent 執行層：在執行緒池中執行 Agent 回合，避免阻塞事件迴圈
+        self.agent_executor = AgentExecutor(
+            max_workers=config.agent_max_workers,
+            max_pending_per_chat=config.agent_max_pending_per_chat
+        )
+        self.application.bot_data['agent_executor'] = self.agent_executor
+
         # 新增：初始化 AgentScheduler
         self.agent_scheduler = AgentScheduler(agent_manager=self.agent_manager)
         self.application.bot_data['agent_scheduler'] = self.agent_scheduler
@@ -209,6 +219,9 @@ class TelegramBot:
         self.agent_scheduler.stop()
         logger.info("Agent 定時任務已停止")
 
+        # 停止 Agent 執行層（不等待執行中的回合）
+        self.agent_executor.shutdown(wait=False)
+
     def run(self):
         """
         啟動 Bot
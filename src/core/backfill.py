@@ -0,0 +1,519 @@
+"""
+多商品歷史數據回填模組
+
+此模組提供商品 × 時間週期矩陣的批次回填：
+- 單一抓取執行緒依序呼叫 MT5（MT5 Python API 非執行緒安全）
+- 單一寫入執行緒以 bulk_insert_candles 寫入 SQLite
+- 兩者以有界佇列串接，抓取下一批的同時寫入上一批
+- 每批寫入後更新資料庫中的進度檢查點，中斷後可續抓
+
+另提供 backfill_ticks()：以一小時為單位向 MT5 抓取 Tick 並寫入 ticks 表。
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+import MetaTrader5 as mt5
+import numpy as np
+from loguru import logger
+
+from .data_fetcher import HistoricalDataFetcher
+from .sqlite_cache import SQLiteCacheManager
+
+
+# 抓取函數簽名：(symbol, timeframe, end_time, count) -> MT5 rates 結構化陣列
+RatesFetcher = Callable[[str, str, datetime, int], Optional[np.ndarray]]
+
+# 佇列標記：抓取重試耗盡，寫入執行緒收到後將工作標記為失敗
+_FETCH_FAILED = object()
+
+# Tick 抓取函數簽名：(symbol, start_time, end_time) -> MT5 ticks 結構化陣列
+TicksFetcher = Callable[[str, datetime, datetime], Optional[np.ndarray]]
+
+
+def copy_rates_from(
+    symbol: str,
+    timeframe: str,
+    end_time: datetime,
+    count: int
+) -> np.ndarray:
+    """
+    從 MT5 抓取 end_time 往前 count 根 K 線
+
+    參數：
+        symbol: 商品代碼
+        timeframe: 時間週期
+        end_time: 抓取起點（往前抓）
+        count: K 線數量
+
+    回傳：
+        MT5 rates 結構化陣列（無更多數據時為空陣列）
+
+    例外：
+        RuntimeError: MT5 回傳錯誤時
+    """
+    rates = mt5.copy_rates_from(
+        symbol,
+        HistoricalDataFetcher.TIMEFRAME_MAP[timeframe],
+        end_time,
+        count
+    )
+
+    if rates is None or len(rates) == 0:
+        error = mt5.last_error()
+        if error[0] != 1:  # 1 = 無更多數據
+            raise RuntimeError(f"MT5 錯誤：{error}")
+        return np.empty(0, dtype=SQLiteCacheManager.RATES_DTYPE)
+
+    return rates
+
+
+def copy_ticks_range(
+    symbol: str,
+    start_time: datetime,
+    end_time: datetime
+) -> np.ndarray:
+    """
+    從 MT5 抓取時間範圍內的全部 Tick
+
+    參數：
+        symbol: 商品代碼
+        start_time: 起始時間（UTC）
+        end_time: 結束時間（UTC）
+
+    回傳：
+        MT5 ticks 結構化陣列（time_msc, bid, ask, last, volume, volume_real, flags 等欄位；
+        無 Tick 時為空陣列）
+
+    例外：
+        RuntimeError: MT5 回傳錯誤時
+    """
+    ticks = mt5.copy_ticks_range(symbol, start_time, end_time, mt5.COPY_TICKS_ALL)
+
+    if ticks is None:
+        error = mt5.last_error()
+        if error[0] != 1:  # 1 = 無更多數據
+            raise RuntimeError(f"MT5 錯誤：{error}")
+        return np.empty(0, dtype=SQLiteCacheManager.TICKS_DTYPE)
+
+    return ticks
+
+
+def backfill_ticks(
+    cache: SQLiteCacheManager,
+    symbol: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    fetch_ticks: Optional[TicksFetcher] = None,
+    window: timedelta = timedelta(hours=1)
+) -> Dict[str, int]:
+    """
+    以固定時間窗口向 MT5 抓取 Tick 並寫入 ticks 表
+
+    每次只抓取 window 長度的 Tick（預設一小時，與 ticks 表的區塊大小相同），
+    寫入後即釋放，一天數千萬筆 Tick 也不必同時放在記憶體中。
+
+    參數：
+        cache: SQLite 快取管理器
+        symbol: 商品代碼
+        start_time: 起始時間（預設為已儲存的最新 Tick 之後；沒有 Tick 時為一天前）
+        end_time: 結束時間（預設為現在）
+        fetch_ticks: 抓取函數（預設 copy_ticks_range，需已連線 MT5）
+        window: 每次抓取的時間長度
+
+    回傳：
+        統計字典 {'ticks': 寫入筆數, 'chunks': 寫入區塊數, 'requests': 抓取次數}
+
+    例外：
+        ValueError: window 不為正數時
+    """
+    if window <= timedelta(0):
+        raise ValueError(f"window 必須為正數：{window}")
+
+    fetch_ticks = fetch_ticks or copy_ticks_range
+    end_time = end_time or datetime.now(timezone.utc)
+
+    if start_time is None:
+        stored = cache.get_tick_range(symbol)
+        if stored is not None:
+            # 從最後一筆 Tick 的同一毫秒重抓，寫入時會取代該毫秒已有的 Tick
+            start_time = datetime.fromtimestamp(stored['last_msc'] / 1000, tz=timezone.utc)
+        else:
+            start_time = end_time - timedelta(days=1)
+
+    stats = {'ticks': 0, 'chunks': 0, 'requests': 0}
+    current = start_time
+
+    logger.info(f"開始回填 {symbol} Tick：{start_time} ~ {end_time}")
+
+    while current < end_time:
+        window_end = min(current + window, end_time)
+        ticks = fetch_ticks(symbol, current, window_end)
+        stats['requests'] += 1
+
+        if ticks is not None and len(ticks) > 0:
+            written = cache.insert_ticks(ticks, symbol)
+            stats['ticks'] += written['ticks']
+            stats['chunks'] += written['chunks']
+
+        current = window_end
+
+    logger.info(
+        f"{symbol} Tick 回填完成：{stats['ticks']} 筆，"
+        f"{stats['chunks']} 個區塊，{stats['requests']} 次請求"
+    )
+
+    return stats
+
+
+@dataclass
+class BackfillJob:
+    """
+    單一商品、週期的回填工作與統計
+
+    屬性：
+        symbol: 商品代碼
+        timeframe: 時間週期
+        status: 狀態（pending, running, completed, skipped, failed）
+        inserted: 新增筆數
+        updated: 更新筆數
+        batches: 已寫入的批次數
+        fetch_seconds: 抓取耗時（秒）
+        write_seconds: 寫入耗時（秒）
+        oldest_time: 本次回填取得的最早 K 線時間
+        started_at: 開始時間
+        finished_at: 完成時間
+        error: 錯誤訊息
+    """
+
+    symbol: str
+    timeframe: str
+    status: str = 'pending'
+    inserted: int = 0
+    updated: int = 0
+    batches: int = 0
+    fetch_seconds: float = 0.0
+    write_seconds: float = 0.0
+    oldest_time: Optional[datetime] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    # 最後寫入檢查點的抓取起點
+    next_end_time: Optional[datetime] = None
+
+    # 檢查點中先前執行累計的寫入筆數、批次數
+    resumed_rows: int = 0
+    resumed_batches: int = 0
+
+    @property
+    def rows(self) -> int:
+        """本次寫入的總筆數（新增 + 更新）"""
+        return self.inserted + self.updated
+
+    @property
+    def elapsed_seconds(self) -> float:
+        """從開始抓取到最後一批寫入完成的耗時（秒）"""
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def rows_per_sec(self) -> float:
+        """本次回填速度（筆/秒）"""
+        elapsed = self.elapsed_seconds
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        """轉換為統計字典"""
+        return {
+            'symbol': self.symbol,
+            'timeframe': self.timeframe,
+            'status': self.status,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'batches': self.batches,
+            'oldest_time': self.oldest_time,
+            'fetch_seconds': self.fetch_seconds,
+            'write_seconds': self.write_seconds,
+            'elapsed_seconds': self.elapsed_seconds,
+            'rows_per_sec': self.rows_per_sec,
+            'error': self.error
+        }
+
+
+class BackfillOrchestrator:
+    """
+    多商品歷史數據回填協調器
+
+    抓取在呼叫端執行緒進行，寫入在專屬寫入執行緒進行，
+    兩者以大小為 queue_size 的有界佇列串接（寫入落後時抓取會等待）。
+    """
+
+    # 連續空結果次數上限（視為已到達歷史數據起點）
+    MAX_CONSECUTIVE_EMPTY = 3
+
+    # 無數據時往前跳過的時間
+    EMPTY_SKIP = timedelta(days=30)
+
+    def __init__(
+        self,
+        cache: SQLiteCacheManager,
+        fetch_rates: Optional[RatesFetcher] = None,
+        batch_size: int = 10000,
+        write_batch_size: int = SQLiteCacheManager.BULK_BATCH_SIZE,
+        queue_size: int = 4,
+        max_retries: int = 3
+    ):
+        """
+        初始化回填協調器
+
+        參數：
+            cache: SQLite 快取管理器
+            fetch_rates: 抓取函數（預設 copy_rates_from，需已連線 MT5）
+            batch_size: 每次向 MT5 請求的 K 線數量
+            write_batch_size: 寫入資料庫時每個交易的筆數
+            queue_size: 抓取與寫入之間的佇列上限（批次數）
+            max_retries: 抓取失敗時的最大重試次數
+        """
+        if queue_size < 1:
+            raise ValueError(f"queue_size 必須為正整數：{queue_size}")
+
+        self.cache = cache
+        self.fetch_rates = fetch_rates or copy_rates_from
+        self.batch_size = batch_size
+        self.write_batch_size = write_batch_size
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+
+    def run(
+        self,
+        symbols: Iterable[str],
+        timeframes: Iterable[str],
+        restart: bool = False
+    ) -> List[BackfillJob]:
+        """
+        回填商品 × 時間週期矩陣
+
+        參數：
+            symbols: 商品代碼列表
+            timeframes: 時間週期列表
+            restart: 是否忽略檢查點，從現在重新往回抓
+
+        回傳：
+            每個商品、週期的 BackfillJob（依執行順序）
+        """
+        timeframes = [tf.upper() for tf in timeframes]
+        for timeframe in timeframes:
+            if timeframe not in HistoricalDataFetcher.TIMEFRAME_MAP:
+                raise ValueError(
+                    f"無效的時間週期：{timeframe}，"
+                    f"支援的週期：{', '.join(HistoricalDataFetcher.TIMEFRAME_MAP.keys())}"
+                )
+
+        jobs = [
+            BackfillJob(symbol=symbol, timeframe=timeframe)
+            for symbol in symbols
+            for timeframe in timeframes
+        ]
+
+        work_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        writer = threading.Thread(
+            target=self._write_loop, args=(work_queue,), name='backfill-writer', daemon=True
+        )
+        writer.start()
+
+        logger.info(f"開始回填 {len(jobs)} 個工作（佇列上限 {self.queue_size} 批）")
+
+        try:
+            for job in jobs:
+                self._fetch_job(job, work_queue, restart)
+        finally:
+            work_queue.put(None)
+            writer.join()
+
+        for job in jobs:
+            logger.info(
+                f"{job.symbol} {job.timeframe}：{job.status}，"
+                f"{job.rows} 筆（新增 {job.inserted}），{job.batches} 批，"
+                f"{job.rows_per_sec:,.0f} 筆/秒"
+            )
+
+        return jobs
+
+    def _start_time(self, job: BackfillJob, restart: bool) -> Optional[datetime]:
+        """
+        決定工作的抓取起點（檢查點 > 資料庫最早時間 > 現在）
+
+        參數：
+            job: 回填工作
+            restart: 是否忽略檢查點，從現在重新往回抓
+
+        回傳：
+            抓取起點，若工作已完成則回傳 None
+        """
+        if restart:
+            return datetime.now(timezone.utc)
+
+        checkpoint = self.cache.get_backfill_checkpoint(job.symbol, job.timeframe)
+
+        if checkpoint is not None:
+            if checkpoint['status'] == 'completed':
+                return None
+
+            job.resumed_rows = checkpoint['rows_written']
+            job.resumed_batches = checkpoint['batches']
+            logger.info(
+                f"{job.symbol} {job.timeframe} 從檢查點續抓："
+                f"{checkpoint['next_end_time']}（已寫入 {job.resumed_rows} 筆）"
+            )
+            return checkpoint['next_end_time']
+
+        existing_oldest = self.cache.get_oldest_time(job.symbol, job.timeframe)
+        if existing_oldest is not None:
+            return existing_oldest
+
+        return datetime.now(timezone.utc)
+
+    def _fetch_job(self, job: BackfillJob, work_queue: queue.Queue, restart: bool) -> None:
+        """
+        抓取單一工作的所有批次並放入佇列
+
+        參數：
+            job: 回填工作
+            work_queue: 寫入佇列
+            restart: 是否忽略檢查點，從現在重新往回抓
+        """
+        current_end_time = self._start_time(job, restart)
+
+        if current_end_time is None:
+            job.status = 'skipped'
+            logger.info(f"{job.symbol} {job.timeframe} 已完成回填，略過")
+            return
+
+        job.status = 'running'
+        job.next_end_time = current_end_time
+        job.started_at = time.perf_counter()
+        step = timedelta(minutes=SQLiteCacheManager.TIMEFRAME_MINUTES[job.timeframe])
+        consecutive_empty = 0
+
+        while consecutive_empty < self.MAX_CONSECUTIVE_EMPTY and job.status == 'running':
+            rates = None
+            last_error = None
+
+            for attempt in range(1, self.max_retries + 1):
+                fetch_start = time.perf_counter()
+                try:
+                    rates = self.fetch_rates(
+                        job.symbol, job.timeframe, current_end_time, self.batch_size
+                    )
+                    break
+                except Exception as e:
+                    last_error = e
+                    logger.warning(
+                        f"{job.symbol} {job.timeframe} 抓取失敗"
+                        f"（重試 {attempt}/{self.max_retries}）：{e}"
+                    )
+                finally:
+                    job.fetch_seconds += time.perf_counter() - fetch_start
+
+            if rates is None:
+                # 抓取錯誤不等於歷史已到盡頭：停止此工作，檢查點停在最後寫入的位置，下次執行續抓
+                logger.error(
+                    f"{job.symbol} {job.timeframe} 達到最大重試次數，停止回填"
+                    f"（{current_end_time}）：{last_error}"
+                )
+                job.error = f"抓取失敗：{last_error}"
+                work_queue.put((job, None, _FETCH_FAILED))
+                return
+
+            if len(rates) == 0:
+                logger.info(f"{job.symbol} {job.timeframe} 已無更多歷史數據（{current_end_time}）")
+                consecutive_empty += 1
+                current_end_time = current_end_time - self.EMPTY_SKIP
+                work_queue.put((job, None, current_end_time))
+                continue
+
+            batch_oldest = datetime.fromtimestamp(int(rates['time'].min()), tz=timezone.utc)
+            job.oldest_time = batch_oldest
+
+            if len(rates) < self.batch_size:
+                consecutive_empty += 1
+            else:
+                consecutive_empty = 0
+
+            current_end_time = batch_oldest - step
+            work_queue.put((job, rates, current_end_time))
+
+        # 完成標記：寫入執行緒處理完此工作所有批次後才會收到
+        work_queue.put((job, None, None))
+
+    def _write_loop(self, work_queue: queue.Queue) -> None:
+        """
+        寫入執行緒：依序寫入佇列中的批次並更新檢查點
+
+        參數：
+            work_queue: 寫入佇列（收到 None 時結束）
+        """
+        while True:
+            item = work_queue.get()
+
+            if item is None:
+                break
+
+            job, rates, next_end_time = item
+
+            # 寫入失敗的工作，後續批次全部丟棄
+            if job.status == 'failed':
+                continue
+
+            try:
+                write_start = time.perf_counter()
+
+                if next_end_time is _FETCH_FAILED:
+                    # 之前排入的批次都已寫入，檢查點以 failed 狀態保留（不會被視為已完成）
+                    job.status = 'failed'
+                    job.finished_at = time.perf_counter()
+                    self.cache.save_backfill_checkpoint(
+                        job.symbol, job.timeframe, job.next_end_time,
+                        job.resumed_rows + job.rows, job.resumed_batches + job.batches,
+                        status='failed'
+                    )
+                    continue
+
+                if next_end_time is None:
+                    job.status = 'completed'
+                    job.finished_at = time.perf_counter()
+                    self.cache.save_backfill_checkpoint(
+                        job.symbol, job.timeframe, job.next_end_time,
+                        job.resumed_rows + job.rows, job.resumed_batches + job.batches,
+                        status='completed'
+                    )
+                    continue
+
+                if rates is not None:
+                    stats = self.cache.bulk_insert_candles(
+                        rates, job.symbol, job.timeframe, batch_size=self.write_batch_size
+                    )
+                    job.inserted += stats['inserted']
+                    job.updated += stats['updated']
+                    job.batches += 1
+
+                # 檢查點在數據寫入後才前進，中斷時最多重抓一批（UPSERT 不會重複）
+                self.cache.save_backfill_checkpoint(
+                    job.symbol, job.timeframe, next_end_time,
+                    job.resumed_rows + job.rows, job.resumed_batches + job.batches
+                )
+                job.next_end_time = next_end_time
+                job.write_seconds += time.perf_counter() - write_start
+
+            except Exception as e:
+                job.status = 'failed'
+                job.error = str(e)
+                job.finished_at = time.perf_counter()
+                logger.error(f"{job.symbol} {job.timeframe} 寫入失敗：{e}")
@@ -193,7 +193,12 @@ class HistoricalDataFetcher:
         # 從 MT5 取得數據
         rates = mt5.copy_rates_range(symbol, tf_constant, from_date, to_date)
 
-        if rates is None or len(rates) == 0:
+        # None 代表請求失敗，空陣列代表該區間確實沒有數據（例如休市）
+        if rates is None:
+            error = mt5.last_error()
+            raise RuntimeError(f"取得 K 線資料失敗：{error}")
+
+        if len(rates) == 0:
             logger.warning(f"MT5 未返回數據：{symbol} {timeframe} {from_date} ~ {to_date}")
             return pd.DataFrame()
 
@@ -229,26 +234,26 @@ class HistoricalDataFetcher:
 
         # 如果啟用 SQLite 快取
         if self.use_sqlite and self.sqlite_cache:
-            # 計算時間範圍
-            end_time = datetime.now(timezone.utc)
+            # 先補齊快取最新一筆之後到現在的數據
+            newest_time = self.sqlite_cache.get_newest_time(symbol, timeframe)
 
-            # 根據時間週期計算起始時間
-            interval_minutes = self.sqlite_cache.TIMEFRAME_MINUTES.get(
-                timeframe.upper(), 60
-            )
-            start_time = end_time - timedelta(minutes=interval_minutes * count * 1.5)
+            if newest_time is not None:
+                self.sqlite_cache.fetch_candles_smart(
+                    symbol=symbol,
+                    timeframe=timeframe,
+                    from_date=newest_time,
+                    to_date=datetime.now(timezone.utc),
+                    fetcher_callback=self._fetch_from_mt5_by_date
+                )
 
-            # 使用智能查詢
-            df = self.sqlite_cache.fetch_candles_smart(
-                symbol=symbol,
-                timeframe=timeframe,
-                from_date=start_time,
-                to_date=end_time,
-                fetcher_callback=self._fetch_from_mt5_by_date
-            )
+            # 直接取最新 count 筆，不需估算時間範圍
+            df = self.sqlite_cache.query_latest(symbol, timeframe, count)
 
-            # 限制返回數量
-            return df.head(count)
+            if len(df) >= count:
+                # 依時間降冪排序（與 MT5 直接取得的結果一致）
+                return df.iloc[::-1].reset_index(drop=True)
+
+            logger.info(f"快取數據不足（{len(df)}/{count}），從 MT5 取得")
 
         # 原有邏輯：直接從 MT5 取得
         self._verify_symbol(symbol)
@@ -265,6 +270,9 @@ class HistoricalDataFetcher:
         df['time'] = pd.to_datetime(df['time'], unit='s', utc=True)
         df = df.sort_values('time', ascending=False).reset_index(drop=True)
 
+        if self.use_sqlite and self.sqlite_cache:
+            self.sqlite_cache.insert_candles(df, symbol, timeframe)
+
         logger.info(f"成功取得 {len(df)} 根 K 線")
         return df
 
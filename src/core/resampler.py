@@ -0,0 +1,144 @@
+"""
+K 線重新取樣模組
+
+此模組以向量化方式將低週期 K 線（通常為 M1）合成為高週期 K 線，
+供快取在本地衍生 M5/M15/H1/H4/D1 等週期，而不必再向 MT5 個別取得。
+
+時間對齊方式與 MT5 相同（K 線時間為伺服器時間的 epoch 秒）：
+- 日內週期（M2 ~ H12）對齊伺服器時間 00:00 起算的整數倍
+- D1 從伺服器時間 00:00 開始，W1 從週日 00:00 開始，MN1 從每月 1 日開始
+- session_offset 可將 D1/W1/MN1 的日界線平移（例如券商以紐約 17:00 收盤為日界線時）
+"""
+
+from typing import Dict, Union
+
+import numpy as np
+
+from .session_calendar import DAY_SECONDS, WEEK_SECONDS
+
+
+# 時間週期對應秒數（MN1 以 31 天作為上限，實際依月份長度對齊）
+TIMEFRAME_SECONDS = {
+    'M1': 60, 'M2': 120, 'M3': 180, 'M4': 240, 'M5': 300, 'M6': 360,
+    'M10': 600, 'M12': 720, 'M15': 900, 'M20': 1200, 'M30': 1800,
+    'H1': 3600, 'H2': 7200, 'H3': 10800, 'H4': 14400, 'H6': 21600,
+    'H8': 28800, 'H12': 43200,
+    'D1': DAY_SECONDS, 'W1': WEEK_SECONDS, 'MN1': 31 * DAY_SECONDS
+}
+
+# 受 session_offset 影響的週期
+SESSION_TIMEFRAMES = ('D1', 'W1', 'MN1')
+
+# 1970-01-04（週日）00:00 的 epoch 秒，作為 W1 起點
+_SUNDAY_ANCHOR = 3 * DAY_SECONDS
+
+# 輸出 K 線的 dtype（與 MT5 rates 結構化陣列相同）
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'),
+    ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+
+
+def bucket_starts(
+    times: np.ndarray,
+    timeframe: str,
+    session_offset: int = 0
+) -> np.ndarray:
+    """
+    計算每個時間所屬的高週期 K 線開盤時間
+
+    參數：
+        times: epoch 秒陣列
+        timeframe: 目標時間週期
+        session_offset: D1/W1/MN1 日界線的平移秒數
+
+    回傳：
+        與 times 等長的 K 線開盤時間陣列（epoch 秒）
+
+    例外：
+        ValueError: 無效的時間週期時
+    """
+    if timeframe not in TIMEFRAME_SECONDS:
+        raise ValueError(f"無效的時間週期：{timeframe}")
+
+    times = np.asarray(times, dtype=np.int64)
+    offset = session_offset if timeframe in SESSION_TIMEFRAMES else 0
+    local = times - offset
+
+    if timeframe == 'MN1':
+        months = local.astype('datetime64[s]').astype('datetime64[M]')
+        return months.astype('datetime64[s]').astype(np.int64) + offset
+
+    anchor = _SUNDAY_ANCHOR if timeframe == 'W1' else 0
+    period = TIMEFRAME_SECONDS[timeframe]
+
+    return (local - anchor) // period * period + anchor + offset
+
+
+def bucket_ends(
+    starts: np.ndarray,
+    timeframe: str,
+    session_offset: int = 0
+) -> np.ndarray:
+    """
+    計算高週期 K 線的結束時間（下一根 K 線的開盤時間）
+
+    參數：
+        starts: K 線開盤時間陣列（bucket_starts 的結果）
+        timeframe: 目標時間週期
+        session_offset: D1/W1/MN1 日界線的平移秒數
+
+    回傳：
+        K 線結束時間陣列（epoch 秒，不含）
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+
+    if timeframe == 'MN1':
+        # 月初加 31 天必落在下個月內
+        return bucket_starts(starts + TIMEFRAME_SECONDS['MN1'], timeframe, session_offset)
+
+    return starts + TIMEFRAME_SECONDS[timeframe]
+
+
+def resample_rates(
+    rates: Union[np.ndarray, Dict[str, np.ndarray]],
+    timeframe: str,
+    session_offset: int = 0
+) -> np.ndarray:
+    """
+    將低週期 K 線合成為高週期 K 線
+
+    開盤價取區間第一根、收盤價取最後一根、最高/最低價取極值、
+    成交量加總、點差取最小值（與 MT5 K 線的點差定義一致）。
+
+    參數：
+        rates: 依時間遞增排序的 K 線（MT5 rates 結構化陣列或欄位字典，time 為 epoch 秒）
+        timeframe: 目標時間週期
+        session_offset: D1/W1/MN1 日界線的平移秒數
+
+    回傳：
+        高週期 K 線結構化陣列（dtype 與 MT5 rates 相同）
+    """
+    times = np.asarray(rates['time'], dtype=np.int64)
+
+    if len(times) == 0:
+        return np.empty(0, dtype=RATES_DTYPE)
+
+    starts = bucket_starts(times, timeframe, session_offset)
+
+    # 每根高週期 K 線在輸入中的第一筆與最後一筆位置
+    first = np.flatnonzero(np.diff(starts, prepend=starts[0] - 1))
+    last = np.append(first[1:] - 1, len(times) - 1)
+
+    bars = np.empty(len(first), dtype=RATES_DTYPE)
+    bars['time'] = starts[first]
+    bars['open'] = np.asarray(rates['open'])[first]
+    bars['close'] = np.asarray(rates['close'])[last]
+    bars['high'] = np.maximum.reduceat(np.asarray(rates['high']), first)
+    bars['low'] = np.minimum.reduceat(np.asarray(rates['low']), first)
+    bars['tick_volume'] = np.add.reduceat(np.asarray(rates['tick_volume'], dtype=np.uint64), first)
+    bars['spread'] = np.minimum.reduceat(np.asarray(rates['spread']), first)
+    bars['real_volume'] = np.add.reduceat(np.asarray(rates['real_volume'], dtype=np.uint64), first)
+
+    return bars
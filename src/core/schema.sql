@@ -0,0 +1,208 @@
+-- ============================================================================
+-- 儲存格式版本 2（PRAGMA user_version = 2）
+--
+-- candles 以 (symbol_id, timeframe_id, time) 為主鍵的 WITHOUT ROWID 表，
+-- time 為 UTC epoch 秒整數。舊版（TEXT 時間）資料庫請執行：
+--     python scripts/manage_cache.py migrate
+-- ============================================================================
+
+-- ============================================================================
+-- 商品字典表
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS symbols (
+    symbol_id INTEGER PRIMARY KEY,           -- 商品整數代碼
+    symbol TEXT NOT NULL UNIQUE              -- 商品代碼（例如：GOLD, SILVER）
+);
+
+-- ============================================================================
+-- 時間週期字典表（timeframe_id 即週期分鐘數，由 SQLiteCacheManager 初始化）
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS timeframes (
+    timeframe_id INTEGER PRIMARY KEY,        -- 週期分鐘數（例如：M1 = 1, H1 = 60）
+    timeframe TEXT NOT NULL UNIQUE           -- 時間週期（例如：H1, D1）
+);
+
+-- ============================================================================
+-- K 線數據表
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS candles (
+    symbol_id INTEGER NOT NULL,              -- 對應 symbols.symbol_id
+    timeframe_id INTEGER NOT NULL,           -- 對應 timeframes.timeframe_id
+    time INTEGER NOT NULL,                   -- K 線時間（UTC epoch 秒）
+
+    -- K 線 OHLC 數據
+    open REAL NOT NULL,                      -- 開盤價
+    high REAL NOT NULL,                      -- 最高價
+    low REAL NOT NULL,                       -- 最低價
+    close REAL NOT NULL,                     -- 收盤價
+
+    -- 成交量數據
+    tick_volume INTEGER NOT NULL,            -- Tick 成交量
+    spread INTEGER NOT NULL,                 -- 點差
+    real_volume INTEGER NOT NULL,            -- 真實成交量
+
+    -- 主鍵即為查詢索引：同一商品、同一週期、同一時間只能有一筆記錄
+    PRIMARY KEY (symbol_id, timeframe_id, time)
+) WITHOUT ROWID;
+
+-- ============================================================================
+-- 數據涵蓋範圍表（已從 MT5 取得過的時間區間，含休市等無數據區間）
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS candle_coverage (
+    symbol_id INTEGER NOT NULL,              -- 對應 symbols.symbol_id
+    timeframe_id INTEGER NOT NULL,           -- 對應 timeframes.timeframe_id
+    start_time INTEGER NOT NULL,             -- 區間起點（UTC epoch 秒，含）
+    end_time INTEGER NOT NULL,               -- 區間終點（UTC epoch 秒，含）
+
+    -- 同一商品、同一週期的區間互不重疊（寫入時合併）
+    PRIMARY KEY (symbol_id, timeframe_id, start_time)
+) WITHOUT ROWID;
+
+-- ============================================================================
+-- 衍生週期登記表（由低週期 K 線在本地合成並隨新數據增量更新的週期）
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS materialized_series (
+    symbol_id INTEGER NOT NULL,              -- 對應 symbols.symbol_id
+    timeframe_id INTEGER NOT NULL,           -- 衍生週期（對應 timeframes.timeframe_id）
+    source_timeframe_id INTEGER NOT NULL,    -- 來源週期（通常為 M1）
+    session_offset INTEGER NOT NULL DEFAULT 0, -- D1/W1/MN1 日界線平移秒數
+    last_source_time INTEGER,                -- 已合成的最新來源 K 線時間（UTC epoch 秒）
+
+    PRIMARY KEY (symbol_id, timeframe_id)
+) WITHOUT ROWID;
+
+-- ============================================================================
+-- Tick 數據表（欄式區塊：每列為一個商品一小時內的全部 Tick）
+--
+-- 每個欄位為 zlib 壓縮的 little-endian NumPy 陣列（time_msc 以差分儲存），
+-- 一天數千萬筆 Tick 只佔數百列，可逐區塊解壓處理而不必整段載入。
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS ticks (
+    symbol_id INTEGER NOT NULL,              -- 對應 symbols.symbol_id
+    chunk_start INTEGER NOT NULL,            -- 區塊起點（UTC epoch 毫秒，整點）
+    first_msc INTEGER NOT NULL,              -- 區塊內第一筆 Tick 時間（UTC epoch 毫秒）
+    last_msc INTEGER NOT NULL,               -- 區塊內最後一筆 Tick 時間（UTC epoch 毫秒）
+    tick_count INTEGER NOT NULL,             -- 區塊內 Tick 筆數
+
+    -- 欄位陣列
+    time_msc BLOB NOT NULL,                  -- int64 時間差分（毫秒）
+    bid BLOB NOT NULL,                       -- float64 買價
+    ask BLOB NOT NULL,                       -- float64 賣價
+    last BLOB NOT NULL,                      -- float64 成交價（無成交價的商品為 0）
+    volume BLOB NOT NULL,                    -- float64 成交量（volume_real）
+    flags BLOB NOT NULL,                     -- uint32 MT5 Tick 旗標
+
+    PRIMARY KEY (symbol_id, chunk_start)
+) WITHOUT ROWID;
+
+-- ============================================================================
+-- 回填進度檢查點（由 BackfillOrchestrator 寫入，中斷後可從此處續抓）
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+    symbol_id INTEGER NOT NULL,              -- 對應 symbols.symbol_id
+    timeframe_id INTEGER NOT NULL,           -- 對應 timeframes.timeframe_id
+    next_end_time INTEGER NOT NULL,          -- 下一批次往前抓取的起點（UTC epoch 秒）
+    rows_written INTEGER NOT NULL DEFAULT 0, -- 累計寫入筆數（新增 + 更新）
+    batches INTEGER NOT NULL DEFAULT 0,      -- 累計批次數
+    status TEXT NOT NULL DEFAULT 'running',  -- 狀態：running, completed, failed
+    updated_at INTEGER NOT NULL,             -- 最後更新時間（UTC epoch 秒）
+
+    PRIMARY KEY (symbol_id, timeframe_id)
+) WITHOUT ROWID;
+
+-- ============================================================================
+-- 快取元數據表
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS cache_metadata (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+
+    -- 數據範圍
+    first_time TIMESTAMP,                    -- 最早數據時間
+    last_time TIMESTAMP,                     -- 最新數據時間
+    total_records INTEGER DEFAULT 0,         -- 總記錄數
+
+    -- 快取狀態
+    last_fetch_time TIMESTAMP,               -- 最後取得時間
+    last_update_time TIMESTAMP,              -- 最後更新時間
+    fetch_count INTEGER DEFAULT 0,           -- 取得次數
+
+    -- 數據品質
+    has_gaps BOOLEAN DEFAULT 0,              -- 是否有數據缺口
+    gap_count INTEGER DEFAULT 0,             -- 缺口數量
+    last_gap_check TIMESTAMP,                -- 最後缺口檢查時間
+
+    UNIQUE(symbol, timeframe)
+);
+
+CREATE INDEX IF NOT EXISTS idx_metadata_symbol_timeframe ON cache_metadata(symbol, timeframe);
+
+-- ============================================================================
+-- 數據缺口表
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS data_gaps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+
+    -- 缺口範圍
+    gap_start TIMESTAMP NOT NULL,            -- 缺口開始時間
+    gap_end TIMESTAMP NOT NULL,              -- 缺口結束時間
+
+    -- 缺口資訊
+    expected_records INTEGER,                -- 預期應有的記錄數
+    gap_duration_minutes INTEGER,            -- 缺口時長（分鐘）
+
+    -- 處理狀態
+    status TEXT DEFAULT 'detected',          -- 狀態：detected, filling, filled, ignored
+    detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    filled_at TIMESTAMP,
+
+    -- 備註
+    notes TEXT,
+
+    UNIQUE(symbol, timeframe, gap_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_gaps_symbol_timeframe ON data_gaps(symbol, timeframe);
+CREATE INDEX IF NOT EXISTS idx_gaps_status ON data_gaps(status);
+
+-- ============================================================================
+-- 指標結果快取表（IndicatorCache 的磁碟層，整份工具結果以 JSON 儲存）
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS indicator_results (
+    cache_key TEXT PRIMARY KEY,              -- 快取鍵（指標名稱、數據指紋、參數的 JSON）
+    indicator TEXT NOT NULL,                 -- 指標名稱（例如：calculate_sma）
+    symbol TEXT NOT NULL,                    -- 商品代碼（K 線 JSON 指紋時為 'json'）
+    timeframe TEXT NOT NULL,                 -- 時間週期（K 線 JSON 指紋時為內容雜湊）
+    result TEXT NOT NULL,                    -- 計算結果（JSON）
+    created_at INTEGER NOT NULL,             -- 寫入時間（UTC epoch 秒）
+    expires_at INTEGER NOT NULL              -- 過期時間（UTC epoch 秒）
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_indicator_results_expires ON indicator_results(expires_at);
+
+-- ============================================================================
+-- 指標計算結果快取表（預留未來使用）
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS indicator_cache (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    indicator_name TEXT NOT NULL,            -- 指標名稱（例如：sma_20, rsi_14）
+
+    -- 計算參數（JSON 格式）
+    parameters TEXT,                         -- 例如：{"window": 20, "column": "close"}
+
+    -- 計算結果
+    time TIMESTAMP NOT NULL,                 -- K 線時間
+    value REAL,                              -- 指標值
+
+    -- 元數據
+    calculated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    UNIQUE(symbol, timeframe, indicator_name, parameters, time)
+);
+
+CREATE INDEX IF NOT EXISTS idx_indicator_cache_lookup ON indicator_cache(symbol, timeframe, indicator_name, parameters, time);
@@ -0,0 +1,393 @@
+"""
+交易時段日曆模組
+
+此模組依商品類別（外匯、貴金屬、指數、加密貨幣）定義每週交易時段、
+每日休市時段與假日，並以向量化方式計算任意 UTC 區間內的開市秒數，
+供缺口檢測判斷缺口是否落在休市期間。
+"""
+
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# 時間常數（秒）
+DAY_SECONDS = 86400
+WEEK_SECONDS = 7 * DAY_SECONDS
+
+# 1970-01-05（週一）00:00 的 epoch 秒，作為每週起點
+_MONDAY_ANCHOR = 4 * DAY_SECONDS
+
+
+def _parse_clock(value: str) -> int:
+    """將 'HH:MM' 轉為當日秒數"""
+    hours, minutes = value.split(':')
+    return int(hours) * 3600 + int(minutes) * 60
+
+
+class SessionCalendar:
+    """
+    交易時段日曆
+
+    時段以交易所所在時區的當地時間定義（自動處理夏令時間），
+    休市區間包含：週末（weekly_close ~ weekly_open）、每日休市（daily_breaks）、
+    以及假日（當地時間整日）。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timezone: str = 'UTC',
+        weekly_close: Optional[Tuple[int, str]] = None,
+        weekly_open: Optional[Tuple[int, str]] = None,
+        daily_breaks: Sequence[Tuple[str, str]] = (),
+        holidays: Iterable[str] = ()
+    ):
+        """
+        初始化交易時段日曆
+
+        參數：
+            name: 日曆名稱（例如 'fx'）
+            timezone: 時段定義所用的時區（例如 'America/New_York'）
+            weekly_close: 每週收盤時間 (weekday, 'HH:MM')，weekday 0 為週一；
+                None 表示全年無休
+            weekly_open: 每週開盤時間 (weekday, 'HH:MM')
+            daily_breaks: 每日休市時段 [('HH:MM', 'HH:MM'), ...]
+            holidays: 假日清單，'MM-DD' 為每年固定日期，'YYYY-MM-DD' 為特定日期
+        """
+        self.name = name
+        self.timezone = timezone
+
+        intervals = []
+
+        if weekly_close is not None and weekly_open is not None:
+            close_at = weekly_close[0] * DAY_SECONDS + _parse_clock(weekly_close[1])
+            open_at = weekly_open[0] * DAY_SECONDS + _parse_clock(weekly_open[1])
+
+            if close_at < open_at:
+                intervals.append((close_at, open_at))
+            else:
+                # 跨越週一 00:00 的週末休市，拆成兩段
+                intervals.append((close_at, WEEK_SECONDS))
+                intervals.append((0, open_at))
+
+        for break_start, break_end in daily_breaks:
+            start = _parse_clock(break_start)
+            end = _parse_clock(break_end)
+            for weekday in range(7):
+                offset = weekday * DAY_SECONDS
+                if start < end:
+                    intervals.append((offset + start, offset + end))
+                else:
+                    intervals.append((offset + start, offset + DAY_SECONDS))
+                    intervals.append((offset, offset + end))
+
+        merged = self._merge(intervals)
+        self._week_starts = np.array([s for s, _ in merged], dtype=np.int64)
+        self._week_ends = np.array([e for _, e in merged], dtype=np.int64)
+
+        self._recurring_holidays: List[Tuple[int, int]] = []
+        self._fixed_holidays: List[date] = []
+
+        for holiday in holidays:
+            parts = [int(part) for part in holiday.split('-')]
+            if len(parts) == 2:
+                self._recurring_holidays.append((parts[0], parts[1]))
+            else:
+                self._fixed_holidays.append(date(parts[0], parts[1], parts[2]))
+
+    def __repr__(self) -> str:
+        return f"SessionCalendar(name={self.name!r}, timezone={self.timezone!r})"
+
+    @staticmethod
+    def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """合併重疊或相鄰的區間"""
+        merged: List[Tuple[int, int]] = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def _to_utc(self, local: np.ndarray) -> np.ndarray:
+        """
+        將當地時間的「牆上時鐘」秒數轉為 UTC epoch 秒
+
+        夏令時間切換時不存在的時刻順延到切換後，重複的時刻視為夏令時間。
+        """
+        local = np.asarray(local, dtype=np.int64)
+
+        if self.timezone == 'UTC' or local.size == 0:
+            return local
+
+        utc = (
+            pd.DatetimeIndex(pd.to_datetime(local, unit='s'))
+            .tz_localize(
+                self.timezone,
+                ambiguous=np.ones(local.shape, dtype=bool),
+                nonexistent='shift_forward'
+            )
+            .tz_convert('UTC')
+        )
+        return utc.as_unit('s').asi8
+
+    def _holiday_intervals(self, first_year: int, last_year: int) -> np.ndarray:
+        """展開指定年份範圍內的假日（當地時間整日），回傳 [[start, end], ...]"""
+        days = [
+            date(year, month, day)
+            for year in range(first_year, last_year + 1)
+            for month, day in self._recurring_holidays
+        ]
+        days += [d for d in self._fixed_holidays if first_year <= d.year <= last_year]
+
+        if not days:
+            return np.empty((0, 2), dtype=np.int64)
+
+        starts = np.array(
+            sorted({(d - date(1970, 1, 1)).days * DAY_SECONDS for d in days}),
+            dtype=np.int64
+        )
+        return np.column_stack([starts, starts + DAY_SECONDS])
+
+    def _closed_intervals(self, first: int, last: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        展開涵蓋 [first, last] 的休市區間，並轉為 UTC 後合併
+
+        休市區間以當地時間定義，逐段轉換端點到 UTC，
+        因此跨越夏令時間切換的週末會得到正確的實際長度。
+
+        參數：
+            first: 範圍起點（UTC epoch 秒）
+            last: 範圍終點（UTC epoch 秒）
+
+        回傳：
+            (starts, ends) 兩個已排序、互不重疊的 UTC epoch 秒陣列
+        """
+        # 時區偏移不超過一天，前後各多展開一天即可涵蓋整個範圍
+        first_local = first - DAY_SECONDS
+        last_local = last + DAY_SECONDS
+
+        weeks = np.arange(
+            (first_local - _MONDAY_ANCHOR) // WEEK_SECONDS,
+            (last_local - _MONDAY_ANCHOR) // WEEK_SECONDS + 1,
+            dtype=np.int64
+        )
+        week_offsets = _MONDAY_ANCHOR + weeks[:, None] * WEEK_SECONDS
+        starts = (week_offsets + self._week_starts).ravel()
+        ends = (week_offsets + self._week_ends).ravel()
+
+        if self._recurring_holidays or self._fixed_holidays:
+            holidays = self._holiday_intervals(
+                pd.Timestamp(first_local, unit='s').year,
+                pd.Timestamp(last_local, unit='s').year
+            )
+            starts = np.concatenate([starts, holidays[:, 0]])
+            ends = np.concatenate([ends, holidays[:, 1]])
+
+        if starts.size == 0:
+            return starts, ends
+
+        starts = self._to_utc(starts)
+        ends = self._to_utc(ends)
+
+        # 合併重疊或相鄰的區間（假日可能與週末或每日休市重疊）
+        order = np.argsort(starts, kind='stable')
+        starts = starts[order]
+        ends = ends[order]
+        is_new = np.concatenate([[True], starts[1:] > np.maximum.accumulate(ends)[:-1]])
+        heads = np.flatnonzero(is_new)
+
+        return starts[heads], np.maximum.reduceat(ends, heads)
+
+    def closed_seconds(self, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """
+        計算每個 [start, end) 區間內的休市秒數
+
+        參數：
+            start: 區間起點陣列（UTC epoch 秒）
+            end: 區間終點陣列（UTC epoch 秒）
+
+        回傳：
+            休市秒數陣列（int64）
+        """
+        start = np.asarray(start, dtype=np.int64)
+        end = np.asarray(end, dtype=np.int64)
+
+        if start.size == 0:
+            return np.zeros(start.shape, dtype=np.int64)
+
+        starts, ends = self._closed_intervals(
+            int(min(start.min(), end.min())), int(max(start.max(), end.max()))
+        )
+
+        if starts.size == 0:
+            return np.zeros(start.shape, dtype=np.int64)
+
+        cumulative = np.concatenate([[0], np.cumsum(ends - starts)])
+
+        def closed_before(times: np.ndarray) -> np.ndarray:
+            # 以 searchsorted 找出每個時間點所在或之前的休市區間，記憶體用量與輸入長度成正比
+            idx = np.searchsorted(starts, times, side='right') - 1
+            clamped = np.maximum(idx, 0)
+            partial = np.clip(times - starts[clamped], 0, ends[clamped] - starts[clamped])
+            return np.where(idx >= 0, cumulative[clamped] + partial, 0)
+
+        closed = closed_before(end) - closed_before(start)
+
+        return np.clip(closed, 0, np.maximum(end - start, 0))
+
+    def open_seconds(self, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """
+        計算每個 [start, end) 區間內的開市秒數
+
+        參數：
+            start: 區間起點陣列（UTC epoch 秒）
+            end: 區間終點陣列（UTC epoch 秒）
+
+        回傳：
+            開市秒數陣列（int64）
+        """
+        start = np.asarray(start, dtype=np.int64)
+        end = np.asarray(end, dtype=np.int64)
+        return np.maximum(end - start, 0) - self.closed_seconds(start, end)
+
+
+# ============================================================================
+# 內建日曆（時段採用 MT5 經紀商常見設定，以紐約時間定義以自動處理夏令時間）
+# ============================================================================
+
+CALENDARS: Dict[str, SessionCalendar] = {
+    # 外匯：週日 17:00 開盤 ~ 週五 17:00 收盤（紐約時間）
+    'fx': SessionCalendar(
+        'fx',
+        timezone='America/New_York',
+        weekly_close=(4, '17:00'),
+        weekly_open=(6, '17:00'),
+        holidays=('12-25', '01-01')
+    ),
+    # 貴金屬：週日 18:00 開盤 ~ 週五 17:00 收盤，每日 17:00 ~ 18:00 休市
+    'metals': SessionCalendar(
+        'metals',
+        timezone='America/New_York',
+        weekly_close=(4, '17:00'),
+        weekly_open=(6, '18:00'),
+        daily_breaks=[('17:00', '18:00')],
+        holidays=('12-25', '01-01')
+    ),
+    # 指數 CFD：週日 18:00 開盤 ~ 週五 17:00 收盤，每日 17:00 ~ 18:00 休市
+    'indices': SessionCalendar(
+        'indices',
+        timezone='America/New_York',
+        weekly_close=(4, '17:00'),
+        weekly_open=(6, '18:00'),
+        daily_breaks=[('17:00', '18:00')],
+        holidays=('12-25', '01-01', '07-04')
+    ),
+    # 加密貨幣：全年無休
+    'crypto': SessionCalendar('crypto'),
+}
+
+# 商品類別判斷前綴（依序比對）
+SYMBOL_CLASS_KEYWORDS = (
+    ('crypto', ('BTC', 'ETH', 'LTC', 'XRP', 'BCH', 'SOL', 'DOGE', 'ADA', 'CRYPTO')),
+    ('metals', ('XAU', 'XAG', 'XPT', 'XPD', 'GOLD', 'SILVER', 'PLATINUM', 'PALLADIUM')),
+    ('indices', (
+        'US30', 'US500', 'US100', 'NAS', 'SPX', 'SP500', 'DJ', 'DOW',
+        'DAX', 'GER', 'DE40', 'UK100', 'FTSE', 'JP225', 'NIKKEI',
+        'HK50', 'HSI', 'AUS200', 'EU50', 'STOXX', 'FRA40', 'CAC'
+    )),
+)
+
+# 個別商品指定的日曆（優先於類別判斷）
+_SYMBOL_CALENDARS: Dict[str, SessionCalendar] = {}
+
+
+def classify_symbol(symbol: str) -> str:
+    """
+    判斷商品類別
+
+    參數：
+        symbol: 商品代碼
+
+    回傳：
+        類別名稱（'fx', 'metals', 'indices', 'crypto'）
+    """
+    # 去除經紀商前綴符號（例如 '#US30'），以開頭比對避免 'CADJPY' 誤判為 'DJ'
+    symbol_upper = symbol.upper().lstrip('#._-')
+
+    for symbol_class, keywords in SYMBOL_CLASS_KEYWORDS:
+        if symbol_upper.startswith(keywords):
+            return symbol_class
+
+    return 'fx'
+
+
+def register_calendar(symbol: str, calendar: SessionCalendar) -> None:
+    """
+    為個別商品指定交易時段日曆
+
+    參數：
+        symbol: 商品代碼
+        calendar: 交易時段日曆
+    """
+    _SYMBOL_CALENDARS[symbol.upper()] = calendar
+
+
+def get_calendar(symbol: str) -> SessionCalendar:
+    """
+    取得商品的交易時段日曆
+
+    參數：
+        symbol: 商品代碼
+
+    回傳：
+        SessionCalendar 物件
+    """
+    calendar = _SYMBOL_CALENDARS.get(symbol.upper())
+    if calendar is not None:
+        return calendar
+
+    return CALENDARS[classify_symbol(symbol)]
+
+
+def find_gaps(
+    times: np.ndarray,
+    step_seconds: int,
+    calendar: SessionCalendar,
+    min_gap_threshold: float = 1.5
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    以向量化方式找出非休市造成的數據缺口
+
+    先以相鄰時間差篩出候選缺口，再以日曆計算缺口內的開市秒數；
+    開市時間不足 (min_gap_threshold - 1) 根 K 線的候選缺口視為正常休市。
+
+    參數：
+        times: 已排序的 K 線時間陣列（UTC epoch 秒）
+        step_seconds: K 線週期秒數
+        calendar: 交易時段日曆
+        min_gap_threshold: 最小缺口閾值（相對於正常間隔的倍數）
+
+    回傳：
+        (缺口前最後一根時間, 缺口後第一根時間, 預期缺少的 K 線數) 三個陣列
+    """
+    times = np.asarray(times, dtype=np.int64)
+
+    if len(times) < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    candidates = np.flatnonzero(np.diff(times) > step_seconds * min_gap_threshold)
+    gap_start = times[candidates]
+    gap_end = times[candidates + 1]
+
+    # 缺少的 K 線開盤時間落在 [gap_start + step, gap_end)
+    open_secs = calendar.open_seconds(gap_start + step_seconds, gap_end)
+    is_gap = open_secs >= step_seconds * (min_gap_threshold - 1)
+
+    expected = np.maximum(np.ceil(open_secs[is_gap] / step_seconds), 1).astype(np.int64)
+
+    return gap_start[is_gap], gap_end[is_gap], expected
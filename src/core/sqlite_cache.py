@@ -5,12 +5,20 @@ SQLite3 快取管理模組
 """
 
 import sqlite3
-from typing import Optional, List, Dict, Tuple
+import os
+import zlib
+from itertools import repeat
+from typing import Optional, List, Dict, Iterator, Tuple, Union
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
+import numpy as np
 import pandas as pd
 from loguru import logger
 
+from .sqlite_pool import SQLiteConnectionPool
+from .session_calendar import SessionCalendar, get_calendar, find_gaps
+from . import resampler
+
 
 class SQLiteCacheManager:
     """
@@ -28,6 +36,60 @@ class SQLiteCacheManager:
         'D1': 1440, 'W1': 10080, 'MN1': 43200  # 約略值
     }
 
+    # K 線數值欄位（與 MT5 rates 結構化陣列欄位一致）
+    CANDLE_VALUE_COLUMNS = (
+        'open', 'high', 'low', 'close',
+        'tick_volume', 'spread', 'real_volume'
+    )
+
+    # MT5 copy_rates_* 回傳的結構化陣列 dtype
+    RATES_DTYPE = resampler.RATES_DTYPE
+
+    # 批次寫入時每個交易的預設筆數
+    BULK_BATCH_SIZE = 50000
+
+    # ticks 表的欄位 dtype（volume 對應 MT5 Tick 的 volume_real）
+    TICKS_DTYPE = np.dtype([
+        ('time_msc', '<i8'), ('bid', '<f8'), ('ask', '<f8'),
+        ('last', '<f8'), ('volume', '<f8'), ('flags', '<u4')
+    ])
+
+    # 每個 Tick 區塊涵蓋的毫秒數（一小時）
+    TICK_CHUNK_MSC = 3_600_000
+
+    # 儲存格式版本（PRAGMA user_version）
+    # 1 以下：candles 以 TEXT 時間儲存（舊版）
+    # 2：candles 以 (symbol_id, timeframe_id, epoch 秒) 為主鍵的 WITHOUT ROWID 表
+    SCHEMA_VERSION = 2
+
+    _UPSERT_CANDLES_SQL = """
+        INSERT INTO candles (
+            symbol_id, timeframe_id, time,
+            open, high, low, close,
+            tick_volume, spread, real_volume
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(symbol_id, timeframe_id, time) DO UPDATE SET
+            open = excluded.open,
+            high = excluded.high,
+            low = excluded.low,
+            close = excluded.close,
+            tick_volume = excluded.tick_volume,
+            spread = excluded.spread,
+            real_volume = excluded.real_volume
+    """
+
+    # 衍生 K 線只補上不存在的記錄，不覆寫 MT5 取得的同一根 K 線
+    _INSERT_MISSING_CANDLES_SQL = """
+        INSERT INTO candles (
+            symbol_id, timeframe_id, time,
+            open, high, low, close,
+            tick_volume, spread, real_volume
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(symbol_id, timeframe_id, time) DO NOTHING
+    """
+
     def __init__(self, db_path: Optional[str] = None):
         """
         初始化快取管理器
@@ -44,6 +106,13 @@ class SQLiteCacheManager:
         db_path.parent.mkdir(parents=True, exist_ok=True)
 
         self.db_path = str(db_path)
+
+        # 商品代碼 -> symbol_id 快取（symbol_id 一經建立不會改變）
+        self._symbol_ids: Dict[str, int] = {}
+
+        # 連線池：每個執行緒一條讀取連線，寫入共用一條連線
+        self._pool = SQLiteConnectionPool(self.db_path)
+
         self._init_database()
 
         logger.info(f"SQLite 快取管理器初始化完成：{self.db_path}")
@@ -53,23 +122,43 @@ class SQLiteCacheManager:
         初始化資料庫結構
 
         讀取 schema.sql 並執行，建立所有必要的資料表和索引。
-        """
-        schema_path = Path(__file__).parent / 'schema.sql'
 
-        if not schema_path.exists():
-            logger.error(f"找不到 schema.sql：{schema_path}")
-            raise FileNotFoundError(f"Schema 檔案不存在：{schema_path}")
+        例外：
+            RuntimeError: 資料庫仍為舊版儲存格式時（需先執行 migrate_storage）
+        """
+        schema_sql = self._read_schema()
 
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
         try:
-            # 讀取並執行 schema.sql
-            with open(schema_path, 'r', encoding='utf-8') as f:
-                schema_sql = f.read()
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            if version < self.SCHEMA_VERSION and self._is_legacy_layout(cursor):
+                raise RuntimeError(
+                    f"資料庫為舊版儲存格式（版本 {version}）：{self.db_path}，"
+                    f"請先執行 python scripts/manage_cache.py "
+                    f"--db-path {self.db_path} migrate"
+                )
 
             cursor.executescript(schema_sql)
 
+            # 初始化時間週期字典（timeframe_id 即週期分鐘數）
+            cursor.executemany(
+                "INSERT OR IGNORE INTO timeframes (timeframe_id, timeframe) VALUES (?, ?)",
+                [(minutes, tf) for tf, minutes in self.TIMEFRAME_MINUTES.items()]
+            )
+
+            # 涵蓋範圍表為空時，以既有數據的首尾時間初始化（等同舊版以元數據判斷的行為）
+            cursor.execute("""
+                INSERT INTO candle_coverage (symbol_id, timeframe_id, start_time, end_time)
+                SELECT symbol_id, timeframe_id, MIN(time), MAX(time)
+                FROM candles
+                WHERE NOT EXISTS (SELECT 1 FROM candle_coverage)
+                GROUP BY symbol_id, timeframe_id
+            """)
+
+            cursor.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
             # 啟用 WAL 模式（提升並發效能）
             cursor.execute("PRAGMA journal_mode=WAL")
 
@@ -85,20 +174,185 @@ class SQLiteCacheManager:
         finally:
             conn.close()
 
+    @staticmethod
+    def _read_schema() -> str:
+        """
+        讀取 schema.sql
+
+        回傳：
+            schema SQL 字串
+
+        例外：
+            FileNotFoundError: 找不到 schema.sql 時
+        """
+        schema_path = Path(__file__).parent / 'schema.sql'
+
+        if not schema_path.exists():
+            logger.error(f"找不到 schema.sql：{schema_path}")
+            raise FileNotFoundError(f"Schema 檔案不存在：{schema_path}")
+
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    @staticmethod
+    def _is_legacy_layout(cursor: sqlite3.Cursor) -> bool:
+        """
+        判斷 candles 表是否為舊版（TEXT 時間、symbol/timeframe 文字欄位）格式
+
+        參數：
+            cursor: 資料庫游標
+
+        回傳：
+            True 如果 candles 表存在且為舊版格式
+        """
+        columns = [row[1] for row in cursor.execute("PRAGMA table_info(candles)")]
+        return 'symbol' in columns
+
+    @classmethod
+    def migrate_storage(cls, db_path: str, vacuum: bool = True) -> Dict:
+        """
+        將舊版資料庫就地遷移為整數 epoch 儲存格式
+
+        在單一交易內把 TEXT 時間的 candles 表轉換為以
+        (symbol_id, timeframe_id, epoch 秒) 為主鍵的 WITHOUT ROWID 表，
+        cache_metadata、data_gaps 等其他資料表保持不變。
+
+        參數：
+            db_path: 資料庫檔案路徑
+            vacuum: 遷移後是否執行 VACUUM 以縮小檔案（預設 True）
+
+        回傳：
+            統計字典：
+            {
+                'status': str,            # 'migrated' 或 'up_to_date'
+                'legacy_records': int,    # 舊表記錄數
+                'migrated_records': int,  # 成功轉換的記錄數
+                'skipped_records': int,   # 無法轉換（未知週期或時間格式）的記錄數
+                'size_before': int,       # 遷移前檔案大小（bytes）
+                'size_after': int         # 遷移後檔案大小（bytes）
+            }
+        """
+        if not Path(db_path).exists():
+            raise FileNotFoundError(f"資料庫檔案不存在：{db_path}")
+
+        schema_sql = cls._read_schema()
+        size_before = os.path.getsize(db_path)
+
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        cursor = conn.cursor()
+
+        try:
+            if not cls._is_legacy_layout(cursor):
+                logger.info(f"資料庫已是新版儲存格式，無需遷移：{db_path}")
+                return {
+                    'status': 'up_to_date',
+                    'legacy_records': 0,
+                    'migrated_records': 0,
+                    'skipped_records': 0,
+                    'size_before': size_before,
+                    'size_after': size_before
+                }
+
+            legacy_records = cursor.execute("SELECT COUNT(*) FROM candles").fetchone()[0]
+            logger.info(f"開始遷移 {legacy_records} 筆 K 線數據：{db_path}")
+
+            timeframe_values = ", ".join(
+                f"({minutes}, '{tf}')" for tf, minutes in cls.TIMEFRAME_MINUTES.items()
+            )
+
+            # 整個遷移在同一個交易中完成，失敗時完整回滾
+            cursor.executescript(f"""
+                BEGIN IMMEDIATE;
+
+                ALTER TABLE candles RENAME TO candles_legacy;
+
+                {schema_sql}
+
+                INSERT OR IGNORE INTO timeframes (timeframe_id, timeframe)
+                VALUES {timeframe_values};
+
+                INSERT OR IGNORE INTO symbols (symbol)
+                SELECT DISTINCT symbol FROM candles_legacy ORDER BY symbol;
+
+                INSERT OR REPLACE INTO candles (
+                    symbol_id, timeframe_id, time,
+                    open, high, low, close,
+                    tick_volume, spread, real_volume
+                )
+                SELECT
+                    s.symbol_id, t.timeframe_id,
+                    CAST(strftime('%s', l.time) AS INTEGER),
+                    l.open, l.high, l.low, l.close,
+                    l.tick_volume, l.spread, l.real_volume
+                FROM candles_legacy l
+                JOIN symbols s ON s.symbol = l.symbol
+                JOIN timeframes t ON t.timeframe = UPPER(l.timeframe)
+                WHERE strftime('%s', l.time) IS NOT NULL
+                ORDER BY s.symbol_id, t.timeframe_id, 3;
+
+                DROP TABLE candles_legacy;
+
+                PRAGMA user_version = {cls.SCHEMA_VERSION};
+
+                COMMIT;
+            """)
+
+            migrated_records = cursor.execute("SELECT COUNT(*) FROM candles").fetchone()[0]
+
+            if vacuum:
+                logger.info("執行 VACUUM 以回收空間")
+                cursor.execute("VACUUM")
+
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            logger.error(f"資料庫遷移失敗：{e}")
+            raise
+        finally:
+            conn.close()
+
+        size_after = os.path.getsize(db_path)
+        skipped_records = legacy_records - migrated_records
+
+        if skipped_records:
+            logger.warning(f"有 {skipped_records} 筆記錄無法轉換（未知週期、時間格式或重複時間）")
+
+        logger.info(
+            f"遷移完成：{migrated_records} 筆，檔案大小 "
+            f"{size_before / 1024 / 1024:.1f} MB -> {size_after / 1024 / 1024:.1f} MB"
+        )
+
+        return {
+            'status': 'migrated',
+            'legacy_records': legacy_records,
+            'migrated_records': migrated_records,
+            'skipped_records': skipped_records,
+            'size_before': size_before,
+            'size_after': size_after
+        }
+
     def _get_connection(self) -> sqlite3.Connection:
         """
-        取得資料庫連線
+        建立一條獨立的資料庫連線，呼叫端負責關閉
+
+        連線由 SQLiteConnectionPool.connect() 建立：套用與連線池相同的 PRAGMA，
+        但不登記在連線池中（不是 acquire_reader() / acquire_writer() 取得的共用連線），
+        也不受寫入鎖保護。供 manage_cache.py 等一次性維護工作使用。
 
         回傳：
             SQLite 連線物件
         """
-        conn = sqlite3.connect(
-            self.db_path,
-            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
-        )
-        # 設定 Row Factory 以便使用欄位名稱存取
-        conn.row_factory = sqlite3.Row
-        return conn
+        return self._pool.connect()
+
+    def close(self) -> None:
+        """關閉連線池中的所有連線"""
+        self._pool.close()
+
+    def __enter__(self) -> 'SQLiteCacheManager':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
 
     def _get_timeframe_interval(self, timeframe: str) -> timedelta:
         """
@@ -120,249 +374,655 @@ class SQLiteCacheManager:
         minutes = self.TIMEFRAME_MINUTES[tf_upper]
         return timedelta(minutes=minutes)
 
-    def insert_candles(
+    def _get_timeframe_id(self, timeframe: str) -> int:
+        """
+        取得時間週期的整數代碼（即週期分鐘數）
+
+        參數：
+            timeframe: 時間週期代碼（例如 'H1', 'D1'）
+
+        回傳：
+            timeframe_id
+
+        例外：
+            ValueError: 時間週期無效時
+        """
+        tf_upper = timeframe.upper()
+        if tf_upper not in self.TIMEFRAME_MINUTES:
+            raise ValueError(f"無效的時間週期：{timeframe}")
+
+        return self.TIMEFRAME_MINUTES[tf_upper]
+
+    def _get_symbol_id(
         self,
-        df: pd.DataFrame,
+        cursor: sqlite3.Cursor,
         symbol: str,
-        timeframe: str
-    ) -> int:
+        create: bool = False
+    ) -> Optional[int]:
         """
-        批次插入 K 線數據（使用 UPSERT 策略）
+        取得商品的整數代碼
 
         參數：
-            df: K 線數據 DataFrame
+            cursor: 資料庫游標
             symbol: 商品代碼
-            timeframe: 時間週期
+            create: 商品不存在時是否新增到字典表
 
         回傳：
-            插入的記錄數
+            symbol_id，若商品不存在且 create=False 則回傳 None
         """
-        if df.empty:
-            logger.warning("DataFrame 為空，略過插入")
-            return 0
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is not None:
+            return symbol_id
 
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        if create:
+            cursor.execute(
+                "INSERT OR IGNORE INTO symbols (symbol) VALUES (?)", (symbol,)
+            )
 
-        try:
-            # 準備數據
-            df_copy = df.copy()
+        row = cursor.execute(
+            "SELECT symbol_id FROM symbols WHERE symbol = ?", (symbol,)
+        ).fetchone()
 
-            # 確保時間欄位為字串格式（ISO 8601）
-            if 'time' in df_copy.columns:
-                df_copy['time'] = pd.to_datetime(df_copy['time']).dt.strftime('%Y-%m-%d %H:%M:%S')
+        if row is None:
+            return None
 
-            # 新增 symbol 和 timeframe 欄位
-            df_copy['symbol'] = symbol
-            df_copy['timeframe'] = timeframe
+        self._symbol_ids[symbol] = row[0]
+        return row[0]
 
-            # 批次插入（使用 INSERT OR REPLACE）
-            insert_query = """
-                INSERT OR REPLACE INTO candles (
-                    symbol, timeframe, time,
-                    open, high, low, close,
-                    tick_volume, spread, real_volume,
-                    updated_at
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """
+    @staticmethod
+    def _datetime_to_epoch(value: datetime) -> int:
+        """
+        將 datetime 轉為 UTC epoch 秒（無時區視為 UTC）
 
-            records = []
-            for _, row in df_copy.iterrows():
-                records.append((
-                    row['symbol'], row['timeframe'], row['time'],
-                    row['open'], row['high'], row['low'], row['close'],
-                    row['tick_volume'], row['spread'], row['real_volume']
-                ))
+        參數：
+            value: datetime 或 Timestamp
 
-            cursor.executemany(insert_query, records)
-            inserted_count = cursor.rowcount
+        回傳：
+            epoch 秒（向下取整）
+        """
+        ts = pd.Timestamp(value)
+        if ts.tzinfo is None:
+            ts = ts.tz_localize('UTC')
+        return int(np.floor(ts.timestamp()))
 
-            # 更新快取元數據
-            self._update_metadata(cursor, symbol, timeframe, df)
+    def _to_epoch_param(self, value: Union[datetime, int]) -> int:
+        """
+        將查詢邊界轉為 epoch 秒（整數原樣使用，datetime 經 _datetime_to_epoch 轉換）
 
-            conn.commit()
-            logger.info(f"成功插入 {inserted_count} 筆 K 線數據：{symbol} {timeframe}")
+        參數：
+            value: datetime 或 epoch 秒
 
-            return inserted_count
+        回傳：
+            epoch 秒
+        """
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        return self._datetime_to_epoch(value)
 
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"插入 K 線數據失敗：{e}")
-            raise
-        finally:
-            conn.close()
+    @staticmethod
+    def _epoch_to_datetime(seconds: int) -> datetime:
+        """
+        將 epoch 秒轉為 UTC datetime
 
-    def _update_metadata(
+        參數：
+            seconds: epoch 秒
+
+        回傳：
+            datetime 物件（UTC 時區）
+        """
+        return datetime.fromtimestamp(int(seconds), tz=timezone.utc)
+
+    @staticmethod
+    def _format_epoch(seconds: int) -> str:
+        """
+        將 epoch 秒格式化為元數據使用的時間字串（'%Y-%m-%d %H:%M:%S'，UTC）
+
+        參數：
+            seconds: epoch 秒
+
+        回傳：
+            時間字串
+        """
+        return datetime.fromtimestamp(int(seconds), tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    def insert_candles(
         self,
-        cursor: sqlite3.Cursor,
+        df: pd.DataFrame,
         symbol: str,
-        timeframe: str,
-        df: pd.DataFrame
-    ) -> None:
+        timeframe: str
+    ) -> int:
         """
-        更新快取元數據
+        批次插入 K 線數據（使用 UPSERT 策略）
 
         參數：
-            cursor: 資料庫游標
+            df: K 線數據 DataFrame
             symbol: 商品代碼
             timeframe: 時間週期
-            df: 新插入的 K 線數據
-        """
-        # 查詢當前快取狀態
-        query = """
-            SELECT
-                MIN(time) as first_time,
-                MAX(time) as last_time,
-                COUNT(*) as total_records
-            FROM candles
-            WHERE symbol = ? AND timeframe = ?
-        """
-
-        cursor.execute(query, (symbol, timeframe))
-        row = cursor.fetchone()
 
-        if row:
-            first_time = row['first_time']
-            last_time = row['last_time']
-            total_records = row['total_records']
+        回傳：
+            寫入的記錄數（新增 + 更新）
+        """
+        if df.empty:
+            logger.warning("DataFrame 為空，略過插入")
+            return 0
 
-            # 更新或插入元數據
-            upsert_query = """
-                INSERT INTO cache_metadata (
-                    symbol, timeframe, first_time, last_time,
-                    total_records, last_update_time, fetch_count
-                )
-                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, 1)
-                ON CONFLICT(symbol, timeframe) DO UPDATE SET
-                    first_time = excluded.first_time,
-                    last_time = excluded.last_time,
-                    total_records = excluded.total_records,
-                    last_update_time = CURRENT_TIMESTAMP,
-                    fetch_count = fetch_count + 1
-            """
+        stats = self.bulk_insert_candles(df, symbol, timeframe)
 
-            cursor.execute(
-                upsert_query,
-                (symbol, timeframe, first_time, last_time, total_records)
-            )
+        return stats['inserted'] + stats['updated']
 
-    def query_candles(
+    def bulk_insert_candles(
         self,
+        data: Union[pd.DataFrame, np.ndarray],
         symbol: str,
         timeframe: str,
-        from_date: Optional[datetime] = None,
-        to_date: Optional[datetime] = None
-    ) -> pd.DataFrame:
+        batch_size: Optional[int] = None
+    ) -> Dict[str, int]:
         """
-        查詢 K 線數據
+        欄式批次寫入 K 線數據
+
+        直接從 NumPy 欄位陣列組出參數列，不經過 iterrows 或逐列 Series，
+        並依 batch_size 分段提交交易。data 可以是 DataFrame，
+        也可以是 MT5 copy_rates_* 回傳的結構化陣列（time 為 epoch 秒）。
 
         參數：
+            data: K 線數據（DataFrame 或 MT5 rates 結構化陣列）
             symbol: 商品代碼
             timeframe: 時間週期
-            from_date: 起始日期（UTC）
-            to_date: 結束日期（UTC）
+            batch_size: 每個交易寫入的筆數（預設 BULK_BATCH_SIZE）
 
         回傳：
-            K 線數據 DataFrame
+            統計字典 {'inserted': 新增筆數, 'updated': 更新筆數, 'batches': 交易數}
+
+        例外：
+            ValueError: 缺少必要欄位或 batch_size 無效時
         """
-        conn = self._get_connection()
+        stats = {'inserted': 0, 'updated': 0, 'batches': 0}
+
+        if data is None or len(data) == 0:
+            logger.warning("輸入數據為空，略過插入")
+            return stats
+
+        batch_size = batch_size or self.BULK_BATCH_SIZE
+        if batch_size <= 0:
+            raise ValueError(f"batch_size 必須為正數，得到：{batch_size}")
+
+        timeframe_id = self._get_timeframe_id(timeframe)
+        columns = self._extract_candle_columns(data)
+        times = self._to_epoch_seconds(columns['time'])
+        total = len(times)
+
+        conn = self._pool.acquire_writer()
+        cursor = conn.cursor()
 
         try:
-            # 建立查詢
-            query = """
-                SELECT
-                    time, open, high, low, close,
-                    tick_volume, spread, real_volume
-                FROM candles
-                WHERE symbol = ? AND timeframe = ?
-            """
+            symbol_id = self._get_symbol_id(cursor, symbol, create=True)
 
-            params = [symbol, timeframe]
+            for start in range(0, total, batch_size):
+                end = min(start + batch_size, total)
+                chunk_times = times[start:end]
+                time_min = int(chunk_times.min())
+                time_max = int(chunk_times.max())
 
-            if from_date:
-                query += " AND time >= ?"
-                params.append(from_date.strftime('%Y-%m-%d %H:%M:%S'))
+                # 以主鍵範圍計數取得寫入前後差值，區分新增與更新
+                before = self._count_range(cursor, symbol_id, timeframe_id, time_min, time_max)
 
-            if to_date:
-                query += " AND time <= ?"
-                params.append(to_date.strftime('%Y-%m-%d %H:%M:%S'))
+                records = zip(
+                    repeat(symbol_id), repeat(timeframe_id), chunk_times.tolist(),
+                    *(columns[col][start:end].tolist() for col in self.CANDLE_VALUE_COLUMNS)
+                )
+                cursor.executemany(self._UPSERT_CANDLES_SQL, records)
 
-            query += " ORDER BY time DESC"
+                after = self._count_range(cursor, symbol_id, timeframe_id, time_min, time_max)
 
-            # 執行查詢
-            df = pd.read_sql_query(query, conn, params=params)
+                inserted = after - before
+                stats['inserted'] += inserted
+                stats['updated'] += (end - start) - inserted
 
-            # 轉換時間欄位為 datetime（UTC）
-            if not df.empty and 'time' in df.columns:
-                df['time'] = pd.to_datetime(df['time'], utc=True)
+                # 在同一交易內以本批次的邊界和新增筆數增量更新元數據
+                self._update_metadata(
+                    cursor, symbol, timeframe,
+                    self._format_epoch(time_min), self._format_epoch(time_max), inserted,
+                    fetch_increment=1 if stats['batches'] == 0 else 0
+                )
+                self._mark_coverage(cursor, symbol_id, timeframe_id, time_min, time_max)
+                stats['batches'] += 1
 
-            logger.info(f"從快取查詢到 {len(df)} 筆 K 線數據：{symbol} {timeframe}")
+                conn.commit()
 
-            return df
+            logger.info(
+                f"成功寫入 {total} 筆 K 線數據：{symbol} {timeframe}"
+                f"（新增 {stats['inserted']}，更新 {stats['updated']}，"
+                f"{stats['batches']} 個交易）"
+            )
 
         except Exception as e:
-            logger.error(f"查詢 K 線數據失敗：{e}")
+            conn.rollback()
+            logger.error(f"插入 K 線數據失敗：{e}")
             raise
         finally:
-            conn.close()
+            self._pool.release(conn)
 
-    def get_cache_info(
+        # 以本次寫入的範圍增量更新由此週期衍生的週期
+        self.refresh_materialized(
+            symbol, source_timeframe=timeframe,
+            start=int(times.min()), end=int(times.max())
+        )
+
+        return stats
+
+    def _extract_candle_columns(
         self,
-        symbol: str,
-        timeframe: str
-    ) -> Optional[Dict]:
+        data: Union[pd.DataFrame, np.ndarray]
+    ) -> Dict[str, np.ndarray]:
         """
-        取得快取資訊
+        取出 K 線欄位的 NumPy 陣列
 
         參數：
-            symbol: 商品代碼
-            timeframe: 時間週期
+            data: K 線數據（DataFrame 或 MT5 rates 結構化陣列）
 
         回傳：
-            快取資訊字典，若無快取則回傳 None
-        """
-        conn = self._get_connection()
+            欄位名稱對應 NumPy 陣列的字典
 
-        try:
-            query = """
-                SELECT * FROM cache_metadata
-                WHERE symbol = ? AND timeframe = ?
-            """
+        例外：
+            ValueError: 缺少必要欄位時
+        """
+        if isinstance(data, pd.DataFrame):
+            available = set(data.columns)
+        else:
+            available = set(data.dtype.names or ())
 
-            cursor = conn.cursor()
-            cursor.execute(query, (symbol, timeframe))
-            row = cursor.fetchone()
+        required = ('time',) + self.CANDLE_VALUE_COLUMNS
+        missing_columns = [col for col in required if col not in available]
+        if missing_columns:
+            raise ValueError(f"缺少必要欄位：{missing_columns}")
 
-            if row:
-                return dict(row)
-            else:
-                return None
+        if isinstance(data, pd.DataFrame):
+            return {col: data[col].to_numpy() for col in required}
 
-        finally:
-            conn.close()
+        return {col: np.asarray(data[col]) for col in required}
 
-    def get_oldest_time(
-        self,
-        symbol: str,
-        timeframe: str
-    ) -> Optional[datetime]:
+    def _to_epoch_seconds(self, values: np.ndarray) -> np.ndarray:
         """
-        取得指定商品和週期的最早數據時間
+        將時間欄位向量化轉為 UTC epoch 秒
 
         參數：
-            symbol: 商品代碼
-            timeframe: 時間週期
+            values: 時間陣列（epoch 秒整數、datetime64 或可解析的時間，無時區視為 UTC）
 
         回傳：
-            最早的時間戳，若無數據則回傳 None
+            int64 epoch 秒陣列
         """
-        conn = self._get_connection()
+        if np.issubdtype(values.dtype, np.integer):
+            return values.astype(np.int64)
+
+        index = pd.DatetimeIndex(pd.to_datetime(values, utc=True)).tz_convert(None)
+        return index.to_numpy().astype('datetime64[s]').astype(np.int64)
+
+    def _count_range(
+        self,
+        cursor: sqlite3.Cursor,
+        symbol_id: int,
+        timeframe_id: int,
+        time_min: int,
+        time_max: int
+    ) -> int:
+        """
+        計算指定時間範圍內的記錄數（使用主鍵範圍搜尋）
+
+        參數：
+            cursor: 資料庫游標
+            symbol_id: 商品整數代碼
+            timeframe_id: 時間週期整數代碼
+            time_min: 範圍起點（epoch 秒，含）
+            time_max: 範圍終點（epoch 秒，含）
+
+        回傳：
+            記錄數
+        """
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM candles
+            WHERE symbol_id = ? AND timeframe_id = ? AND time BETWEEN ? AND ?
+            """,
+            (symbol_id, timeframe_id, time_min, time_max)
+        )
+        return cursor.fetchone()[0]
+
+    def _update_metadata(
+        self,
+        cursor: sqlite3.Cursor,
+        symbol: str,
+        timeframe: str,
+        first_time: str,
+        last_time: str,
+        inserted: int,
+        fetch_increment: int = 1
+    ) -> None:
+        """
+        增量更新快取元數據
+
+        只依據本批次的時間邊界和實際新增筆數（不含覆寫的既有記錄）
+        調整 first_time / last_time / total_records，不重新掃描 candles 表。
+        若元數據與實際數據不一致，請使用 rebuild_metadata() 重建。
+
+        參數：
+            cursor: 資料庫游標
+            symbol: 商品代碼
+            timeframe: 時間週期
+            first_time: 本批次最早時間
+            last_time: 本批次最新時間
+            inserted: 本批次實際新增的筆數
+            fetch_increment: fetch_count 的增量
+        """
+        upsert_query = """
+            INSERT INTO cache_metadata (
+                symbol, timeframe, first_time, last_time,
+                total_records, last_update_time, fetch_count
+            )
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+            ON CONFLICT(symbol, timeframe) DO UPDATE SET
+                first_time = MIN(COALESCE(first_time, excluded.first_time), excluded.first_time),
+                last_time = MAX(COALESCE(last_time, excluded.last_time), excluded.last_time),
+                total_records = total_records + excluded.total_records,
+                last_update_time = CURRENT_TIMESTAMP,
+                fetch_count = fetch_count + excluded.fetch_count
+        """
+
+        cursor.execute(
+            upsert_query,
+            (symbol, timeframe, first_time, last_time, inserted, fetch_increment)
+        )
+
+    def rebuild_metadata(
+        self,
+        symbol: Optional[str] = None,
+        timeframe: Optional[str] = None
+    ) -> int:
+        """
+        從 candles 表完整重建快取元數據
+
+        以 MIN/MAX/COUNT 全表掃描重新計算 first_time、last_time 和
+        total_records，用於修正增量維護產生的偏差。缺口統計欄位保持不變，
+        已無數據的組合會刪除其元數據。
+
+        參數：
+            symbol: 商品代碼（若為 None 則重建所有商品）
+            timeframe: 時間週期（若為 None 則重建所有週期）
+
+        回傳：
+            重建的商品-週期組合數
+        """
+        conn = self._pool.acquire_writer()
+        cursor = conn.cursor()
 
         try:
-            query = """
-                SELECT MIN(time) as oldest_time
+            where = " WHERE 1=1"
+            params = []
+
+            if symbol:
+                where += " AND symbol = ?"
+                params.append(symbol)
+
+            if timeframe:
+                where += " AND timeframe = ?"
+                params.append(timeframe)
+
+            # 刪除已無數據的元數據
+            cursor.execute(
+                "DELETE FROM cache_metadata" + where + """
+                AND NOT EXISTS (
+                    SELECT 1 FROM candles
+                    JOIN symbols s ON s.symbol_id = candles.symbol_id
+                    JOIN timeframes t ON t.timeframe_id = candles.timeframe_id
+                    WHERE s.symbol = cache_metadata.symbol
+                    AND t.timeframe = cache_metadata.timeframe
+                )
+                """,
+                params
+            )
+
+            cursor.execute(
+                """
+                INSERT INTO cache_metadata (
+                    symbol, timeframe, first_time, last_time,
+                    total_records, last_update_time
+                )
+                SELECT
+                    symbol, timeframe,
+                    strftime('%Y-%m-%d %H:%M:%S', MIN(time), 'unixepoch'),
+                    strftime('%Y-%m-%d %H:%M:%S', MAX(time), 'unixepoch'),
+                    COUNT(*), CURRENT_TIMESTAMP
+                FROM candles
+                JOIN symbols USING (symbol_id)
+                JOIN timeframes USING (timeframe_id)""" + where + """
+                GROUP BY symbol_id, timeframe_id
+                ON CONFLICT(symbol, timeframe) DO UPDATE SET
+                    first_time = excluded.first_time,
+                    last_time = excluded.last_time,
+                    total_records = excluded.total_records,
+                    last_update_time = CURRENT_TIMESTAMP
+                """,
+                params
+            )
+            rebuilt_count = cursor.rowcount
+
+            conn.commit()
+            logger.info(f"已重建 {rebuilt_count} 個商品-週期組合的快取元數據")
+
+            return rebuilt_count
+
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"重建快取元數據失敗：{e}")
+            raise
+        finally:
+            self._pool.release(conn)
+
+    def query_candles(
+        self,
+        symbol: str,
+        timeframe: str,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None
+    ) -> pd.DataFrame:
+        """
+        查詢 K 線數據
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 時間週期
+            from_date: 起始日期（UTC）
+            to_date: 結束日期（UTC）
+
+        回傳：
+            K 線數據 DataFrame（time 欄位為 datetime64[ns, UTC]）
+        """
+        arrays = self.query_candles_arrays(
+            symbol, timeframe, from_date, to_date, order='desc'
+        )
+        df = self._arrays_to_frame(arrays)
+
+        logger.info(f"從快取查詢到 {len(df)} 筆 K 線數據：{symbol} {timeframe}")
+
+        return df
+
+    def query_latest(
+        self,
+        symbol: str,
+        timeframe: str,
+        count: int
+    ) -> pd.DataFrame:
+        """
+        查詢最新的 N 根 K 線
+
+        以主鍵倒序掃描加 LIMIT 取得，不需依時間週期估算查詢區間，
+        因此不受週末、假日等休市時段影響。
+
+        衍生週期只儲存已完成的 K 線；查詢衍生週期時，
+        會以最後一根之後的來源 K 線即時合成尚未完成的最新 K 線並附加在結尾。
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 時間週期
+            count: K 線數量
+
+        回傳：
+            K 線數據 DataFrame（依時間升冪排序，time 欄位為 datetime64[ns, UTC]），
+            快取不足 count 筆時回傳現有的全部數據
+        """
+        rates = self.query_candles_arrays(
+            symbol, timeframe, order='desc', limit=count, structured=True
+        )[::-1]
+
+        developing = self._developing_bar(
+            symbol, timeframe, int(rates['time'][-1]) if len(rates) > 0 else None
+        )
+        if developing is not None:
+            rates = np.concatenate([rates, developing.astype(rates.dtype)])[-count:]
+
+        df = self._arrays_to_frame(
+            {col: np.ascontiguousarray(rates[col]) for col in rates.dtype.names}
+        )
+
+        logger.info(f"從快取查詢到最新 {len(df)}/{count} 筆 K 線數據：{symbol} {timeframe}")
+
+        return df
+
+    @staticmethod
+    def _arrays_to_frame(arrays: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """
+        將 query_candles_arrays 的結果轉為 DataFrame
+
+        參數：
+            arrays: 欄位名稱 -> NumPy 陣列
+
+        回傳：
+            K 線數據 DataFrame（time 欄位為 datetime64[ns, UTC]，成交量欄位為 int64）
+        """
+        df = pd.DataFrame(arrays)
+
+        # 由 epoch 秒整數直接轉換為 datetime64[ns, UTC]
+        df['time'] = pd.to_datetime(
+            df['time'], unit='s', utc=True
+        ).astype('datetime64[ns, UTC]')
+
+        for col in ('tick_volume', 'spread', 'real_volume'):
+            df[col] = df[col].astype(np.int64)
+
+        return df
+
+    def query_candles_arrays(
+        self,
+        symbol: str,
+        timeframe: str,
+        start: Optional[Union[datetime, int]] = None,
+        end: Optional[Union[datetime, int]] = None,
+        order: str = 'asc',
+        columns: Optional[List[str]] = None,
+        structured: bool = False,
+        limit: Optional[int] = None
+    ) -> Union[Dict[str, np.ndarray], np.ndarray]:
+        """
+        查詢 K 線數據並直接回傳 NumPy 陣列
+
+        逐列從游標填入 NumPy 陣列，不經過 DataFrame 和 Python 物件的中間表示，
+        且只讀取 columns 指定的欄位。
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 時間週期
+            start: 起始時間（datetime 或 UTC epoch 秒，含）
+            end: 結束時間（datetime 或 UTC epoch 秒，含）
+            order: 時間排序方向，'asc' 或 'desc'（預設 'asc'）
+            columns: 要讀取的欄位（預設為 MT5 rates 的全部欄位）
+            structured: True 時回傳與 MT5 rates 相同 dtype 的結構化陣列
+            limit: 最多回傳的筆數（依 order 排序後取前 limit 筆）
+
+        回傳：
+            欄位名稱 -> 連續記憶體 NumPy 陣列的字典，或結構化陣列
+            （time 為 int64 epoch 秒）
+
+        例外：
+            ValueError: 欄位名稱或排序方向無效時
+        """
+        columns = list(columns) if columns is not None else list(self.RATES_DTYPE.names)
+
+        unknown = [col for col in columns if col not in self.RATES_DTYPE.names]
+        if unknown or not columns:
+            raise ValueError(f"無效的欄位：{unknown or columns}")
+
+        order_sql = {'asc': 'ASC', 'desc': 'DESC'}.get(order.lower())
+        if order_sql is None:
+            raise ValueError(f"無效的排序方向：{order}")
+
+        dtype = np.dtype([(col, self.RATES_DTYPE[col]) for col in columns])
+
+        conn = self._pool.acquire_reader()
+
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+
+            # 欄位名稱已對照 RATES_DTYPE 驗證，可安全組入 SQL
+            query = f"""
+                SELECT {', '.join(columns)}
                 FROM candles
+                WHERE symbol_id = ? AND timeframe_id = ?
+            """
+
+            symbol_id = self._get_symbol_id(cursor, symbol)
+            params = [symbol_id, self._get_timeframe_id(timeframe)]
+
+            if start is not None:
+                query += " AND time >= ?"
+                params.append(self._to_epoch_param(start))
+
+            if end is not None:
+                query += " AND time <= ?"
+                params.append(self._to_epoch_param(end))
+
+            query += f" ORDER BY time {order_sql}"
+
+            if limit is not None:
+                query += " LIMIT ?"
+                params.append(int(limit))
+
+            # 未知商品時 symbol_id 為 None，回傳空陣列
+            cursor.execute(query, params)
+            rates = np.fromiter(cursor, dtype=dtype)
+
+            logger.debug(f"從快取查詢到 {len(rates)} 筆 K 線數據：{symbol} {timeframe}")
+
+            if structured:
+                return rates
+
+            return {col: np.ascontiguousarray(rates[col]) for col in columns}
+
+        except Exception as e:
+            logger.error(f"查詢 K 線數據失敗：{e}")
+            raise
+        finally:
+            self._pool.release(conn)
+
+    def get_cache_info(
+        self,
+        symbol: str,
+        timeframe: str
+    ) -> Optional[Dict]:
+        """
+        取得快取資訊
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 時間週期
+
+        回傳：
+            快取資訊字典，若無快取則回傳 None
+        """
+        conn = self._pool.acquire_reader()
+
+        try:
+            query = """
+                SELECT * FROM cache_metadata
                 WHERE symbol = ? AND timeframe = ?
             """
 
@@ -370,20 +1030,51 @@ class SQLiteCacheManager:
             cursor.execute(query, (symbol, timeframe))
             row = cursor.fetchone()
 
-            if row and row['oldest_time']:
+            if row:
+                return dict(row)
+            else:
+                return None
+
+        finally:
+            self._pool.release(conn)
+
+    def get_oldest_time(
+        self,
+        symbol: str,
+        timeframe: str
+    ) -> Optional[datetime]:
+        """
+        取得指定商品和週期的最早數據時間
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 時間週期
+
+        回傳：
+            最早的時間戳，若無數據則回傳 None
+        """
+        conn = self._pool.acquire_reader()
+
+        try:
+            query = """
+                SELECT MIN(time) as oldest_time
+                FROM candles
+                WHERE symbol_id = ? AND timeframe_id = ?
+            """
+
+            cursor = conn.cursor()
+            symbol_id = self._get_symbol_id(cursor, symbol)
+            cursor.execute(query, (symbol_id, self._get_timeframe_id(timeframe)))
+            row = cursor.fetchone()
+
+            if row and row['oldest_time'] is not None:
                 # 轉換為 datetime（UTC）
-                oldest_str = row['oldest_time']
-                if isinstance(oldest_str, str):
-                    return datetime.fromisoformat(oldest_str.replace('Z', '+00:00'))
-                elif isinstance(oldest_str, datetime):
-                    return oldest_str.replace(tzinfo=timezone.utc)
-                else:
-                    return None
+                return self._epoch_to_datetime(row['oldest_time'])
             else:
                 return None
 
         finally:
-            conn.close()
+            self._pool.release(conn)
 
     def get_newest_time(
         self,
@@ -391,134 +1082,1011 @@ class SQLiteCacheManager:
         timeframe: str
     ) -> Optional[datetime]:
         """
-        取得指定商品和週期的最新數據時間
+        取得指定商品和週期的最新數據時間
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 時間週期
+
+        回傳：
+            最新的時間戳，若無數據則回傳 None
+        """
+        conn = self._pool.acquire_reader()
+
+        try:
+            query = """
+                SELECT MAX(time) as newest_time
+                FROM candles
+                WHERE symbol_id = ? AND timeframe_id = ?
+            """
+
+            cursor = conn.cursor()
+            symbol_id = self._get_symbol_id(cursor, symbol)
+            cursor.execute(query, (symbol_id, self._get_timeframe_id(timeframe)))
+            row = cursor.fetchone()
+
+            if row and row['newest_time'] is not None:
+                # 轉換為 datetime（UTC）
+                return self._epoch_to_datetime(row['newest_time'])
+            else:
+                return None
+
+        finally:
+            self._pool.release(conn)
+
+    def get_record_count(
+        self,
+        symbol: str,
+        timeframe: str
+    ) -> int:
+        """
+        取得指定商品和週期的數據筆數
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 時間週期
+
+        回傳：
+            數據筆數
+        """
+        conn = self._pool.acquire_reader()
+
+        try:
+            query = """
+                SELECT COUNT(*) as count
+                FROM candles
+                WHERE symbol_id = ? AND timeframe_id = ?
+            """
+
+            cursor = conn.cursor()
+            symbol_id = self._get_symbol_id(cursor, symbol)
+            cursor.execute(query, (symbol_id, self._get_timeframe_id(timeframe)))
+            row = cursor.fetchone()
+
+            return row['count'] if row else 0
+
+        finally:
+            self._pool.release(conn)
+
+    def clear_cache(
+        self,
+        symbol: Optional[str] = None,
+        timeframe: Optional[str] = None
+    ) -> int:
+        """
+        清除快取數據
+
+        參數：
+            symbol: 商品代碼（若為 None 則清除所有商品）
+            timeframe: 時間週期（若為 None 則清除所有週期）
+
+        回傳：
+            刪除的記錄數
+        """
+        conn = self._pool.acquire_writer()
+        cursor = conn.cursor()
+
+        try:
+            query = "DELETE FROM candles WHERE 1=1"
+            params = []
+
+            if symbol:
+                query += " AND symbol_id IN (SELECT symbol_id FROM symbols WHERE symbol = ?)"
+                params.append(symbol)
+
+            if timeframe:
+                query += " AND timeframe_id = ?"
+                params.append(self._get_timeframe_id(timeframe))
+
+            cursor.execute(query, params)
+            deleted_count = cursor.rowcount
+
+            # 同步刪除涵蓋範圍
+            coverage_query = query.replace("DELETE FROM candles", "DELETE FROM candle_coverage", 1)
+            cursor.execute(coverage_query, params)
+
+            # 同步刪除回填檢查點
+            checkpoint_query = query.replace(
+                "DELETE FROM candles", "DELETE FROM backfill_checkpoints", 1
+            )
+            cursor.execute(checkpoint_query, params)
+
+            # 同步刪除衍生週期登記
+            materialized_query = query.replace(
+                "DELETE FROM candles", "DELETE FROM materialized_series", 1
+            )
+            cursor.execute(materialized_query, params)
+
+            # 同步刪除元數據
+            meta_query = "DELETE FROM cache_metadata WHERE 1=1"
+            meta_params = []
+
+            if symbol:
+                meta_query += " AND symbol = ?"
+                meta_params.append(symbol)
+
+            if timeframe:
+                meta_query += " AND timeframe = ?"
+                meta_params.append(timeframe)
+
+            cursor.execute(meta_query, meta_params)
+
+            # 同步刪除指標結果快取（欄位與元數據表相同）
+            cursor.execute(
+                meta_query.replace(
+                    "DELETE FROM cache_metadata", "DELETE FROM indicator_results", 1
+                ),
+                meta_params,
+            )
+
+            conn.commit()
+            logger.info(f"已清除 {deleted_count} 筆快取數據")
+
+            return deleted_count
+
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"清除快取失敗：{e}")
+            raise
+        finally:
+            self._pool.release(conn)
+
+    # ========================================================================
+    # Materialized Series
+    # ========================================================================
+
+    def materialize_timeframe(
+        self,
+        symbol: str,
+        timeframe: str,
+        source_timeframe: str = 'M1',
+        session_offset: int = 0
+    ) -> int:
+        """
+        登記由低週期在本地合成的衍生週期，並以現有來源數據完整建立
+
+        登記後，來源週期每次寫入新 K 線都會增量更新此衍生週期，
+        查詢衍生週期時即可直接使用 query_candles / query_latest，不必向 MT5 取得。
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 衍生時間週期（例如 'H1'）
+            source_timeframe: 來源時間週期（預設 'M1'）
+            session_offset: D1/W1/MN1 日界線的平移秒數（預設 0，即伺服器時間 00:00）
+
+        回傳：
+            寫入的衍生 K 線數量
+
+        例外：
+            ValueError: 衍生週期不是來源週期的整數倍時
+        """
+        timeframe_id = self._get_timeframe_id(timeframe)
+        source_timeframe_id = self._get_timeframe_id(source_timeframe)
+
+        if timeframe_id <= source_timeframe_id or (
+            timeframe not in resampler.SESSION_TIMEFRAMES
+            and timeframe_id % source_timeframe_id != 0
+        ):
+            raise ValueError(f"衍生週期 {timeframe} 必須是來源週期 {source_timeframe} 的整數倍")
+
+        conn = self._pool.acquire_writer()
+        cursor = conn.cursor()
+
+        try:
+            symbol_id = self._get_symbol_id(cursor, symbol, create=True)
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO materialized_series (
+                    symbol_id, timeframe_id, source_timeframe_id,
+                    session_offset, last_source_time
+                )
+                VALUES (?, ?, ?, ?, NULL)
+                """,
+                (symbol_id, timeframe_id, source_timeframe_id, int(session_offset))
+            )
+            conn.commit()
+
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"登記衍生週期失敗：{e}")
+            raise
+        finally:
+            self._pool.release(conn)
+
+        logger.info(f"已登記衍生週期：{symbol} {source_timeframe} -> {timeframe}")
+
+        return self.refresh_materialized(
+            symbol, source_timeframe=source_timeframe, timeframes=[timeframe]
+        ).get(timeframe, 0)
+
+    def ensure_materialized(
+        self,
+        symbol: str,
+        timeframe: str,
+        source_timeframe: str = 'M1'
+    ) -> bool:
+        """
+        確保衍生週期已登記（來源週期有數據且尚未登記時自動登記並建立）
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 衍生時間週期
+            source_timeframe: 來源時間週期（預設 'M1'）
+
+        回傳：
+            衍生週期是否由本地合成
+        """
+        timeframe_id = self._get_timeframe_id(timeframe)
+        source_timeframe_id = self._get_timeframe_id(source_timeframe)
+
+        if timeframe_id <= source_timeframe_id or (
+            timeframe not in resampler.SESSION_TIMEFRAMES
+            and timeframe_id % source_timeframe_id != 0
+        ):
+            return False
+
+        registered = self._get_materialized(symbol, source_timeframe)
+        if any(row['timeframe'] == timeframe for row in registered):
+            return True
+
+        if self.get_newest_time(symbol, source_timeframe) is None:
+            return False
+
+        self.materialize_timeframe(symbol, timeframe, source_timeframe)
+        return True
+
+    def refresh_materialized(
+        self,
+        symbol: str,
+        source_timeframe: str = 'M1',
+        start: Optional[Union[datetime, int]] = None,
+        end: Optional[Union[datetime, int]] = None,
+        timeframes: Optional[List[str]] = None
+    ) -> Dict[str, int]:
+        """
+        以來源週期的 K 線重新合成衍生週期
+
+        只重算 [start, end] 所在的衍生 K 線；未指定 start 時從上次合成的
+        最新來源時間所在的 K 線開始（該 K 線可能尚未完成），未曾合成則完整建立。
+        只有完整落在來源涵蓋區間內的衍生 K 線才會寫入，且不覆寫已存在的記錄。
+
+        參數：
+            symbol: 商品代碼
+            source_timeframe: 來源時間週期
+            start: 來源範圍起點（datetime 或 epoch 秒）
+            end: 來源範圍終點（datetime 或 epoch 秒，None 表示到最新）
+            timeframes: 只更新指定的衍生週期（預設全部）
+
+        回傳：
+            衍生週期 -> 新寫入 K 線數量的字典
+        """
+        registered = self._get_materialized(symbol, source_timeframe)
+        if timeframes is not None:
+            registered = [row for row in registered if row['timeframe'] in timeframes]
+
+        results = {}
+
+        for row in registered:
+            timeframe = row['timeframe']
+            offset = row['session_offset']
+
+            if start is not None:
+                range_start = self._to_epoch_param(start)
+            else:
+                range_start = row['last_source_time']
+
+            # 擴展到完整的衍生 K 線邊界
+            query_start = query_end = None
+            if range_start is not None:
+                query_start = int(resampler.bucket_starts([range_start], timeframe, offset)[0])
+            if end is not None:
+                last_bucket = resampler.bucket_starts(
+                    [self._to_epoch_param(end)], timeframe, offset
+                )
+                query_end = int(resampler.bucket_ends(last_bucket, timeframe, offset)[0]) - 1
+
+            rates = self.query_candles_arrays(
+                symbol, source_timeframe, start=query_start, end=query_end, structured=True
+            )
+
+            if len(rates) == 0:
+                results[timeframe] = 0
+                continue
+
+            bars = resampler.resample_rates(rates, timeframe, offset)
+            inserted = self._write_materialized(
+                symbol, source_timeframe, timeframe, offset, bars, int(rates['time'][-1])
+            )
+
+            results[timeframe] = inserted
+            logger.debug(f"已合成 {inserted} 根 {symbol} {timeframe}（來源 {source_timeframe}）")
+
+        return results
+
+    def _get_materialization(self, symbol: str, timeframe: str) -> Optional[Dict]:
+        """
+        查詢衍生週期的登記資料
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 衍生時間週期
+
+        回傳：
+            {'source_timeframe', 'session_offset'}，未登記時回傳 None
+        """
+        conn = self._pool.acquire_reader()
+
+        try:
+            cursor = conn.cursor()
+            symbol_id = self._get_symbol_id(cursor, symbol)
+
+            if symbol_id is None:
+                return None
+
+            cursor.execute(
+                """
+                SELECT t.timeframe AS source_timeframe, m.session_offset
+                FROM materialized_series m
+                JOIN timeframes t ON t.timeframe_id = m.source_timeframe_id
+                WHERE m.symbol_id = ? AND m.timeframe_id = ?
+                """,
+                (symbol_id, self._get_timeframe_id(timeframe))
+            )
+            row = cursor.fetchone()
+
+            return dict(row) if row is not None else None
+
+        finally:
+            self._pool.release(conn)
+
+    def _developing_bar(
+        self,
+        symbol: str,
+        timeframe: str,
+        last_time: Optional[int]
+    ) -> Optional[np.ndarray]:
+        """
+        以來源 K 線合成衍生週期尚未完成的最新 K 線（不寫入資料庫）
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 衍生時間週期
+            last_time: 已儲存的最新衍生 K 線時間（epoch 秒，None 表示沒有）
+
+        回傳：
+            最新來源 K 線所在的衍生 K 線（長度 1 的結構化陣列）；
+            不是衍生週期、沒有來源數據或該 K 線已儲存時回傳 None
+        """
+        materialization = self._get_materialization(symbol, timeframe)
+        if materialization is None:
+            return None
+
+        source_timeframe = materialization['source_timeframe']
+        offset = materialization['session_offset']
+
+        newest_time = self.get_newest_time(symbol, source_timeframe)
+        if newest_time is None:
+            return None
+
+        bucket_start = int(
+            resampler.bucket_starts([self._datetime_to_epoch(newest_time)], timeframe, offset)[0]
+        )
+        if last_time is not None and bucket_start <= last_time:
+            return None
+
+        rates = self.query_candles_arrays(
+            symbol, source_timeframe, start=bucket_start, structured=True
+        )
+        return resampler.resample_rates(rates, timeframe, offset)
+
+    def _get_materialized(self, symbol: str, source_timeframe: str) -> List[Dict]:
+        """
+        查詢由指定來源週期衍生的週期
+
+        參數：
+            symbol: 商品代碼
+            source_timeframe: 來源時間週期
+
+        回傳：
+            登記資料列表 [{'timeframe', 'session_offset', 'last_source_time'}, ...]
+        """
+        conn = self._pool.acquire_reader()
+
+        try:
+            cursor = conn.cursor()
+            symbol_id = self._get_symbol_id(cursor, symbol)
+
+            if symbol_id is None:
+                return []
+
+            cursor.execute(
+                """
+                SELECT t.timeframe, m.session_offset, m.last_source_time
+                FROM materialized_series m
+                JOIN timeframes t ON t.timeframe_id = m.timeframe_id
+                WHERE m.symbol_id = ? AND m.source_timeframe_id = ?
+                ORDER BY m.timeframe_id
+                """,
+                (symbol_id, self._get_timeframe_id(source_timeframe))
+            )
+
+            return [dict(row) for row in cursor.fetchall()]
+
+        finally:
+            self._pool.release(conn)
+
+    def _write_materialized(
+        self,
+        symbol: str,
+        source_timeframe: str,
+        timeframe: str,
+        session_offset: int,
+        bars: np.ndarray,
+        last_source_time: int
+    ) -> int:
+        """
+        寫入完整的衍生 K 線、記錄涵蓋範圍並推進合成進度
+
+        只有完整落在來源週期已涵蓋區間內的衍生 K 線才寫入並記錄為已涵蓋，
+        來源數據有缺口或 K 線尚未完成時不產生不完整的衍生 K 線。
+        已存在的記錄（例如由 MT5 取得的 K 線）不會被覆寫，也不增加 fetch_count。
+
+        參數：
+            symbol: 商品代碼
+            source_timeframe: 來源時間週期
+            timeframe: 衍生時間週期
+            session_offset: D1/W1/MN1 日界線的平移秒數
+            bars: 本次合成的衍生 K 線
+            last_source_time: 本次使用的最新來源 K 線時間
+
+        回傳：
+            新寫入的衍生 K 線數量
+        """
+        timeframe_id = self._get_timeframe_id(timeframe)
+        source_timeframe_id = self._get_timeframe_id(source_timeframe)
+        source_step = source_timeframe_id * 60
+        inserted = 0
+
+        conn = self._pool.acquire_writer()
+        cursor = conn.cursor()
+
+        try:
+            symbol_id = self._get_symbol_id(cursor, symbol, create=True)
+
+            starts = bars['time']
+            ends = resampler.bucket_ends(starts, timeframe, session_offset)
+
+            for cov_start, cov_end in self._get_coverage(
+                cursor, symbol_id, source_timeframe_id, int(starts[0]), int(ends[-1])
+            ):
+                complete = bars[(starts >= cov_start) & (ends - source_step <= cov_end)]
+                if len(complete) == 0:
+                    continue
+
+                time_min = int(complete['time'][0])
+                time_max = int(complete['time'][-1])
+                before = self._count_range(cursor, symbol_id, timeframe_id, time_min, time_max)
+
+                records = zip(
+                    repeat(symbol_id), repeat(timeframe_id), complete['time'].tolist(),
+                    *(complete[col].tolist() for col in self.CANDLE_VALUE_COLUMNS)
+                )
+                cursor.executemany(self._INSERT_MISSING_CANDLES_SQL, records)
+
+                added = (
+                    self._count_range(cursor, symbol_id, timeframe_id, time_min, time_max) - before
+                )
+                inserted += added
+
+                self._update_metadata(
+                    cursor, symbol, timeframe,
+                    self._format_epoch(time_min), self._format_epoch(time_max), added,
+                    fetch_increment=0
+                )
+                self._mark_coverage(cursor, symbol_id, timeframe_id, time_min, time_max)
+
+            cursor.execute(
+                """
+                UPDATE materialized_series
+                SET last_source_time = MAX(COALESCE(last_source_time, 0), ?)
+                WHERE symbol_id = ? AND timeframe_id = ?
+                """,
+                (last_source_time, symbol_id, timeframe_id)
+            )
+            conn.commit()
+
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"寫入衍生週期失敗：{e}")
+            raise
+        finally:
+            self._pool.release(conn)
+
+        return inserted
+
+    # ========================================================================
+    # Ticks
+    # ========================================================================
+
+    @staticmethod
+    def _to_msc_param(value: Union[datetime, int]) -> int:
+        """將 datetime（無時區視為 UTC）或 epoch 毫秒整數轉為 epoch 毫秒"""
+        if isinstance(value, datetime):
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+            return int(round(value.timestamp() * 1000))
+        return int(value)
+
+    def _extract_tick_columns(
+        self, ticks: Union[pd.DataFrame, np.ndarray]
+    ) -> Dict[str, np.ndarray]:
+        """
+        取出 Tick 欄位並轉為 TICKS_DTYPE 的型別
+
+        參數：
+            ticks: MT5 copy_ticks_* 回傳的結構化陣列或同欄位的 DataFrame
+                   （成交量優先使用 volume_real，沒有時使用 volume）
+
+        回傳：
+            欄位名稱對應 NumPy 陣列的字典
+
+        例外：
+            ValueError: 缺少必要欄位時
+        """
+        available = set(
+            ticks.columns if isinstance(ticks, pd.DataFrame) else ticks.dtype.names or ()
+        )
+        volume_column = 'volume_real' if 'volume_real' in available else 'volume'
+
+        source = {name: name for name in self.TICKS_DTYPE.names}
+        source['volume'] = volume_column
+
+        missing_columns = [col for col in source.values() if col not in available]
+        if missing_columns:
+            raise ValueError(f"缺少必要欄位：{missing_columns}")
+
+        return {
+            name: np.asarray(ticks[col]).astype(self.TICKS_DTYPE[name], copy=False)
+            for name, col in source.items()
+        }
+
+    def _encode_tick_column(self, name: str, values: np.ndarray) -> bytes:
+        """壓縮單一 Tick 欄位（time_msc 先做差分，壓縮率高得多）"""
+        if name == 'time_msc':
+            values = np.diff(values, prepend=np.int64(0))
+        return zlib.compress(
+            np.ascontiguousarray(values, dtype=self.TICKS_DTYPE[name]).tobytes(), 1
+        )
+
+    def _decode_tick_column(self, name: str, blob: bytes) -> np.ndarray:
+        """解壓縮單一 Tick 欄位"""
+        values = np.frombuffer(zlib.decompress(blob), dtype=self.TICKS_DTYPE[name])
+        if name == 'time_msc':
+            return np.cumsum(values)
+        return values
+
+    def insert_ticks(
+        self,
+        ticks: Union[pd.DataFrame, np.ndarray],
+        symbol: str
+    ) -> Dict[str, int]:
+        """
+        寫入 Tick 數據
+
+        依 TICK_CHUNK_MSC 切成區塊，每個區塊一列。區塊已存在時，
+        舊數據中落在本次寫入時間範圍內的 Tick 由新數據取代，範圍外的保留，
+        因此重複抓取同一段時間不會產生重複的 Tick。
+
+        參數：
+            ticks: MT5 copy_ticks_* 回傳的結構化陣列或同欄位的 DataFrame
+            symbol: 商品代碼
+
+        回傳：
+            統計字典 {'ticks': 寫入筆數, 'chunks': 寫入區塊數}
+
+        例外：
+            ValueError: 缺少必要欄位時
+        """
+        stats = {'ticks': 0, 'chunks': 0}
+
+        if ticks is None or len(ticks) == 0:
+            logger.warning("輸入 Tick 數據為空，略過插入")
+            return stats
+
+        columns = self._extract_tick_columns(ticks)
+        times = columns['time_msc']
+
+        if np.any(times[1:] < times[:-1]):
+            order = np.argsort(times, kind='stable')
+            columns = {name: values[order] for name, values in columns.items()}
+            times = columns['time_msc']
+
+        chunk_ids = times // self.TICK_CHUNK_MSC * self.TICK_CHUNK_MSC
+        bounds = np.concatenate([[0], np.flatnonzero(np.diff(chunk_ids)) + 1, [len(times)]])
+
+        conn = self._pool.acquire_writer()
+        cursor = conn.cursor()
+
+        try:
+            symbol_id = self._get_symbol_id(cursor, symbol, create=True)
+
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                chunk_start = int(chunk_ids[start])
+                chunk = {name: values[start:end] for name, values in columns.items()}
+
+                existing = self._read_tick_chunk(cursor, symbol_id, chunk_start)
+                if existing is not None:
+                    first, last = chunk['time_msc'][0], chunk['time_msc'][-1]
+                    before = existing['time_msc'] < first
+                    after = existing['time_msc'] > last
+                    chunk = {
+                        name: np.concatenate(
+                            [existing[name][before], chunk[name], existing[name][after]]
+                        )
+                        for name in chunk
+                    }
+
+                cursor.execute(
+                    f"""
+                    INSERT OR REPLACE INTO ticks (
+                        symbol_id, chunk_start, first_msc, last_msc, tick_count,
+                        {', '.join(self.TICKS_DTYPE.names)}
+                    )
+                    VALUES (?, ?, ?, ?, ?, {', '.join('?' * len(self.TICKS_DTYPE.names))})
+                    """,
+                    (
+                        symbol_id,
+                        chunk_start,
+                        int(chunk['time_msc'][0]),
+                        int(chunk['time_msc'][-1]),
+                        len(chunk['time_msc']),
+                        *(
+                            self._encode_tick_column(name, chunk[name])
+                            for name in self.TICKS_DTYPE.names
+                        ),
+                    ),
+                )
+                stats['chunks'] += 1
+
+            conn.commit()
+            stats['ticks'] = len(times)
+
+            logger.info(
+                f"成功寫入 {stats['ticks']} 筆 Tick 數據：{symbol}（{stats['chunks']} 個區塊）"
+            )
+
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"插入 Tick 數據失敗：{e}")
+            raise
+        finally:
+            self._pool.release(conn)
+
+        return stats
+
+    def _read_tick_chunk(
+        self,
+        cursor: sqlite3.Cursor,
+        symbol_id: int,
+        chunk_start: int,
+        columns: Optional[List[str]] = None
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """讀取並解壓縮單一 Tick 區塊（不存在時回傳 None）"""
+        columns = list(columns or self.TICKS_DTYPE.names)
+
+        # 欄位名稱已對照 TICKS_DTYPE 驗證，可安全組入 SQL
+        row = cursor.execute(
+            f"SELECT {', '.join(columns)} FROM ticks WHERE symbol_id = ? AND chunk_start = ?",
+            (symbol_id, chunk_start)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        return {name: self._decode_tick_column(name, blob) for name, blob in zip(columns, row)}
+
+    def iter_tick_chunks(
+        self,
+        symbol: str,
+        start: Optional[Union[datetime, int]] = None,
+        end: Optional[Union[datetime, int]] = None,
+        columns: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        依時間順序逐區塊讀取 Tick 數據
+
+        一次只解壓縮一個區塊（約一小時的 Tick），一整天數千萬筆 Tick
+        也只需要單一區塊大小的記憶體。
+
+        參數：
+            symbol: 商品代碼
+            start: 起始時間（datetime 或 UTC epoch 毫秒，含）
+            end: 結束時間（datetime 或 UTC epoch 毫秒，含）
+            columns: 要讀取的欄位（預設為 TICKS_DTYPE 的全部欄位，time_msc 一定會讀取）
+
+        回傳：
+            產生器，每個區塊一個「欄位名稱 -> NumPy 陣列」字典（已依 start / end 裁切）
+
+        例外：
+            ValueError: 欄位名稱無效時
+        """
+        columns = list(columns) if columns is not None else list(self.TICKS_DTYPE.names)
+
+        unknown = [col for col in columns if col not in self.TICKS_DTYPE.names]
+        if unknown or not columns:
+            raise ValueError(f"無效的欄位：{unknown or columns}")
+
+        if 'time_msc' not in columns:
+            columns = ['time_msc'] + columns
+
+        start_msc = self._to_msc_param(start) if start is not None else None
+        end_msc = self._to_msc_param(end) if end is not None else None
+
+        conn = self._pool.acquire_reader()
+
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            symbol_id = self._get_symbol_id(cursor, symbol)
+
+            if symbol_id is None:
+                return
+
+            # 先取得區塊清單，之後逐一讀取，不在產生器暫停期間佔用查詢游標
+            query = "SELECT chunk_start FROM ticks WHERE symbol_id = ?"
+            params = [symbol_id]
+
+            if start_msc is not None:
+                query += " AND last_msc >= ?"
+                params.append(start_msc)
+
+            if end_msc is not None:
+                query += " AND first_msc <= ?"
+                params.append(end_msc)
+
+            chunk_starts = [
+                row[0] for row in cursor.execute(query + " ORDER BY chunk_start", params)
+            ]
+
+            for chunk_start in chunk_starts:
+                chunk = self._read_tick_chunk(cursor, symbol_id, chunk_start, columns)
+                if chunk is None:
+                    continue
+
+                times = chunk['time_msc']
+                lo = np.searchsorted(times, start_msc, side='left') if start_msc is not None else 0
+                hi = (
+                    np.searchsorted(times, end_msc, side='right')
+                    if end_msc is not None
+                    else len(times)
+                )
+
+                if hi > lo:
+                    yield {name: values[lo:hi] for name, values in chunk.items()}
+
+        finally:
+            self._pool.release(conn)
+
+    def get_tick_range(self, symbol: str) -> Optional[Dict]:
+        """
+        取得已儲存的 Tick 時間範圍與筆數
+
+        參數：
+            symbol: 商品代碼
+
+        回傳：
+            {'first_msc': int, 'last_msc': int, 'tick_count': int, 'chunks': int}，
+            沒有 Tick 時回傳 None
+        """
+        conn = self._pool.acquire_reader()
+
+        try:
+            row = conn.execute(
+                """
+                SELECT MIN(t.first_msc), MAX(t.last_msc), SUM(t.tick_count), COUNT(*)
+                FROM ticks t
+                JOIN symbols s ON s.symbol_id = t.symbol_id
+                WHERE s.symbol = ?
+                """,
+                (symbol,)
+            ).fetchone()
+
+            if row is None or row[3] == 0:
+                return None
+
+            return {
+                'first_msc': row[0],
+                'last_msc': row[1],
+                'tick_count': row[2],
+                'chunks': row[3]
+            }
+
+        finally:
+            self._pool.release(conn)
+
+    # ========================================================================
+    # Indicator Results
+    # ========================================================================
+
+    def get_indicator_result(self, cache_key: str, now: Optional[int] = None) -> Optional[Dict]:
+        """
+        讀取未過期的指標結果快取
+
+        參數：
+            cache_key: 快取鍵字串
+            now: 目前時間（UTC epoch 秒，預設為現在）
+
+        回傳：
+            {'result': JSON 字串, 'created_at': int, 'expires_at': int}，
+            不存在或已過期時回傳 None
+        """
+        if now is None:
+            now = int(datetime.now(timezone.utc).timestamp())
+
+        conn = self._pool.acquire_reader()
+
+        try:
+            row = conn.execute(
+                """
+                SELECT result, created_at, expires_at
+                FROM indicator_results
+                WHERE cache_key = ? AND expires_at > ?
+                """,
+                (cache_key, now)
+            ).fetchone()
+
+            return dict(row) if row is not None else None
+
+        finally:
+            self._pool.release(conn)
+
+    def save_indicator_result(
+        self,
+        cache_key: str,
+        indicator: str,
+        symbol: str,
+        timeframe: str,
+        result: str,
+        expires_at: int
+    ) -> None:
+        """
+        寫入指標結果快取（覆蓋同鍵的舊結果），並順帶刪除已過期的結果
 
         參數：
+            cache_key: 快取鍵字串
+            indicator: 指標名稱
             symbol: 商品代碼
             timeframe: 時間週期
-
-        回傳：
-            最新的時間戳，若無數據則回傳 None
+            result: 計算結果（JSON 字串）
+            expires_at: 過期時間（UTC epoch 秒）
         """
-        conn = self._get_connection()
-
-        try:
-            query = """
-                SELECT MAX(time) as newest_time
-                FROM candles
-                WHERE symbol = ? AND timeframe = ?
-            """
+        now = int(datetime.now(timezone.utc).timestamp())
 
-            cursor = conn.cursor()
-            cursor.execute(query, (symbol, timeframe))
-            row = cursor.fetchone()
+        conn = self._pool.acquire_writer()
 
-            if row and row['newest_time']:
-                # 轉換為 datetime（UTC）
-                newest_str = row['newest_time']
-                if isinstance(newest_str, str):
-                    return datetime.fromisoformat(newest_str.replace('Z', '+00:00'))
-                elif isinstance(newest_str, datetime):
-                    return newest_str.replace(tzinfo=timezone.utc)
-                else:
-                    return None
-            else:
-                return None
+        try:
+            conn.execute("DELETE FROM indicator_results WHERE expires_at <= ?", (now,))
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO indicator_results (
+                    cache_key, indicator, symbol, timeframe, result, created_at, expires_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (cache_key, indicator, symbol, timeframe, result, now, expires_at)
+            )
+            conn.commit()
 
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"寫入指標結果快取失敗：{e}")
+            raise
         finally:
-            conn.close()
+            self._pool.release(conn)
 
-    def get_record_count(
+    # ========================================================================
+    # Backfill Checkpoints
+    # ========================================================================
+
+    def get_backfill_checkpoint(
         self,
         symbol: str,
         timeframe: str
-    ) -> int:
+    ) -> Optional[Dict]:
         """
-        取得指定商品和週期的數據筆數
+        取得回填進度檢查點
 
         參數：
             symbol: 商品代碼
             timeframe: 時間週期
 
         回傳：
-            數據筆數
+            檢查點字典（next_end_time 為 UTC datetime），若無則回傳 None
         """
-        conn = self._get_connection()
+        conn = self._pool.acquire_reader()
 
         try:
-            query = """
-                SELECT COUNT(*) as count
-                FROM candles
-                WHERE symbol = ? AND timeframe = ?
-            """
-
             cursor = conn.cursor()
-            cursor.execute(query, (symbol, timeframe))
+            symbol_id = self._get_symbol_id(cursor, symbol)
+
+            if symbol_id is None:
+                return None
+
+            cursor.execute(
+                """
+                SELECT next_end_time, rows_written, batches, status, updated_at
+                FROM backfill_checkpoints
+                WHERE symbol_id = ? AND timeframe_id = ?
+                """,
+                (symbol_id, self._get_timeframe_id(timeframe))
+            )
             row = cursor.fetchone()
 
-            return row['count'] if row else 0
+            if row is None:
+                return None
+
+            return {
+                'symbol': symbol,
+                'timeframe': timeframe,
+                'next_end_time': self._epoch_to_datetime(row['next_end_time']),
+                'rows_written': row['rows_written'],
+                'batches': row['batches'],
+                'status': row['status'],
+                'updated_at': self._epoch_to_datetime(row['updated_at'])
+            }
 
         finally:
-            conn.close()
+            self._pool.release(conn)
 
-    def clear_cache(
+    def save_backfill_checkpoint(
         self,
-        symbol: Optional[str] = None,
-        timeframe: Optional[str] = None
-    ) -> int:
+        symbol: str,
+        timeframe: str,
+        next_end_time: Union[datetime, int],
+        rows_written: int,
+        batches: int,
+        status: str = 'running'
+    ) -> None:
         """
-        清除快取數據
+        寫入回填進度檢查點（覆蓋同一商品、週期的舊檢查點）
 
         參數：
-            symbol: 商品代碼（若為 None 則清除所有商品）
-            timeframe: 時間週期（若為 None 則清除所有週期）
-
-        回傳：
-            刪除的記錄數
+            symbol: 商品代碼
+            timeframe: 時間週期
+            next_end_time: 下一批次往前抓取的起點
+            rows_written: 累計寫入筆數
+            batches: 累計批次數
+            status: 狀態（running, completed, failed）
         """
-        conn = self._get_connection()
+        timeframe_id = self._get_timeframe_id(timeframe)
+
+        conn = self._pool.acquire_writer()
         cursor = conn.cursor()
 
         try:
-            query = "DELETE FROM candles WHERE 1=1"
-            params = []
-
-            if symbol:
-                query += " AND symbol = ?"
-                params.append(symbol)
-
-            if timeframe:
-                query += " AND timeframe = ?"
-                params.append(timeframe)
-
-            cursor.execute(query, params)
-            deleted_count = cursor.rowcount
-
-            # 同步刪除元數據
-            meta_query = "DELETE FROM cache_metadata WHERE 1=1"
-            meta_params = []
-
-            if symbol:
-                meta_query += " AND symbol = ?"
-                meta_params.append(symbol)
-
-            if timeframe:
-                meta_query += " AND timeframe = ?"
-                meta_params.append(timeframe)
-
-            cursor.execute(meta_query, meta_params)
-
+            symbol_id = self._get_symbol_id(cursor, symbol, create=True)
+            cursor.execute(
+                """
+                INSERT OR REPLACE INTO backfill_checkpoints (
+                    symbol_id, timeframe_id, next_end_time,
+                    rows_written, batches, status, updated_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    symbol_id, timeframe_id, self._to_epoch_param(next_end_time),
+                    rows_written, batches, status,
+                    int(datetime.now(timezone.utc).timestamp())
+                )
+            )
             conn.commit()
-            logger.info(f"已清除 {deleted_count} 筆快取數據")
-
-            return deleted_count
 
         except Exception as e:
             conn.rollback()
-            logger.error(f"清除快取失敗：{e}")
+            logger.error(f"寫入回填檢查點失敗：{e}")
             raise
         finally:
-            conn.close()
+            self._pool.release(conn)
 
     # ========================================================================
     # Phase 2: Smart Query Functions
@@ -543,17 +2111,35 @@ class SQLiteCacheManager:
         回傳：
             True 如果快取完全涵蓋請求範圍
         """
-        cache_info = self.get_cache_info(symbol, timeframe)
+        return not self.identify_missing_ranges(symbol, timeframe, from_date, to_date)
 
-        if cache_info is None:
-            return False
+    def is_stale(
+        self,
+        symbol: str,
+        timeframe: str,
+        now: Optional[datetime] = None
+    ) -> bool:
+        """
+        檢查快取的最新 K 線是否落後超過一個週期
 
-        # 解析快取時間範圍
-        cache_first = pd.to_datetime(cache_info['first_time'], utc=True)
-        cache_last = pd.to_datetime(cache_info['last_time'], utc=True)
+        快取筆數足夠不代表是最新數據（例如上週抓取後未再更新），
+        依最新筆數取得 K 線前應先以此檢查決定是否要向 MT5 更新到現在。
+        休市期間此檢查會持續回傳 True，MT5 則回傳空結果。
 
-        # 檢查是否涵蓋
-        return cache_first <= from_date and cache_last >= to_date
+        參數：
+            symbol: 商品代碼
+            timeframe: 時間週期
+            now: 目前時間（預設為現在，UTC）
+
+        回傳：
+            True 如果沒有數據，或最新 K 線早於 now 減一個週期
+        """
+        newest_time = self.get_newest_time(symbol, timeframe)
+        if newest_time is None:
+            return True
+
+        now = now or datetime.now(timezone.utc)
+        return newest_time <= now - self._get_timeframe_interval(timeframe)
 
     def identify_missing_ranges(
         self,
@@ -565,6 +2151,9 @@ class SQLiteCacheManager:
         """
         識別需要從 MT5 取得的缺失時間範圍
 
+        以請求範圍減去 candle_coverage 中已取得的區間，
+        因此快取範圍內部的缺口也會被識別，已確認無數據的休市區間則不會重複請求。
+
         參數：
             symbol: 商品代碼
             timeframe: 時間週期
@@ -574,26 +2163,205 @@ class SQLiteCacheManager:
         回傳：
             缺失範圍列表 [(start1, end1), (start2, end2), ...]
         """
-        cache_info = self.get_cache_info(symbol, timeframe)
+        start = self._datetime_to_epoch(from_date)
+        end = self._datetime_to_epoch(to_date)
+        step = self._get_timeframe_id(timeframe) * 60
 
-        if cache_info is None:
-            # 完全沒有快取
-            return [(from_date, to_date)]
+        conn = self._pool.acquire_reader()
 
-        cache_first = pd.to_datetime(cache_info['first_time'], utc=True)
-        cache_last = pd.to_datetime(cache_info['last_time'], utc=True)
+        try:
+            cursor = conn.cursor()
+            symbol_id = self._get_symbol_id(cursor, symbol)
+            intervals = self._get_coverage(
+                cursor, symbol_id, self._get_timeframe_id(timeframe), start, end
+            )
+        finally:
+            self._pool.release(conn)
 
         missing_ranges = []
+        cursor_time = start
+
+        for covered_start, covered_end in intervals:
+            # 兩個已涵蓋區間之間至少要能容納一根 K 線才算缺口
+            if covered_start - step >= cursor_time:
+                missing_ranges.append((cursor_time, covered_start - step))
+            cursor_time = max(cursor_time, covered_end + step)
+
+        if cursor_time <= end:
+            missing_ranges.append((cursor_time, end))
+
+        # 轉回 datetime（邊界與請求一致時保留原始物件）
+        return [
+            (
+                from_date if hole_start == start else self._epoch_to_datetime(hole_start),
+                to_date if hole_end == end else self._epoch_to_datetime(hole_end)
+            )
+            for hole_start, hole_end in missing_ranges
+        ]
+
+    def get_coverage(
+        self,
+        symbol: str,
+        timeframe: str
+    ) -> List[Tuple[datetime, datetime]]:
+        """
+        取得已從 MT5 取得過的時間區間
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 時間週期
+
+        回傳：
+            依時間排序的區間列表 [(start1, end1), ...]（UTC，含端點）
+        """
+        conn = self._pool.acquire_reader()
+
+        try:
+            cursor = conn.cursor()
+            symbol_id = self._get_symbol_id(cursor, symbol)
+            intervals = self._get_coverage(
+                cursor, symbol_id, self._get_timeframe_id(timeframe)
+            )
+
+            return [
+                (self._epoch_to_datetime(start), self._epoch_to_datetime(end))
+                for start, end in intervals
+            ]
+
+        finally:
+            self._pool.release(conn)
+
+    def mark_covered(
+        self,
+        symbol: str,
+        timeframe: str,
+        from_date: datetime,
+        to_date: datetime
+    ) -> None:
+        """
+        將時間區間記錄為已從 MT5 取得（即使該區間沒有任何 K 線）
+
+        參數：
+            symbol: 商品代碼
+            timeframe: 時間週期
+            from_date: 區間起點
+            to_date: 區間終點
+        """
+        timeframe_id = self._get_timeframe_id(timeframe)
+
+        conn = self._pool.acquire_writer()
+        cursor = conn.cursor()
+
+        try:
+            symbol_id = self._get_symbol_id(cursor, symbol, create=True)
+            self._mark_coverage(
+                cursor, symbol_id, timeframe_id,
+                self._datetime_to_epoch(from_date), self._datetime_to_epoch(to_date)
+            )
+            conn.commit()
+
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"記錄涵蓋範圍失敗：{e}")
+            raise
+        finally:
+            self._pool.release(conn)
+
+    def _get_coverage(
+        self,
+        cursor: sqlite3.Cursor,
+        symbol_id: Optional[int],
+        timeframe_id: int,
+        start: Optional[int] = None,
+        end: Optional[int] = None
+    ) -> List[Tuple[int, int]]:
+        """
+        查詢與 [start, end] 重疊的已涵蓋區間
+
+        參數：
+            cursor: 資料庫游標
+            symbol_id: 商品整數代碼（None 時回傳空列表）
+            timeframe_id: 時間週期整數代碼
+            start: 範圍起點（epoch 秒，None 表示不限）
+            end: 範圍終點（epoch 秒，None 表示不限）
+
+        回傳：
+            依起點排序的 (start_time, end_time) 列表
+        """
+        if symbol_id is None:
+            return []
+
+        query = """
+            SELECT start_time, end_time FROM candle_coverage
+            WHERE symbol_id = ? AND timeframe_id = ?
+        """
+        params = [symbol_id, timeframe_id]
+
+        if start is not None:
+            query += " AND end_time >= ?"
+            params.append(start)
+
+        if end is not None:
+            query += " AND start_time <= ?"
+            params.append(end)
+
+        query += " ORDER BY start_time"
+
+        cursor.execute(query, params)
+        return [(row[0], row[1]) for row in cursor.fetchall()]
+
+    def _mark_coverage(
+        self,
+        cursor: sqlite3.Cursor,
+        symbol_id: int,
+        timeframe_id: int,
+        start: int,
+        end: int
+    ) -> None:
+        """
+        將 [start, end] 併入涵蓋範圍（與重疊或相鄰的區間合併）
+
+        尚未收盤的 K 線（開盤時間晚於「現在減一個週期」）不會被標記，
+        確保下次查詢時會重新取得最新價格。
 
-        # 檢查前端缺口
-        if from_date < cache_first:
-            missing_ranges.append((from_date, cache_first))
+        參數：
+            cursor: 資料庫游標
+            symbol_id: 商品整數代碼
+            timeframe_id: 時間週期整數代碼
+            start: 區間起點（epoch 秒）
+            end: 區間終點（epoch 秒）
+        """
+        step = timeframe_id * 60
+        end = min(end, int(datetime.now(timezone.utc).timestamp()) - step)
+
+        if end < start:
+            return
 
-        # 檢查後端缺口
-        if to_date > cache_last:
-            missing_ranges.append((cache_last, to_date))
+        # 相距不到一根 K 線的區間視為相鄰
+        overlapping = self._get_coverage(
+            cursor, symbol_id, timeframe_id, start - step, end + step
+        )
+
+        if overlapping:
+            start = min(start, overlapping[0][0])
+            end = max(end, max(interval_end for _, interval_end in overlapping))
+
+            cursor.execute(
+                """
+                DELETE FROM candle_coverage
+                WHERE symbol_id = ? AND timeframe_id = ?
+                AND start_time BETWEEN ? AND ?
+                """,
+                (symbol_id, timeframe_id, overlapping[0][0], overlapping[-1][0])
+            )
 
-        return missing_ranges
+        cursor.execute(
+            """
+            INSERT INTO candle_coverage (symbol_id, timeframe_id, start_time, end_time)
+            VALUES (?, ?, ?, ?)
+            """,
+            (symbol_id, timeframe_id, start, end)
+        )
 
     def fetch_candles_smart(
         self,
@@ -646,6 +2414,9 @@ class SQLiteCacheManager:
                         logger.info(
                             f"已補充 {len(df_new)} 筆數據：{start} ~ {end}"
                         )
+
+                    # 整個請求區間記為已取得（無數據代表休市，之後不再請求）
+                    self.mark_covered(symbol, timeframe, start, end)
                 except Exception as e:
                     logger.error(f"補充數據失敗：{e}")
                     # 繼續處理其他範圍
@@ -661,84 +2432,69 @@ class SQLiteCacheManager:
         self,
         symbol: str,
         timeframe: str,
-        min_gap_threshold: float = 1.5
+        min_gap_threshold: float = 1.5,
+        calendar: Optional[SessionCalendar] = None
     ) -> List[Dict]:
         """
         檢測數據缺口
 
+        以單次向量化運算找出相鄰 K 線的異常間隔，再依交易時段日曆
+        排除週末、每日休市與假日造成的正常間隔。
+
         參數：
             symbol: 商品代碼
             timeframe: 時間週期
             min_gap_threshold: 最小缺口閾值（相對於正常間隔的倍數）
+            calendar: 交易時段日曆（若為 None 則依商品類別自動選擇）
 
         回傳：
             缺口清單
         """
         logger.info(f"開始檢測數據缺口：{symbol} {timeframe}")
 
-        conn = self._get_connection()
-
         try:
-            # 1. 查詢所有時間戳（升序）
-            query = """
-                SELECT time
-                FROM candles
-                WHERE symbol = ? AND timeframe = ?
-                ORDER BY time ASC
-            """
-
-            df = pd.read_sql_query(query, conn, params=(symbol, timeframe))
+            # 1. 查詢所有時間戳（升序，epoch 秒）
+            times = self.query_candles_arrays(
+                symbol, timeframe, columns=['time']
+            )['time']
 
-            if len(df) < 2:
+            if len(times) < 2:
                 logger.info("數據筆數不足，無法檢測缺口")
                 return []
 
-            df['time'] = pd.to_datetime(df['time'], utc=True)
-
-            # 2. 計算預期間隔
-            expected_interval = self._get_timeframe_interval(timeframe)
-
-            # 3. 計算實際間隔
-            df['time_diff'] = df['time'].diff()
-
-            # 4. 識別異常間隔
-            threshold = expected_interval * min_gap_threshold
-            gaps_df = df[df['time_diff'] > threshold].copy()
-
-            # 5. 過濾合理的缺口（週末、假日等）
-            filtered_gaps = []
+            # 2. 依交易時段日曆過濾合理的缺口（週末、每日休市、假日）
+            if calendar is None:
+                calendar = get_calendar(symbol)
 
-            for idx, row in gaps_df.iterrows():
-                gap_start = df.loc[idx - 1, 'time']
-                gap_end = row['time']
-
-                if not self._is_expected_gap(gap_start, gap_end, timeframe):
-                    gap_duration_minutes = int(
-                        row['time_diff'].total_seconds() / 60
-                    )
-                    expected_records = self._calculate_expected_records(
-                        gap_start, gap_end, timeframe
-                    )
-
-                    gap_info = {
-                        'symbol': symbol,
-                        'timeframe': timeframe,
-                        'gap_start': gap_start,
-                        'gap_end': gap_end,
-                        'gap_duration_minutes': gap_duration_minutes,
-                        'expected_records': expected_records
-                    }
+            step = self._get_timeframe_id(timeframe) * 60
+            gap_starts, gap_ends, expected_records = find_gaps(
+                times, step, calendar, min_gap_threshold
+            )
 
-                    filtered_gaps.append(gap_info)
+            filtered_gaps = [
+                {
+                    'symbol': symbol,
+                    'timeframe': timeframe,
+                    'gap_start': self._epoch_to_datetime(gap_start),
+                    'gap_end': self._epoch_to_datetime(gap_end),
+                    'gap_duration_minutes': int((gap_end - gap_start) // 60),
+                    'expected_records': int(expected)
+                }
+                for gap_start, gap_end, expected in zip(
+                    gap_starts.tolist(), gap_ends.tolist(), expected_records.tolist()
+                )
+            ]
 
-            # 6. 儲存缺口記錄
+            # 3. 儲存缺口記錄
             if filtered_gaps:
                 self._save_gaps(filtered_gaps)
-                logger.info(f"檢測到 {len(filtered_gaps)} 個數據缺口")
+                logger.info(
+                    f"檢測到 {len(filtered_gaps)} 個數據缺口（日曆：{calendar.name}）"
+                )
             else:
                 logger.info("未檢測到數據缺口")
 
-            # 7. 更新元數據
+            # 4. 更新元數據
             self._update_gap_metadata(symbol, timeframe, len(filtered_gaps))
 
             return filtered_gaps
@@ -746,62 +2502,6 @@ class SQLiteCacheManager:
         except Exception as e:
             logger.error(f"檢測數據缺口失敗：{e}")
             raise
-        finally:
-            conn.close()
-
-    def _is_expected_gap(
-        self,
-        start: datetime,
-        end: datetime,
-        timeframe: str
-    ) -> bool:
-        """
-        判斷缺口是否為預期的（週末、假日等）
-
-        參數：
-            start: 缺口開始時間
-            end: 缺口結束時間
-            timeframe: 時間週期
-
-        回傳：
-            True 如果是預期的缺口
-        """
-        # 檢查是否跨越週末（週五收盤到週一開盤）
-        # 外匯市場：週五 21:00 UTC ~ 週日 21:00 UTC
-        if start.weekday() == 4:  # 週五
-            # 如果是週五晚上到週一早上，視為正常
-            if end.weekday() == 0 and (end - start).days <= 3:
-                return True
-
-        # TODO: 整合假日日曆
-        # 目前僅檢查週末
-
-        return False
-
-    def _calculate_expected_records(
-        self,
-        start: datetime,
-        end: datetime,
-        timeframe: str
-    ) -> int:
-        """
-        計算預期應有的記錄數
-
-        參數：
-            start: 開始時間
-            end: 結束時間
-            timeframe: 時間週期
-
-        回傳：
-            預期記錄數
-        """
-        interval = self._get_timeframe_interval(timeframe)
-        duration = end - start
-
-        # 計算理論記錄數
-        expected = int(duration / interval)
-
-        return max(expected, 1)
 
     def _save_gaps(self, gaps: List[Dict]) -> None:
         """
@@ -810,7 +2510,7 @@ class SQLiteCacheManager:
         參數：
             gaps: 缺口資訊列表
         """
-        conn = self._get_connection()
+        conn = self._pool.acquire_writer()
         cursor = conn.cursor()
 
         try:
@@ -839,7 +2539,7 @@ class SQLiteCacheManager:
             logger.error(f"儲存缺口記錄失敗：{e}")
             raise
         finally:
-            conn.close()
+            self._pool.release(conn)
 
     def _update_gap_metadata(
         self,
@@ -855,7 +2555,7 @@ class SQLiteCacheManager:
             timeframe: 時間週期
             gap_count: 缺口數量
         """
-        conn = self._get_connection()
+        conn = self._pool.acquire_writer()
         cursor = conn.cursor()
 
         try:
@@ -878,7 +2578,7 @@ class SQLiteCacheManager:
         except Exception as e:
             logger.error(f"更新缺口元數據失敗：{e}")
         finally:
-            conn.close()
+            self._pool.release(conn)
 
     def get_gaps(
         self,
@@ -897,7 +2597,7 @@ class SQLiteCacheManager:
         回傳：
             缺口資訊 DataFrame
         """
-        conn = self._get_connection()
+        conn = self._pool.acquire_reader()
 
         try:
             query = """
@@ -924,7 +2624,7 @@ class SQLiteCacheManager:
             return df
 
         finally:
-            conn.close()
+            self._pool.release(conn)
 
     def fill_data_gaps(
         self,
@@ -1014,7 +2714,7 @@ class SQLiteCacheManager:
             status: 新狀態
             notes: 備註
         """
-        conn = self._get_connection()
+        conn = self._pool.acquire_writer()
         cursor = conn.cursor()
 
         try:
@@ -1038,7 +2738,7 @@ class SQLiteCacheManager:
         except Exception as e:
             logger.error(f"更新缺口狀態失敗：{e}")
         finally:
-            conn.close()
+            self._pool.release(conn)
 
     def ignore_gap(self, gap_id: int, notes: Optional[str] = None) -> None:
         """
@@ -0,0 +1,189 @@
+"""
+SQLite3 連線池模組
+
+此模組提供執行緒感知的 SQLite 連線池：每個執行緒擁有獨立的讀取連線，
+所有寫入共用單一寫入連線並以鎖序列化。連線建立時套用一次效能相關的
+PRAGMA，之後重複使用，同時保留 sqlite3 模組內建的預編譯語句快取。
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from loguru import logger
+
+
+class SQLiteConnectionPool:
+    """
+    SQLite 連線池
+
+    - 讀取連線：每個執行緒一條（threading.local），WAL 模式下可與寫入並行
+    - 寫入連線：全域一條，以 RLock 序列化，避免 SQLITE_BUSY
+
+    可安全地從 asyncio 事件迴圈透過 run_in_executor 的工作執行緒使用。
+    """
+
+    # 每條連線建立時套用的 PRAGMA
+    DEFAULT_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,       # 256 MB
+        'cache_size': -65536,         # 64 MB（負值單位為 KiB）
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON',
+        'busy_timeout': 5000          # 毫秒
+    }
+
+    # 每條連線的預編譯語句快取數量
+    CACHED_STATEMENTS = 256
+
+    def __init__(
+        self,
+        db_path: str,
+        pragmas: Optional[Dict[str, object]] = None
+    ):
+        """
+        初始化連線池
+
+        參數：
+            db_path: 資料庫檔案路徑
+            pragmas: 額外或覆寫的 PRAGMA 設定
+        """
+        self.db_path = str(db_path)
+        self.pragmas = {**self.DEFAULT_PRAGMAS, **(pragmas or {})}
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._readers: List[sqlite3.Connection] = []
+        self._pid = os.getpid()
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        建立一條已套用 PRAGMA 的新連線
+
+        連線以 check_same_thread=False 建立，由連線池負責保證同一時間
+        只有一個執行緒使用。
+
+        回傳：
+            SQLite 連線物件
+        """
+        conn = sqlite3.connect(
+            self.db_path,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            check_same_thread=False,
+            cached_statements=self.CACHED_STATEMENTS
+        )
+        # 設定 Row Factory 以便使用欄位名稱存取
+        conn.row_factory = sqlite3.Row
+
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+
+        return conn
+
+    def _check_fork(self) -> None:
+        """在 fork 後的子行程中捨棄繼承自父行程的連線"""
+        if os.getpid() != self._pid:
+            self._local = threading.local()
+            self._lock = threading.Lock()
+            self._write_lock = threading.RLock()
+            self._writer = None
+            self._readers = []
+            self._pid = os.getpid()
+
+    def acquire_reader(self) -> sqlite3.Connection:
+        """
+        取得目前執行緒的讀取連線（不存在時建立）
+
+        回傳：
+            SQLite 連線物件
+        """
+        self._check_fork()
+
+        conn = getattr(self._local, 'reader', None)
+        if conn is None:
+            conn = self.connect()
+            self._local.reader = conn
+            with self._lock:
+                self._readers.append(conn)
+            logger.debug(f"建立讀取連線（執行緒：{threading.current_thread().name}）")
+
+        return conn
+
+    def acquire_writer(self) -> sqlite3.Connection:
+        """
+        取得寫入連線並鎖定，必須以 release() 釋放
+
+        回傳：
+            SQLite 連線物件
+        """
+        self._check_fork()
+
+        self._write_lock.acquire()
+
+        try:
+            if self._writer is None:
+                self._writer = self.connect()
+                logger.debug("建立寫入連線")
+        except Exception:
+            self._write_lock.release()
+            raise
+
+        return self._writer
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """
+        歸還連線
+
+        讀取連線保留給原執行緒重複使用；寫入連線若仍有未提交的交易
+        會先回滾，再釋放寫入鎖。
+
+        參數：
+            conn: acquire_reader() 或 acquire_writer() 取得的連線
+        """
+        if conn is not self._writer:
+            return
+
+        try:
+            if conn.in_transaction:
+                logger.warning("寫入連線歸還時仍有未提交的交易，已回滾")
+                conn.rollback()
+        finally:
+            self._write_lock.release()
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """讀取連線的 context manager"""
+        conn = self.acquire_reader()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """寫入連線的 context manager"""
+        conn = self.acquire_writer()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        """關閉連線池中的所有連線"""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+        with self._lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+
+        self._local = threading.local()
+        logger.debug(f"連線池已關閉：{self.db_path}")
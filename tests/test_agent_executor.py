@@ -0,0 +1,136 @@
+"""
+Agent 執行層單元測試
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.agent.agent_executor import AgentExecutor, AgentQueueFullError
+
+
+class Recorder:
+    """記錄同步函數的執行順序與最大並行數"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.active = 0
+        self.max_active = 0
+
+    def work(self, name, seconds=0.05):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.events.append(('start', name))
+        time.sleep(seconds)
+        with self.lock:
+            self.active -= 1
+            self.events.append(('end', name))
+        return name
+
+
+def test_same_chat_runs_in_order():
+    """測試：同一群組的訊息依提交順序逐一執行"""
+    recorder = Recorder()
+    executor = AgentExecutor(max_workers=4)
+
+    async def main():
+        return await asyncio.gather(*[
+            executor.submit(1, recorder.work, f'm{i}', 0.02) for i in range(4)
+        ])
+
+    assert asyncio.run(main()) == ['m0', 'm1', 'm2', 'm3']
+    assert recorder.max_active == 1
+    assert [name for event, name in recorder.events if event == 'start'] == ['m0', 'm1', 'm2', 'm3']
+    executor.shutdown()
+
+
+def test_global_limit_across_chats():
+    """測試：不同群組並行執行，但同時執行數不超過上限"""
+    recorder = Recorder()
+    executor = AgentExecutor(max_workers=2)
+    depths = []
+
+    async def main():
+        tasks = [
+            asyncio.ensure_future(executor.submit(chat, recorder.work, chat, 0.1))
+            for chat in range(4)
+        ]
+        await asyncio.sleep(0.03)
+        depths.append(executor.stats())
+        await asyncio.gather(*tasks)
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - started
+
+    assert recorder.max_active == 2
+    assert elapsed < 0.35
+    assert (depths[0]['running'], depths[0]['waiting'], depths[0]['active_chats']) == (2, 2, 4)
+
+    stats = executor.stats()
+    assert (stats['completed'], stats['running'], stats['waiting']) == (4, 0, 0)
+    assert stats['max_queue_depth'] == 2
+    assert stats['avg_wait_ms'] > 0 and stats['avg_run_ms'] >= 100
+    assert stats['chat_depths'] == {}
+    executor.shutdown()
+
+
+def test_event_loop_not_blocked():
+    """測試：同步的 Agent 回合執行時，事件迴圈仍可處理其他工作"""
+    executor = AgentExecutor(max_workers=1)
+    ticks = []
+
+    async def heartbeat():
+        for _ in range(5):
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.02)
+
+    async def main():
+        await asyncio.gather(executor.submit(1, time.sleep, 0.2), heartbeat())
+
+    asyncio.run(main())
+
+    assert len(ticks) == 5
+    assert ticks[-1] - ticks[0] < 0.15
+    executor.shutdown()
+
+
+def test_queue_full_and_failures():
+    """測試：群組排隊已滿時拒絕新訊息，例外原樣拋出並計入失敗"""
+    executor = AgentExecutor(max_workers=2, max_pending_per_chat=2)
+
+    def fail():
+        raise RuntimeError('boom')
+
+    async def main():
+        first = asyncio.ensure_future(executor.submit(1, time.sleep, 0.05))
+        second = asyncio.ensure_future(executor.submit(1, time.sleep, 0.05))
+        await asyncio.sleep(0)
+        assert executor.pending(1) == 2
+
+        with pytest.raises(AgentQueueFullError):
+            await executor.submit(1, time.sleep, 0.05)
+
+        await asyncio.gather(first, second)
+
+        with pytest.raises(RuntimeError, match='boom'):
+            await executor.submit(2, fail)
+
+    asyncio.run(main())
+
+    stats = executor.stats()
+    assert (stats['completed'], stats['failed'], stats['rejected']) == (2, 1, 1)
+    assert executor.pending(1) == 0
+    executor.shutdown()
+
+
+def test_invalid_settings():
+    """測試：無效的執行緒數與排隊上限"""
+    with pytest.raises(ValueError):
+        AgentExecutor(max_workers=0)
+    with pytest.raises(ValueError):
+        AgentExecutor(max_pending_per_chat=0)
@@ -0,0 +1,145 @@
+"""
+多商品回填協調器單元測試
+"""
+
+import pytest
+import numpy as np
+from datetime import datetime, timezone
+from pathlib import Path
+import tempfile
+
+from src.core.sqlite_cache import SQLiteCacheManager
+from src.core.backfill import BackfillOrchestrator
+
+
+# 模擬 MT5 歷史數據範圍
+HISTORY_START = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())
+HISTORY_END = int(datetime(2024, 1, 3, tzinfo=timezone.utc).timestamp())
+
+
+class FakeMT5:
+    """模擬 MT5 copy_rates_from（回傳 end_time 往前 count 根 K 線）"""
+
+    def __init__(self, interrupt_after=None, fail_after=None):
+        self.calls = []
+        self.interrupt_after = interrupt_after
+        self.fail_after = fail_after
+
+    def __call__(self, symbol, timeframe, end_time, count):
+        if self.interrupt_after is not None and len(self.calls) >= self.interrupt_after:
+            raise KeyboardInterrupt
+        if self.fail_after is not None and len(self.calls) >= self.fail_after:
+            raise RuntimeError('MT5 錯誤：(-10004, No IPC connection)')
+
+        self.calls.append((symbol, timeframe, end_time))
+
+        step = SQLiteCacheManager.TIMEFRAME_MINUTES[timeframe] * 60
+        times = np.arange(HISTORY_START, HISTORY_END, step)
+        times = times[times <= int(end_time.timestamp())][-count:]
+
+        rates = np.zeros(len(times), dtype=SQLiteCacheManager.RATES_DTYPE)
+        rates['time'] = times
+        rates['open'] = rates['high'] = rates['low'] = rates['close'] = 100.0
+        rates['tick_volume'] = 10
+        return rates
+
+
+@pytest.fixture
+def cache_manager():
+    """建立快取管理器實例"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = SQLiteCacheManager(db_path=str(Path(tmp_dir) / 'backfill.db'))
+        yield manager
+        manager.close()
+
+
+def test_backfill_matrix(cache_manager):
+    """測試：回填商品 × 週期矩陣並記錄完成檢查點"""
+    orchestrator = BackfillOrchestrator(
+        cache_manager, fetch_rates=FakeMT5(), batch_size=500, queue_size=2
+    )
+
+    jobs = orchestrator.run(['GOLD', 'SILVER'], ['M1', 'h1'])
+
+    assert [(job.symbol, job.timeframe) for job in jobs] == [
+        ('GOLD', 'M1'), ('GOLD', 'H1'), ('SILVER', 'M1'), ('SILVER', 'H1')
+    ]
+
+    for job in jobs:
+        expected = (HISTORY_END - HISTORY_START) // (
+            SQLiteCacheManager.TIMEFRAME_MINUTES[job.timeframe] * 60
+        )
+        assert job.status == 'completed'
+        assert job.inserted == expected
+        assert job.rows_per_sec > 0
+        assert cache_manager.get_record_count(job.symbol, job.timeframe) == expected
+
+        checkpoint = cache_manager.get_backfill_checkpoint(job.symbol, job.timeframe)
+        assert checkpoint['status'] == 'completed'
+        assert checkpoint['rows_written'] == expected
+
+
+def test_backfill_resume_from_checkpoint(cache_manager):
+    """測試：中斷後從檢查點續抓，已完成的工作不重抓"""
+    interrupted = FakeMT5(interrupt_after=3)
+
+    with pytest.raises(KeyboardInterrupt):
+        BackfillOrchestrator(
+            cache_manager, fetch_rates=interrupted, batch_size=500
+        ).run(['GOLD'], ['M1'])
+
+    checkpoint = cache_manager.get_backfill_checkpoint('GOLD', 'M1')
+    assert checkpoint['status'] == 'running'
+    assert checkpoint['batches'] == 3
+
+    resumed = FakeMT5()
+    jobs = BackfillOrchestrator(
+        cache_manager, fetch_rates=resumed, batch_size=500
+    ).run(['GOLD'], ['M1'])
+
+    # 續抓從檢查點開始，而非從現在
+    assert resumed.calls[0][2] == checkpoint['next_end_time']
+    assert jobs[0].status == 'completed'
+    assert cache_manager.get_record_count('GOLD', 'M1') == (HISTORY_END - HISTORY_START) // 60
+    assert cache_manager.get_backfill_checkpoint('GOLD', 'M1')['rows_written'] == (
+        (HISTORY_END - HISTORY_START) // 60
+    )
+
+    # 再次執行：已完成，不呼叫 MT5
+    rerun = FakeMT5()
+    jobs = BackfillOrchestrator(cache_manager, fetch_rates=rerun).run(['GOLD'], ['M1'])
+
+    assert jobs[0].status == 'skipped'
+    assert rerun.calls == []
+
+
+def test_backfill_fetch_errors_fail_job(cache_manager):
+    """測試：重試耗盡時工作標記為失敗，檢查點保留可續抓，不被當成歷史盡頭"""
+    failing = FakeMT5(fail_after=2)
+
+    jobs = BackfillOrchestrator(
+        cache_manager, fetch_rates=failing, batch_size=500, max_retries=2
+    ).run(['GOLD'], ['M1'])
+
+    assert jobs[0].status == 'failed'
+    assert 'No IPC connection' in jobs[0].error
+    assert jobs[0].batches == 2
+
+    checkpoint = cache_manager.get_backfill_checkpoint('GOLD', 'M1')
+    assert checkpoint['status'] == 'failed'
+    assert checkpoint['batches'] == 2
+
+    resumed = FakeMT5()
+    jobs = BackfillOrchestrator(
+        cache_manager, fetch_rates=resumed, batch_size=500
+    ).run(['GOLD'], ['M1'])
+
+    assert resumed.calls[0][2] == checkpoint['next_end_time']
+    assert jobs[0].status == 'completed'
+    assert cache_manager.get_record_count('GOLD', 'M1') == (HISTORY_END - HISTORY_START) // 60
+
+
+def test_backfill_invalid_timeframe(cache_manager):
+    """測試：無效時間週期"""
+    with pytest.raises(ValueError):
+        BackfillOrchestrator(cache_manager, fetch_rates=FakeMT5()).run(['GOLD'], ['X1'])
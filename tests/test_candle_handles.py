@@ -0,0 +1,160 @@
+"""
+K 線資料代號（candles_handle）單元測試
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.agent import tools
+from src.agent.tools import CandleDatasetRegistry, execute_tool, TOOLS
+from src.agent.indicator_cache import IndicatorCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手動推進的時間"""
+    now = [1000.0]
+    monkeypatch.setattr('src.agent.tools.time.monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """以獨立的登記表與記憶體快取取代模組層級實例"""
+    registry = CandleDatasetRegistry(ttl_seconds=60, max_datasets=3)
+    monkeypatch.setattr(tools, '_candle_registry', registry)
+    monkeypatch.setattr(tools, '_indicator_cache', IndicatorCache())
+    return registry
+
+
+def make_candles(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(2000 + rng.normal(0, 1.5, n).cumsum(), 2)
+    return pd.DataFrame({
+        'time': pd.date_range('2026-01-05', periods=n, freq='1h', tz='UTC'),
+        'open': close, 'high': close + 1, 'low': close - 1, 'close': close,
+        'tick_volume': rng.integers(100, 1000, n), 'real_volume': rng.integers(1, 50, n)
+    })
+
+
+def test_register_and_get_scoped_to_conversation(registry):
+    """測試：代號只能在建立它的對話中取得"""
+    df = make_candles()
+    handle = registry.register(df, 'GOLD', 'H1', 'conv-a')
+
+    assert handle.startswith('GOLD-H1-')
+    assert registry.get(handle, 'conv-a')['frame'] is df
+
+    with pytest.raises(KeyError):
+        registry.get(handle, 'conv-b')
+
+
+def test_ttl_refreshes_on_access(registry, clock):
+    """測試：存取後重新計算存活時間，閒置超過存活時間後失效"""
+    handle = registry.register(make_candles(), 'GOLD', 'H1', 'conv')
+
+    clock[0] += 50
+    registry.get(handle, 'conv')
+    clock[0] += 50
+    registry.get(handle, 'conv')
+
+    clock[0] += 61
+    with pytest.raises(KeyError):
+        registry.get(handle, 'conv')
+    assert len(registry) == 0
+
+
+def test_capacity_and_release(registry):
+    """測試：超過上限時淘汰最久未使用的代號，對話結束時釋放全部代號"""
+    df = make_candles(10)
+    first = registry.register(df, 'GOLD', 'H1', 'a')
+    second = registry.register(df, 'GOLD', 'H1', 'a')
+    registry.get(first, 'a')
+    registry.register(df, 'GOLD', 'H1', 'b')
+    registry.register(df, 'GOLD', 'H1', 'b')
+
+    assert len(registry) == 3
+    with pytest.raises(KeyError):
+        registry.get(second, 'a')
+
+    assert tools.release_conversation('b') == 2
+    assert len(registry) == 1
+
+
+def test_indicator_tools_accept_handle(registry):
+    """測試：計算工具以代號取得 K 線，結果與傳入 candles_json 相同"""
+    df = make_candles()
+    handle = registry.register(df, 'GOLD', 'H1', 'conv')
+    candles_json = df.assign(time=df['time'].astype(str)).to_json(orient='records')
+
+    for tool_name, params in [
+        ('calculate_sma', {'window': 20}),
+        ('calculate_rsi', {'window': 14}),
+        ('calculate_volume_profile', {'price_bins': 50})
+    ]:
+        by_handle = execute_tool(tool_name, {'candles_handle': handle, **params}, 'conv')
+        by_json = execute_tool(tool_name, {'candles_json': candles_json, **params}, 'conv')
+
+        assert by_handle['success'], by_handle
+        assert by_handle['data'] == by_json['data']
+
+
+def test_get_candles_fallback_is_ascending(registry, monkeypatch):
+    """測試：回退到 HistoricalDataFetcher（降冪）時，登記與摘要仍以最新 K 線為結尾"""
+    df = make_candles(50)
+
+    class FakeCache:
+        def ensure_materialized(self, symbol, timeframe):
+            return False
+
+        def is_stale(self, symbol, timeframe):
+            return False
+
+        def query_latest(self, symbol, timeframe, count):
+            return None
+
+    class FakeFetcher:
+        def __init__(self, client):
+            pass
+
+        def get_candles_latest(self, symbol, timeframe, count):
+            return df.iloc[::-1].reset_index(drop=True)
+
+    def update_db_to_now(*args, **kwargs):
+        raise RuntimeError('MT5 未連線')
+
+    monkeypatch.setattr(tools, 'get_mt5_client', lambda: None)
+    monkeypatch.setattr(tools, '_get_cache_manager', FakeCache)
+    monkeypatch.setattr(tools, 'HistoricalDataFetcher', FakeFetcher)
+    monkeypatch.setattr('scripts.analyze_vppa.update_db_to_now', update_db_to_now)
+
+    result = execute_tool('get_candles', {'symbol': 'GOLD', 'timeframe': 'H1', 'count': 50}, 'conv')
+
+    assert result['success'], result
+    data = result['data']
+    assert data['summary']['price_range']['latest_close'] == df['close'].iloc[-1]
+    assert data['recent_candles'][-1]['time'] == str(df['time'].iloc[-1])
+    frame = registry.get(data['candles_handle'], 'conv')['frame']
+    assert frame['time'].is_monotonic_increasing
+
+
+def test_invalid_or_missing_handle(registry):
+    """測試：代號無效、屬於其他對話或沒有提供 K 線時回傳錯誤"""
+    handle = registry.register(make_candles(), 'GOLD', 'H1', 'conv')
+
+    foreign = execute_tool('calculate_sma', {'candles_handle': handle}, 'other')
+    missing = execute_tool('calculate_sma', {}, 'conv')
+
+    assert not foreign['success']
+    assert handle in foreign['error'] and 'get_candles' in foreign['error']
+    assert not missing['success']
+
+
+def test_tool_schemas_prefer_handle():
+    """測試：計算工具的參數說明以 candles_handle 為主"""
+    schemas = {tool['name']: tool['input_schema'] for tool in TOOLS}
+
+    for name in ('calculate_sma', 'calculate_rsi', 'calculate_volume_profile'):
+        assert 'candles_handle' in schemas[name]['properties']
+        assert 'candles_json' not in schemas[name].get('required', [])
@@ -0,0 +1,123 @@
+"""
+指標運算後端單元測試
+
+確認 indicator_backend 的 JIT 核心函數與 NumPy 向量化路徑結果一致。
+未安裝 numba 時核心函數以純 Python 執行，仍可驗證邏輯。
+"""
+
+import pytest
+import numpy as np
+
+from src.agent import indicator_backend
+from src.agent.indicators import (
+    _distribute_volume_by_range,
+    _expand_value_area,
+    find_pivot_indices
+)
+
+
+@pytest.fixture
+def numpy_backend():
+    """測試期間固定使用 NumPy 路徑作為參考"""
+    previous = indicator_backend.set_backend('numpy')
+    yield
+    indicator_backend._backend = previous
+
+
+def make_prices(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = np.round(100 + rng.normal(0, 1, n).cumsum(), 1)
+    highs = close + np.round(rng.exponential(0.5, n), 1)
+    lows = close - np.round(rng.exponential(0.5, n), 1)
+    return highs, lows, rng.integers(0, 1000, n).astype(float)
+
+
+def test_distribute_volume_matches_numpy(numpy_backend):
+    """測試：JIT 成交量分配與差分陣列版本一致（含一字線與 NaN）"""
+    highs, lows, volumes = make_prices(400)
+    lows[::11] = highs[::11]
+    highs[7] = np.nan
+
+    range_ids = np.repeat(np.arange(4), 100)
+    price_lowest = np.array([np.nanmin(lows[i * 100:(i + 1) * 100]) for i in range(4)])
+    price_highest = np.array([np.nanmax(highs[i * 100:(i + 1) * 100]) for i in range(4)])
+    price_step = (price_highest - price_lowest) / 27
+
+    args = (highs, lows, volumes, range_ids, price_lowest, price_step, 27)
+
+    np.testing.assert_allclose(
+        indicator_backend.distribute_volume_by_range(*args),
+        _distribute_volume_by_range(*args),
+        rtol=1e-9, atol=1e-6
+    )
+
+
+def test_distribute_volume_even_split_matches_numpy(numpy_backend):
+    """測試：平均分配模式的 JIT 版本與差分陣列版本一致"""
+    highs, lows, volumes = make_prices(300, seed=3)
+    lows[::13] = highs[::13]
+    lows[5] = np.nan
+
+    range_ids = np.repeat(np.arange(3), 100)
+    price_lowest = np.array([np.nanmin(lows[i * 100:(i + 1) * 100]) for i in range(3)])
+    price_highest = np.array([np.nanmax(highs[i * 100:(i + 1) * 100]) for i in range(3)])
+    price_step = (price_highest - price_lowest) / 20
+
+    args = (highs, lows, volumes, range_ids, price_lowest, price_step, 20)
+    expected = _distribute_volume_by_range(*args, weights='even')
+
+    np.testing.assert_allclose(
+        indicator_backend.distribute_volume_by_range(*args, True),
+        expected,
+        rtol=1e-9, atol=1e-6
+    )
+    np.testing.assert_allclose(expected.sum(), np.nansum(volumes[~np.isnan(lows)]))
+
+
+def test_expand_value_area_matches_numpy():
+    """測試：JIT Value Area 擴展與 NumPy 版本一致（含零成交量與平手層級）"""
+    rng = np.random.default_rng(1)
+    matrix = rng.integers(0, 4, (100, 25)).astype(float)
+    matrix[::9] = 0.0
+    poc_level = np.argmax(matrix, axis=1)
+    total_volume = matrix.sum(axis=1)
+    target_volume = total_volume * 0.68
+
+    expected = _expand_value_area(matrix, poc_level, target_volume, total_volume)
+    actual = indicator_backend.expand_value_area(matrix, poc_level, target_volume, total_volume)
+
+    for actual_values, expected_values in zip(actual, expected):
+        np.testing.assert_array_equal(actual_values, expected_values)
+
+
+@pytest.mark.parametrize('length', [1, 3, 10])
+def test_scan_pivots_matches_numpy(numpy_backend, length):
+    """測試：JIT Pivot 掃描與滑動窗口版本一致（含平手價格與 NaN）"""
+    highs, lows, _ = make_prices(300, seed=length)
+    highs[[20, 150]] = np.nan
+    lows[[21, 151]] = np.nan
+
+    is_high, is_low = indicator_backend.scan_pivots(highs, lows, length)
+    expected_high, expected_low = find_pivot_indices(highs, lows, length)
+
+    assert np.flatnonzero(is_high).tolist() == expected_high.tolist()
+    assert np.flatnonzero(is_low).tolist() == expected_low.tolist()
+
+
+@pytest.mark.parametrize('requested,expected', [
+    ('numpy', 'numpy'),
+    ('auto', 'numba' if indicator_backend.numba is not None else 'numpy'),
+    ('numba', 'numba' if indicator_backend.numba is not None else 'numpy'),
+    ('invalid', 'numba' if indicator_backend.numba is not None else 'numpy'),
+])
+def test_backend_env(monkeypatch, requested, expected):
+    """測試：環境變數強制指定後端，未安裝 numba 時改用 numpy"""
+    monkeypatch.setenv(indicator_backend.BACKEND_ENV, requested)
+
+    assert indicator_backend._select_backend() == expected
+
+
+def test_set_backend_validation():
+    """測試：無效的後端名稱"""
+    with pytest.raises(ValueError):
+        indicator_backend.set_backend('cuda')
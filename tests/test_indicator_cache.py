@@ -0,0 +1,118 @@
+"""
+指標計算結果快取單元測試
+"""
+
+import pytest
+import pandas as pd
+
+from src.agent.indicator_cache import IndicatorCache
+from src.core.sqlite_cache import SQLiteCacheManager
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手動推進的時間"""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr('src.agent.indicator_cache.time.time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def store(tmp_path):
+    """磁碟層使用的臨時資料庫"""
+    with SQLiteCacheManager(str(tmp_path / 'candles.db')) as manager:
+        yield manager
+
+
+def make_frame(n=5, start='2026-01-02 00:00'):
+    return pd.DataFrame({
+        'time': pd.date_range(start, periods=n, freq='1min', tz='UTC'),
+        'close': range(n)
+    })
+
+
+def test_fingerprint_changes_with_new_bar():
+    """測試：最新 K 線時間或數量改變時指紋不同"""
+    df = make_frame()
+
+    def sma_key(frame, window=20):
+        return IndicatorCache.make_key(
+            'sma', IndicatorCache.frame_fingerprint('GOLD', 'M1', frame), {'window': window}
+        )
+
+    key = sma_key(df)
+
+    assert key == sma_key(df.set_index('time'))
+    assert key != sma_key(make_frame(start='2026-01-02 00:01'))
+    assert key != sma_key(make_frame(n=6))
+    assert key != sma_key(df, window=50)
+    assert IndicatorCache.json_fingerprint('[1]') != IndicatorCache.json_fingerprint('[2]')
+
+
+def test_get_or_compute_counts_hits_and_misses(clock):
+    """測試：第二次呼叫不重新計算，並計入命中"""
+    cache = IndicatorCache(max_entries=4, ttl_seconds=60)
+    calls = []
+    key = cache.make_key('rsi', ('GOLD', 'M1', 't', 100), {'window': 14})
+
+    for _ in range(3):
+        assert cache.get_or_compute(key, lambda: calls.append(1) or {'rsi': 55.0}) == {'rsi': 55.0}
+
+    stats = cache.stats()
+    assert len(calls) == 1
+    assert (stats['hits'], stats['misses'], stats['size']) == (2, 1, 1)
+    assert stats['hit_rate'] == pytest.approx(2 / 3)
+
+
+def test_ttl_expiration(clock):
+    """測試：超過存活時間後視為未命中"""
+    cache = IndicatorCache(ttl_seconds=30)
+    cache.set(('k',), 1)
+
+    clock[0] += 29
+    assert cache.get(('k',)) == 1
+
+    clock[0] += 2
+    assert cache.get(('k',)) is None
+    assert cache.stats()['expirations'] == 1
+    assert cache.stats()['size'] == 0
+
+
+def test_lru_eviction(clock):
+    """測試：超過容量時淘汰最久未使用的項目"""
+    cache = IndicatorCache(max_entries=2)
+    cache.set(('a',), 1)
+    cache.set(('b',), 2)
+    cache.get(('a',))
+    cache.set(('c',), 3)
+
+    assert cache.get(('b',)) is None
+    assert cache.get(('a',)) == 1
+    assert cache.get(('c',)) == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_disk_tier_survives_new_instance(clock, store):
+    """測試：磁碟層結果可由新的快取實例讀取，過期後失效"""
+    key = IndicatorCache.make_key(
+        'calculate_sma', IndicatorCache.json_fingerprint('[]'), {'window': 20}
+    )
+    IndicatorCache(ttl_seconds=60, store=store).set(
+        key, {'success': True, 'sma': 1.5}, persist=True
+    )
+
+    cache = IndicatorCache(ttl_seconds=60, store=store)
+    assert cache.get(key) == {'success': True, 'sma': 1.5}
+    assert cache.get(key) == {'success': True, 'sma': 1.5}
+    assert (cache.stats()['disk_hits'], cache.stats()['hits']) == (1, 1)
+
+    clock[0] += 61
+    assert IndicatorCache(ttl_seconds=60, store=store).get(key) is None
+
+
+def test_invalid_settings():
+    """測試：無效的容量與存活時間"""
+    with pytest.raises(ValueError):
+        IndicatorCache(max_entries=0)
+    with pytest.raises(ValueError):
+        IndicatorCache(ttl_seconds=0)
@@ -0,0 +1,130 @@
+"""
+串流技術指標狀態單元測試
+
+確認 SMAState / RSIState / BollingerState 逐根更新的結果與批次函數一致。
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.agent import indicator_state
+from src.agent.indicator_state import SMAState, RSIState, BollingerState, seed_from_cache
+from src.agent.indicators import calculate_sma, calculate_rsi, calculate_bollinger_bands
+from src.core.sqlite_cache import SQLiteCacheManager
+
+
+def make_closes(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = np.round(2000 + rng.normal(0, 1.5, n).cumsum(), 2)
+    closes[100:130] = closes[100]  # 一段橫盤（漲跌皆為 0）
+    return closes
+
+
+def as_array(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+@pytest.mark.parametrize('window', [1, 5, 20])
+def test_sma_matches_batch(window):
+    """測試：逐根更新的 SMA 與 calculate_sma 一致"""
+    closes = make_closes()
+    state = SMAState(window)
+
+    actual = as_array([state.update(c) for c in closes])
+    expected = calculate_sma(pd.DataFrame({'close': closes}), window).to_numpy()
+
+    np.testing.assert_allclose(actual, expected, rtol=1e-10, atol=1e-9)
+
+
+@pytest.mark.parametrize('smoothing', ['sma', 'wilder'])
+@pytest.mark.parametrize('window', [2, 14])
+def test_rsi_matches_batch(window, smoothing):
+    """測試：逐根更新的 RSI 與 calculate_rsi 一致（含橫盤時的 NaN 與 100）"""
+    closes = make_closes()
+    closes[300:320] = closes[299] + np.arange(1, 21)  # 連續上漲（平均跌幅為 0）
+    state = RSIState(window, smoothing=smoothing)
+
+    actual = as_array([state.update(c) for c in closes])
+    expected = calculate_rsi(pd.DataFrame({'close': closes}), window, smoothing=smoothing).to_numpy()
+
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('window', [2, 20])
+def test_bollinger_matches_batch(window):
+    """測試：逐根更新的布林通道與 calculate_bollinger_bands 一致"""
+    closes = make_closes()
+    state = BollingerState(window, num_std=2.5)
+
+    bands = [state.update(c) for c in closes]
+    expected = calculate_bollinger_bands(pd.DataFrame({'close': closes}), window, 2.5)
+
+    for i, series in enumerate(expected):
+        actual = as_array([None if b is None else b[i] for b in bands])
+        np.testing.assert_allclose(actual, series.to_numpy(), rtol=1e-9, atol=1e-8)
+
+
+@pytest.mark.parametrize('make_state', [
+    lambda: SMAState(20),
+    lambda: RSIState(14),
+    lambda: RSIState(14, smoothing='wilder'),
+    lambda: BollingerState(20)
+])
+def test_seed_and_revise_match_batch(make_state):
+    """測試：以歷史暖身後，逐 Tick 改寫最新 K 線的結果與批次計算最後一個值一致"""
+    closes = make_closes()
+    state = make_state().seed(closes[:400])
+
+    for close in closes[400:]:
+        state.update(close - 3.0)            # 新 K 線開盤
+        for tick in (close + 1.0, close - 2.0, close):
+            state.revise(tick)               # 盤中價格變動
+
+    reference = make_state()
+    for close in closes:
+        reference.update(close)
+
+    assert state.count == len(closes)
+    np.testing.assert_allclose(np.ravel(state.value), np.ravel(reference.value), rtol=1e-9)
+
+
+def test_resync_limits_drift(monkeypatch):
+    """測試：定期重新計算累計和後仍與批次結果一致"""
+    monkeypatch.setattr(indicator_state, 'RESYNC_INTERVAL', 16)
+    closes = make_closes(2000) * 1e4
+    state = SMAState(50).seed(closes)
+
+    expected = calculate_sma(pd.DataFrame({'close': closes}), 50).iloc[-1]
+    assert state.value == pytest.approx(expected, rel=1e-12)
+
+
+def test_seed_from_cache(tmp_path):
+    """測試：以 SQLite 快取中的 K 線暖身"""
+    closes = make_closes(300)
+    df = pd.DataFrame({
+        'time': pd.date_range('2026-01-05', periods=300, freq='1min', tz='UTC'),
+        'open': closes, 'high': closes + 1, 'low': closes - 1, 'close': closes,
+        'tick_volume': 1, 'spread': 0, 'real_volume': 1
+    })
+
+    with SQLiteCacheManager(str(tmp_path / 'candles.db')) as cache:
+        cache.insert_candles(df, 'GOLD', 'M1')
+        sma, rsi = SMAState(20), RSIState(14, smoothing='wilder')
+
+        assert seed_from_cache(cache, 'GOLD', 'M1', [sma, rsi], count=200) == 200
+
+    assert sma.value == pytest.approx(closes[-20:].mean())
+    assert rsi.value == pytest.approx(RSIState(14, smoothing='wilder').seed(closes[-200:]).value)
+
+
+def test_invalid_parameters():
+    """測試：無效的視窗大小、平滑方式與空狀態改寫"""
+    with pytest.raises(ValueError):
+        SMAState(0)
+    with pytest.raises(ValueError):
+        RSIState(14, smoothing='ema')
+    with pytest.raises(ValueError):
+        BollingerState(20).revise(1.0)
+    with pytest.raises(ValueError):
+        calculate_rsi(pd.DataFrame({'close': make_closes()}), 14, smoothing='ema')
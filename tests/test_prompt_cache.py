@@ -0,0 +1,138 @@
+"""
+Prompt caching、用量統計與當日記憶視窗單元測試
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.agent import tools
+from src.agent.agent import MT5Agent, CACHE_CONTROL
+from src.agent.agent_manager import summarize_daily_memory
+from src.agent.tools import TOOLS
+
+
+def make_response(stop_reason, content, **usage):
+    counts = {
+        'input_tokens': 0, 'output_tokens': 0,
+        'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 0
+    }
+    counts.update(usage)
+    return SimpleNamespace(
+        stop_reason=stop_reason, content=content, usage=SimpleNamespace(**counts)
+    )
+
+
+def make_agent(responses, prompt_cache=True):
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        return responses[len(requests) - 1]
+
+    agent = MT5Agent(api_key='test-key', prompt_cache=prompt_cache)
+    agent.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+    return agent, requests
+
+
+def test_cache_breakpoints_on_static_blocks(monkeypatch):
+    """測試：工具定義、系統提示與最後一則工具結果加上斷點，原始資料不被修改"""
+    monkeypatch.setattr(
+        tools, '_dispatch_tool', lambda name, args, conversation_id: {'success': True}
+    )
+    tool_use = SimpleNamespace(type='tool_use', id='t1', name='calculate_sma', input={})
+    agent, requests = make_agent([
+        make_response('tool_use', [tool_use]),
+        make_response('end_turn', [SimpleNamespace(type='text', text='完成')])
+    ])
+
+    assert agent.process_message('黃金 SMA', system_prompt='系統提示') == '完成'
+
+    first, second = requests
+    assert first['system'] == [{'type': 'text', 'text': '系統提示', 'cache_control': CACHE_CONTROL}]
+    assert first['tools'][-1]['cache_control'] == CACHE_CONTROL
+    assert all('cache_control' not in tool for tool in first['tools'][:-1] + TOOLS)
+    assert first['messages'][0] == {'role': 'user', 'content': '黃金 SMA'}
+
+    tool_results = second['messages'][-1]['content']
+    assert tool_results[-1]['cache_control'] == CACHE_CONTROL
+    breakpoints = [
+        block for message in second['messages'] if isinstance(message['content'], list)
+        for block in message['content'] if isinstance(block, dict) and 'cache_control' in block
+    ]
+    assert len(breakpoints) == 1
+
+
+def test_prompt_cache_disabled():
+    """測試：停用時維持原本的字串系統提示與工具定義"""
+    agent, requests = make_agent(
+        [make_response('end_turn', [SimpleNamespace(type='text', text='好')])], prompt_cache=False
+    )
+
+    agent.process_message('你好', system_prompt='系統提示')
+
+    assert requests[0]['system'] == '系統提示'
+    assert requests[0]['tools'] is TOOLS
+
+
+def test_usage_counters(monkeypatch):
+    """測試：累計每次請求的 token 用量與耗時，並計算快取命中率"""
+    monkeypatch.setattr(
+        tools, '_dispatch_tool', lambda name, args, conversation_id: {'success': True}
+    )
+    tool_use = SimpleNamespace(type='tool_use', id='t1', name='calculate_rsi', input={})
+    agent, _ = make_agent([
+        make_response('tool_use', [tool_use],
+                      input_tokens=100, cache_creation_input_tokens=5000, output_tokens=50),
+        make_response('end_turn', [SimpleNamespace(type='text', text='完成')],
+                      input_tokens=200, cache_read_input_tokens=5000, output_tokens=80)
+    ])
+
+    agent.process_message('RSI')
+    stats = agent.get_usage_stats()
+
+    assert (stats['messages'], stats['requests']) == (1, 2)
+    assert (stats['input_tokens'], stats['output_tokens']) == (300, 130)
+    assert (stats['cache_creation_input_tokens'], stats['cache_read_input_tokens']) == (5000, 5000)
+    assert stats['cache_hit_rate'] == pytest.approx(5000 / 10300)
+    assert stats['total_seconds'] >= stats['api_seconds'] >= 0
+
+
+def make_daily_log(interactions=30):
+    log = (
+        f"{'=' * 60}\n2026年01月05日 自我認知\n{'=' * 60}\n\n"
+        f"我是亞瑟，今天專注黃金。\n\n{'=' * 60}\n\n"
+    )
+    for i in range(interactions):
+        log += (
+            f"\n[2026-01-05 {8 + i // 60:02d}:{i % 60:02d}:00] "
+            f"用戶 trader (42): 問題 {i} 黃金走勢？\n"
+            f"回應: {'分析內容 ' * 200}結論 {i}\n\n"
+        )
+    return log
+
+
+def test_summarize_daily_memory_is_bounded():
+    """測試：壓縮後不超過上限，保留自我認知、最近互動的回應與較早互動的問題"""
+    log = make_daily_log()
+
+    memory = summarize_daily_memory(log, max_chars=1500, recent=2, response_chars=300)
+
+    assert len(log) > 30000
+    assert len(memory) <= 1500
+    assert '我是亞瑟，今天專注黃金。' in memory
+    assert '問題 29 黃金走勢？' in memory and '問題 28 黃金走勢？' in memory
+    assert '結論 27' not in memory
+    assert '- 08:27 trader (42)：問題 27 黃金走勢？' in memory
+    assert '則更早的互動已省略' in memory
+    assert memory.index('[自我認知]') < memory.index('[較早的互動') < memory.index('[最近的互動]')
+
+
+def test_summarize_daily_memory_short_log():
+    """測試：內容少時完整保留，沒有內容時回傳空字串"""
+    memory = summarize_daily_memory(make_daily_log(interactions=1).replace('分析內容 ' * 200, ''))
+
+    assert '問題 0 黃金走勢？' in memory
+    assert '結論 0' in memory
+    assert '更早的互動' not in memory
+    assert summarize_daily_memory('') == ''
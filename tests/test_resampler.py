@@ -0,0 +1,85 @@
+"""
+K 線重新取樣單元測試
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.core.resampler import RATES_DTYPE, bucket_starts, bucket_ends, resample_rates
+
+
+def _m1_rates(start, periods):
+    """建立連續的 M1 K 線（結構化陣列）"""
+    times = pd.date_range(start, periods=periods, freq='min', tz='UTC')
+    rng = np.random.default_rng(0)
+    close = 100 + rng.normal(0, 0.1, periods).cumsum()
+
+    rates = np.zeros(periods, dtype=RATES_DTYPE)
+    rates['time'] = times.as_unit('s').asi8
+    rates['open'] = close - 0.05
+    rates['close'] = close
+    rates['high'] = close + rng.uniform(0, 0.2, periods)
+    rates['low'] = close - 0.05 - rng.uniform(0, 0.2, periods)
+    rates['tick_volume'] = rng.integers(1, 100, periods)
+    rates['spread'] = rng.integers(1, 5, periods)
+    rates['real_volume'] = rng.integers(1, 1000, periods)
+    return rates
+
+
+@pytest.mark.parametrize('timeframe,rule', [
+    ('M5', '5min'), ('M15', '15min'), ('H1', 'h'), ('H4', '4h'), ('D1', 'D')
+])
+def test_resample_matches_pandas(timeframe, rule):
+    """測試：合成結果與 pandas resample 一致"""
+    rates = _m1_rates('2024-01-02 03:07', 3 * 1440)
+    bars = resample_rates(rates, timeframe)
+
+    df = pd.DataFrame(rates)
+    df.index = pd.to_datetime(df['time'], unit='s', utc=True)
+    expected = df.resample(rule).agg({
+        'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last',
+        'tick_volume': 'sum', 'spread': 'min', 'real_volume': 'sum'
+    }).dropna()
+
+    assert bars['time'].tolist() == expected.index.as_unit('s').asi8.tolist()
+    for col in ('open', 'high', 'low', 'close'):
+        np.testing.assert_allclose(bars[col], expected[col].to_numpy())
+    for col in ('tick_volume', 'spread', 'real_volume'):
+        np.testing.assert_array_equal(bars[col], expected[col].to_numpy())
+
+
+def test_resample_skips_missing_bars():
+    """測試：來源缺少的區間不產生衍生 K 線"""
+    rates = _m1_rates('2024-01-02', 180)
+    rates = np.delete(rates, np.arange(60, 120))
+
+    bars = resample_rates(rates, 'H1')
+
+    assert len(bars) == 2
+    assert bars['tick_volume'].sum() == rates['tick_volume'].sum()
+
+
+def test_weekly_and_monthly_alignment():
+    """測試：W1 從週日開始、MN1 從月初開始"""
+    times = np.array([pd.Timestamp('2024-02-14 12:00', tz='UTC').value // 10**9])
+
+    week = bucket_starts(times, 'W1')
+    month = bucket_starts(times, 'MN1')
+
+    assert pd.Timestamp(week[0], unit='s') == pd.Timestamp('2024-02-11')  # 週日
+    assert pd.Timestamp(month[0], unit='s') == pd.Timestamp('2024-02-01')
+    assert pd.Timestamp(bucket_ends(month, 'MN1')[0], unit='s') == pd.Timestamp('2024-03-01')
+
+
+def test_session_offset():
+    """測試：session_offset 平移 D1 日界線，不影響日內週期"""
+    offset = -7 * 3600  # 日界線為前一日 17:00
+    times = np.array([pd.Timestamp('2024-01-02 18:00', tz='UTC').value // 10**9])
+
+    assert pd.Timestamp(bucket_starts(times, 'D1', offset)[0], unit='s') == (
+        pd.Timestamp('2024-01-02 17:00')
+    )
+    assert pd.Timestamp(bucket_starts(times, 'H4', offset)[0], unit='s') == (
+        pd.Timestamp('2024-01-02 16:00')
+    )
@@ -0,0 +1,142 @@
+"""
+交易時段日曆單元測試
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.core.session_calendar import (
+    SessionCalendar,
+    classify_symbol,
+    get_calendar,
+    register_calendar,
+    find_gaps
+)
+
+
+def _epoch(value):
+    """將 UTC 時間字串轉為 epoch 秒"""
+    return pd.Timestamp(value, tz='UTC').value // 10**9
+
+
+def _m1_bars(calendar, start, end):
+    """產生日曆開市期間的所有 M1 K 線時間"""
+    times = np.arange(_epoch(start), _epoch(end), 60)
+    return times[calendar.open_seconds(times, times + 60) > 0]
+
+
+class TestSymbolClassification:
+    """商品類別判斷測試"""
+
+    def test_classify_symbol(self):
+        """測試：依商品代碼判斷類別"""
+        assert classify_symbol('GOLD') == 'metals'
+        assert classify_symbol('XAUUSD') == 'metals'
+        assert classify_symbol('BTCUSD') == 'crypto'
+        assert classify_symbol('US30.cash') == 'indices'
+        assert classify_symbol('#GER40') == 'indices'
+        assert classify_symbol('EURUSD') == 'fx'
+        assert classify_symbol('CADJPY') == 'fx'
+
+    def test_register_calendar(self):
+        """測試：為個別商品指定日曆"""
+        calendar = SessionCalendar('custom')
+        register_calendar('MYSYMBOL', calendar)
+
+        assert get_calendar('mysymbol') is calendar
+
+
+class TestSessionCalendar:
+    """交易時段計算測試"""
+
+    def test_weekend_closed(self):
+        """測試：外匯週末（紐約時間週五 17:00 ~ 週日 17:00）休市"""
+        calendar = get_calendar('EURUSD')
+
+        # 冬令時間：週五 22:00 UTC ~ 週日 22:00 UTC
+        start = np.array([_epoch('2024-01-05 22:00')])
+        end = np.array([_epoch('2024-01-07 22:00')])
+
+        assert calendar.open_seconds(start, end)[0] == 0
+        assert calendar.open_seconds(start - 3600, end + 3600)[0] == 7200
+
+    def test_daily_break_follows_dst(self):
+        """測試：貴金屬每日休市時段隨夏令時間調整"""
+        calendar = get_calendar('GOLD')
+
+        winter = np.array([_epoch('2024-01-03 22:00')])
+        summer = np.array([_epoch('2024-07-03 21:00')])
+
+        assert calendar.open_seconds(winter, winter + 3600)[0] == 0
+        assert calendar.open_seconds(summer, summer + 3600)[0] == 0
+        assert calendar.open_seconds(summer + 3600, summer + 7200)[0] == 3600
+
+    def test_weekend_across_fall_back(self):
+        """測試：週末跨越夏令時間結束時，以 UTC 計算休市長度"""
+        calendar = get_calendar('EURUSD')
+
+        # 週五 17:00 EDT = 21:00 UTC，週日 17:00 EST = 22:00 UTC（休市 49 小時）
+        start = np.array([_epoch('2024-11-01 20:59')])
+        end = np.array([_epoch('2024-11-03 22:00')])
+
+        assert calendar.closed_seconds(start, end)[0] == 49 * 3600
+        assert calendar.open_seconds(start, end)[0] == 60
+
+        gap_starts, _, _ = find_gaps(np.concatenate([start, end]), 60, calendar)
+        assert len(gap_starts) == 0
+
+    def test_weekend_across_spring_forward(self):
+        """測試：週末跨越夏令時間開始時，以 UTC 計算休市長度"""
+        calendar = get_calendar('EURUSD')
+
+        # 週五 17:00 EST = 22:00 UTC，週日 17:00 EDT = 21:00 UTC（休市 47 小時）
+        start = np.array([_epoch('2024-03-08 21:59')])
+        end = np.array([_epoch('2024-03-10 21:01')])
+
+        assert calendar.closed_seconds(start, end)[0] == 47 * 3600
+        assert calendar.open_seconds(start, end)[0] == 120
+
+    def test_holiday_closed(self):
+        """測試：假日整日休市"""
+        calendar = get_calendar('GOLD')
+
+        # 2024-12-25（紐約時間）= 05:00 UTC ~ 隔日 05:00 UTC
+        start = np.array([_epoch('2024-12-25 05:00')])
+
+        assert calendar.open_seconds(start, start + 86400)[0] == 0
+
+    def test_crypto_always_open(self):
+        """測試：加密貨幣全年無休"""
+        calendar = get_calendar('BTCUSD')
+
+        start = np.array([_epoch('2024-12-25 00:00')])
+
+        assert calendar.open_seconds(start, start + 7 * 86400)[0] == 7 * 86400
+
+
+class TestFindGaps:
+    """向量化缺口檢測測試"""
+
+    def test_no_false_gaps_across_sessions(self):
+        """測試：完整數據跨越週末、每日休市與假日時不產生缺口"""
+        calendar = get_calendar('GOLD')
+        times = _m1_bars(calendar, '2023-12-20', '2024-01-10')
+
+        gap_starts, _, _ = find_gaps(times, 60, calendar)
+
+        assert len(gap_starts) == 0
+
+    def test_detects_missing_bars(self):
+        """測試：開市期間缺少的 K 線會被檢測"""
+        calendar = get_calendar('GOLD')
+        times = _m1_bars(calendar, '2024-01-08', '2024-01-13')
+
+        # 移除 30 根 K 線
+        missing = np.arange(1000, 1030)
+        gap_starts, gap_ends, expected = find_gaps(
+            np.delete(times, missing), 60, calendar
+        )
+
+        assert gap_starts.tolist() == [times[999]]
+        assert gap_ends.tolist() == [times[1030]]
+        assert expected.tolist() == [30]
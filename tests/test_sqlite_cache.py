@@ -3,11 +3,14 @@ SQLite 快取管理器單元測試
 """
 
 import pytest
+import numpy as np
 import pandas as pd
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 import tempfile
 import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 
 from src.core.sqlite_cache import SQLiteCacheManager
 
@@ -35,7 +38,9 @@ def temp_db():
 @pytest.fixture
 def cache_manager(temp_db):
     """建立快取管理器實例"""
-    return SQLiteCacheManager(db_path=temp_db)
+    manager = SQLiteCacheManager(db_path=temp_db)
+    yield manager
+    manager.close()
 
 
 @pytest.fixture
@@ -177,9 +182,409 @@ class TestSQLiteCacheManager:
         assert first_record['close'] == 999.9
 
 
+class TestBulkInsert:
+    """欄式批次寫入測試"""
+
+    @staticmethod
+    def _make_rates(n, start_epoch=1704067200):
+        """建立與 MT5 copy_rates_* 相同 dtype 的結構化陣列"""
+        dtype = np.dtype([
+            ('time', '<i8'), ('open', '<f8'), ('high', '<f8'),
+            ('low', '<f8'), ('close', '<f8'), ('tick_volume', '<u8'),
+            ('spread', '<i4'), ('real_volume', '<u8')
+        ])
+        rates = np.zeros(n, dtype=dtype)
+        rates['time'] = start_epoch + np.arange(n) * 60
+        rates['open'] = 100.0 + np.arange(n) * 0.01
+        rates['high'] = rates['open'] + 1.0
+        rates['low'] = rates['open'] - 1.0
+        rates['close'] = rates['open'] + 0.5
+        rates['tick_volume'] = 100
+        rates['spread'] = 2
+        rates['real_volume'] = 500
+        return rates
+
+    def test_bulk_insert_from_rates(self, cache_manager):
+        """測試：直接寫入 MT5 rates 結構化陣列"""
+        rates = self._make_rates(250)
+
+        stats = cache_manager.bulk_insert_candles(
+            rates, 'GOLD', 'M1', batch_size=100
+        )
+
+        assert stats == {'inserted': 250, 'updated': 0, 'batches': 3}
+
+        df = cache_manager.query_candles('GOLD', 'M1')
+        assert len(df) == 250
+        assert df['time'].min() == pd.Timestamp('2024-01-01 00:00', tz='UTC')
+
+    def test_bulk_insert_counts_updates(self, cache_manager):
+        """測試：重疊寫入時正確區分新增與更新筆數"""
+        rates = self._make_rates(200)
+        cache_manager.bulk_insert_candles(rates[:150], 'GOLD', 'M1')
+
+        stats = cache_manager.bulk_insert_candles(
+            rates[100:], 'GOLD', 'M1', batch_size=30
+        )
+
+        assert stats['inserted'] == 50
+        assert stats['updated'] == 50
+        assert cache_manager.get_record_count('GOLD', 'M1') == 200
+
+    def test_bulk_insert_missing_columns(self, cache_manager, sample_candles):
+        """測試：缺少必要欄位"""
+        with pytest.raises(ValueError) as exc_info:
+            cache_manager.bulk_insert_candles(
+                sample_candles.drop(columns=['spread']), 'GOLD', 'H1'
+            )
+
+        assert "缺少必要欄位" in str(exc_info.value)
+
+
+class TestMetadataMaintenance:
+    """快取元數據增量維護測試"""
+
+    def test_metadata_tracks_inserts_not_replacements(
+        self, cache_manager, sample_candles
+    ):
+        """測試：覆寫既有記錄不會增加 total_records"""
+        cache_manager.insert_candles(sample_candles[:60], 'GOLD', 'H1')
+        cache_manager.insert_candles(sample_candles[40:], 'GOLD', 'H1')
+
+        info = cache_manager.get_cache_info('GOLD', 'H1')
+
+        assert info['total_records'] == 100
+        assert info['fetch_count'] == 2
+        assert pd.Timestamp(info['first_time'], tz='UTC') == sample_candles['time'].iloc[0]
+        assert pd.Timestamp(info['last_time'], tz='UTC') == sample_candles['time'].iloc[-1]
+
+    def test_rebuild_metadata(self, cache_manager, sample_candles):
+        """測試：從 candles 表重建元數據"""
+        cache_manager.insert_candles(sample_candles, 'GOLD', 'H1')
+
+        # 模擬元數據偏差
+        conn = cache_manager._get_connection()
+        conn.execute("UPDATE cache_metadata SET total_records = 1, first_time = NULL")
+        conn.commit()
+        conn.close()
+
+        rebuilt = cache_manager.rebuild_metadata('GOLD')
+
+        info = cache_manager.get_cache_info('GOLD', 'H1')
+        assert rebuilt == 1
+        assert info['total_records'] == 100
+        assert info['first_time'] is not None
+
+
+class TestStorageLayout:
+    """整數 epoch 儲存格式與遷移測試"""
+
+    @staticmethod
+    def _create_legacy_db(db_path, sample_candles):
+        """建立舊版（TEXT 時間）格式的資料庫"""
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            CREATE TABLE candles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                symbol TEXT NOT NULL,
+                timeframe TEXT NOT NULL,
+                time TIMESTAMP NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                tick_volume INTEGER NOT NULL,
+                spread INTEGER NOT NULL,
+                real_volume INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(symbol, timeframe, time)
+            );
+            CREATE INDEX idx_candles_symbol_timeframe_time
+                ON candles(symbol, timeframe, time);
+        """)
+        conn.executemany(
+            """
+            INSERT INTO candles (
+                symbol, timeframe, time, open, high, low, close,
+                tick_volume, spread, real_volume
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    'GOLD', 'H1', row.time.strftime('%Y-%m-%d %H:%M:%S'),
+                    row.open, row.high, row.low, row.close,
+                    row.tick_volume, row.spread, row.real_volume
+                )
+                for row in sample_candles.itertuples()
+            ]
+        )
+        conn.commit()
+        conn.close()
+
+    def test_compact_candles_table(self, cache_manager, temp_db):
+        """測試：candles 為 WITHOUT ROWID 的整數主鍵表"""
+        conn = sqlite3.connect(temp_db)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(candles)")]
+        sql = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'candles'"
+        ).fetchone()[0]
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        conn.close()
+
+        assert columns[:3] == ['symbol_id', 'timeframe_id', 'time']
+        assert 'WITHOUT ROWID' in sql
+        assert version == SQLiteCacheManager.SCHEMA_VERSION
+
+    def test_query_returns_ns_utc(self, cache_manager, sample_candles):
+        """測試：查詢結果時間欄位為 datetime64[ns, UTC]"""
+        cache_manager.insert_candles(sample_candles, 'GOLD', 'H1')
+
+        df = cache_manager.query_candles('GOLD', 'H1')
+        empty_df = cache_manager.query_candles('SILVER', 'H1')
+
+        assert df['time'].dtype == 'datetime64[ns, UTC]'
+        assert df['time'].iloc[-1] == sample_candles['time'].iloc[0]
+        assert empty_df.empty
+        assert empty_df['time'].dtype == 'datetime64[ns, UTC]'
+
+    def test_legacy_database_requires_migration(self, temp_db, sample_candles):
+        """測試：舊版資料庫需先遷移才能開啟"""
+        self._create_legacy_db(temp_db, sample_candles)
+
+        with pytest.raises(RuntimeError):
+            SQLiteCacheManager(db_path=temp_db)
+
+    def test_migrate_storage(self, temp_db, sample_candles):
+        """測試：舊版資料庫就地遷移"""
+        self._create_legacy_db(temp_db, sample_candles)
+
+        stats = SQLiteCacheManager.migrate_storage(temp_db)
+
+        assert stats['status'] == 'migrated'
+        assert stats['migrated_records'] == 100
+        assert stats['skipped_records'] == 0
+
+        cache_manager = SQLiteCacheManager(db_path=temp_db)
+        df = cache_manager.query_candles('GOLD', 'H1').sort_values('time')
+
+        assert len(df) == 100
+        assert df['time'].tolist() == sample_candles['time'].tolist()
+        assert df['close'].tolist() == sample_candles['close'].tolist()
+
+        # 再次執行不做任何變更
+        assert SQLiteCacheManager.migrate_storage(temp_db)['status'] == 'up_to_date'
+
+
+class TestArrayQuery:
+    """NumPy 陣列查詢測試"""
+
+    def test_query_arrays_ascending(self, cache_manager):
+        """測試：預設升冪排序並回傳連續陣列"""
+        rates = TestBulkInsert._make_rates(50)
+        cache_manager.bulk_insert_candles(rates, 'GOLD', 'M1')
+
+        arrays = cache_manager.query_candles_arrays('GOLD', 'M1')
+
+        assert list(arrays) == list(SQLiteCacheManager.RATES_DTYPE.names)
+        np.testing.assert_array_equal(arrays['time'], rates['time'])
+        np.testing.assert_array_equal(arrays['close'], rates['close'])
+        assert arrays['high'].flags['C_CONTIGUOUS']
+
+    def test_query_arrays_projection_and_range(self, cache_manager):
+        """測試：欄位投影、epoch 邊界與降冪排序"""
+        rates = TestBulkInsert._make_rates(50)
+        cache_manager.bulk_insert_candles(rates, 'GOLD', 'M1')
+
+        arrays = cache_manager.query_candles_arrays(
+            'GOLD', 'M1',
+            start=int(rates['time'][10]), end=int(rates['time'][19]),
+            order='desc', columns=['high', 'low', 'tick_volume']
+        )
+
+        assert list(arrays) == ['high', 'low', 'tick_volume']
+        np.testing.assert_array_equal(arrays['high'], rates['high'][10:20][::-1])
+
+    def test_query_arrays_structured(self, cache_manager):
+        """測試：回傳與 MT5 rates 相同 dtype 的結構化陣列"""
+        rates = TestBulkInsert._make_rates(20)
+        cache_manager.bulk_insert_candles(rates, 'GOLD', 'M1')
+
+        result = cache_manager.query_candles_arrays('GOLD', 'M1', structured=True)
+        empty = cache_manager.query_candles_arrays('SILVER', 'M1', structured=True)
+
+        assert result.dtype == rates.dtype
+        np.testing.assert_array_equal(result, rates)
+        assert len(empty) == 0
+
+    def test_query_latest(self, cache_manager):
+        """測試：取最新 N 筆（跨越休市缺口），依時間升冪排序"""
+        rates = TestBulkInsert._make_rates(100)
+        # 模擬週末休市：後 50 筆往後平移兩天
+        rates['time'][50:] += 2 * 24 * 3600
+        cache_manager.bulk_insert_candles(rates, 'GOLD', 'M1')
+
+        df = cache_manager.query_latest('GOLD', 'M1', 80)
+        short_df = cache_manager.query_latest('GOLD', 'M1', 500)
+
+        assert len(df) == 80
+        assert df['time'].is_monotonic_increasing
+        assert df['time'].iloc[-1] == pd.Timestamp(int(rates['time'][-1]), unit='s', tz='UTC')
+        assert df['close'].tolist() == rates['close'][20:].tolist()
+        assert len(short_df) == 100
+
+    def test_query_arrays_invalid_column(self, cache_manager):
+        """測試：無效欄位"""
+        with pytest.raises(ValueError):
+            cache_manager.query_candles_arrays('GOLD', 'M1', columns=['volume'])
+
+
+class TestConnectionPool:
+    """連線池測試"""
+
+    def test_pragmas_applied(self, cache_manager):
+        """測試：連線建立時套用 PRAGMA"""
+        conn = cache_manager._pool.acquire_reader()
+
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -65536
+
+    def test_reader_reused_per_thread(self, cache_manager):
+        """測試：同一執行緒重複使用讀取連線，不同執行緒各自獨立"""
+        pool = cache_manager._pool
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            other = executor.submit(pool.acquire_reader).result()
+
+        assert pool.acquire_reader() is pool.acquire_reader()
+        assert pool.acquire_reader() is not other
+        assert pool.acquire_reader() is not pool.acquire_writer()
+
+    def test_concurrent_writes_and_reads(self, cache_manager, sample_candles):
+        """測試：多個執行緒同時寫入與讀取"""
+        symbols = [f'SYM{i}' for i in range(8)]
+
+        def worker(symbol):
+            cache_manager.insert_candles(sample_candles, symbol, 'H1')
+            return len(cache_manager.query_candles(symbol, 'H1'))
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            counts = list(executor.map(worker, symbols))
+
+        assert counts == [100] * len(symbols)
+        for symbol in symbols:
+            assert cache_manager.get_cache_info(symbol, 'H1')['total_records'] == 100
+
+
+class TestMaterializedSeries:
+    """衍生週期測試"""
+
+    def test_materialize_from_m1(self, cache_manager):
+        """測試：由 M1 合成 H1 並記錄涵蓋範圍"""
+        rates = TestBulkInsert._make_rates(180)
+        cache_manager.bulk_insert_candles(rates, 'GOLD', 'M1')
+
+        written = cache_manager.materialize_timeframe('GOLD', 'H1')
+        bars = cache_manager.query_candles_arrays('GOLD', 'H1', structured=True)
+
+        assert written == 3
+        assert bars['time'].tolist() == rates['time'][::60].tolist()
+        np.testing.assert_array_equal(bars['open'], rates['open'][::60])
+        np.testing.assert_array_equal(bars['close'], rates['close'][59::60])
+        assert bars['tick_volume'].tolist() == [6000] * 3
+        assert cache_manager.is_cache_sufficient(
+            'GOLD', 'H1',
+            cache_manager._epoch_to_datetime(int(bars['time'][0])),
+            cache_manager._epoch_to_datetime(int(bars['time'][-1]))
+        )
+
+    def test_incremental_update_on_m1_insert(self, cache_manager):
+        """測試：寫入新的 M1 時只補上已完成的 H1，未完成的 H1 不寫入"""
+        rates = TestBulkInsert._make_rates(150)
+        cache_manager.bulk_insert_candles(rates[:90], 'GOLD', 'M1')
+        cache_manager.materialize_timeframe('GOLD', 'H1')
+
+        # 第二根 H1 尚未完成（只有 30 根 M1）
+        assert cache_manager.get_record_count('GOLD', 'H1') == 1
+
+        cache_manager.bulk_insert_candles(rates[90:], 'GOLD', 'M1')
+        bars = cache_manager.query_candles_arrays('GOLD', 'H1', structured=True)
+
+        assert bars['tick_volume'].tolist() == [6000, 6000]
+        assert bars['high'][1] == rates['high'][60:120].max()
+        assert cache_manager.get_cache_info('GOLD', 'H1')['fetch_count'] == 0
+
+    def test_query_latest_serves_developing_bar(self, cache_manager):
+        """測試：查詢衍生週期時以最新的 M1 合成尚未完成的 K 線"""
+        rates = TestBulkInsert._make_rates(150)
+        cache_manager.bulk_insert_candles(rates, 'GOLD', 'M1')
+        cache_manager.materialize_timeframe('GOLD', 'H1')
+
+        df = cache_manager.query_latest('GOLD', 'H1', 2)
+        last = df.iloc[-1]
+
+        assert len(df) == 2
+        assert df['time'].astype('int64').floordiv(10**9).tolist() == (
+            rates['time'][[60, 120]].tolist()
+        )
+        assert last['open'] == rates['open'][120]
+        assert last['high'] == rates['high'][120:].max()
+        assert last['close'] == rates['close'][-1]
+        assert last['tick_volume'] == 3000
+
+        # 未完成的 K 線只在查詢時合成，不寫入資料庫
+        assert cache_manager.get_record_count('GOLD', 'H1') == 2
+
+    def test_materialize_keeps_mt5_bars(self, cache_manager):
+        """測試：M1 有缺口時不合成該 K 線，也不覆寫 MT5 取得的 K 線"""
+        rates = TestBulkInsert._make_rates(180)
+        mt5_bar = rates[:1].copy()
+        mt5_bar['tick_volume'] = 9999
+        cache_manager.bulk_insert_candles(mt5_bar, 'GOLD', 'H1')
+
+        # 第二小時缺少 M1（只有前後兩段）
+        cache_manager.bulk_insert_candles(rates[:70], 'GOLD', 'M1')
+        cache_manager.bulk_insert_candles(rates[110:], 'GOLD', 'M1')
+
+        written = cache_manager.materialize_timeframe('GOLD', 'H1')
+        bars = cache_manager.query_candles_arrays('GOLD', 'H1', structured=True)
+
+        assert written == 1
+        assert bars['time'].tolist() == rates['time'][[0, 120]].tolist()
+        assert bars['tick_volume'].tolist() == [9999, 6000]
+        assert cache_manager.get_cache_info('GOLD', 'H1')['fetch_count'] == 1
+
+    def test_ensure_materialized(self, cache_manager):
+        """測試：只有在來源有數據且週期可整除時才登記"""
+        assert cache_manager.ensure_materialized('GOLD', 'H1') is False
+
+        cache_manager.bulk_insert_candles(TestBulkInsert._make_rates(120), 'GOLD', 'M1')
+
+        assert cache_manager.ensure_materialized('GOLD', 'M1') is False
+        assert cache_manager.ensure_materialized('GOLD', 'H1') is True
+        assert cache_manager.get_record_count('GOLD', 'H1') == 2
+
+        with pytest.raises(ValueError):
+            cache_manager.materialize_timeframe('GOLD', 'M3', source_timeframe='M2')
+
+
 class TestSmartQueryFunctions:
     """智能查詢功能測試"""
 
+    def test_is_stale(self, cache_manager):
+        """測試：最新 K 線落後超過一個週期時視為過期"""
+        rates = TestBulkInsert._make_rates(10)
+        newest = cache_manager._epoch_to_datetime(int(rates['time'][-1]))
+
+        assert cache_manager.is_stale('GOLD', 'M1') is True
+
+        cache_manager.bulk_insert_candles(rates, 'GOLD', 'M1')
+
+        assert cache_manager.is_stale('GOLD', 'M1', now=newest + timedelta(seconds=30)) is False
+        assert cache_manager.is_stale('GOLD', 'M1', now=newest + timedelta(minutes=1)) is True
+        assert cache_manager.is_stale('GOLD', 'M1', now=newest + timedelta(days=7)) is True
+
     def test_is_cache_sufficient_full_coverage(
         self, cache_manager, sample_candles
     ):
@@ -279,6 +684,59 @@ class TestSmartQueryFunctions:
         cache_info = cache_manager.get_cache_info(symbol, timeframe)
         assert cache_info is not None
 
+    def test_identify_missing_ranges_inner_hole(
+        self, cache_manager, sample_candles
+    ):
+        """測試：識別快取範圍內部的缺口"""
+        cache_manager.insert_candles(sample_candles[:40], 'GOLD', 'H1')
+        cache_manager.insert_candles(sample_candles[60:], 'GOLD', 'H1')
+
+        ranges = cache_manager.identify_missing_ranges(
+            'GOLD', 'H1',
+            sample_candles['time'].iloc[0], sample_candles['time'].iloc[-1]
+        )
+
+        assert ranges == [
+            (sample_candles['time'].iloc[40], sample_candles['time'].iloc[59])
+        ]
+        assert len(cache_manager.get_coverage('GOLD', 'H1')) == 2
+
+    def test_fetch_candles_smart_only_fetches_holes(
+        self, cache_manager, sample_candles
+    ):
+        """測試：只請求真正的缺口，無數據區間不重複請求"""
+        requests = []
+
+        def mock_fetcher(sym, tf, start, end):
+            requests.append((start, end))
+            # 模擬休市：前 20 根沒有數據
+            return sample_candles[
+                (sample_candles['time'] >= max(start, sample_candles['time'].iloc[20])) &
+                (sample_candles['time'] <= end)
+            ]
+
+        cache_manager.insert_candles(sample_candles[50:70], 'GOLD', 'H1')
+
+        from_date = sample_candles['time'].iloc[0]
+        to_date = sample_candles['time'].iloc[-1]
+
+        df = cache_manager.fetch_candles_smart(
+            'GOLD', 'H1', from_date, to_date, mock_fetcher
+        )
+
+        assert len(requests) == 2
+        assert len(df) == 80
+
+        # 第二次查詢完全命中，不再請求 MT5
+        cache_manager.fetch_candles_smart(
+            'GOLD', 'H1', from_date, to_date, mock_fetcher
+        )
+
+        assert len(requests) == 2
+        assert cache_manager.get_coverage('GOLD', 'H1') == [
+            (from_date.to_pydatetime(), to_date.to_pydatetime())
+        ]
+
 
 class TestGapDetectionAndFilling:
     """缺口檢測與填補測試"""
@@ -291,7 +749,7 @@ class TestGapDetectionAndFilling:
         # 建立有缺口的數據
         data1 = {
             'time': pd.date_range(
-                '2024-01-01 00:00', periods=10, freq='h', tz='UTC'
+                '2024-01-02 00:00', periods=10, freq='h', tz='UTC'
             ),
             'open': [100.0] * 10,
             'high': [101.0] * 10,
@@ -306,7 +764,7 @@ class TestGapDetectionAndFilling:
         # 缺口：10小時後繼續
         data2 = {
             'time': pd.date_range(
-                '2024-01-01 20:00', periods=10, freq='h', tz='UTC'
+                '2024-01-02 20:00', periods=10, freq='h', tz='UTC'
             ),
             'open': [100.0] * 10,
             'high': [101.0] * 10,
@@ -336,7 +794,7 @@ class TestGapDetectionAndFilling:
         # 建立有缺口的數據並檢測
         data1 = {
             'time': pd.date_range(
-                '2024-01-01 00:00', periods=10, freq='h', tz='UTC'
+                '2024-01-02 00:00', periods=10, freq='h', tz='UTC'
             ),
             'open': [100.0] * 10,
             'high': [101.0] * 10,
@@ -350,7 +808,7 @@ class TestGapDetectionAndFilling:
 
         data2 = {
             'time': pd.date_range(
-                '2024-01-01 20:00', periods=10, freq='h', tz='UTC'
+                '2024-01-02 20:00', periods=10, freq='h', tz='UTC'
             ),
             'open': [100.0] * 10,
             'high': [101.0] * 10,
@@ -381,7 +839,7 @@ class TestGapDetectionAndFilling:
         # 建立有缺口的數據
         data1 = {
             'time': pd.date_range(
-                '2024-01-01 00:00', periods=10, freq='h', tz='UTC'
+                '2024-01-02 00:00', periods=10, freq='h', tz='UTC'
             ),
             'open': [100.0] * 10,
             'high': [101.0] * 10,
@@ -395,7 +853,7 @@ class TestGapDetectionAndFilling:
 
         data2 = {
             'time': pd.date_range(
-                '2024-01-01 20:00', periods=10, freq='h', tz='UTC'
+                '2024-01-02 20:00', periods=10, freq='h', tz='UTC'
             ),
             'open': [100.0] * 10,
             'high': [101.0] * 10,
@@ -441,7 +899,7 @@ class TestGapDetectionAndFilling:
         # 建立有缺口的數據
         data1 = {
             'time': pd.date_range(
-                '2024-01-01 00:00', periods=10, freq='h', tz='UTC'
+                '2024-01-02 00:00', periods=10, freq='h', tz='UTC'
             ),
             'open': [100.0] * 10,
             'high': [101.0] * 10,
@@ -455,7 +913,7 @@ class TestGapDetectionAndFilling:
 
         data2 = {
             'time': pd.date_range(
-                '2024-01-01 20:00', periods=10, freq='h', tz='UTC'
+                '2024-01-02 20:00', periods=10, freq='h', tz='UTC'
             ),
             'open': [100.0] * 10,
             'high': [101.0] * 10,
@@ -0,0 +1,164 @@
+"""
+串流回應單元測試
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from telegram.error import BadRequest
+
+from src.agent import tools
+from src.agent.agent import MT5Agent
+from src.bot.stream_reply import StreamingReply, TELEGRAM_MESSAGE_LIMIT
+
+
+class FakeStream:
+    """模擬 client.messages.stream() 回傳的 MessageStream"""
+
+    def __init__(self, texts, final):
+        self.texts = texts
+        self.final = final
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        yield SimpleNamespace(type='message_start')
+        for text in self.texts:
+            yield SimpleNamespace(type='text', text=text)
+        yield SimpleNamespace(type='message_stop')
+
+    def get_final_message(self):
+        return self.final
+
+
+def make_streaming_agent(turns):
+    calls = []
+
+    def stream(**kwargs):
+        texts, final = turns[len(calls)]
+        calls.append(kwargs)
+        return FakeStream(texts, final)
+
+    def create(**kwargs):
+        raise AssertionError('串流模式不應呼叫 messages.create')
+
+    agent = MT5Agent(api_key='test-key')
+    agent.client = SimpleNamespace(messages=SimpleNamespace(stream=stream, create=create))
+    return agent, calls
+
+
+def test_agent_forwards_text_and_tool_events(monkeypatch):
+    """測試：串流模式轉送文字片段與工具進度，回傳值與一般模式相同"""
+    monkeypatch.setattr(
+        tools, '_dispatch_tool', lambda name, args, conversation_id: {'success': True}
+    )
+    tool_use = SimpleNamespace(
+        type='tool_use', id='t1', name='get_candles', input={'symbol': 'GOLD'}
+    )
+    answer = SimpleNamespace(type='text', text='黃金偏多')
+    agent, calls = make_streaming_agent([
+        (['先取得', '資料'], SimpleNamespace(stop_reason='tool_use', content=[tool_use])),
+        (['黃金', '偏多'], SimpleNamespace(stop_reason='end_turn', content=[answer]))
+    ])
+    events = []
+
+    assert agent.process_message('黃金', on_event=events.append) == '黃金偏多'
+
+    assert len(calls) == 2
+    assert [e['type'] for e in events] == ['text', 'text', 'tool_start', 'tool_end', 'text', 'text']
+    assert ''.join(e['text'] for e in events if e['type'] == 'text') == '先取得資料黃金偏多'
+    assert events[2]['tools'] == ['get_candles']
+    assert events[3]['seconds'] >= 0
+
+
+def test_callback_errors_do_not_break_conversation():
+    """測試：事件回呼拋出例外時，對話仍正常完成"""
+    answer = SimpleNamespace(type='text', text='好')
+    agent, _ = make_streaming_agent([
+        (['好'], SimpleNamespace(stop_reason='end_turn', content=[answer]))
+    ])
+
+    def broken(event):
+        raise RuntimeError('boom')
+
+    assert agent.process_message('你好', on_event=broken) == '好'
+
+
+class FakeMessage:
+    """記錄 edit_text 呼叫的 Telegram 訊息"""
+
+    def __init__(self, not_modified_once=False):
+        self.edits = []
+        self.not_modified_once = not_modified_once
+
+    async def edit_text(self, text):
+        if self.not_modified_once:
+            self.not_modified_once = False
+            raise BadRequest('Message is not modified')
+        self.edits.append(text)
+
+
+def test_streaming_reply_throttles_edits():
+    """測試：頻繁的事件被合併為有間隔的編輯，最後一次編輯包含全部內容"""
+    message = FakeMessage()
+
+    async def main():
+        reply = StreamingReply(message, header='Arthur 正在處理中...', interval=0.1)
+        reply.start()
+
+        def produce():
+            reply.on_event({'type': 'tool_start', 'tools': ['get_candles', 'calculate_rsi']})
+            reply.on_event({
+                'type': 'tool_end', 'tools': ['get_candles', 'calculate_rsi'], 'seconds': 1.25
+            })
+            for i in range(50):
+                reply.on_event({'type': 'text', 'text': f'{i} '})
+                time.sleep(0.005)
+
+        await asyncio.to_thread(produce)
+        await asyncio.sleep(0.25)
+        await reply.finish()
+        return reply
+
+    reply = asyncio.run(main())
+
+    assert 1 <= len(message.edits) <= 6
+    assert reply.edits == len(message.edits)
+    assert message.edits[-1].startswith('Arthur 正在處理中...\n✅ 工具完成（1.2 秒）')
+    assert message.edits[-1].endswith('48 49')
+
+
+def test_streaming_reply_ignores_not_modified_and_idle():
+    """測試：內容未變時不編輯，Telegram 回報未修改時不重試"""
+    message = FakeMessage(not_modified_once=True)
+
+    async def main():
+        reply = StreamingReply(message, interval=0.05)
+        reply.start()
+        await asyncio.sleep(0.12)
+        reply.on_event({'type': 'text', 'text': '分析'})
+        await asyncio.sleep(0.2)
+        await reply.finish()
+
+    asyncio.run(main())
+
+    assert message.edits == []
+
+
+def test_render_keeps_tail_within_limit():
+    """測試：超過 Telegram 長度上限時保留標題與最新的文字"""
+    reply = StreamingReply(FakeMessage(), header='Max 正在處理中...')
+    reply._apply({'type': 'tool_start', 'tools': ['generate_vppa_chart']})
+    reply._apply({'type': 'text', 'text': '舊' * 5000 + '最新結論'})
+
+    text = reply.render()
+
+    assert len(text) <= TELEGRAM_MESSAGE_LIMIT
+    assert text.startswith('Max 正在處理中...\n🔧 繪製 VPPA 圖表...')
+    assert text.endswith('最新結論')
+    assert '…' in text
@@ -0,0 +1,162 @@
+"""
+Tick 儲存與 Tick Volume Profile 單元測試
+"""
+
+import pytest
+import numpy as np
+from datetime import datetime, timezone, timedelta
+
+from src.core.sqlite_cache import SQLiteCacheManager
+from src.core.backfill import backfill_ticks
+from src.agent.indicators import calculate_tick_volume_profile, calculate_value_area
+
+
+# MT5 copy_ticks_* 回傳的結構化陣列 dtype
+MT5_TICK_DTYPE = np.dtype([
+    ('time', '<i8'), ('bid', '<f8'), ('ask', '<f8'), ('last', '<f8'),
+    ('volume', '<u8'), ('time_msc', '<i8'), ('flags', '<u4'), ('volume_real', '<f8')
+])
+
+START_MSC = 1_767_225_600_000  # 2026-01-01 00:00 UTC
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with SQLiteCacheManager(str(tmp_path / 'candles.db')) as manager:
+        yield manager
+
+
+def make_ticks(n, start_msc=START_MSC, span_msc=3 * 3_600_000, seed=0, with_last=True):
+    """建立 MT5 格式的 Tick（跨越數個一小時區塊，含同一毫秒的多筆 Tick）"""
+    rng = np.random.default_rng(seed)
+    ticks = np.zeros(n, dtype=MT5_TICK_DTYPE)
+    ticks['time_msc'] = np.sort(start_msc + rng.integers(0, span_msc, n))
+    ticks['time'] = ticks['time_msc'] // 1000
+    ticks['bid'] = np.round(2000 + rng.normal(0, 2, n).cumsum() * 0.1, 2)
+    ticks['ask'] = ticks['bid'] + 0.2
+    if with_last:
+        ticks['last'] = ticks['bid'] + 0.1
+        ticks['volume_real'] = rng.integers(1, 10, n)
+        ticks['volume'] = ticks['volume_real']
+    ticks['flags'] = rng.integers(0, 8, n)
+    return ticks
+
+
+def read_all(cache, symbol='GOLD', **kwargs):
+    chunks = list(cache.iter_tick_chunks(symbol, **kwargs))
+    return {name: np.concatenate([c[name] for c in chunks]) for name in chunks[0]} if chunks else {}
+
+
+def test_insert_and_read_round_trip(cache):
+    """測試：寫入後逐區塊讀回的欄位與原始 Tick 相同"""
+    ticks = make_ticks(20000)
+
+    stats = cache.insert_ticks(ticks, 'GOLD')
+    stored = read_all(cache)
+
+    assert stats == {'ticks': 20000, 'chunks': 3}
+    np.testing.assert_array_equal(stored['time_msc'], ticks['time_msc'])
+    np.testing.assert_array_equal(stored['bid'], ticks['bid'])
+    np.testing.assert_array_equal(stored['volume'], ticks['volume_real'])
+    np.testing.assert_array_equal(stored['flags'], ticks['flags'])
+    assert cache.get_tick_range('GOLD') == {
+        'first_msc': int(ticks['time_msc'][0]),
+        'last_msc': int(ticks['time_msc'][-1]),
+        'tick_count': 20000,
+        'chunks': 3
+    }
+
+
+def test_overlapping_insert_replaces_range(cache):
+    """測試：重複寫入重疊的時間範圍時，範圍內的舊 Tick 被取代而不重複"""
+    ticks = make_ticks(9000)
+    cache.insert_ticks(ticks[:6000], 'GOLD')
+    cache.insert_ticks(ticks[3000:], 'GOLD')
+    cache.insert_ticks(ticks[4000:5000], 'GOLD')
+
+    np.testing.assert_array_equal(read_all(cache)['time_msc'], ticks['time_msc'])
+
+
+def test_iter_tick_chunks_time_filter(cache):
+    """測試：依時間範圍裁切並只讀取指定欄位"""
+    ticks = make_ticks(10000)
+    cache.insert_ticks(ticks, 'GOLD')
+
+    start = START_MSC + 1_800_000
+    end = datetime.fromtimestamp((START_MSC + 5_400_000) / 1000, tz=timezone.utc)
+    stored = read_all(cache, start=start, end=end, columns=['bid'])
+
+    expected = ticks[(ticks['time_msc'] >= start) & (ticks['time_msc'] <= START_MSC + 5_400_000)]
+    assert set(stored) == {'time_msc', 'bid'}
+    np.testing.assert_array_equal(stored['bid'], expected['bid'])
+    assert list(cache.iter_tick_chunks('SILVER')) == []
+
+    with pytest.raises(ValueError):
+        list(cache.iter_tick_chunks('GOLD', columns=['price']))
+
+
+def test_tick_profile_matches_naive_histogram(cache):
+    """測試：逐區塊 bincount 的結果與一次計算整段 Tick 的直方圖相同"""
+    ticks = make_ticks(30000)
+    cache.insert_ticks(ticks, 'GOLD')
+
+    profile = calculate_tick_volume_profile(
+        cache.iter_tick_chunks('GOLD'), price_step=0.5, price='last', weight='volume'
+    )
+
+    levels = np.floor(ticks['last'] / 0.5 + 1e-9).astype(int)
+    expected = np.bincount(levels - levels.min(), weights=ticks['volume_real'])
+    value_area = calculate_value_area(expected, levels.min() * 0.5, 0.5, 0.7)
+
+    np.testing.assert_allclose(profile['volume_profile'], expected)
+    assert profile['price_lowest'] == pytest.approx(levels.min() * 0.5)
+    assert profile['tick_count'] == 30000
+    assert profile['poc']['price'] == pytest.approx(value_area['poc_price'])
+    assert (profile['vah'], profile['val']) == pytest.approx((value_area['vah'], value_area['val']))
+
+
+def test_tick_profile_auto_falls_back_to_mid_and_count():
+    """測試：沒有成交價與成交量時，auto 改用買賣中價並以 Tick 筆數為權重"""
+    chunk = {
+        'bid': np.array([100.0, 100.0, 101.0, np.nan]),
+        'ask': np.array([100.2, 100.2, 101.2, np.nan]),
+        'last': np.zeros(4),
+        'volume': np.zeros(4)
+    }
+
+    profile = calculate_tick_volume_profile([chunk], price_step=1.0)
+
+    np.testing.assert_array_equal(profile['volume_profile'], [2.0, 1.0])
+    assert profile['tick_count'] == 3
+    assert profile['poc']['price'] == pytest.approx(100.5)
+
+
+def test_tick_profile_invalid_input():
+    """測試：無效參數與沒有 Tick"""
+    with pytest.raises(ValueError):
+        calculate_tick_volume_profile([], price_step=0)
+    with pytest.raises(ValueError):
+        calculate_tick_volume_profile([], price_step=0.1, price='close')
+    with pytest.raises(ValueError):
+        calculate_tick_volume_profile([], price_step=0.1)
+
+
+def test_backfill_ticks_windows(cache):
+    """測試：以固定時間窗口抓取並寫入，之後從最後一筆 Tick 續抓"""
+    ticks = make_ticks(5000)
+    requests = []
+
+    def fetch(symbol, start_time, end_time):
+        requests.append((start_time, end_time))
+        start_msc, end_msc = (int(t.timestamp() * 1000) for t in (start_time, end_time))
+        return ticks[(ticks['time_msc'] >= start_msc) & (ticks['time_msc'] <= end_msc)]
+
+    start = datetime.fromtimestamp(START_MSC / 1000, tz=timezone.utc)
+    stats = backfill_ticks(cache, 'GOLD', start, start + timedelta(hours=3), fetch_ticks=fetch)
+
+    assert stats['requests'] == 3
+    np.testing.assert_array_equal(read_all(cache)['time_msc'], ticks['time_msc'])
+
+    backfill_ticks(cache, 'GOLD', end_time=start + timedelta(hours=3), fetch_ticks=fetch)
+    assert requests[-1][0] == datetime.fromtimestamp(ticks['time_msc'][-1] / 1000, tz=timezone.utc)
+    assert cache.get_tick_range('GOLD')['tick_count'] == 5000
@@ -0,0 +1,143 @@
+"""
+工具並行執行單元測試
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.agent import tools
+from src.agent.tools import TOOLS, TOOL_PARALLEL_SAFE, execute_tools
+from src.agent.agent import MT5Agent
+
+
+class FakeDispatch:
+    """取代 _dispatch_tool：每個工具等待固定時間，並記錄同時執行的數量"""
+
+    def __init__(self, seconds=0.1):
+        self.seconds = seconds
+        self.lock = threading.Lock()
+        self.active = {'parallel': 0, 'serial': 0}
+        self.max_active = {'parallel': 0, 'serial': 0}
+
+    def __call__(self, tool_name, tool_input, conversation_id):
+        kind = 'parallel' if TOOL_PARALLEL_SAFE[tool_name] else 'serial'
+        with self.lock:
+            self.active[kind] += 1
+            self.max_active[kind] = max(self.max_active[kind], self.active[kind])
+        time.sleep(self.seconds)
+        with self.lock:
+            self.active[kind] -= 1
+        return {
+            'success': True, 'tool': tool_name, 'input': tool_input,
+            'conversation': conversation_id
+        }
+
+
+@pytest.fixture
+def dispatch(monkeypatch):
+    fake = FakeDispatch()
+    monkeypatch.setattr(tools, '_dispatch_tool', fake)
+    return fake
+
+
+def test_every_tool_declares_parallel_safety():
+    """測試：每個工具都有並行安全宣告"""
+    assert {tool['name'] for tool in TOOLS} == set(TOOL_PARALLEL_SAFE)
+
+
+def test_parallel_tools_run_concurrently(dispatch):
+    """測試：計算工具並行執行，耗時接近最慢的工具，結果依原順序排列"""
+    calls = [
+        ('calculate_sma', {'window': 20}),
+        ('calculate_rsi', {'window': 14}),
+        ('calculate_volume_profile', {'price_bins': 50})
+    ]
+
+    started = time.perf_counter()
+    results = execute_tools(calls, 'conv')
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.25
+    assert dispatch.max_active['parallel'] == 3
+    assert [(r['tool'], r['input'], r['conversation']) for r in results] == [
+        (name, args, 'conv') for name, args in calls
+    ]
+
+
+def test_serial_tools_run_in_order(dispatch):
+    """測試：MT5 相關工具在同一回合中於目前執行緒依序執行，結果依原順序排列"""
+    calls = [
+        ('get_candles', {'symbol': 'GOLD'}),
+        ('calculate_sma', {}),
+        ('get_account_info', {}),
+        ('calculate_rsi', {})
+    ]
+
+    results = execute_tools(calls)
+
+    assert dispatch.max_active['serial'] == 1
+    assert [r['tool'] for r in results] == [name for name, _ in calls]
+
+
+def test_mt5_calls_never_overlap(monkeypatch):
+    """測試：不同執行緒的 MT5 終端機呼叫以全域鎖逐一執行"""
+    lock = threading.Lock()
+    active = [0]
+    max_active = [0]
+
+    class FakeClient:
+        def get_account_info(self):
+            with lock:
+                active[0] += 1
+                max_active[0] = max(max_active[0], active[0])
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return {'login': 1, 'balance': 100.0}
+
+    monkeypatch.setattr(tools, 'get_mt5_client', FakeClient)
+
+    threads = [
+        threading.Thread(target=execute_tools, args=([('get_account_info', {})],))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max_active[0] == 1
+
+
+def test_agent_reassembles_tool_results_in_order(dispatch):
+    """測試：Agent 迴圈把並行工具的結果依 tool_use 順序回傳給模型"""
+    blocks = [
+        SimpleNamespace(type='text', text='計算中'),
+        SimpleNamespace(
+            type='tool_use', id='t1', name='calculate_volume_profile', input={'price_bins': 50}
+        ),
+        SimpleNamespace(type='tool_use', id='t2', name='calculate_sma', input={'window': 20}),
+        SimpleNamespace(type='tool_use', id='t3', name='calculate_rsi', input={'window': 14})
+    ]
+    responses = [
+        SimpleNamespace(stop_reason='tool_use', content=blocks),
+        SimpleNamespace(stop_reason='end_turn', content=[SimpleNamespace(type='text', text='完成')])
+    ]
+    requests = []
+
+    def create(**kwargs):
+        requests.append(list(kwargs['messages']))
+        return responses[len(requests) - 1]
+
+    agent = MT5Agent(api_key='test-key')
+    agent.client = SimpleNamespace(messages=SimpleNamespace(create=create))
+
+    assert agent.process_message('分析黃金') == '完成'
+
+    tool_results = requests[1][-1]['content']
+    assert [r['tool_use_id'] for r in tool_results] == ['t1', 't2', 't3']
+    assert 'calculate_volume_profile' in tool_results[0]['content']
+    assert 'calculate_rsi' in tool_results[2]['content']
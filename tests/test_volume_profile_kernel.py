@@ -0,0 +1,313 @@
+"""
+向量化成交量分配核心的一致性測試
+
+以改版前的逐根逐層迴圈作為參考實作，確認 distribute_volume 與
+calculate_volume_profile_for_range 的結果與 PineScript 相容演算法一致。
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.agent import indicator_backend
+from src.agent.indicators import (
+    distribute_volume,
+    calculate_volume_profile_for_range,
+    calculate_volume_profiles,
+    calculate_volume_profile,
+    calculate_value_area,
+    calculate_value_area_many,
+    calculate_vppa
+)
+
+
+def reference_distribute_volume(highs, lows, volumes, price_lowest, price_step, price_levels):
+    """改版前的逐根逐層迴圈實作"""
+    volume_storage = np.zeros(price_levels)
+
+    for bar_high, bar_low, bar_volume in zip(highs, lows, volumes):
+        bar_range = bar_high - bar_low
+
+        for level in range(price_levels):
+            level_low = price_lowest + level * price_step
+            level_high = price_lowest + (level + 1) * price_step
+
+            if bar_high >= level_low and bar_low < level_high:
+                if bar_range == 0:
+                    volume_storage[level] += bar_volume
+                else:
+                    ratio = price_step / bar_range
+                    volume_storage[level] += bar_volume * ratio
+
+    return volume_storage
+
+
+def baseline_volume_profile(df, price_bins):
+    """改版前的 calculate_volume_profile（平均分配成交量、以中心價回報 Value Area）"""
+    price_edges = np.linspace(df['low'].min(), df['high'].max(), price_bins + 1)
+    price_centers = (price_edges[:-1] + price_edges[1:]) / 2
+    volumes = np.zeros(price_bins)
+
+    for _, row in df.iterrows():
+        low_idx = np.searchsorted(price_edges, row['low'], side='left')
+        high_idx = np.searchsorted(price_edges, row['high'], side='right') - 1
+        low_idx = max(0, min(low_idx, price_bins - 1))
+        high_idx = max(0, min(high_idx, price_bins - 1))
+
+        span = high_idx - low_idx + 1
+        if span > 0:
+            volumes[low_idx:high_idx + 1] += row['real_volume'] / span
+
+    poc_idx = int(np.argmax(volumes))
+    total_volume = volumes.sum()
+    value_area_volume = volumes[poc_idx]
+    lower_idx = upper_idx = poc_idx
+
+    while value_area_volume < total_volume * 0.70:
+        can_expand_lower = lower_idx > 0
+        can_expand_upper = upper_idx < price_bins - 1
+        if not can_expand_lower and not can_expand_upper:
+            break
+
+        lower_volume = volumes[lower_idx - 1] if can_expand_lower else 0
+        upper_volume = volumes[upper_idx + 1] if can_expand_upper else 0
+
+        if lower_volume > upper_volume and can_expand_lower:
+            lower_idx -= 1
+            value_area_volume += lower_volume
+        elif can_expand_upper:
+            upper_idx += 1
+            value_area_volume += upper_volume
+
+    return volumes, {
+        'poc_price': price_centers[poc_idx],
+        'poc_volume': volumes[poc_idx],
+        'vah': price_centers[upper_idx],
+        'val': price_centers[lower_idx],
+        'value_area_volume': value_area_volume,
+        'total_volume': total_volume,
+        'value_area_percentage': value_area_volume / total_volume * 100
+    }
+
+
+def make_bars(n, seed=0, tick=None):
+    """建立隨機走勢的 K 線（可選擇將價格對齊最小跳動單位）"""
+    rng = np.random.default_rng(seed)
+    close = 2000 + rng.normal(0, 1, n).cumsum()
+    high = close + rng.exponential(0.5, n)
+    low = close - rng.exponential(0.5, n)
+
+    if tick is not None:
+        high = np.round(high / tick) * tick
+        low = np.round(low / tick) * tick
+
+    return pd.DataFrame({
+        'high': high,
+        'low': low,
+        'close': close,
+        'real_volume': rng.integers(0, 5000, n).astype(float),
+        'tick_volume': rng.integers(1, 500, n)
+    })
+
+
+def assert_profile_equal(actual, expected):
+    """容許浮點累加順序造成的誤差"""
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9 * expected.sum())
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('price_levels', [1, 5, 25, 27, 100])
+def test_kernel_matches_reference(seed, price_levels):
+    """測試：隨機 K 線的分配結果與參考實作一致"""
+    df = make_bars(300, seed=seed)
+    lowest = df['low'].min()
+    step = (df['high'].max() - lowest) / price_levels
+
+    args = (df['high'].to_numpy(), df['low'].to_numpy(), df['real_volume'].to_numpy(),
+            lowest, step, price_levels)
+
+    assert_profile_equal(distribute_volume(*args), reference_distribute_volume(*args))
+
+
+@pytest.mark.parametrize('tick', [0.01, 0.1, 1.0])
+def test_kernel_boundaries(tick):
+    """測試：價格恰好落在層級邊界、一字線（high == low）時一致"""
+    df = make_bars(500, seed=1, tick=tick)
+    flat = np.arange(0, 500, 7)
+    df.loc[flat, 'low'] = df.loc[flat, 'high']
+
+    lowest = df['low'].min()
+    price_levels = 20
+    step = (df['high'].max() - lowest) / price_levels
+
+    args = (df['high'].to_numpy(), df['low'].to_numpy(), df['real_volume'].to_numpy(),
+            lowest, step, price_levels)
+
+    assert_profile_equal(distribute_volume(*args), reference_distribute_volume(*args))
+
+
+def test_kernel_ignores_nan_prices():
+    """測試：價格為 NaN 的 K 線不分配成交量"""
+    highs = np.array([10.0, np.nan, 12.0])
+    lows = np.array([9.0, 9.5, np.nan])
+    volumes = np.array([100.0, 50.0, 70.0])
+
+    result = distribute_volume(highs, lows, volumes, 9.0, 1.0, 3)
+
+    np.testing.assert_allclose(
+        result, reference_distribute_volume(highs, lows, volumes, 9.0, 1.0, 3)
+    )
+
+
+@pytest.mark.parametrize('volume_column', ['real_volume', 'tick_volume'])
+def test_range_function_matches_reference(volume_column):
+    """測試：calculate_volume_profile_for_range 與參考實作一致（含 tick_volume 回退）"""
+    df = make_bars(1000, seed=2)
+    if volume_column == 'tick_volume':
+        df['real_volume'] = 0.0
+
+    result = calculate_volume_profile_for_range(df, 100, 899, price_levels=27)
+
+    range_df = df.iloc[100:900]
+    lowest = range_df['low'].min()
+    step = (range_df['high'].max() - lowest) / 27
+    expected = reference_distribute_volume(
+        range_df['high'].to_numpy(), range_df['low'].to_numpy(),
+        range_df[volume_column].to_numpy(dtype=float), lowest, step, 27
+    )
+
+    assert_profile_equal(result['volume_profile'], expected)
+    np.testing.assert_allclose(
+        result['price_centers'], [lowest + (level + 0.5) * step for level in range(27)]
+    )
+    assert result['bar_count'] == 800
+
+
+def test_batch_matches_per_range():
+    """測試：批次計算與逐一區間計算一致（含價格無變化與 tick_volume 回退的區間）"""
+    df = make_bars(600, seed=3)
+    df.loc[200:210, ['high', 'low']] = 2000.0
+    df.loc[300:350, 'real_volume'] = 0.0
+
+    starts = np.array([0, 40, 40, 200, 300, 120])
+    ends = np.array([40, 90, 41, 210, 350, 599])
+
+    batch = calculate_volume_profiles(
+        df['high'].to_numpy(), df['low'].to_numpy(), df['real_volume'].to_numpy(),
+        starts, ends, price_levels=25, fallback_volumes=df['tick_volume'].to_numpy()
+    )
+
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        single = calculate_volume_profile_for_range(df, start, end, price_levels=25)
+
+        assert_profile_equal(batch['volume_profile'][i], single['volume_profile'])
+        np.testing.assert_allclose(batch['price_centers'][i], single['price_centers'])
+        assert batch['price_lowest'][i] == single['price_lowest']
+        assert batch['price_highest'][i] == single['price_highest']
+        assert batch['price_step'][i] == single['price_step']
+        assert batch['total_volume'][i] == pytest.approx(single['total_volume'])
+        assert batch['bar_count'][i] == single['bar_count']
+
+
+def test_calculate_vppa_matches_per_range():
+    """測試：calculate_vppa 的每個區間與 calculate_volume_profile_for_range 一致"""
+    df = make_bars(2160, seed=4)
+    df.index = pd.date_range('2024-01-01', periods=len(df), freq='min')
+
+    result = calculate_vppa(df, pivot_length=10, price_levels=27)
+    ranges = result['pivot_ranges'] + [result['developing_range']]
+
+    assert len(result['pivot_ranges']) > 20
+    for range_data in ranges:
+        single = calculate_volume_profile_for_range(
+            df, range_data['start_idx'], range_data['end_idx'], price_levels=27
+        )
+        assert_profile_equal(np.array(range_data['volume_profile']), single['volume_profile'])
+        assert range_data['price_step'] == single['price_step']
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'numba'])
+def test_calculate_vppa_value_area_ties_match_reference(monkeypatch, backend):
+    """測試：整數價格（大量平手層級）時 Value Area 與參考實作一致（兩種後端）"""
+    # 未安裝 numba 時 JIT 核心函數以純 Python 執行
+    monkeypatch.setattr(indicator_backend, '_backend', backend)
+    df = make_bars(3000, seed=2, tick=1.0)
+
+    result = calculate_vppa(df, pivot_length=10, price_levels=27)
+
+    assert len(result['pivot_ranges']) > 20
+    for range_data in result['pivot_ranges']:
+        range_df = df.iloc[range_data['start_idx']:range_data['end_idx'] + 1]
+        price_lowest = range_df['low'].min()
+        price_step = (range_df['high'].max() - price_lowest) / 27
+        expected = reference_distribute_volume(
+            range_df['high'].to_numpy(), range_df['low'].to_numpy(),
+            range_df['real_volume'].to_numpy(), price_lowest, price_step, 27
+        )
+        value_area = calculate_value_area(expected, price_lowest, price_step, 0.68)
+
+        np.testing.assert_array_equal(np.array(range_data['volume_profile']), expected)
+        assert range_data['vah'] == pytest.approx(value_area['vah'])
+        assert range_data['val'] == pytest.approx(value_area['val'])
+
+
+def test_value_area_many_matches_single():
+    """測試：批次 Value Area 與逐一呼叫 calculate_value_area 一致（含零成交量與平手層級）"""
+    rng = np.random.default_rng(5)
+    matrix = rng.integers(0, 4, (200, 27)).astype(float)
+    matrix[::9] = 0.0
+    price_lowest = rng.normal(2000, 5, 200)
+    price_step = rng.uniform(0, 1, 200)
+
+    batch = calculate_value_area_many(matrix, price_lowest, price_step, 0.68)
+
+    for i in range(len(matrix)):
+        single = calculate_value_area(matrix[i], price_lowest[i], price_step[i], 0.68)
+        for key, value in single.items():
+            assert batch[key][i] == pytest.approx(value), key
+
+
+def test_whole_dataset_profile_uses_shared_kernels():
+    """測試：calculate_volume_profile 與 distribute_volume / calculate_value_area 的結果一致"""
+    df = make_bars(400, seed=6)
+    price_bins = 50
+
+    price_lowest = df['low'].min()
+    price_step = (df['high'].max() - price_lowest) / price_bins
+    expected = distribute_volume(
+        df['high'].to_numpy(), df['low'].to_numpy(), df['real_volume'].to_numpy(),
+        price_lowest, price_step, price_bins, weights='even'
+    )
+    value_area = calculate_value_area(expected, price_lowest, price_step, 0.70)
+
+    profile_df, metrics = calculate_volume_profile(df, price_bins=price_bins)
+
+    assert_profile_equal(profile_df['volume'].to_numpy(), expected)
+    assert profile_df['volume'].sum() == pytest.approx(df['real_volume'].sum())
+    assert metrics['total_volume'] == df['real_volume'].sum()
+    assert metrics['poc_price'] == pytest.approx(value_area['poc_price'])
+    assert metrics['vah'] == pytest.approx(value_area['vah'] - price_step / 2)
+    assert metrics['val'] == pytest.approx(value_area['val'] + price_step / 2)
+    assert metrics['val'] <= metrics['poc_price'] <= metrics['vah']
+    assert metrics['value_area_percentage'] >= 70
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_whole_dataset_profile_matches_baseline(seed):
+    """測試：整數價格（K 線最低價落在層級邊界）時與改版前的結果相同"""
+    rng = np.random.default_rng(seed)
+    close = 2000 + rng.integers(-2, 3, 400).cumsum()
+    df = pd.DataFrame({
+        'high': (close + 1 + rng.integers(0, 3, 400)).astype(float),
+        'low': (close - rng.integers(0, 3, 400)).astype(float),
+        # 成交量為 1 ~ 16 的公倍數，平均分配後仍為整數，比較時不受累加順序影響
+        'real_volume': rng.integers(1, 5000, 400) * 720720.0
+    })
+    price_bins = int(df['high'].max() - df['low'].min())
+
+    expected_volumes, expected = baseline_volume_profile(df, price_bins)
+    profile_df, metrics = calculate_volume_profile(df, price_bins=price_bins)
+
+    np.testing.assert_array_equal(profile_df['volume'].to_numpy(), expected_volumes)
+    for key, value in expected.items():
+        assert metrics[key] == pytest.approx(value), key
@@ -12,6 +12,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 
 from agent.indicators import (
     find_pivot_points,
+    find_pivot_indices,
     extract_pivot_ranges,
     calculate_volume_profile_for_range,
     calculate_value_area,
@@ -98,6 +99,59 @@ class TestFindPivotPoints:
         assert "缺少必要欄位" in str(exc_info.value)
 
 
+class TestFindPivotIndices:
+    """測試 find_pivot_indices() 函數"""
+
+    @staticmethod
+    def reference_pivots(highs, lows, length):
+        """改版前的逐根切片實作"""
+        high_series = pd.Series(highs)
+        low_series = pd.Series(lows)
+        pivot_highs, pivot_lows = [], []
+
+        for i in range(length, len(highs) - length):
+            if (high_series.iloc[i] > high_series.iloc[i-length:i].max() and
+                    high_series.iloc[i] > high_series.iloc[i+1:i+length+1].max()):
+                pivot_highs.append(i)
+            if (low_series.iloc[i] < low_series.iloc[i-length:i].min() and
+                    low_series.iloc[i] < low_series.iloc[i+1:i+length+1].min()):
+                pivot_lows.append(i)
+
+        return pivot_highs, pivot_lows
+
+    @pytest.mark.parametrize('length', [1, 2, 5, 13, 67])
+    def test_matches_reference(self, length):
+        """測試：與逐根切片的結果一致（含平手價格與 NaN）"""
+        rng = np.random.default_rng(length)
+        close = np.round(100 + rng.normal(0, 1, 800).cumsum(), 1)
+        highs = close + np.round(rng.exponential(0.5, 800), 1)
+        lows = close - np.round(rng.exponential(0.5, 800), 1)
+        highs[[50, 400]] = np.nan
+        lows[[51, 401]] = np.nan
+
+        high_indices, low_indices = find_pivot_indices(highs, lows, length)
+        expected_highs, expected_lows = self.reference_pivots(highs, lows, length)
+
+        assert high_indices.tolist() == expected_highs
+        assert low_indices.tolist() == expected_lows
+
+    def test_strict_inequality(self):
+        """測試：與鄰近 K 線同價時不視為 Pivot Point"""
+        highs = np.array([1.0, 2.0, 5.0, 5.0, 2.0, 1.0, 1.0])
+        lows = highs - 0.5
+
+        high_indices, _ = find_pivot_indices(highs, lows, length=2)
+
+        assert len(high_indices) == 0
+
+    def test_insufficient_data(self):
+        """測試資料量不足的情況"""
+        with pytest.raises(ValueError) as exc_info:
+            find_pivot_indices(np.ones(10), np.ones(10), length=5)
+
+        assert "資料筆數" in str(exc_info.value)
+
+
 class TestExtractPivotRanges:
     """測試 extract_pivot_ranges() 函數"""
 
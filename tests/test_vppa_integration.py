@@ -210,14 +210,15 @@ class TestGetCandlesWithBackfill:
 
         # 模擬 DB 有足夠資料
         df = pd.DataFrame({
-            'time': pd.date_range('2026-01-01', periods=150, freq='1H'),
-            'open': [2000] * 150,
-            'high': [2005] * 150,
-            'low': [1995] * 150,
-            'close': [2000] * 150,
-            'real_volume': [1000] * 150
+            'time': pd.date_range('2026-01-01', periods=100, freq='1H'),
+            'open': [2000] * 100,
+            'high': [2005] * 100,
+            'low': [1995] * 100,
+            'close': [2000] * 100,
+            'real_volume': [1000] * 100
         })
-        mock_cache_manager.query_candles.return_value = df
+        mock_cache_manager.query_latest.return_value = df
+        mock_cache_manager.is_stale.return_value = False
 
         result = _get_candles({
             'symbol': 'GOLD',
@@ -232,6 +233,39 @@ class TestGetCandlesWithBackfill:
         # 驗證未調用回補
         mock_update_db.assert_not_called()
 
+    @patch('scripts.analyze_vppa.update_db_to_now')
+    def test_get_candles_stale_cache_refreshes(
+        self, mock_update_db, mock_mt5_client, mock_cache_manager
+    ):
+        """測試 DB 筆數足夠但最新 K 線已落後時，先更新到最新再查詢"""
+        import pandas as pd
+
+        df = pd.DataFrame({
+            'time': pd.date_range('2026-01-01', periods=100, freq='h', tz='UTC'),
+            'open': [2000] * 100,
+            'high': [2005] * 100,
+            'low': [1995] * 100,
+            'close': [2000] * 100,
+            'real_volume': [1000] * 100
+        })
+        mock_cache_manager.ensure_materialized.return_value = False
+        mock_cache_manager.is_stale.return_value = True
+        mock_cache_manager.query_latest.return_value = df
+        mock_update_db.return_value = 12
+
+        result = _get_candles({
+            'symbol': 'GOLD',
+            'timeframe': 'H1',
+            'count': 100
+        })
+
+        assert result['success'] is True
+        assert result['data']['summary']['backfilled'] is True
+        assert result['data']['summary']['backfill_count'] == 12
+        mock_cache_manager.is_stale.assert_called_once_with('GOLD', 'H1')
+        mock_update_db.assert_called_once()
+        assert mock_update_db.call_args.args[:2] == ('GOLD', 'H1')
+
     @patch('scripts.analyze_vppa.update_db_to_now')
     def test_get_candles_triggers_backfill(self, mock_update_db, mock_mt5_client, mock_cache_manager):
         """測試 DB 資料不足時觸發回補"""
@@ -249,15 +283,16 @@ class TestGetCandlesWithBackfill:
 
         # 第二次查詢：回補後資料充足
         df_sufficient = pd.DataFrame({
-            'time': pd.date_range('2026-01-01', periods=150, freq='1H'),
-            'open': [2000] * 150,
-            'high': [2005] * 150,
-            'low': [1995] * 150,
-            'close': [2000] * 150,
-            'real_volume': [1000] * 150
+            'time': pd.date_range('2026-01-01', periods=100, freq='1H'),
+            'open': [2000] * 100,
+            'high': [2005] * 100,
+            'low': [1995] * 100,
+            'close': [2000] * 100,
+            'real_volume': [1000] * 100
         })
 
-        mock_cache_manager.query_candles.side_effect = [df_insufficient, df_sufficient]
+        mock_cache_manager.query_latest.side_effect = [df_insufficient, df_sufficient]
+        mock_cache_manager.is_stale.return_value = False
         mock_update_db.return_value = 100
 
         result = _get_candles({
@@ -286,6 +321,29 @@ class TestGetCandlesWithBackfill:
         assert '無效的時間週期' in result['error']
 
 
+class TestFetchData:
+    """測試 analyze_vppa.fetch_data 的資料新鮮度檢查"""
+
+    @patch('scripts.analyze_vppa.update_db_to_now')
+    def test_fetch_data_refreshes_stale_cache(self, mock_update_db):
+        """測試 DB 筆數足夠但已過期時，先更新到最新"""
+        import pandas as pd
+        from scripts.analyze_vppa import fetch_data
+
+        df = pd.DataFrame({'time': pd.date_range('2026-01-01', periods=10, freq='h', tz='UTC')})
+        cache = MagicMock()
+        cache.is_stale.return_value = True
+        cache.query_latest.return_value = df
+
+        assert fetch_data('GOLD', 'H1', 10, cache, MagicMock()) is df
+        mock_update_db.assert_called_once()
+
+        cache.is_stale.return_value = False
+        mock_update_db.reset_mock()
+        fetch_data('GOLD', 'H1', 10, cache, MagicMock())
+        mock_update_db.assert_not_called()
+
+
 class TestExecuteTool:
     """測試工具執行器"""
 
@@ -0,0 +1,170 @@
+"""
+串流 VPPA 狀態單元測試
+
+以 calculate_vppa 對相同 K 線的結果作為參考，確認逐步餵入、
+滑動視窗與修正最後幾根 K 線後的 snapshot() 結果一致。
+"""
+
+import threading
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.agent.indicators import calculate_vppa
+from src.agent.vppa_state import VPPAState
+
+
+PIVOT_LENGTH = 10
+PRICE_LEVELS = 27
+VALUE_AREA_PCT = 0.67
+
+
+def make_candles(n, seed=0):
+    """建立隨機走勢、以時間為索引的 M1 K 線"""
+    rng = np.random.default_rng(seed)
+    close = 2000 + rng.normal(0, 1, n).cumsum()
+
+    return pd.DataFrame({
+        'high': close + rng.exponential(0.5, n),
+        'low': close - rng.exponential(0.5, n),
+        'real_volume': rng.integers(0, 5000, n).astype(float),
+        'tick_volume': rng.integers(1, 500, n)
+    }, index=pd.date_range('2024-01-01', periods=n, freq='min'))
+
+
+def assert_same_range(actual, expected):
+    """比對單一區間（容許浮點累加順序的誤差）"""
+    assert list(actual) == list(expected)
+
+    for key, value in expected.items():
+        if key in ('volume_profile', 'price_centers'):
+            np.testing.assert_allclose(actual[key], value, rtol=1e-9, atol=1e-6)
+        elif key == 'poc':
+            assert actual[key]['level'] == value['level']
+            assert actual[key]['price'] == pytest.approx(value['price'])
+        elif isinstance(value, float):
+            assert actual[key] == pytest.approx(value, rel=1e-9), key
+        else:
+            assert actual[key] == value, key
+
+
+def assert_same_result(actual, expected):
+    """比對 snapshot() 與 calculate_vppa 的結果"""
+    assert actual['metadata'] == expected['metadata']
+    assert actual['pivot_summary'] == expected['pivot_summary']
+    assert len(actual['pivot_ranges']) == len(expected['pivot_ranges'])
+
+    for actual_range, expected_range in zip(actual['pivot_ranges'], expected['pivot_ranges']):
+        assert_same_range(actual_range, expected_range)
+
+    if expected['developing_range'] is None:
+        assert actual['developing_range'] is None
+    else:
+        assert_same_range(actual['developing_range'], expected['developing_range'])
+
+
+def reference(df):
+    return calculate_vppa(df, PIVOT_LENGTH, PRICE_LEVELS, VALUE_AREA_PCT)
+
+
+def new_state(max_bars=None):
+    return VPPAState(PIVOT_LENGTH, PRICE_LEVELS, VALUE_AREA_PCT, max_bars=max_bars)
+
+
+def test_initial_snapshot_matches_batch():
+    """測試：一次餵入全部 K 線的結果與 calculate_vppa 相同"""
+    df = make_candles(1500)
+    state = new_state()
+
+    assert state.update(df) == 1500
+    assert_same_result(state.snapshot(), reference(df))
+    assert_same_result(state.snapshot(count=600), reference(df.iloc[-600:]))
+
+
+def test_sliding_window_matches_batch():
+    """測試：每次請求往後滑動幾根 K 線時，結果與重新計算相同"""
+    df = make_candles(1600, seed=1)
+    window = 800
+    state = new_state(max_bars=window)
+
+    state.update(df.iloc[:window])
+
+    for end in range(window + 3, len(df) + 1, 3):
+        part = df.iloc[end - window:end]
+        assert state.update(part) == 3
+
+        if end % 60 == 0 or end == len(df):
+            assert_same_result(state.snapshot(count=window), reference(part))
+
+    assert state.bar_count <= window * 2
+
+
+def test_repeat_update_is_noop():
+    """測試：相同資料重複餵入不重新計算"""
+    df = make_candles(500, seed=2)
+    state = new_state()
+    state.update(df)
+
+    assert state.update(df) == 0
+    assert state.update(df.iloc[100:]) == 0
+
+
+@pytest.mark.parametrize('back', [1, 5, PIVOT_LENGTH + 3, 200])
+def test_revised_bars_roll_back(back):
+    """測試：修正最後幾根 K 線（例如未收盤的 K 線）後重新判定受影響的 Pivot Points"""
+    df = make_candles(1000, seed=3)
+    state = new_state()
+    state.update(df)
+
+    revised = df.copy()
+    revised.iloc[-back, revised.columns.get_loc('high')] += 25.0
+    revised.iloc[-back, revised.columns.get_loc('real_volume')] += 100.0
+
+    assert state.update(revised) == back
+    assert_same_result(state.snapshot(), reference(revised))
+
+
+def test_tick_volume_fallback():
+    """測試：沒有 real_volume 時與 calculate_vppa 相同改用 tick_volume"""
+    df = make_candles(900, seed=4)
+    df['real_volume'] = 0.0
+    state = new_state()
+
+    for end in range(300, len(df) + 1, 50):
+        state.update(df.iloc[:end])
+
+    assert_same_result(state.snapshot(), reference(df))
+
+
+def test_insufficient_data():
+    """測試：K 線數量不足時拋出與 calculate_vppa 相同的錯誤"""
+    state = new_state()
+    state.update(make_candles(15))
+
+    with pytest.raises(ValueError) as exc_info:
+        state.snapshot()
+
+    assert "資料筆數" in str(exc_info.value)
+
+
+def test_update_and_snapshot_is_atomic():
+    """測試：多執行緒共用狀態時，update_and_snapshot 的結果對應自己餵入的 K 線"""
+    frames = [make_candles(300, seed=seed) for seed in (5, 6)]
+    expected = [reference(df)['pivot_summary'] for df in frames]
+    state = new_state()
+    mismatches = []
+
+    def worker(index):
+        for _ in range(20):
+            _, result = state.update_and_snapshot(frames[index], count=300)
+            if result['pivot_summary'] != expected[index]:
+                mismatches.append(index)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in (0, 1)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert mismatches == []
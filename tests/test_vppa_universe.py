@@ -0,0 +1,85 @@
+"""
+多商品 VPPA 批次計算單元測試
+"""
+
+import pytest
+import numpy as np
+from pathlib import Path
+import tempfile
+
+from src.core.sqlite_cache import SQLiteCacheManager
+from src.agent.indicators import calculate_vppa
+from src.agent.vppa_universe import compute_vppa_universe, load_universe_symbols
+
+
+SYMBOLS = ['GOLD', 'SILVER', 'EURUSD']
+PARAMS = {'pivot_length': 10, 'price_levels': 27, 'value_area_pct': 0.67}
+
+
+def make_rates(n, seed):
+    """建立隨機走勢的 M1 K 線（MT5 rates 結構化陣列）"""
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.normal(0, 0.5, n).cumsum()
+
+    rates = np.zeros(n, dtype=SQLiteCacheManager.RATES_DTYPE)
+    rates['time'] = 1704067200 + np.arange(n) * 60
+    rates['open'] = close
+    rates['close'] = close
+    rates['high'] = close + rng.exponential(0.3, n)
+    rates['low'] = close - rng.exponential(0.3, n)
+    rates['tick_volume'] = rng.integers(1, 500, n)
+    rates['real_volume'] = rng.integers(0, 5000, n)
+    return rates
+
+
+@pytest.fixture
+def cache_manager():
+    """建立含三個商品 K 線的快取"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = SQLiteCacheManager(db_path=str(Path(tmp_dir) / 'universe.db'))
+        for seed, symbol in enumerate(SYMBOLS):
+            manager.bulk_insert_candles(make_rates(1500, seed), symbol, 'M1')
+        yield manager
+        manager.close()
+
+
+def expected_vppa(cache_manager, symbol, count):
+    df = cache_manager.query_latest(symbol, 'M1', count).set_index('time')
+    return calculate_vppa(df, **PARAMS)
+
+
+@pytest.mark.parametrize('max_workers', [0, 2])
+def test_universe_matches_single_symbol(cache_manager, max_workers):
+    """測試：批次結果與逐一計算相同，並回報未知商品"""
+    results = list(compute_vppa_universe(
+        SYMBOLS + ['UNKNOWN'], 'M1', PARAMS,
+        cache=cache_manager, count=1200, max_workers=max_workers
+    ))
+
+    by_symbol = {result['symbol']: result for result in results}
+    assert set(by_symbol) == set(SYMBOLS + ['UNKNOWN'])
+    assert not by_symbol['UNKNOWN']['success']
+
+    for symbol in SYMBOLS:
+        result = by_symbol[symbol]
+        expected = expected_vppa(cache_manager, symbol, 1200)
+
+        assert result['success'] and result['bars'] == 1200
+        assert result['vppa']['metadata'] == expected['metadata']
+        assert result['vppa']['pivot_summary'] == expected['pivot_summary']
+        assert result['levels']['poc'] == expected['developing_range']['poc']['price']
+        assert result['levels']['vah'] == expected['developing_range']['vah']
+
+
+def test_invalid_params(cache_manager):
+    """測試：未知參數"""
+    with pytest.raises(ValueError):
+        list(compute_vppa_universe(SYMBOLS, 'M1', {'length': 10}, cache=cache_manager))
+
+
+def test_load_universe_symbols(tmp_path):
+    """測試：讀取 symbols.txt 格式的商品清單"""
+    symbols_file = tmp_path / 'symbols.txt'
+    symbols_file.write_text("# 註解\nGOLD -> Gold\n\nSILVER -> Silver\n", encoding='utf-8')
+
+    assert load_universe_symbols(str(symbols_file)) == ['GOLD', 'SILVER']